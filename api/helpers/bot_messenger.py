@@ -7,6 +7,7 @@
 # Supabase Realtime delivers them to connected frontends automatically.
 
 from api.supabase_client import supabase
+from api.services import unread_counters
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -97,6 +98,7 @@ def post_bot_message(
 
         if result.data and len(result.data) > 0:
             msg_id = result.data[0].get("id", "?")
+            unread_counters.record_message(result.data[0])
             print(f"[BotMessenger] Message posted OK | id={msg_id} | {target}")
             return result.data[0]
 
@@ -8,6 +8,7 @@
 
 import logging
 from api.supabase_client import supabase
+from api.services import unread_counters
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -98,6 +99,7 @@ def post_daneel_message(
 
         if result.data and len(result.data) > 0:
             msg_id = result.data[0].get("id", "?")
+            unread_counters.record_message(result.data[0])
             logger.info("[DaneelMessenger] Message posted OK | id=%s | %s", msg_id, target)
             return result.data[0]
 
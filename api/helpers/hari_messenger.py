@@ -8,6 +8,7 @@
 
 import logging
 from api.supabase_client import supabase
+from api.services import unread_counters
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -97,6 +98,7 @@ def post_hari_message(
 
         if result.data and len(result.data) > 0:
             msg_id = result.data[0].get("id", "?")
+            unread_counters.record_message(result.data[0])
             logger.info("[HariMessenger] Message posted OK | id=%s | %s", msg_id, target)
             return result.data[0]
 
@@ -504,6 +504,10 @@ async def _start_memory_manager():
                 # Clean stale caches across modules
                 _purge_stale_caches()
 
+                # Abandoned Vault chunked uploads (disk, off the event loop)
+                from api.services.vault_service import cleanup_stale_uploads
+                await asyncio.to_thread(cleanup_stale_uploads)
+
                 if collected > 100:
                     _mem_logger.info("[MEM-GC] Collected %d objects", collected)
             except Exception as e:
@@ -512,6 +516,67 @@ async def _start_memory_manager():
     _memory_task = asyncio.create_task(_memory_loop())
 
 
+# ========================================
+# Telemetry: batched ai_usage / ocr_metrics writers
+# ========================================
+
+@app.on_event("startup")
+async def _start_telemetry_flushers():
+    """Background bulk flush for telemetry rows (see telemetry_buffer.py)."""
+    from api.services.telemetry_buffer import start_all
+    start_all()
+
+
+@app.on_event("shutdown")
+async def _stop_telemetry_flushers():
+    """Drain queued telemetry rows before the worker exits."""
+    from api.services.telemetry_buffer import stop_all
+    await stop_all()
+
+
+# ========================================
+# Push notifications: fan-out pipeline
+# ========================================
+
+@app.on_event("startup")
+async def _start_notification_pipeline():
+    """Workers for push-notification fan-out (see notification_pipeline.py)."""
+    from api.services.notification_pipeline import start
+    start()
+
+
+@app.on_event("shutdown")
+async def _stop_notification_pipeline():
+    """Finish queued push fan-outs before the worker exits."""
+    from api.services.notification_pipeline import stop
+    await stop()
+
+
+# ========================================
+# Messages: live event hub (/messages/stream)
+# ========================================
+
+@app.on_event("startup")
+async def _start_message_events():
+    """Bind the message event hub to this loop (and LISTEN when on postgres)."""
+    from api.services.message_events import start
+    await start()
+
+
+@app.on_event("shutdown")
+async def _stop_message_events():
+    """Tell open streams to resync elsewhere and close the LISTEN connection."""
+    from api.services.message_events import stop
+    await stop()
+
+
+@app.on_event("shutdown")
+async def _close_qbo_client():
+    """Close the pooled QuickBooks HTTP client."""
+    from services.qbo_service import close_http_client
+    await close_http_client()
+
+
 @app.on_event("shutdown")
 async def _stop_memory_manager():
     """Cancel the memory management loop on shutdown."""
@@ -570,6 +635,13 @@ def _purge_stale_caches():
     except Exception:
         pass
 
+    # --- gpt_cache: expired prompt-cache entries ---
+    try:
+        from api.services.gpt_cache import response_cache
+        response_cache.purge_expired()
+    except Exception:
+        pass
+
     # --- agent_attention: expired sessions ---
     try:
         from api.services.agent_attention import cleanup
@@ -577,6 +649,13 @@ def _purge_stale_caches():
     except Exception:
         pass
 
+    # --- calendar_feed_cache: rendered ICS feeds + feed tokens past TTL ---
+    try:
+        from api.services.calendar_feed_cache import purge_expired
+        purge_expired()
+    except Exception:
+        pass
+
 
 # ========================================
 # Debug: Memory monitoring endpoint
@@ -621,17 +700,63 @@ async def debug_memory():
         cache_sizes["company_knowledge._cache"] = len(_cache)
     except Exception:
         pass
+    try:
+        from api.services.gpt_cache import response_cache
+        cache_sizes["gpt_cache.response_cache"] = len(response_cache)
+    except Exception:
+        pass
+    try:
+        from api.routers.calendar import _occurrence_cache
+        cache_sizes["calendar._occurrence_cache"] = len(_occurrence_cache)
+    except Exception:
+        pass
+    try:
+        from api.services.calendar_feed_cache import stats as calendar_feed_stats
+        cache_sizes["calendar_feed_cache"] = calendar_feed_stats()
+    except Exception:
+        pass
+    try:
+        from api.services.pipeline_lookups import stats as pipeline_lookup_stats
+        cache_sizes["pipeline_lookups"] = pipeline_lookup_stats()
+    except Exception:
+        pass
+    try:
+        from api.services.my_work_projection import stats as my_work_stats
+        cache_sizes["my_work_projection"] = my_work_stats()
+    except Exception:
+        pass
+    try:
+        from api.services.dependency_graph import stats as dependency_graph_stats
+        cache_sizes["dependency_graph"] = dependency_graph_stats()
+    except Exception:
+        pass
     try:
         from api.services.agent_attention import get_active_sessions_count
         cache_sizes["agent_attention.sessions"] = get_active_sessions_count()
     except Exception:
         pass
 
+    telemetry = {}
+    try:
+        from api.services.telemetry_buffer import get_stats as telemetry_stats
+        telemetry = telemetry_stats()
+    except Exception:
+        pass
+
+    message_streams = {}
+    try:
+        from api.services.message_events import get_stats as message_event_stats
+        message_streams = message_event_stats()
+    except Exception:
+        pass
+
     return {
         "rss_mb": round(mem.rss / 1024 / 1024, 1),
         "vms_mb": round(mem.vms / 1024 / 1024, 1),
         "gc_counts": gc.get_count(),
         "cache_sizes": cache_sizes,
+        "telemetry": telemetry,
+        "message_streams": message_streams,
     }
 
 
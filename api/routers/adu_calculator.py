@@ -209,7 +209,7 @@ async def analyze_screenshot(
         # Call GPT-5.2 Vision
         from api.services.ai_usage import ai_context
         with ai_context(feature="adu"):
-            raw = gpt.heavy(
+            raw = await gpt.heavy_async(
                 system=prompt_with_label,
                 user=[{"type": "image_url", "image_url": {
                     "url": f"data:{media_type};base64,{img_b64}",
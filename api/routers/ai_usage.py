@@ -16,6 +16,9 @@ from fastapi import APIRouter, Depends, Query
 from api.auth import get_current_user
 from api.supabase_client import supabase
 from api.services.ai_usage import PRICING
+from api.services.gpt_cache import response_cache
+from api.services.gpt_limits import get_stats as gpt_stats
+from api.services.telemetry_buffer import get_stats as telemetry_stats
 
 router = APIRouter(prefix="/ai-usage", tags=["ai-usage"])
 
@@ -96,6 +99,8 @@ async def summary(days: int = Query(30, ge=1, le=365),
         "daily": _flatten(by_day, "date", sort_by_key=True),
         "pricing": {m: {"input_per_1m": p[0], "output_per_1m": p[1]} for m, p in PRICING.items()},
         "capped": len(rows) >= _MAX_ROWS,
+        # Prompt cache effectiveness for this worker since start (in-memory).
+        "cache": response_cache.stats(),
     }
 
 
@@ -112,3 +117,11 @@ async def recent(limit: int = Query(50, ge=1, le=200),
         .data
     ) or []
     return {"items": rows}
+
+
+@router.get("/live")
+async def live(current_user: dict = Depends(get_current_user)):
+    """Per-model client gate counters for this worker process (in-flight,
+    queued, retries, throttled waits) plus telemetry writer backlog/drops.
+    In-memory; resets on deploy."""
+    return {"models": gpt_stats(), "telemetry": telemetry_stats()}
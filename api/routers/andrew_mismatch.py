@@ -114,11 +114,12 @@ async def run_follow_up_check():
     - 72h: marked as stale
     """
     from api.services.andrew_smart_layer import check_pending_followups, execute_followups
+    import asyncio
     try:
         pending = check_pending_followups()
         if not pending:
             return {"ok": True, "message": "No follow-ups needed", "stats": {}}
-        stats = execute_followups(pending)
+        stats = await asyncio.to_thread(execute_followups, pending)
         return {
             "ok": True,
             "receipts_checked": len(pending),
@@ -10,6 +10,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+import asyncio
 import re
 import json
 import time
@@ -23,7 +24,7 @@ from api.services.agent_access import roles_for
 
 # Importar el engine de Arturito
 from services.arturito import (
-    interpret_message,
+    interpret_message_async,
     route,
     route_slash_command,
     set_personality_level,
@@ -152,7 +153,7 @@ async def receive_message(message: ChatMessage):
         if slash_match:
             command = slash_match.group(1)
             args = (slash_match.group(2) or "").strip()
-            result = route_slash_command(command, args, context)
+            result = await asyncio.to_thread(route_slash_command, command, args, context)
             return BotResponse(
                 text=result.get("text", ""),
                 action=result.get("action"),
@@ -165,9 +166,9 @@ async def receive_message(message: ChatMessage):
         if not clean_text:
             clean_text = text
 
-        # Interpretar y rutear
-        intent_result = interpret_message(clean_text, context)
-        response = route(intent_result, context)
+        # Interpretar y rutear (route() y sus handlers son sync: van a un thread)
+        intent_result = await interpret_message_async(clean_text, context)
+        response = await asyncio.to_thread(route, intent_result, context)
 
         return BotResponse(
             text=response.get("text", ""),
@@ -196,7 +197,7 @@ async def receive_slash_command(command: SlashCommand):
             "space_id": command.space_id or command.space_name or "default",
         }
 
-        result = route_slash_command(command.command, command.args or "", context)
+        result = await asyncio.to_thread(route_slash_command, command.command, command.args or "", context)
 
         return BotResponse(
             text=result.get("text", ""),
@@ -291,7 +292,7 @@ async def web_chat(
         if slash_match:
             command = slash_match.group(1)
             args = (slash_match.group(2) or "").strip()
-            result = route_slash_command(command, args, context)
+            result = await asyncio.to_thread(route_slash_command, command, args, context)
             return BotResponse(
                 text=result.get("text", ""),
                 action=result.get("action"),
@@ -317,11 +318,12 @@ async def web_chat(
                 )
 
         # Interpretar mensaje
-        intent_result = interpret_message(text, context)
+        intent_result = await interpret_message_async(text, context)
 
         # Para intents conversacionales, usar Assistants API
         if intent_result.get("intent") in ["SMALL_TALK", "GREETING", "UNKNOWN"]:
-            response_text, thread_id, error = send_message_and_get_response(
+            response_text, thread_id, error = await asyncio.to_thread(
+                send_message_and_get_response,
                 session_id=session_id,
                 message=text,
                 personality_level=personality_level,
@@ -344,7 +346,7 @@ async def web_chat(
             from api.supabase_client import supabase
             response = await route_async(intent_result, context, db_client=supabase)
         else:
-            response = route(intent_result, context)
+            response = await asyncio.to_thread(route, intent_result, context)
 
         if response.get("error"):
             logger_art.warning("[ART] Route handler error: %s", response.get('error'))
@@ -869,7 +871,7 @@ async def interpret_intent(request: IntentRequest, current_user: dict = Depends(
         if account_groups:
             system_prompt += f"\nACCOUNT GROUPS (budget categories): {', '.join(account_groups)}\n"
 
-        raw = gpt.mini(system_prompt, request.text[:500], json_mode=True, max_tokens=200)
+        raw = await gpt.mini_async(system_prompt, request.text[:500], json_mode=True, max_tokens=200)
         if not raw:
             return IntentResponse(type="chat")
 
@@ -954,7 +956,7 @@ For filter_account, extract the account/category name from the command.
 If you can't interpret the command as a filter action, return:
 {"action": null, "value": null, "message": null}"""
 
-        result_text = gpt.mini(system_prompt, request.text[:500], json_mode=True, max_tokens=150)
+        result_text = await gpt.mini_async(system_prompt, request.text[:500], json_mode=True, max_tokens=150)
         if not result_text:
             return FilterInterpretResponse(understood=False)
 
@@ -1018,7 +1020,7 @@ Response format:
 
 If no semantic match is found, return: {{"matches": [], "reasoning": "no match"}}"""
 
-        result_text = gpt.mini(system_prompt, f"Find accounts matching: {query[:200]}", json_mode=True, max_tokens=200)
+        result_text = await gpt.mini_async(system_prompt, f"Find accounts matching: {query[:200]}", json_mode=True, max_tokens=200)
         if not result_text:
             return []
 
@@ -22,10 +22,13 @@ Migration: C:\\Users\\germa\\Desktop\\NGM_API\\sql\\create_calendar_events.sql
 """
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import secrets
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
@@ -35,8 +38,9 @@ from pydantic import BaseModel, Field
 from fastapi.responses import RedirectResponse
 
 from api.auth import get_current_user
-from api.services.notifications_feed import create_notifications
-from api.services.rrule_lite import expand_occurrences, next_occurrence, parse_rrule
+from api.services.notifications_feed import create_notifications, create_notifications_batch
+from api.services.rrule_lite import expand_occurrences, parse_rrule, with_until
+from api.services import calendar_feed_cache, calendar_reminders
 from api.services import google_calendar as gcal
 from api.supabase_client import supabase
 
@@ -376,18 +380,28 @@ async def list_events(
     project_id: Optional[str] = Query(None),
     user_id: Optional[str] = Query(None, description="Filter to events the given user attends or created"),
     company_id: Optional[str] = Query(None, description="Scope to the active workspace (its events plus shared NULL ones). Omit for all."),
+    expand: bool = Query(False, description="Return one entry per recurring occurrence in [from, to] instead of the series master"),
     current_user: dict = Depends(get_current_user),
 ):
     """List events overlapping [from, to] (inclusive). Visibility-filtered for
     the current user. `project_id` narrows to a single project. `user_id`
     narrows to a single attendee/creator. `company_id` scopes to the active
-    workspace (events tagged to it plus shared/untagged ones)."""
+    workspace (events tagged to it plus shared/untagged ones).
+
+    With `expand=true` (and both bounds set) recurring series are expanded
+    server-side: each occurrence overlapping the window comes back as a copy
+    of the master with its own start_at/end_at and `occurrence_start`."""
     try:
         me = str(current_user.get("user_id") or "")
+        window = None
+        if expand and from_ and to:
+            window = (_parse_iso(from_), _parse_iso(to))
+            if None in window:
+                raise HTTPException(status_code=400, detail="from/to must be ISO 8601 timestamps")
 
         # Two queries unioned client-side so recurring events whose master row
-        # starts before `from_` are still included (the frontend will expand
-        # the rrule into the visible window).
+        # starts before `from_` are still included (the frontend expands the
+        # rrule into the visible window unless expand=true).
         one_off = supabase.table("calendar_events").select("*").is_("rrule", "null")
         recurring = supabase.table("calendar_events").select("*").not_.is_("rrule", "null")
         if from_:
@@ -437,9 +451,17 @@ async def list_events(
             eid = str(r["event_id"])
             atts = attendees_by_event.get(eid, [])
             attendee_set = {a["user_id"] for a in atts}
-            if _can_see_event(r, me, attendee_set):
-                visible.append(_serialize_event(r, atts, sync_by_event.get(eid)))
-
+            if not _can_see_event(r, me, attendee_set):
+                continue
+            event = _serialize_event(r, atts, sync_by_event.get(eid))
+            if expand and window and r.get("rrule"):
+                visible.extend(_expand_event(event, r, *window))
+            else:
+                visible.append(event)
+
+        if expand and window:
+            visible.sort(key=lambda e: _parse_iso(e["start_at"]) or window[0])
+            return {"events": visible, "expanded": True}
         return {"events": visible}
     except HTTPException:
         raise
@@ -448,6 +470,60 @@ async def list_events(
         raise HTTPException(status_code=500, detail=f"Error listing events: {e}")
 
 
+# Occurrence starts per (series version, window). The key carries every field
+# the expansion depends on, so an edited series simply stops matching; the
+# OrderedDict is trimmed LRU-style.
+_OCCURRENCE_CACHE_MAX = 2000
+_occurrence_cache: "OrderedDict[tuple, List[datetime]]" = OrderedDict()
+
+
+def _series_occurrences(row: dict, window_start: datetime, window_end: datetime) -> Optional[List[datetime]]:
+    """Occurrence starts of a recurring row overlapping [window_start, window_end].
+    None when the row's rrule can't be parsed (treat it as a one-off)."""
+    key = (
+        str(row.get("event_id")), row.get("start_at"), row.get("end_at"),
+        row.get("rrule"), row.get("rrule_until"),
+        window_start.isoformat(), window_end.isoformat(),
+    )
+    hit = _occurrence_cache.get(key)
+    if hit is not None:
+        _occurrence_cache.move_to_end(key)
+        return hit
+
+    rule = parse_rrule(row.get("rrule"))
+    start = _parse_iso(row.get("start_at"))
+    if not rule or not start:
+        return None
+    end = _parse_iso(row.get("end_at")) or start
+    # An occurrence overlaps the window if it starts up to one duration before it.
+    occs = expand_occurrences(
+        with_until(rule, _parse_iso(row.get("rrule_until"))),
+        start, window_start - max(end - start, timedelta(0)), window_end,
+    )
+    _occurrence_cache[key] = occs
+    if len(_occurrence_cache) > _OCCURRENCE_CACHE_MAX:
+        _occurrence_cache.popitem(last=False)
+    return occs
+
+
+def _expand_event(event: dict, row: dict, window_start: datetime, window_end: datetime) -> List[dict]:
+    """One serialized copy of `event` per occurrence in the window."""
+    occs = _series_occurrences(row, window_start, window_end)
+    if occs is None:
+        return [event]
+    start = _parse_iso(row.get("start_at"))
+    duration = (_parse_iso(row.get("end_at")) or start) - start
+    return [
+        {
+            **event,
+            "start_at": occ.isoformat(),
+            "end_at": (occ + duration).isoformat(),
+            "occurrence_start": occ.isoformat(),
+        }
+        for occ in occs
+    ]
+
+
 @router.get("/events/{event_id}")
 async def get_event(event_id: str, current_user: dict = Depends(get_current_user)):
     try:
@@ -505,6 +581,7 @@ async def create_event(payload: EventCreate, current_user: dict = Depends(get_cu
             raise HTTPException(status_code=500, detail="Insert returned no row")
         created = res.data[0]
         event_id = str(created["event_id"])
+        calendar_reminders.refresh([created])
 
         clean_attendees: List[str] = []
         if payload.attendee_user_ids:
@@ -535,6 +612,7 @@ async def create_event(payload: EventCreate, current_user: dict = Depends(get_cu
             if refreshed.data:
                 final_row = refreshed.data[0]
 
+        calendar_feed_cache.invalidate()
         atts = _fetch_attendees([event_id]).get(event_id, [])
         sync = _fetch_sync_mappings([event_id]).get(event_id)
         return _serialize_event(final_row, atts, sync)
@@ -606,6 +684,8 @@ async def update_event(event_id: str, payload: EventUpdate, current_user: dict =
         refreshed = (
             supabase.table("calendar_events").select("*").eq("event_id", event_id).limit(1).execute()
         )
+        if any(f in update for f in calendar_reminders.SCHEDULE_FIELDS):
+            calendar_reminders.refresh(refreshed.data)
         atts = _fetch_attendees([event_id]).get(event_id, [])
 
         # Notify any NEWLY-added attendees (not the full set on every PATCH).
@@ -640,6 +720,7 @@ async def update_event(event_id: str, payload: EventUpdate, current_user: dict =
         except Exception:
             logger.exception("push_event after update failed")
 
+        calendar_feed_cache.invalidate()
         sync = _fetch_sync_mappings([event_id]).get(event_id)
         return _serialize_event(final_row, atts, sync)
     except HTTPException:
@@ -669,6 +750,7 @@ async def delete_event(event_id: str, current_user: dict = Depends(get_current_u
         except Exception:
             logger.exception("push_delete failed")
         supabase.table("calendar_events").delete().eq("event_id", event_id).execute()
+        calendar_feed_cache.invalidate()
         return {"ok": True}
     except HTTPException:
         raise
@@ -706,6 +788,7 @@ async def update_attendee_status(
             "status": status,
             "responded_at": responded_at,
         }, on_conflict="event_id,user_id").execute()
+        calendar_feed_cache.invalidate()
 
         atts = _fetch_attendees([event_id]).get(event_id, [])
         return {"attendees": atts}
@@ -807,26 +890,40 @@ async def export_event_ics(event_id: str, current_user: dict = Depends(get_curre
     )
 
 
-@router.get("/feed.ics")
-async def export_feed_ics(token: str = Query(..., min_length=16)):
-    """Public ICS subscription feed keyed by token. No JWT — the token IS auth.
+def _feed_response(request: Request, entry: dict) -> Response:
+    """200 / 304 for a rendered feed. Strong ETag per encoding (identity vs
+    gzip); If-None-Match wins over If-Modified-Since as in RFC 9110."""
+    use_gzip = "gzip" in (request.headers.get("accept-encoding") or "").lower()
+    etag = entry["etag_gzip"] if use_gzip else entry["etag"]
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(entry["last_modified"], usegmt=True),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
 
-    Returns every event the token's user can see (team + their own + project),
-    over a 1-year forward window. Recurring events keep their RRULE so the
-    subscriber expands them locally."""
-    tok = supabase.table("user_calendar_tokens").select("user_id").eq("token", token).limit(1).execute()
-    if not tok.data:
-        raise HTTPException(status_code=404, detail="Feed token not found")
-    user_id = str(tok.data[0]["user_id"])
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {t.strip() for t in inm.split(",")}
+        if tags & {entry["etag"], entry["etag_gzip"], "*"}:
+            return Response(status_code=304, headers=headers)
+    else:
+        ims = request.headers.get("if-modified-since")
+        if ims:
+            try:
+                if int(parsedate_to_datetime(ims).timestamp()) >= entry["last_modified"]:
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
 
-    # Touch last_used_at (best-effort).
-    try:
-        supabase.table("user_calendar_tokens").update(
-            {"last_used_at": datetime.now(timezone.utc).isoformat()}
-        ).eq("token", token).execute()
-    except Exception:
-        pass
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry["gzip"], media_type="text/calendar; charset=utf-8", headers=headers)
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
 
+
+def _render_feed(user_id: str) -> str:
+    """Every event `user_id` can see over a 1-year forward window, as ICS."""
     now = datetime.now(timezone.utc)
     horizon = now + timedelta(days=365)
 
@@ -863,8 +960,28 @@ async def export_feed_ics(token: str = Query(..., min_length=16)):
             continue
         visible_lines.extend(_ics_lines_for_event(r))
 
-    body = _ics_envelope(visible_lines)
-    return Response(content=body, media_type="text/calendar; charset=utf-8")
+    return _ics_envelope(visible_lines)
+
+
+@router.get("/feed.ics")
+async def export_feed_ics(request: Request, token: str = Query(..., min_length=16)):
+    """Public ICS subscription feed keyed by token. No JWT — the token IS auth.
+
+    Returns every event the token's user can see (team + their own + project),
+    over a 1-year forward window. Recurring events keep their RRULE so the
+    subscriber expands them locally.
+
+    Polls are served from calendar_feed_cache (rebuilt after any event or
+    attendee change) with ETag / Last-Modified revalidation and gzip."""
+    user_id = calendar_feed_cache.resolve_token(token)
+    if not user_id:
+        raise HTTPException(status_code=404, detail="Feed token not found")
+
+    entry = calendar_feed_cache.get(user_id)
+    if entry is None:
+        gen = calendar_feed_cache.generation()
+        entry = calendar_feed_cache.put(user_id, _render_feed(user_id), gen)
+    return _feed_response(request, entry)
 
 
 class FeedTokenCreate(BaseModel):
@@ -926,6 +1043,7 @@ async def revoke_feed_token(label: str, current_user: dict = Depends(get_current
         supabase.table("user_calendar_tokens").delete().eq("user_id", me).eq("label", label).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not revoke token: {e}")
+    calendar_feed_cache.forget_user_tokens(me)
     return {"ok": True}
 
 
@@ -936,141 +1054,138 @@ async def revoke_feed_token(label: str, current_user: dict = Depends(get_current
 #   curl -fsSL -H "X-Cron-Secret: $NGM_CRON_SECRET" \
 #       https://ngm-fastapi.onrender.com/calendar/cron/dispatch-reminders
 #
-# The endpoint walks calendar_events with reminder_minutes set and emits
-# notifications for occurrences whose reminder time falls in the lookback
-# window. Idempotency via calendar_reminder_log.
+# The endpoint reads events whose materialized next_reminder_at is due (one
+# range query on idx_calendar_events_next_reminder), claims them in
+# calendar_reminder_log (idempotency), notifies every claimed event's
+# attendees with one attendee read and one notifications insert, then
+# advances each event's schedule to its next occurrence.
+
+_REMINDER_SWEEP_LIMIT = 500
+
 
 @router.get("/cron/dispatch-reminders")
 @router.post("/cron/dispatch-reminders")
 async def dispatch_reminders(request: Request):
-    """Sweep events whose reminder fires in the last ~lookback_seconds window
-    and emit notifications. Idempotent via calendar_reminder_log."""
+    """Fire reminders whose next_reminder_at is due and emit notifications.
+    Reminders older than ~lookback_seconds (missed while the cron was down)
+    are skipped, not fired late. Idempotent via calendar_reminder_log."""
     _require_cron(request)
 
     lookback_seconds = int(request.query_params.get("lookback_seconds") or 90)
     now = datetime.now(timezone.utc)
     floor = now - timedelta(seconds=lookback_seconds)
-    horizon = now + timedelta(days=60)  # how far ahead to look for next recurring occurrence
 
-    # Candidate events: reminder set, not yet ended (one-off) OR rrule_until not yet passed.
     res = (
         supabase.table("calendar_events").select("*")
-        .not_.is_("reminder_minutes", "null")
+        .lte("next_reminder_at", now.isoformat())
+        .order("next_reminder_at")
+        .limit(_REMINDER_SWEEP_LIMIT)
         .execute()
     )
-    candidates = res.data or []
+    due = res.data or []
+
+    # Split fresh reminders from stale ones; both get their schedule advanced.
+    fire: List[tuple] = []
+    stale = 0
+    for row in due:
+        fire_at = _parse_iso(row.get("next_reminder_at"))
+        occurrence = _parse_iso(row.get("next_reminder_occurrence"))
+        if fire_at is None or occurrence is None or fire_at <= floor:
+            stale += 1
+            continue
+        fire.append((row, occurrence))
 
-    dispatched = 0
+    # Claim all occurrences in one insert; ON CONFLICT DO NOTHING returns only
+    # the rows this run inserted, so overlapping runs never double-fire.
+    claimed: List[tuple] = []
     errors = 0
-
-    for row in candidates:
+    if fire:
         try:
-            event_id = str(row["event_id"])
-            reminder = int(row.get("reminder_minutes") or 0)
-            if reminder <= 0:
-                continue
-
-            occurrence = _next_due_occurrence(row, floor, now, horizon, reminder)
-            if occurrence is None:
-                continue
-
-            # Idempotent insert; PK conflict means already dispatched.
-            try:
-                supabase.table("calendar_reminder_log").insert({
-                    "event_id": event_id,
-                    "occurrence_at": occurrence.isoformat(),
-                }).execute()
-            except Exception:
-                # Already dispatched for this (event, occurrence) — skip.
-                continue
-
-            atts = _fetch_attendees([event_id]).get(event_id, [])
-            recipients = list({a["user_id"] for a in atts} | {str(row.get("created_by"))})
-            preview_when = occurrence.strftime("%Y-%m-%d %H:%M UTC")
-            create_notifications(
-                recipients,
-                type="event_reminder",
-                module="calendar",
-                actor_id=None,
-                reference_type="calendar_event",
-                reference_id=event_id,
-                deep_link="/calendar",
-                preview=f"Reminder: {row.get('title') or 'Event'} — {preview_when}",
-                context={
-                    "event_id": event_id,
-                    "occurrence_at": occurrence.isoformat(),
-                    "reminder_minutes": reminder,
-                },
+            log = (
+                supabase.table("calendar_reminder_log")
+                .upsert(
+                    [{"event_id": str(r["event_id"]), "occurrence_at": occ.isoformat()} for r, occ in fire],
+                    on_conflict="event_id,occurrence_at",
+                    ignore_duplicates=True,
+                )
+                .execute()
             )
-
-            # Also push to devices (best-effort) so reminders actually ping the
-            # phone/desktop, not just the in-app bell. Push failure never blocks.
+            won = {str(x.get("event_id")) for x in (log.data or [])}
+            claimed = [(r, occ) for r, occ in fire if str(r["event_id"]) in won]
+        except Exception:
+            # Leave the schedule untouched so the next tick retries.
+            logger.exception("dispatch_reminders: claim failed for %d events", len(fire))
+            return {
+                "ok": False,
+                "now": now.isoformat(),
+                "lookback_seconds": lookback_seconds,
+                "scanned": len(due),
+                "dispatched": 0,
+                "stale": stale,
+                "errors": len(fire),
+            }
+
+    attendees = _fetch_attendees([str(r["event_id"]) for r, _ in claimed])
+    batch: List[dict] = []
+    pushes: List[tuple] = []
+    for row, occurrence in claimed:
+        event_id = str(row["event_id"])
+        recipients = list(
+            {a["user_id"] for a in attendees.get(event_id, [])} | {str(row.get("created_by"))}
+        )
+        preview_when = occurrence.strftime("%Y-%m-%d %H:%M UTC")
+        batch.append({
+            "recipient_ids": recipients,
+            "type": "event_reminder",
+            "module": "calendar",
+            "actor_id": None,
+            "reference_type": "calendar_event",
+            "reference_id": event_id,
+            "deep_link": "/calendar",
+            "preview": f"Reminder: {row.get('title') or 'Event'} — {preview_when}",
+            "context": {
+                "event_id": event_id,
+                "occurrence_at": occurrence.isoformat(),
+                "reminder_minutes": row.get("reminder_minutes"),
+            },
+        })
+        pushes.append((event_id, recipients, f"{row.get('title') or 'Event'} — {preview_when}"))
+    create_notifications_batch(batch)
+
+    # Also push to devices (best-effort) so reminders actually ping the
+    # phone/desktop, not just the in-app bell. Push failure never blocks.
+    if pushes:
+        from api.services.firebase_notifications import send_push_to_users
+        for event_id, recipients, body in pushes:
             try:
-                from api.services.firebase_notifications import send_push_notification
-                for rid in recipients:
-                    await send_push_notification(
-                        rid,
-                        title="Event reminder",
-                        body=f"{row.get('title') or 'Event'} — {preview_when}",
-                        data={"event_id": event_id, "deep_link": "/calendar"},
-                        tag=f"event-reminder-{event_id}",
-                    )
+                await send_push_to_users(
+                    recipients,
+                    title="Event reminder",
+                    body=body,
+                    data={"event_id": event_id, "deep_link": "/calendar"},
+                    tag=f"event-reminder-{event_id}",
+                )
             except Exception:
+                errors += 1
                 logger.exception("dispatch_reminders: push failed for event %s", event_id)
 
-            dispatched += 1
-        except Exception:
-            errors += 1
-            logger.exception("dispatch_reminders: failed for event %s", row.get("event_id"))
+    # Advance every due event (fired, lost the claim, or stale) past `now`.
+    calendar_reminders.save_schedules(
+        {"event_id": str(row["event_id"]), **calendar_reminders.schedule_fields(row, now)}
+        for row in due
+    )
 
     return {
         "ok": True,
         "now": now.isoformat(),
         "lookback_seconds": lookback_seconds,
-        "scanned": len(candidates),
-        "dispatched": dispatched,
+        "scanned": len(due),
+        "dispatched": len(claimed),
+        "stale": stale,
         "errors": errors,
     }
 
 
-def _next_due_occurrence(
-    row: dict,
-    floor: datetime,
-    now: datetime,
-    horizon: datetime,
-    reminder_minutes: int,
-) -> Optional[datetime]:
-    """Return the occurrence whose reminder fires in (floor, now]. Handles both
-    one-off events (start_at) and recurring events (rrule expansion)."""
-    start = _parse_iso(row.get("start_at"))
-    if not start:
-        return None
-    rrule = row.get("rrule")
-    delta = timedelta(minutes=reminder_minutes)
-
-    if not rrule:
-        fire_at = start - delta
-        if floor < fire_at <= now:
-            return start
-        return None
-
-    rule = parse_rrule(rrule)
-    if not rule:
-        # Stored rrule was malformed; treat as one-off.
-        fire_at = start - delta
-        if floor < fire_at <= now:
-            return start
-        return None
-
-    # Find the first occurrence whose fire_at falls in window.
-    occurrences = expand_occurrences(rule, start, floor, horizon)
-    for occ in occurrences:
-        fire_at = occ - delta
-        if floor < fire_at <= now:
-            return occ
-    return None
-
-
 def _parse_iso(value: Optional[str]) -> Optional[datetime]:
     if not value:
         return None
@@ -1178,19 +1293,10 @@ async def cron_google_sync(request: Request):
     if not gcal.is_google_configured():
         return {"ok": False, "configured": False, "reason": "Google OAuth not configured"}
 
-    users_res = supabase.table("google_calendar_tokens").select("user_id").execute()
-    users = [str(r["user_id"]) for r in (users_res.data or [])]
-
-    totals = {"users": len(users), "created": 0, "updated": 0, "deleted": 0, "skipped": 0, "errors": 0}
-    for uid in users:
-        try:
-            counts = gcal.pull_sync(uid)
-            for k in ("created", "updated", "deleted", "skipped"):
-                totals[k] += int(counts.get(k) or 0)
-        except Exception:
-            totals["errors"] += 1
-            logger.exception("cron_google_sync: pull_sync failed for %s", uid)
-    return {"ok": True, **totals}
+    # Users are pulled concurrently (GOOGLE_SYNC_WORKERS) on a worker thread so
+    # the event loop stays free; per-user duration/counts come back in `users`.
+    result = await asyncio.to_thread(gcal.sync_users)
+    return {"ok": True, **result["totals"], "users": result["users"]}
 
 
 # ============================================================================
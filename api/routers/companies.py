@@ -6,6 +6,7 @@ from api.auth import require_internal, require_leadership, get_current_user
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from api.supabase_client import supabase
+from api.services import pipeline_lookups
 
 router = APIRouter(dependencies=[Depends(require_internal)], prefix="/companies", tags=["companies"])
 
@@ -102,6 +103,7 @@ async def create_company(company: CompanyCreate):
         insert_data = {k: v for k, v in insert_data.items() if v is not None}
 
         response = supabase.table("companies").insert(insert_data).execute()
+        pipeline_lookups.invalidate()
 
         created = response.data[0] if response.data else None
 
@@ -150,6 +152,7 @@ async def update_company(company_id: str, company: CompanyUpdate):
                 raise HTTPException(status_code=400, detail="Company name already in use")
 
         response = supabase.table("companies").update(update_data).eq("id", company_id).execute()
+        pipeline_lookups.invalidate()
 
         return {"message": "Company updated successfully", "data": response.data[0] if response.data else None}
     except HTTPException:
@@ -171,6 +174,7 @@ async def delete_company(company_id: str):
             raise HTTPException(status_code=404, detail="Company not found")
 
         response = supabase.table("companies").delete().eq("id", company_id).execute()
+        pipeline_lookups.invalidate()
 
         return {"message": "Company deleted successfully"}
     except HTTPException:
@@ -536,7 +536,7 @@ async def run_follow_up_check():
         pending = check_pending_followups(followup_h, escalation_h)
         if not pending:
             return {"ok": True, "message": "No follow-ups needed", "stats": {}}
-        stats = execute_followups(pending)
+        stats = await asyncio.to_thread(execute_followups, pending)
         return {
             "ok": True,
             "items_checked": len(pending),
@@ -2476,7 +2476,8 @@ async def parse_receipt(
                 correction_data = None
 
         # Delegate to shared service
-        result = _scan_receipt_core(
+        result = await asyncio.to_thread(
+            _scan_receipt_core,
             file_content=file_content,
             file_type=file.content_type,
             model=model,
@@ -11,17 +11,25 @@
 """
 
 import re
+import json
 import time
+import base64
+import hashlib
 import logging
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, File, UploadFile, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 from api.supabase_client import supabase, SUPABASE_URL
-from api.auth import get_current_user
-from api.services.firebase_notifications import notify_mentioned_users, notify_message_recipients
+from api.auth import get_current_user, require_internal
+from api.services.firebase_notifications import (
+    get_push_tokens_for_users, notify_mentioned_users, notify_message_recipients,
+)
 from api.services.agent_personas import is_bot_user, AGENT_PERSONAS, BOT_USER_IDS
+from api.services import message_events, notification_pipeline, unread_counters
 
 logger = logging.getLogger(__name__)
 
@@ -51,12 +59,18 @@ def _is_messages_admin(current_user: dict) -> bool:
         logger.debug("[messages] admin check failed for %s: %s", user_id, exc)
         return False
 
-# In-memory cache for unread-counts (per user_id): {user_id: {"data": {...}, "ts": float}}
+# In-memory cache for the get_unread_counts RPC fallback (per user_id):
+# {user_id: {"data": {...}, "ts": float}}. The normal path reads channel_unread_counts.
 # Cleanup: stale entries purged by _purge_stale_caches() in main.py every 5 min
 _unread_cache: Dict[str, dict] = {}
 _UNREAD_CACHE_TTL = 30  # seconds
 _UNREAD_CACHE_MAX = 100  # max entries to prevent unbounded growth
 
+# Role -> user_ids (and the messages admins) for scoping live events on
+# broadcast channels with read_roles. One users read per TTL, not per event.
+_role_audience_cache: Dict[str, Any] = {"ts": 0.0, "by_role": {}, "admins": set()}
+_ROLE_AUDIENCE_TTL = 60  # seconds
+
 # Chat attachments live in the existing public 'vault' bucket under a dedicated
 # prefix (no new bucket / RLS needed; writes use the service-role client).
 MESSAGE_ATTACHMENTS_BUCKET = "vault"
@@ -266,6 +280,92 @@ def get_attachments_for_messages(message_ids: List[str]) -> Dict[str, List[Dict[
         return {}
 
 
+# One request per page: sender, reactions, attachments and reply count are
+# embedded via their foreign keys. Falls back to the batched per-table lookups
+# if PostgREST cannot resolve the embeds (flag flips once per process).
+_MESSAGE_PAGE_SELECT = (
+    "*, users!user_id(user_name, avatar_color), "
+    "message_reactions(emoji, user_id), "
+    "message_attachments(id, name, type, size, url, thumbnail_url), "
+    "replies:messages!reply_to_id(count)"
+)
+_MESSAGE_BASIC_SELECT = "*, users!user_id(user_name, avatar_color)"
+_combined_hydration = True
+
+
+def get_thread_counts_for_messages(message_ids: List[str]) -> Dict[str, int]:
+    """Reply counts keyed by parent message_id — one query for a whole page."""
+    if not message_ids:
+        return {}
+    try:
+        result = supabase.table("messages") \
+            .select("reply_to_id") \
+            .in_("reply_to_id", message_ids) \
+            .execute()
+        out: Dict[str, int] = {}
+        for row in (result.data or []):
+            pid = str(row.get("reply_to_id"))
+            out[pid] = out.get(pid, 0) + 1
+        return out
+    except Exception:
+        return {}
+
+
+def _hydrate_embedded(row: Dict[str, Any]) -> Dict[str, Any]:
+    """normalize_message for a row fetched with _MESSAGE_PAGE_SELECT."""
+    reactions: Dict[str, List[str]] = {}
+    for r in (row.pop("message_reactions", None) or []):
+        reactions.setdefault(r.get("emoji"), []).append(str(r.get("user_id")))
+    attachments = row.pop("message_attachments", None) or []
+    replies = row.pop("replies", None) or []
+    msg = normalize_message(row)
+    msg["reactions"] = reactions
+    msg["attachments"] = attachments
+    msg["thread_count"] = replies[0].get("count", 0) if replies else 0
+    return msg
+
+
+def fetch_message_page(apply_filters) -> List[Dict[str, Any]]:
+    """Run `apply_filters(query) -> query` against messages and return fully
+    hydrated messages (reactions, attachments, thread_count, sender)."""
+    global _combined_hydration
+    if _combined_hydration:
+        try:
+            result = apply_filters(supabase.table("messages").select(_MESSAGE_PAGE_SELECT)).execute()
+            return [_hydrate_embedded(row) for row in (result.data or [])]
+        except Exception as e:
+            if "PGRST2" not in str(e):  # not a relationship/embedding error
+                raise
+            _combined_hydration = False
+            logger.warning("[Messages] embedded hydration unavailable, using batched lookups: %s", e)
+
+    result = apply_filters(supabase.table("messages").select(_MESSAGE_BASIC_SELECT)).execute()
+    rows = result.data or []
+    msg_ids = [str(row["id"]) for row in rows]
+    reactions_map = get_reactions_for_messages(msg_ids)
+    attachments_map = get_attachments_for_messages(msg_ids)
+    thread_counts = get_thread_counts_for_messages(msg_ids)
+
+    messages = []
+    for row in rows:
+        msg = normalize_message(row)
+        mid = str(row["id"])
+        msg["reactions"] = reactions_map.get(mid, {})
+        msg["attachments"] = attachments_map.get(mid, [])
+        msg["thread_count"] = thread_counts.get(mid, 0)
+        messages.append(msg)
+    return messages
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match") or ""
+    return any(tag.strip() in (etag, "*") for tag in header.split(","))
+
+
+def _make_etag(*parts: Any) -> str:
+    return 'W/"' + hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20] + '"'
+
+
 def extract_mentioned_user_ids(content: str, sender_user_id: str) -> List[str]:
     """
     Extract user IDs from @mentions in message content.
@@ -370,6 +470,115 @@ def get_channel_member_ids(channel_id: str, exclude_user_id: str = None) -> List
         return []
 
 
+def _role_audience() -> tuple:
+    """({role_name: {user_id}}, {messages admin user_ids}), cached for
+    _ROLE_AUDIENCE_TTL. Admins follow _is_messages_admin: CEO/COO, or a role
+    with Delete on the 'messages' module."""
+    cached = _role_audience_cache
+    if time.time() - cached["ts"] < _ROLE_AUDIENCE_TTL:
+        return cached["by_role"], cached["admins"]
+    rows = supabase.table("users").select(
+        "user_id, rols!users_user_rol_fkey(rol_name, role_permissions(module_key, can_delete))"
+    ).execute().data or []
+    by_role: Dict[str, set] = {}
+    admins = set()
+    for row in rows:
+        uid = str(row.get("user_id") or "")
+        if not uid:
+            continue
+        rol = row.get("rols") or {}
+        role = rol.get("rol_name") or ""
+        by_role.setdefault(role, set()).add(uid)
+        perms = rol.get("role_permissions") or []
+        if role in ("CEO", "COO") or any(
+            p.get("module_key") == "messages" and p.get("can_delete") for p in perms
+        ):
+            admins.add(uid)
+    cached.update(ts=time.time(), by_role=by_role, admins=admins)
+    return by_role, admins
+
+
+def get_channel_audience(channel_type: str, channel_id: Optional[str]) -> Optional[List[str]]:
+    """Users who may receive a channel's live events, by the same rules as the
+    read endpoints: members for custom/direct/group channels; for broadcast
+    channels with read_roles, users holding one of those roles plus messages
+    admins; None (= every connected user) for project channels and open
+    broadcasts. Fails closed ([]) when the visibility lookup fails."""
+    if channel_type in ("custom", "direct", "group") and channel_id:
+        return get_channel_member_ids(channel_id)
+    if channel_type == "broadcast":
+        if not channel_id:
+            return []
+        try:
+            row = supabase.table("channels") \
+                .select("read_roles") \
+                .eq("id", channel_id) \
+                .single() \
+                .execute()
+            if not row.data:
+                return []
+            read_roles = row.data.get("read_roles") or []
+            if not read_roles:
+                return None
+            by_role, admins = _role_audience()
+        except Exception as e:
+            logger.warning("[Messages] broadcast audience lookup failed for %s: %s", channel_id, e)
+            return []
+        audience = set(admins)
+        for role in read_roles:
+            audience |= by_role.get(role, set())
+        return sorted(audience)
+    return None
+
+
+def publish_message_events(message: Dict[str, Any], sender_user_id: str):
+    """Background task: push a new message (and the unread delta it causes) to
+    every open /messages/stream in the channel's audience."""
+    if not message_events.hub.has_listeners():
+        return
+    channel_key = build_channel_key(message["channel_type"], message.get("channel_id"), message.get("project_id"))
+    audience = get_channel_audience(message["channel_type"], message.get("channel_id"))
+
+    message_events.publish({"type": "message", "channel_key": channel_key, "message": message}, audience)
+
+    # get_unread_counts only counts top-level messages
+    if not message.get("reply_to_id"):
+        message_events.publish(
+            {"type": "unread", "channel_key": channel_key, "delta": 1},
+            audience,
+            exclude=str(sender_user_id),
+        )
+
+
+def publish_reaction_event(message_id: str, reactions: Dict[str, List[str]]):
+    """Background task: push a message's updated reactions to its channel."""
+    if not message_events.hub.has_listeners():
+        return
+    try:
+        row = supabase.table("messages") \
+            .select("channel_type, channel_id, project_id") \
+            .eq("id", message_id) \
+            .single() \
+            .execute()
+    except Exception as e:
+        logger.debug("[Messages] reaction event lookup failed for %s: %s", message_id, e)
+        return
+    if not row.data:
+        return
+    channel_type = row.data.get("channel_type", "")
+    channel_id = str(row.data["channel_id"]) if row.data.get("channel_id") else None
+    project_id = str(row.data["project_id"]) if row.data.get("project_id") else None
+    message_events.publish(
+        {
+            "type": "reaction",
+            "channel_key": build_channel_key(channel_type, channel_id, project_id),
+            "message_id": message_id,
+            "reactions": reactions,
+        },
+        get_channel_audience(channel_type, channel_id),
+    )
+
+
 # ---------------------------------------------------------------------------
 # Agent Brain: @mention detection and dispatch
 # ---------------------------------------------------------------------------
@@ -579,7 +788,10 @@ async def send_message_notifications(
     metadata: dict = None,
     message_id: str = None,
 ):
-    """Background task to send push notifications for mentions and DM/group messages."""
+    """Pipeline job: push notifications for mentions and DM/group messages.
+
+    Resolves both recipient sets first so all push tokens come from one query,
+    then sends one multicast fan-out per phase and records delivery stats."""
 
     # Build URL for notification click.
     # NGM Cam photo comments (channel_type=project_photos) deep-link into the
@@ -599,17 +811,46 @@ async def send_message_notifications(
 
     channel_name = get_channel_name(channel_type, project_id, channel_id)
 
-    # --- Phase 1: @mention notifications ---
+    # Recipients for both phases up front
     mentioned_user_ids = extract_mentioned_user_ids(content, sender_user_id)
 
+    recipient_ids: List[str] = []
+    if channel_type in ("direct", "group") and channel_id:
+        # Exclude users already notified via @mention to avoid double notifications
+        already_notified = set(mentioned_user_ids)
+        recipient_ids = [
+            uid for uid in get_channel_member_ids(channel_id, exclude_user_id=sender_user_id)
+            if uid not in already_notified
+        ]
+
+    if not mentioned_user_ids and not recipient_ids:
+        return
+
+    tokens_by_user = await get_push_tokens_for_users(mentioned_user_ids + recipient_ids)
+    delivery: Dict[str, dict] = {}
+
+    # --- Phase 1: @mention notifications ---
     if mentioned_user_ids:
+        message_events.publish(
+            {
+                "type": "mention",
+                "channel_key": build_channel_key(channel_type, channel_id, project_id),
+                "message_id": message_id,
+                "sender_name": sender_name,
+                "preview": (content or "")[:200],
+            },
+            mentioned_user_ids,
+        )
+
         await notify_mentioned_users(
             mentioned_user_ids=mentioned_user_ids,
             sender_name=sender_name,
             message_preview=content,
             channel_name=channel_name,
             message_url=message_url,
-            avatar_color=sender_avatar_color
+            avatar_color=sender_avatar_color,
+            tokens_by_user=tokens_by_user,
+            delivery=delivery,
         )
 
         # In-app notifications feed (dashboard Mentions widget). Deep-link uses
@@ -654,23 +895,20 @@ async def send_message_notifications(
             logger.debug("[Messages] notifications feed insert failed: %s", notif_err)
 
     # --- Phase 2: DM / Group notifications ---
-    if channel_type in ("direct", "group") and channel_id:
-        recipient_ids = get_channel_member_ids(channel_id, exclude_user_id=sender_user_id)
-
-        # Exclude users already notified via @mention to avoid double notifications
-        already_notified = set(mentioned_user_ids)
-        recipient_ids = [uid for uid in recipient_ids if uid not in already_notified]
+    if recipient_ids:
+        await notify_message_recipients(
+            recipient_user_ids=recipient_ids,
+            sender_name=sender_name,
+            message_preview=content,
+            channel_name=channel_name,
+            channel_type=channel_type,
+            message_url=message_url,
+            avatar_color=sender_avatar_color,
+            tokens_by_user=tokens_by_user,
+            delivery=delivery,
+        )
 
-        if recipient_ids:
-            await notify_message_recipients(
-                recipient_user_ids=recipient_ids,
-                sender_name=sender_name,
-                message_preview=content,
-                channel_name=channel_name,
-                channel_type=channel_type,
-                message_url=message_url,
-                avatar_color=sender_avatar_color
-            )
+    notification_pipeline.record("message", message_id, delivery)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -679,56 +917,104 @@ async def send_message_notifications(
 
 @router.get("")
 def get_messages(
+    request: Request,
+    response: Response,
     channel_type: str = Query(...),
     channel_id: Optional[str] = Query(None),
     project_id: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    before: Optional[str] = Query(None, description="Message id: page of messages older than it"),
+    after: Optional[str] = Query(None, description="Message id: page of messages newer than it"),
+    newest: bool = Query(False, description="Page of the newest messages (initial load)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get messages for a channel.
     For project channels, use channel_type + project_id.
     For custom/direct channels, use channel_type + channel_id.
+
+    Keyset pagination: `newest=true` for the latest page, then `before=<first id>`
+    to scroll back and `after=<last id>` to catch up. Pages are always returned
+    oldest-first with `page.has_more`. Without before/after/newest the legacy
+    offset paging applies. Responses carry an ETag (channel's newest message);
+    send it back as If-None-Match to get a 304 when nothing was posted.
     """
     try:
-        query = supabase.table("messages") \
-            .select("*, users!user_id(user_name, avatar_color)") \
-            .eq("channel_type", channel_type)
-
-        # Filter by channel
         if channel_type in ["custom", "direct", "group", "broadcast"]:
             if not channel_id:
                 raise HTTPException(status_code=400, detail="channel_id required for custom/direct/group/broadcast channels")
-            query = query.eq("channel_id", channel_id)
-        else:
-            # Project channels
-            if not project_id:
-                raise HTTPException(status_code=400, detail="project_id required for project channels")
-            query = query.eq("project_id", project_id)
+        elif not project_id:
+            raise HTTPException(status_code=400, detail="project_id required for project channels")
+        if before and after:
+            raise HTTPException(status_code=400, detail="Use either before or after, not both")
 
-        # Only get top-level messages (not thread replies)
-        query = query.is_("reply_to_id", "null")
+        def channel_filter(query):
+            query = query.eq("channel_type", channel_type)
+            if channel_type in ["custom", "direct", "group", "broadcast"]:
+                query = query.eq("channel_id", channel_id)
+            else:
+                query = query.eq("project_id", project_id)
+            # Only top-level messages (not thread replies)
+            return query.is_("reply_to_id", "null")
 
-        # Order and paginate
-        result = query.order("created_at", desc=False) \
-            .range(offset, offset + limit - 1) \
+        # Conditional request: one indexed probe for the newest message
+        head = channel_filter(supabase.table("messages").select("id")) \
+            .order("created_at", desc=True) \
+            .order("id", desc=True) \
+            .limit(1) \
             .execute()
-
-        rows = result.data or []
-        msg_ids = [str(row["id"]) for row in rows]
-        reactions_map = get_reactions_for_messages(msg_ids)
-        attachments_map = get_attachments_for_messages(msg_ids)
-
-        messages = []
-        for row in rows:
-            msg = normalize_message(row)
-            mid = str(row["id"])
-            msg["reactions"] = reactions_map.get(mid, {})
-            msg["attachments"] = attachments_map.get(mid, [])
-            messages.append(msg)
-
-        return {"messages": messages}
+        newest_id = head.data[0]["id"] if head.data else ""
+        etag = _make_etag(channel_type, channel_id or project_id, newest_id, limit, offset, before, after, newest)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+        anchor_id = before or after
+        if not anchor_id and not newest:
+            messages = fetch_message_page(
+                lambda q: channel_filter(q)
+                .order("created_at", desc=False)
+                .range(offset, offset + limit - 1)
+            )
+            return {"messages": messages}
+
+        anchor_ts = None
+        if anchor_id:
+            anchor = supabase.table("messages").select("created_at").eq("id", anchor_id).execute()
+            if not anchor.data:
+                raise HTTPException(status_code=404, detail="Cursor message not found")
+            anchor_ts = anchor.data[0]["created_at"]
+
+        # (created_at, id) keyset; fetch one extra row to know if more exist
+        descending = not after
+        op = "lt" if descending else "gt"
+
+        def page_filter(query):
+            query = channel_filter(query)
+            if anchor_ts:
+                query = query.or_(
+                    f'created_at.{op}."{anchor_ts}",and(created_at.eq."{anchor_ts}",id.{op}.{anchor_id})'
+                )
+            return query.order("created_at", desc=descending) \
+                .order("id", desc=descending) \
+                .limit(limit + 1)
+
+        messages = fetch_message_page(page_filter)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if descending:
+            messages.reverse()
+
+        return {
+            "messages": messages,
+            "page": {
+                "has_more": has_more,
+                "before": messages[0]["id"] if messages else before,
+                "after": messages[-1]["id"] if messages else after,
+            },
+        }
 
     except HTTPException:
         raise
@@ -738,7 +1024,10 @@ def get_messages(
 
 @router.get("/broadcast-feed")
 def get_broadcast_feed(
+    request: Request,
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = Query(None, description="Item id: older items than it"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -747,6 +1036,7 @@ def get_broadcast_feed(
     the dashboard News widget. Each item carries its source channel name and
     reactions so the widget can render and react in-place (reactions are shared
     with the Messages view via the same message_reactions table).
+    Paged with `before=<last item id>`; ETag / If-None-Match as in GET /messages.
     """
     try:
         user_role = current_user.get("role") or ""
@@ -769,21 +1059,50 @@ def get_broadcast_feed(
         if not channel_names:
             return {"items": []}
 
-        rows = supabase.table("messages") \
-            .select("*, users!user_id(user_name, avatar_color)") \
-            .eq("channel_type", "broadcast") \
-            .in_("channel_id", list(channel_names.keys())) \
-            .is_("reply_to_id", "null") \
+        visible_ids = list(channel_names.keys())
+
+        def feed_filter(query):
+            return query.eq("channel_type", "broadcast") \
+                .in_("channel_id", visible_ids) \
+                .is_("reply_to_id", "null")
+
+        head = feed_filter(supabase.table("messages").select("id")) \
             .order("created_at", desc=True) \
-            .limit(limit) \
+            .order("id", desc=True) \
+            .limit(1) \
             .execute()
+        newest_id = head.data[0]["id"] if head.data else ""
+        etag = _make_etag("broadcast-feed", ",".join(sorted(visible_ids)), newest_id, limit, before)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+        anchor_ts = None
+        if before:
+            anchor = supabase.table("messages").select("created_at").eq("id", before).execute()
+            if not anchor.data:
+                raise HTTPException(status_code=404, detail="Cursor message not found")
+            anchor_ts = anchor.data[0]["created_at"]
+
+        def page_filter(query):
+            query = feed_filter(query)
+            if anchor_ts:
+                query = query.or_(
+                    f'created_at.lt."{anchor_ts}",and(created_at.eq."{anchor_ts}",id.lt.{before})'
+                )
+            return query.order("created_at", desc=True) \
+                .order("id", desc=True) \
+                .limit(limit + 1)
 
-        data_rows = [r for r in (rows.data or []) if not r.get("is_deleted")]
-        reactions_map = get_reactions_for_messages([str(r["id"]) for r in data_rows])
+        page = fetch_message_page(page_filter)
+        has_more = len(page) > limit
+        page = page[:limit]
 
         items = []
-        for row in data_rows:
-            msg = normalize_message(row)
+        for msg in page:
+            if msg.get("is_deleted"):
+                continue
             cid = msg.get("channel_id")
             items.append({
                 "id": msg["id"],
@@ -793,10 +1112,15 @@ def get_broadcast_feed(
                 "sender_name": msg["user_name"],
                 "avatar_color": msg["avatar_color"],
                 "created_at": msg["created_at"],
-                "reactions": reactions_map.get(str(row["id"]), {}),
+                "reactions": msg["reactions"],
+                "thread_count": msg["thread_count"],
             })
 
-        return {"items": items}
+        return {
+            "items": items,
+            "has_more": has_more,
+            "before": page[-1]["id"] if page else None,
+        }
 
     except HTTPException:
         raise
@@ -904,9 +1228,11 @@ def create_message(
         except Exception as user_err:
             logger.warning("[Messages] User lookup error (non-blocking): %s", user_err)
 
-        # Send push notifications for @mentions + DM/group (in background)
+        # Live streams first, then push notifications for @mentions + DM/group
         try:
-            background_tasks.add_task(
+            background_tasks.add_task(unread_counters.record_message, response)
+            background_tasks.add_task(publish_message_events, response, user_id)
+            notification_pipeline.submit(
                 send_message_notifications,
                 content=payload.content,
                 sender_user_id=user_id,
@@ -919,7 +1245,7 @@ def create_message(
                 message_id=message_id,
             )
         except Exception as bg_err:
-            logger.warning("[Messages] Background task setup error (non-blocking): %s", bg_err)
+            logger.warning("[Messages] Notification fan-out setup error (non-blocking): %s", bg_err)
 
         # --- Agent Brain: detect @mentions OR active attention sessions ---
         try:
@@ -1140,9 +1466,11 @@ def create_thread_reply(
             sender_name = user_result.data.get("user_name", "Someone")
             sender_avatar_color = user_result.data.get("avatar_color")
 
-        # Send push notifications for @mentions + DM/group (in background)
+        # Live streams first, then push notifications for @mentions + DM/group
         try:
-            background_tasks.add_task(
+            background_tasks.add_task(unread_counters.record_message, msg)
+            background_tasks.add_task(publish_message_events, msg, user_id)
+            notification_pipeline.submit(
                 send_message_notifications,
                 content=payload.content,
                 sender_user_id=user_id,
@@ -1171,6 +1499,7 @@ def create_thread_reply(
 def toggle_reaction(
     message_id: str,
     payload: ReactionToggle,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
     """Add or remove a reaction to a message"""
@@ -1206,6 +1535,7 @@ def toggle_reaction(
 
         # Return updated reactions
         reactions = get_reactions_for_message(message_id)
+        background_tasks.add_task(publish_reaction_event, message_id, reactions)
 
         return {"reactions": reactions}
 
@@ -1296,10 +1626,18 @@ def get_channels(
 def get_unread_counts(
     current_user: dict = Depends(get_current_user)
 ):
-    """Get unread message counts for all channels the user has access to."""
+    """Get unread message counts for all channels the user has access to.
+
+    Reads the incrementally maintained channel_unread_counts rows (one indexed
+    read); falls back to recounting via the get_unread_counts RPC if the
+    counter table is unavailable."""
+    user_id = current_user["user_id"]
     try:
-        user_id = current_user["user_id"]
+        return {"unread_counts": unread_counters.get_counts(user_id)}
+    except Exception as e:
+        logger.warning(f"[unread-counts] counter read failed for user {user_id}, recounting: {e}")
 
+    try:
         # Check in-memory cache first
         cached = _unread_cache.get(user_id)
         if cached and (time.time() - cached["ts"]) < _UNREAD_CACHE_TTL:
@@ -1326,7 +1664,7 @@ def get_unread_counts(
         return {"unread_counts": counts}
 
     except Exception as e:
-        logger.error(f"[unread-counts] RPC failed for user {current_user.get('user_id','?')}: {e}")
+        logger.error(f"[unread-counts] RPC failed for user {user_id}: {e}")
         return {"unread_counts": {}}
 
 
@@ -1359,8 +1697,11 @@ def mark_channel_read(
                 .insert({"user_id": user_id, "channel_key": channel_key, "last_read_at": now, "updated_at": now}) \
                 .execute()
 
-        # Invalidate unread cache so next poll reflects the change
+        # Reset the counter; invalidate the fallback cache too
+        unread_counters.reset(user_id, channel_key)
         _unread_cache.pop(user_id, None)
+        # ...and clear the badge in the user's other open tabs
+        message_events.publish({"type": "unread", "channel_key": channel_key, "count": 0}, [user_id])
 
         return {"ok": True, "channel_key": channel_key}
 
@@ -1368,6 +1709,57 @@ def mark_channel_read(
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# LIVE STREAM (Server-Sent Events)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="JWT (EventSource cannot send headers)"),
+):
+    """Push channel replacing the unread-counts / messages polling.
+
+    Emits `message`, `reaction`, `unread` (delta or reset), `mention` and
+    `resync` events (see api/services/message_events.py), plus a comment
+    heartbeat every MESSAGE_STREAM_HEARTBEAT_S. On `ready` or `resync` the
+    client refetches /messages/unread-counts once, then applies deltas."""
+    raw = token
+    if not raw:
+        auth = request.headers.get("authorization") or ""
+        if auth.lower().startswith("bearer "):
+            raw = auth[7:].strip()
+    if not raw:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    current_user = get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=raw))
+    # Project channels and open broadcasts fan out to every stream, so portal
+    # accounts (clients, external collaborators) never get one.
+    current_user = require_internal(current_user)
+
+    sub = message_events.hub.subscribe(str(current_user["user_id"]))
+    if sub is None:
+        raise HTTPException(status_code=429, detail="Too many open message streams")
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n" + _sse({"type": "ready", "heartbeat_s": message_events.HEARTBEAT_S})
+            while not await request.is_disconnected():
+                event = await sub.next(message_events.HEARTBEAT_S)
+                yield ": ping\n\n" if event is None else _sse(event)
+        finally:
+            message_events.hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/channels", status_code=201)
 def create_channel(
     payload: ChannelCreate,
@@ -1542,6 +1934,35 @@ def create_channel(
 # SEARCH ENDPOINT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_SEARCH_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SEARCH_MAX_TERMS = 8
+
+
+def _build_search_tsquery(q: str) -> Optional[str]:
+    """User text -> to_tsquery expression: every word must match, as a prefix
+    (search-as-you-type). Operators and punctuation are dropped."""
+    words = _SEARCH_WORD_RE.findall(q.lower())
+    # Single letters ("o" from "o'neil") as prefixes match nearly everything
+    words = ([w for w in words if len(w) > 1] or words)[:_SEARCH_MAX_TERMS]
+    if not words:
+        return None
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def _encode_search_cursor(rank: float, created_at: str, message_id: str) -> str:
+    raw = json.dumps({"r": rank, "t": created_at, "i": message_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_search_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"r": float(data["r"]), "t": str(data["t"]), "i": str(UUID(str(data["i"])))}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
+
+
 @router.get("/search")
 def search_messages(
     q: str = Query(..., min_length=2),
@@ -1549,19 +1970,72 @@ def search_messages(
     channel_id: Optional[str] = Query(None),
     project_id: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Search messages by content"""
+    """Full-text search over messages the user can see, best match first.
+
+    Backed by the search_messages() RPC (GIN index on messages.search_tsv, see
+    sql/create_message_search.sql). Returns next_cursor while more results exist."""
+    tsquery = _build_search_tsquery(q)
+    if not tsquery:
+        return {"messages": [], "next_cursor": None}
+
+    # Channel filters (same meaning as before)
+    filter_channel_id = None
+    filter_project_id = None
+    if channel_type:
+        if channel_type in ["custom", "direct", "group", "broadcast"] and channel_id:
+            filter_channel_id = channel_id
+        elif project_id:
+            filter_project_id = project_id
+
+    after = _decode_search_cursor(cursor) if cursor else None
+
+    try:
+        result = supabase.rpc("search_messages", {
+            "p_user_id": current_user["user_id"],
+            "p_role": current_user.get("role") or "",
+            "p_is_admin": _is_messages_admin(current_user),
+            "p_query": tsquery,
+            "p_channel_type": channel_type,
+            "p_channel_id": filter_channel_id,
+            "p_project_id": filter_project_id,
+            "p_limit": limit,
+            "p_after_rank": after["r"] if after else None,
+            "p_after_created": after["t"] if after else None,
+            "p_after_id": after["i"] if after else None,
+        }).execute()
+    except Exception as e:
+        logger.warning("[Messages] search RPC failed, falling back to ilike: %s", e)
+        return _search_messages_ilike(q, channel_type, filter_channel_id, filter_project_id, limit)
+
+    rows = result.data or []
+    messages = []
+    for row in rows:
+        msg = normalize_message(row["message"])
+        msg["rank"] = row["rank"]
+        messages.append(msg)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = _encode_search_cursor(last["rank"], last["message"]["created_at"], str(last["message"]["id"]))
+
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
+def _search_messages_ilike(q, channel_type, channel_id, project_id, limit):
+    """Pre-index search (substring scan, newest first). Used only while the
+    search migration has not been applied."""
     try:
         query = supabase.table("messages") \
             .select("*, users!user_id(user_name, avatar_color)") \
             .ilike("content", f"%{q}%")
 
-        # Apply channel filters if provided
         if channel_type:
             query = query.eq("channel_type", channel_type)
-
-            if channel_type in ["custom", "direct", "group", "broadcast"] and channel_id:
+            if channel_id:
                 query = query.eq("channel_id", channel_id)
             elif project_id:
                 query = query.eq("project_id", project_id)
@@ -1570,9 +2044,7 @@ def search_messages(
             .limit(limit) \
             .execute()
 
-        messages = [normalize_message(row) for row in (result.data or [])]
-
-        return {"messages": messages}
+        return {"messages": [normalize_message(row) for row in (result.data or [])], "next_cursor": None}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -1786,7 +2258,7 @@ def soft_delete_message(
 
         # Verify message exists and belongs to user
         msg_result = supabase.table("messages") \
-            .select("id, user_id") \
+            .select("id, user_id, is_deleted") \
             .eq("id", message_id) \
             .single() \
             .execute()
@@ -1807,6 +2279,9 @@ def soft_delete_message(
             .eq("id", message_id) \
             .execute()
 
+        if not msg_result.data.get("is_deleted"):
+            unread_counters.release_message(message_id)
+
         return {"ok": True}
 
     except HTTPException:
@@ -1842,6 +2317,9 @@ def clear_channel_messages(
 
         result = query.execute()
         count = len(result.data) if result.data else 0
+        unread_counters.clear_channel(
+            build_channel_key(payload.channel_type, payload.channel_id, payload.project_id)
+        )
 
         return {"ok": True, "count": count}
 
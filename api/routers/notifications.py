@@ -7,7 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
 
-from api.auth import get_current_user
+from api.auth import get_current_user, require_leadership
 from api.supabase_client import supabase
 from api.services.firebase_notifications import send_push_notification
 
@@ -144,6 +144,17 @@ def get_notification_status(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Failed to get notification status")
 
 
+@router.get("/delivery-stats", dependencies=[Depends(require_leadership)])
+def get_delivery_stats(recent: int = 20):
+    """
+    Push fan-out pipeline health: queue depth, job counts, delivery totals
+    (tokens / sent / failed / invalid tokens pruned) and the latest per-message
+    stats, newest first.
+    """
+    from api.services.notification_pipeline import get_stats
+    return get_stats(max(0, min(recent, 200)))
+
+
 # ============================================================================
 # Test Endpoint
 # ============================================================================
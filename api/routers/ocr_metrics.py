@@ -152,3 +152,13 @@ async def get_recent_metrics(
     except Exception as e:
         logger.error(f"[ocr-metrics] Failed to query recent metrics: {e}")
         return {"items": [], "count": 0}
+
+
+@router.get("/prompt-stats")
+async def get_prompt_stats():
+    """
+    Estimated OCR prompt size per scan mode for this worker (in-memory, resets
+    on deploy). Per-scan values are also stored in ocr_metrics.metadata.
+    """
+    from services.receipt_prompt import get_prompt_stats as _prompt_stats
+    return {"by_mode": _prompt_stats()}
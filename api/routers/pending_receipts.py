@@ -1082,7 +1082,7 @@ async def process_receipt(receipt_id: str, current_user: dict = Depends(get_curr
                 file_content = response.content
 
             # ===== OCR via shared service (pdfplumber-first, 250 DPI, tax-aware) =====
-            scan_result = _scan_receipt_core(file_content, file_type, model="heavy")
+            scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="heavy")
 
             line_items = scan_result.get("expenses", [])
             validation = scan_result.get("validation", {})
@@ -1090,8 +1090,8 @@ async def process_receipt(receipt_id: str, current_user: dict = Depends(get_curr
             # Correction pass if validation failed
             if not validation.get("validation_passed", True) and line_items:
                 try:
-                    corrected = _scan_receipt_core(
-                        file_content, file_type, model="heavy",
+                    corrected = await asyncio.to_thread(
+                        _scan_receipt_core, file_content, file_type, model="heavy",
                         correction_context={
                             "invoice_total": validation.get("invoice_total", 0),
                             "calculated_sum": validation.get("calculated_sum", 0),
@@ -2337,20 +2337,20 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
 
         # Tiered OCR with error-based escalation
         try:
-            scan_result = _scan_receipt_core(file_content, file_type, model=_scan_mode)
+            scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model=_scan_mode)
         except ValueError as e:
             if _scan_mode == "fast-beta":
                 logger.warning(f"[Agent] Step 3: fast-beta failed ({e}), escalating to fast...")
                 try:
-                    scan_result = _scan_receipt_core(file_content, file_type, model="fast")
+                    scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="fast")
                     _scan_mode = "fast"
                 except ValueError as e2:
                     logger.warning(f"[Agent] Step 3: fast failed ({e2}), escalating to heavy...")
-                    scan_result = _scan_receipt_core(file_content, file_type, model="heavy")
+                    scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="heavy")
                     _scan_mode = "heavy"
             elif _scan_mode == "fast":
                 logger.warning(f"[Agent] Step 3: fast failed ({e}), escalating to heavy...")
-                scan_result = _scan_receipt_core(file_content, file_type, model="heavy")
+                scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="heavy")
                 _scan_mode = "heavy"
             else:
                 raise ValueError(f"OCR extraction failed: {str(e)}")
@@ -2365,7 +2365,7 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
                 _next = "fast" if _scan_mode == "fast-beta" else "heavy"
                 logger.info(f"[Agent] Step 3: Confidence escalation {_scan_mode} -> {_next} (items={_items_count}, valid={_val_check.get('validation_passed')})")
                 try:
-                    scan_result = _scan_receipt_core(file_content, file_type, model=_next)
+                    scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model=_next)
                     _scan_mode = _next
                     # Second escalation if still failing at fast
                     if _scan_mode == "fast":
@@ -2373,11 +2373,11 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
                         _vc2 = scan_result.get("validation", {})
                         if _ic2 == 0 or not _vc2.get("validation_passed", True):
                             logger.info("[Agent] Step 3: Second escalation fast -> heavy")
-                            scan_result = _scan_receipt_core(file_content, file_type, model="heavy")
+                            scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="heavy")
                             _scan_mode = "heavy"
                 except Exception:
                     if _scan_mode != "heavy":
-                        scan_result = _scan_receipt_core(file_content, file_type, model="heavy")
+                        scan_result = await asyncio.to_thread(_scan_receipt_core, file_content, file_type, model="heavy")
                         _scan_mode = "heavy"
 
         line_items = scan_result.get("expenses", [])
@@ -2396,8 +2396,8 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
                     "calculated_sum": calc_sum,
                     "items": line_items,
                 }
-                corrected_result = _scan_receipt_core(
-                    file_content, file_type, model="heavy",
+                corrected_result = await asyncio.to_thread(
+                    _scan_receipt_core, file_content, file_type, model="heavy",
                     correction_context=correction_context
                 )
                 corrected_validation = corrected_result.get("validation", {})
@@ -2746,7 +2746,8 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
             pass
 
         # Build intelligent message with personality + context
-        msg_content = craft_receipt_message(
+        msg_content = await asyncio.to_thread(
+            craft_receipt_message,
             parsed_data=parsed_data,
             categorize_data=categorize_data,
             warnings=warnings,
@@ -2814,7 +2815,8 @@ async def _agent_process_receipt_core(receipt_id: str, scan_mode: str = None):
             inv_total = validation.get("invoice_total", 0)
             calc_sum = validation.get("calculated_sum", 0)
             difference = round(abs(inv_total - calc_sum), 2)
-            escalation_msg = craft_escalation_message(
+            escalation_msg = await asyncio.to_thread(
+                craft_escalation_message,
                 receipt_data={"parsed_data": parsed_data},
                 mentions=mentions,
                 issue=(
@@ -4412,7 +4414,11 @@ async def check_action(receipt_id: str, payload: CheckActionRequest, current_use
         if current_state == "awaiting_check_number":
             return _handle_awaiting_check_number(receipt_id, project_id, check_flow, parsed_data, action, payload.payload)
         elif current_state == "awaiting_entry_confirmation":
-            return _handle_awaiting_entry_confirmation(receipt_id, project_id, check_flow, parsed_data, action, payload.payload)
+            # Confirming entries runs GPT labor categorization (sync): off the loop
+            return await asyncio.to_thread(
+                _handle_awaiting_entry_confirmation,
+                receipt_id, project_id, check_flow, parsed_data, action, payload.payload,
+            )
         elif current_state == "awaiting_split_decision":
             return _handle_split_decision(receipt_id, project_id, check_flow, parsed_data, action)
         elif current_state == "awaiting_vendor_info":
@@ -4420,7 +4426,10 @@ async def check_action(receipt_id: str, payload: CheckActionRequest, current_use
         elif current_state == "awaiting_split_entries":
             return _handle_split_entries(receipt_id, project_id, check_flow, parsed_data, action, payload.payload)
         elif current_state == "awaiting_date_confirm":
-            return _handle_date_confirm(receipt_id, project_id, check_flow, parsed_data, action, payload.payload)
+            return await asyncio.to_thread(
+                _handle_date_confirm,
+                receipt_id, project_id, check_flow, parsed_data, action, payload.payload,
+            )
         elif current_state == "awaiting_category_review":
             return _handle_category_review(receipt_id, project_id, check_flow, parsed_data, action, payload.payload)
         elif current_state == "awaiting_category_confirm":
@@ -4885,7 +4894,7 @@ async def receipt_action(receipt_id: str, payload: ReceiptActionRequest, current
                 "amount": parsed_data.get("amount"),
                 "missing_fields": smart.get("unresolved", []),
             }
-            interpretation = interpret_reply(text, reply_context)
+            interpretation = await asyncio.to_thread(interpret_reply, text, reply_context)
             logger.info(f"[ReceiptFlow] Missing info reply interpreted: {interpretation}")
 
             # Apply extracted fields
@@ -4921,7 +4930,7 @@ async def receipt_action(receipt_id: str, payload: ReceiptActionRequest, current
 
             if interpretation.get("unclear"):
                 # Ask again with clarification
-                response_msg = craft_reply_response(interpretation, reply_context)
+                response_msg = await asyncio.to_thread(craft_reply_response, interpretation, reply_context)
                 if response_msg:
                     post_andrew_message(
                         content=response_msg,
@@ -4949,7 +4958,7 @@ async def receipt_action(receipt_id: str, payload: ReceiptActionRequest, current
                     "updated_at": datetime.utcnow().isoformat()
                 }).eq("id", receipt_id).execute()
 
-                response_msg = craft_reply_response(interpretation, reply_context)
+                response_msg = await asyncio.to_thread(craft_reply_response, interpretation, reply_context)
                 if response_msg:
                     post_andrew_message(
                         content=response_msg,
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
 import logging
 import traceback
@@ -11,6 +12,8 @@ import traceback
 from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Depends
 from api.auth import require_internal
 from pydantic import BaseModel, field_validator
+from api.services import dependency_graph, my_work_projection, workload_scheduler
+from api.services.pipeline_lookups import get_lookups, lookups_for
 from api.supabase_client import supabase
 
 logger = logging.getLogger(__name__)
@@ -149,182 +152,129 @@ def get_pipeline_users() -> Dict[str, Any]:
 
 # ====== MAIN GROUPED ENDPOINT ======
 
+def _person(user_id: Optional[str], users_map: Dict[str, Any]) -> Dict[str, Any]:
+    u = users_map.get(user_id) or {}
+    return {
+        "id": user_id,
+        "name": u.get("user_name"),
+        "avatar_color": u.get("avatar_color"),
+        "photo": u.get("user_photo"),
+    }
+
+
+def _enrich_task(task: Dict[str, Any], lk: Dict[str, Any]) -> Dict[str, Any]:
+    """Task row + display names / nested people objects for the board.
+
+    `lk` is pipeline_lookups.get_lookups()."""
+    users_map = lk["users"]
+    status_name = lk["status_names"].get(task.get("task_status"), "(no status)")
+
+    owner_id = task.get("Owner_id")
+
+    # Handle collaborators: prefer new array column, fallback to legacy single
+    collaborators_ids = task.get("collaborators_ids") or []
+    if not collaborators_ids:
+        legacy_collab = task.get("Colaborators_id")
+        if legacy_collab:
+            collaborators_ids = [legacy_collab]
+
+    # Handle managers: prefer new array column, fallback to legacy single
+    managers_ids = task.get("managers_ids") or []
+    if not managers_ids:
+        legacy_manager = task.get("manager")
+        if legacy_manager:
+            managers_ids = [legacy_manager]
+
+    project_id = task.get("project_id")
+    project_data = lk["projects"].get(project_id) if project_id else None
+
+    company_id = task.get("company_management")
+    company_data = lk["companies"].get(company_id) if company_id else None
+
+    priority_id = task.get("task_priority")
+    priority_data = lk["priorities"].get(priority_id) if priority_id else None
+
+    finished_id = task.get("task_finished_status")
+    finished_data = lk["completed"].get(finished_id) if finished_id else None
+
+    return {
+        **task,
+        # Nombres útiles
+        "project_name": project_data["project_name"] if project_data else None,
+        "company_name": company_data["name"] if company_data else None,
+        "status_name": status_name,
+        "priority_name": priority_data["priority"] if priority_data else None,
+        "finished_status_name": finished_data["completed_status"] if finished_data else None,
+        # Objetos anidados para el frontend (incluyen avatar_color y photo para avatares)
+        "owner": _person(owner_id, users_map) if owner_id else None,
+        "collaborators": [_person(cid, users_map) for cid in collaborators_ids if cid],
+        "managers": [_person(mid, users_map) for mid in managers_ids if mid],
+        # Legacy single manager (for backward compatibility)
+        "manager": _person(managers_ids[0], users_map) if managers_ids else None,
+        "priority": {
+            "priority_id": priority_id,
+            "priority_name": priority_data["priority"] if priority_data else None,
+        } if priority_id else None,
+        "finished_status": {
+            "completed_status_id": finished_id,
+            "completed_status_name": finished_data["completed_status"] if finished_data else None,
+        } if finished_id else None,
+    }
+
+
 @router.get("/grouped")
 def get_pipeline_grouped(company_id: Optional[str] = Query(None)) -> Dict[str, Any]:
     """
     Devuelve las tareas agrupadas por task_status.
-    Usa múltiples queries al cliente Supabase para obtener los datos relacionados.
+    Lookups (statuses, users, projects, ...) come from the shared
+    pipeline_lookups cache; only the tasks are queried per request.
+    For large boards prefer GET /pipeline/board (limits + since=).
     """
     logger.info("[PIPELINE] GET /pipeline/grouped called")
 
     try:
-        # 1. Obtener todos los statuses
-        logger.info("[PIPELINE] Fetching statuses...")
-        statuses_response = supabase.table("tasks_status").select("task_status_id, task_status").order("task_status").execute()
-        statuses = statuses_response.data or []
-        logger.info(f"[PIPELINE] Found {len(statuses)} statuses")
-
-        # 2. Obtener las tareas (scopeadas al workspace activo cuando se provee
-        #    company_id: tareas de esa compañía mas las compartidas/NULL).
-        logger.info("[PIPELINE] Fetching tasks...")
+        lk = get_lookups()
+        statuses = lk["statuses"]
+
+        # Tareas scopeadas al workspace activo cuando se provee company_id:
+        # tareas de esa compañía mas las compartidas/NULL.
         tasks_query = supabase.table("tasks").select("*").order("created_at", desc=True)
         if company_id:
             tasks_query = tasks_query.or_(f"company_management.eq.{company_id},company_management.is.null")
-        tasks_response = tasks_query.execute()
-        tasks = tasks_response.data or []
+        tasks = tasks_query.execute().data or []
         logger.info(f"[PIPELINE] Found {len(tasks)} tasks")
+        lk = lookups_for(tasks)
+        statuses = lk["statuses"]
 
-        # 3. Obtener datos relacionados para enriquecer las tareas
-        logger.info("[PIPELINE] Fetching related data...")
-
-        # Users (para owner, collaborator, manager) - incluye avatar_color y user_photo para avatares
-        users_response = supabase.table("users").select("user_id, user_name, avatar_color, user_photo").execute()
-        users_map = {u["user_id"]: u for u in (users_response.data or [])}
-
-        # Projects
-        projects_response = supabase.table("projects").select("project_id, project_name").execute()
-        projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
-
-        # Companies
-        companies_response = supabase.table("companies").select("id, name").execute()
-        companies_map = {c["id"]: c for c in (companies_response.data or [])}
-
-        # Priorities
-        priorities_response = supabase.table("tasks_priority").select("priority_id, priority").execute()
-        priorities_map = {p["priority_id"]: p for p in (priorities_response.data or [])}
-
-        # Completed statuses
-        completed_response = supabase.table("task_completed_status").select("completed_status_id, completed_status").execute()
-        completed_map = {c["completed_status_id"]: c for c in (completed_response.data or [])}
-
-        # Status map for names
-        status_map = {s["task_status_id"]: s["task_status"] for s in statuses}
-
-        logger.info("[PIPELINE] Processing tasks...")
-
-        # 4. Agrupar tareas por status
+        # Agrupar tareas por status
         groups_map: Dict[str, Dict[str, Any]] = {}
-
         for task in tasks:
             status_id = task.get("task_status")
-            status_name = status_map.get(status_id, "(no status)")
-
+            status_name = lk["status_names"].get(status_id, "(no status)")
             group_key = str(status_id) if status_id else status_name
-
             if group_key not in groups_map:
                 groups_map[group_key] = {
                     "status_id": status_id,
                     "status_name": status_name,
                     "tasks": [],
                 }
+            groups_map[group_key]["tasks"].append(_enrich_task(task, lk))
 
-            # Enriquecer la tarea con datos relacionados
-            owner_id = task.get("Owner_id")
-            owner_data = users_map.get(owner_id) if owner_id else None
-
-            # Handle collaborators: prefer new array column, fallback to legacy single
-            collaborators_ids = task.get("collaborators_ids") or []
-            if not collaborators_ids:
-                # Fallback to legacy single collaborator
-                legacy_collab = task.get("Colaborators_id")
-                if legacy_collab:
-                    collaborators_ids = [legacy_collab]
-
-            # Handle managers: prefer new array column, fallback to legacy single
-            managers_ids = task.get("managers_ids") or []
-            if not managers_ids:
-                # Fallback to legacy single manager
-                legacy_manager = task.get("manager")
-                if legacy_manager:
-                    managers_ids = [legacy_manager]
-
-            project_id = task.get("project_id")
-            project_data = projects_map.get(project_id) if project_id else None
-
-            company_id = task.get("company_management")
-            company_data = companies_map.get(company_id) if company_id else None
-
-            priority_id = task.get("task_priority")
-            priority_data = priorities_map.get(priority_id) if priority_id else None
-
-            finished_id = task.get("task_finished_status")
-            finished_data = completed_map.get(finished_id) if finished_id else None
-
-            # Construir objeto de tarea enriquecido
-            enriched_task = {
-                **task,
-                # Nombres útiles
-                "project_name": project_data["project_name"] if project_data else None,
-                "company_name": company_data["name"] if company_data else None,
-                "status_name": status_name,
-                "priority_name": priority_data["priority"] if priority_data else None,
-                "finished_status_name": finished_data["completed_status"] if finished_data else None,
-                # Objetos anidados para el frontend (incluyen avatar_color y photo para avatares)
-                "owner": {
-                    "id": owner_id,
-                    "name": owner_data["user_name"] if owner_data else None,
-                    "avatar_color": owner_data.get("avatar_color") if owner_data else None,
-                    "photo": owner_data.get("user_photo") if owner_data else None,
-                } if owner_id else None,
-                # Build collaborators array from all IDs
-                "collaborators": [
-                    {
-                        "id": cid,
-                        "name": users_map.get(cid, {}).get("user_name") if users_map.get(cid) else None,
-                        "avatar_color": users_map.get(cid, {}).get("avatar_color") if users_map.get(cid) else None,
-                        "photo": users_map.get(cid, {}).get("user_photo") if users_map.get(cid) else None,
-                    }
-                    for cid in collaborators_ids if cid
-                ],
-                # Build managers array from all IDs
-                "managers": [
-                    {
-                        "id": mid,
-                        "name": users_map.get(mid, {}).get("user_name") if users_map.get(mid) else None,
-                        "avatar_color": users_map.get(mid, {}).get("avatar_color") if users_map.get(mid) else None,
-                        "photo": users_map.get(mid, {}).get("user_photo") if users_map.get(mid) else None,
-                    }
-                    for mid in managers_ids if mid
-                ],
-                # Legacy single manager (for backward compatibility)
-                "manager": {
-                    "id": managers_ids[0] if managers_ids else None,
-                    "name": users_map.get(managers_ids[0], {}).get("user_name") if managers_ids and users_map.get(managers_ids[0]) else None,
-                    "avatar_color": users_map.get(managers_ids[0], {}).get("avatar_color") if managers_ids and users_map.get(managers_ids[0]) else None,
-                    "photo": users_map.get(managers_ids[0], {}).get("user_photo") if managers_ids and users_map.get(managers_ids[0]) else None,
-                } if managers_ids else None,
-                "priority": {
-                    "priority_id": priority_id,
-                    "priority_name": priority_data["priority"] if priority_data else None,
-                } if priority_id else None,
-                "finished_status": {
-                    "completed_status_id": finished_id,
-                    "completed_status_name": finished_data["completed_status"] if finished_data else None,
-                } if finished_id else None,
-            }
-
-            groups_map[group_key]["tasks"].append(enriched_task)
-
-        # 5. Construir lista final con todos los statuses (incluso vacíos)
+        # Construir lista final con todos los statuses (incluso vacíos)
         groups: List[Dict[str, Any]] = []
-
         for status in statuses:
-            status_id = status["task_status_id"]
-            status_name = status["task_status"]
-            group_key = str(status_id)
-
+            group_key = str(status["task_status_id"])
             if group_key in groups_map:
                 groups.append(groups_map.pop(group_key))
             else:
                 groups.append({
-                    "status_id": status_id,
-                    "status_name": status_name,
+                    "status_id": status["task_status_id"],
+                    "status_name": status["task_status"],
                     "tasks": [],
                 })
 
         # Añadir grupos remanentes (tareas sin status válido)
-        for remaining_group in groups_map.values():
-            groups.append(remaining_group)
+        groups.extend(groups_map.values())
 
         total_tasks = sum(len(g.get("tasks", [])) for g in groups)
         logger.info(f"[PIPELINE] Returning {len(groups)} groups with {total_tasks} total tasks")
@@ -337,6 +287,176 @@ def get_pipeline_grouped(company_id: Optional[str] = Query(None)) -> Dict[str, A
         raise HTTPException(status_code=500, detail=f"DB error: {e}") from e
 
 
+# ====== BOARD (paged + incremental) ======
+# Same enrichment as /grouped, but:
+#   * only the columns the board renders (BOARD_TASK_COLUMNS)
+#   * top `per_status_limit` tasks per status plus each status's total, so
+#     the UI can "load more" one column (status_id + offset)
+#   * open tasks + tasks closed in the last `closed_days` (all closed with
+#     include_all_closed=true)
+#   * since=<cursor>: only tasks changed after the cursor plus deleted ids,
+#     for patching client state; every response returns the next cursor
+# The paged read is one pipeline_board() call (sql/pipeline_board.sql);
+# without the function it falls back to one query per status.
+
+BOARD_TASK_COLUMNS = (
+    "task_id, task_description, task_status, task_priority, task_finished_status, "
+    "project_id, company_management, task_department, task_type, Owner_id, "
+    "collaborators_ids, Colaborators_id, managers_ids, manager, due_date, start_date, "
+    "deadline, time_start, time_finish, estimated_hours, docs_link, result_link, "
+    "is_automated, automation_type, created_at, updated_at"
+)
+
+
+def _parse_stamp(value: Any) -> Optional[datetime]:
+    """ISO timestamp -> aware UTC datetime ('Z' or any offset; naive = UTC)."""
+    try:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+
+def _board_cursor(rows: List[Dict[str, Any]], floor: Optional[datetime] = None) -> Optional[str]:
+    """Highest updated_at/deleted_at seen, compared as datetimes (a client
+    cursor may differ from DB strings in offset or precision), as UTC ISO."""
+    stamps = [_parse_stamp(r.get("updated_at") or r.get("deleted_at")) for r in rows]
+    stamps = [s for s in stamps if s]
+    if floor:
+        stamps.append(floor)
+    return max(stamps).isoformat() if stamps else None
+
+
+def _board_page_fallback(
+    company_id: Optional[str],
+    status_ids: List[Optional[str]],
+    per_status: int,
+    offset: int,
+    closed_ids: set,
+    closed_since: Optional[str],
+) -> List[tuple]:
+    """pipeline_board() without the SQL function: one query per status."""
+    out: List[tuple] = []
+    for sid in status_ids:
+        q = supabase.table("tasks").select(BOARD_TASK_COLUMNS, count="exact")
+        q = q.eq("task_status", sid) if sid else q.is_("task_status", "null")
+        if company_id:
+            q = q.or_(f"company_management.eq.{company_id},company_management.is.null")
+        if closed_since and sid in closed_ids:
+            q = q.gte("updated_at", closed_since)
+        res = q.order("created_at", desc=True).range(offset, offset + per_status - 1).execute()
+        total = res.count if res.count is not None else len(res.data or [])
+        out.extend((row, total) for row in (res.data or []))
+    return out
+
+
+@router.get("/board")
+def get_pipeline_board(
+    company_id: Optional[str] = Query(None),
+    per_status_limit: int = Query(100, ge=1, le=500),
+    status_id: Optional[str] = Query(None, description="Load more for one status column"),
+    offset: int = Query(0, ge=0),
+    closed_days: int = Query(14, ge=0, description="Closed tasks updated in the last N days"),
+    include_all_closed: bool = Query(False),
+    since: Optional[str] = Query(None, description="Cursor from a previous response: only changes after it"),
+) -> Dict[str, Any]:
+    """Task board grouped by status, paged per column, with incremental refresh."""
+    since_dt = None
+    if since:
+        since_dt = _parse_stamp(since)
+        if since_dt is None:
+            raise HTTPException(status_code=400, detail="since must be an ISO 8601 timestamp")
+        since = since_dt.isoformat()
+
+    try:
+        lk = get_lookups()
+
+        if since:
+            q = supabase.table("tasks").select(BOARD_TASK_COLUMNS).gt("updated_at", since)
+            if company_id:
+                q = q.or_(f"company_management.eq.{company_id},company_management.is.null")
+            changed = q.order("updated_at").limit(2000).execute().data or []
+            dq = supabase.table("task_deletions").select("task_id, deleted_at").gt("deleted_at", since)
+            if company_id:
+                dq = dq.or_(f"company_management.eq.{company_id},company_management.is.null")
+            deleted = dq.execute().data or []
+            lk = lookups_for(changed)
+            return {
+                "since": since,
+                "cursor": _board_cursor(changed + deleted, since_dt),
+                "changed": [_enrich_task(t, lk) for t in changed],
+                "deleted": [d["task_id"] for d in deleted],
+            }
+
+        closed_ids = lk["closed_status_ids"]
+        closed_since = None
+        if not include_all_closed:
+            closed_since = (datetime.now(timezone.utc) - timedelta(days=closed_days)).isoformat()
+
+        try:
+            res = supabase.rpc("pipeline_board", {
+                "p_company_id": company_id,
+                "p_per_status": per_status_limit,
+                "p_closed_status_ids": closed_ids,
+                "p_closed_since": closed_since,
+                "p_status_id": status_id,
+                "p_offset": offset,
+            }).execute()
+            page = [(r["task"], r["status_total"]) for r in (res.data or [])]
+        except Exception as e:
+            logger.warning(f"[PIPELINE] pipeline_board RPC unavailable, per-status fallback: {e}")
+            sids = [status_id] if status_id else [s["task_status_id"] for s in lk["statuses"]] + [None]
+            page = _board_page_fallback(company_id, sids, per_status_limit, offset, set(closed_ids), closed_since)
+        lk = lookups_for([t for t, _ in page])
+
+        groups_map: Dict[Any, Dict[str, Any]] = {}
+        for task, total in page:
+            sid = task.get("task_status")
+            g = groups_map.setdefault(sid, {"tasks": [], "total": int(total or 0)})
+            g["tasks"].append(_enrich_task(task, lk))
+
+        closed_set = set(lk["closed_status_ids"])
+        statuses = lk["statuses"]
+        if status_id:
+            statuses = [s for s in statuses if str(s["task_status_id"]) == str(status_id)]
+        groups: List[Dict[str, Any]] = []
+        for s in statuses:
+            sid = s["task_status_id"]
+            g = groups_map.pop(sid, {"tasks": [], "total": 0})
+            groups.append({
+                "status_id": sid,
+                "status_name": s["task_status"],
+                "is_closed": sid in closed_set,
+                "total": g["total"],
+                "offset": offset,
+                "has_more": offset + len(g["tasks"]) < g["total"],
+                "tasks": g["tasks"],
+            })
+        # Tasks whose status is missing / unknown.
+        for sid, g in groups_map.items():
+            groups.append({
+                "status_id": sid,
+                "status_name": lk["status_names"].get(sid, "(no status)"),
+                "is_closed": False,
+                "total": g["total"],
+                "offset": offset,
+                "has_more": offset + len(g["tasks"]) < g["total"],
+                "tasks": g["tasks"],
+            })
+
+        return {
+            "groups": groups,
+            "cursor": _board_cursor([t for t, _ in page]) or datetime.now(timezone.utc).isoformat(),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[PIPELINE] ERROR in GET /pipeline/board: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"DB error: {e}") from e
+
+
 # ====== TASK CRUD ENDPOINTS ======
 
 @router.post("/tasks", status_code=201)
@@ -382,6 +502,8 @@ def create_task(payload: TaskCreate) -> Dict[str, Any]:
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create task")
 
+        dependency_graph.on_task_written(response.data[0])
+
         return {
             "message": "Task created successfully",
             "task": response.data[0],
@@ -913,6 +1035,8 @@ def patch_task(task_id: str, payload: TaskUpdate) -> Dict[str, Any]:
         if not response.data:
             raise HTTPException(status_code=404, detail="Task not found after update")
 
+        dependency_graph.on_task_written(response.data[0])
+
         return {
             "message": "Task updated successfully",
             "task": response.data[0],
@@ -938,6 +1062,7 @@ def delete_task(task_id: str) -> Dict[str, Any]:
 
         # Eliminar
         supabase.table("tasks").delete().eq("task_id", task_id).execute()
+        dependency_graph.on_task_deleted(task_id)
 
         return {"message": "Task deleted successfully"}
 
@@ -1172,6 +1297,7 @@ def start_task(task_id: str) -> Dict[str, Any]:
             raise HTTPException(status_code=500, detail="Failed to update task")
 
         updated_task = response.data[0]
+        dependency_graph.on_task_written(updated_task)
 
         # Log the workflow event
         try:
@@ -1276,6 +1402,7 @@ def send_task_to_review(task_id: str, payload: SendToReviewRequest) -> Dict[str,
             raise HTTPException(status_code=500, detail="Failed to update task")
 
         updated_task = response.data[0]
+        dependency_graph.on_task_written(updated_task)
 
         # 4. Crear tarea para el autorizador
         reviewer_task_created = False
@@ -1554,6 +1681,8 @@ class DutyContext:
     """Inputs a duty's collect() may need beyond its own source query."""
     settings: Dict[str, Any]
     existing_tasks: Dict[Any, Dict[str, Any]]   # project_id -> existing automated task row
+    # Datasets shared by every duty of the current run (projects, expenses, ...).
+    run: "DutyRunContext" = field(default_factory=lambda: DutyRunContext())
 
 
 @dataclass
@@ -1572,54 +1701,266 @@ class DutySpec:
     collect: Optional[Callable[["DutyContext"], Dict[Any, DutyTask]]] = None
 
 
-def _resolve_not_started_status_id() -> Optional[str]:
-    resp = supabase.table("tasks_status").select("task_status_id").ilike(
-        "task_status", "not started"
-    ).execute()
-    return resp.data[0]["task_status_id"] if resp.data else None
+# Columns of existing automated tasks: enough to diff desired vs current content.
+_AUTOMATED_TASK_COLUMNS = (
+    "task_id, project_id, created_at, automation_type, automation_source_id, "
+    "task_description, task_notes, automation_metadata, managers_ids, manager, "
+    "Owner_id, task_department"
+)
 
+# Last run of each duty in this process, for GET /automations/status.
+_DUTY_RUN_STATS: Dict[str, Dict[str, Any]] = {}
+_LAST_AUTOMATIONS_RUN: Dict[str, Any] = {}
 
-def _resolve_duty_department(settings: Dict[str, Any], hint: Optional[str]) -> Optional[str]:
-    """Configured department wins; otherwise fall back to a name match on `hint`."""
-    dept = settings.get("default_department_id")
-    if dept:
-        return dept
-    if hint:
-        resp = supabase.table("task_departments").select("department_id").ilike(
-            "department_name", f"%{hint}%"
-        ).execute()
-        if resp.data:
-            return resp.data[0]["department_id"]
-    return None
+
+_DUTY_PAGE_SIZE = 1000  # PostgREST's default max rows per request
+
+
+def _fetch_all_rows(build: Callable[[], Any], order_col: str) -> List[Dict[str, Any]]:
+    """Every row of the query build() returns, paged past the 1000-row cap.
+    A failed page raises: duties delete tasks for projects missing from their
+    input, so a short read must never pass for a complete one."""
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        batch = (
+            build().order(order_col)
+            .range(offset, offset + _DUTY_PAGE_SIZE - 1)
+            .execute().data or []
+        )
+        rows.extend(batch)
+        if len(batch) < _DUTY_PAGE_SIZE:
+            return rows
+        offset += _DUTY_PAGE_SIZE
+
+
+class DutyRunContext:
+    """Datasets shared by the duties of one automations run.
+
+    Each dataset is read on first use and reused by every later duty, so
+    running the whole registry reads settings, projects, expenses, automated
+    tasks and overrides once instead of once per duty (or per project). Also
+    records per-dataset load times and per-duty stats.
+    """
+
+    def __init__(self):
+        import time
+        self._data: Dict[str, Any] = {}
+        self.started = time.perf_counter()
+        self.load_ms: Dict[str, float] = {}
+
+    def _memo(self, name: str, loader: Callable[[], Any]) -> Any:
+        if name not in self._data:
+            import time
+            t0 = time.perf_counter()
+            self._data[name] = loader()
+            self.load_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+        return self._data[name]
+
+    # -- datasets --
+
+    def settings(self, automation_type: str) -> Dict[str, Any]:
+        rows = self._memo("automation_settings", lambda: {
+            r["automation_type"]: r
+            for r in (supabase.table("automation_settings").select("*").execute().data or [])
+        })
+        return rows.get(automation_type) or {}
+
+    def projects(self) -> Dict[Any, Dict[str, Any]]:
+        def load():
+            try:
+                rows = _fetch_all_rows(lambda: supabase.table("projects").select(
+                    "project_id, project_name, budget, is_active, source_company, project_status(status)"
+                ), "project_id")
+            except Exception:
+                rows = _fetch_all_rows(lambda: supabase.table("projects").select(
+                    "project_id, project_name, budget, is_active, source_company"
+                ), "project_id")
+            return {p["project_id"]: p for p in rows}
+        return self._memo("projects", load)
+
+    def project_name(self, project_id: Any) -> str:
+        return (self.projects().get(project_id) or {}).get("project_name") or "Unknown Project"
+
+    def _expense_rows(self, name: str, where: Callable[[Any], Any]) -> List[Dict[str, Any]]:
+        return self._memo(name, lambda: _fetch_all_rows(
+            lambda: where(supabase.table("expenses_manual_COGS").select(
+                "expense_id, project, Amount"
+            ).eq("is_deleted", False)),
+            "expense_id",
+        ))
+
+    def expenses(self) -> List[Dict[str, Any]]:
+        """Every non-deleted COGS expense (project spend)."""
+        return self._expense_rows("expenses", lambda q: q)
+
+    def pending_expenses(self) -> List[Dict[str, Any]]:
+        """Non-deleted expenses awaiting authorization (auth_status null/false)."""
+        return self._expense_rows(
+            "pending_expenses", lambda q: q.or_("auth_status.is.null,auth_status.eq.false"))
+
+    def uncategorized_expenses(self) -> List[Dict[str, Any]]:
+        """Non-deleted expenses without a category (null or empty)."""
+        return self._expense_rows(
+            "uncategorized_expenses", lambda q: q.or_("expense_category.is.null,expense_category.eq."))
+
+    def automated_tasks(self, automation_type: str) -> List[Dict[str, Any]]:
+        by_type = self._memo("automated_tasks", lambda: _group_by(
+            _fetch_all_rows(lambda: supabase.table("tasks").select(_AUTOMATED_TASK_COLUMNS)
+                            .eq("is_automated", True), "task_id"),
+            "automation_type",
+        ))
+        return by_type.get(automation_type, [])
+
+    def work_tasks(self) -> List[Dict[str, Any]]:
+        """Non-automated tasks (the ones duties report on)."""
+        return self._memo("work_tasks", lambda: _fetch_all_rows(lambda: supabase.table("tasks").select(
+            "task_id, project_id, deadline, due_date, task_status, is_automated"
+        ).eq("is_automated", False), "task_id"))
+
+    def override(self, automation_type: str, project_id: Any) -> Optional[Dict[str, Any]]:
+        rows = self._memo("overrides", lambda: {
+            (r.get("automation_type"), r.get("project_id")): r
+            for r in (supabase.table("automation_owner_overrides").select(
+                "automation_type, project_id, owner_id, manager_id"
+            ).execute().data or [])
+        })
+        return rows.get((automation_type, project_id))
+
+    def user_ids_for_role(self, role_id: Any) -> List[str]:
+        by_role = self._memo("users_by_role", lambda: _group_by(
+            supabase.table("users").select("user_id, user_rol").execute().data or [],
+            "user_rol",
+        ))
+        return [u["user_id"] for u in by_role.get(role_id, []) if u.get("user_id")]
+
+    def not_started_status_id(self) -> Optional[str]:
+        for sid, name in get_lookups()["status_names"].items():
+            if (name or "").lower() == "not started":
+                return sid
+        return None
+
+    def done_status_ids(self) -> set:
+        return set(get_lookups()["closed_status_ids"])
+
+    def department_for(self, settings: Dict[str, Any], hint: Optional[str]) -> Optional[str]:
+        """Configured department wins; otherwise fall back to a name match on `hint`."""
+        if settings.get("default_department_id"):
+            return settings["default_department_id"]
+        if not hint:
+            return None
+        departments = self._memo("task_departments", lambda: supabase.table("task_departments").select(
+            "department_id, department_name"
+        ).execute().data or [])
+        for d in departments:
+            if hint.lower() in (d.get("department_name") or "").lower():
+                return d["department_id"]
+        return None
+
+    def priority_id(self, level) -> Optional[str]:
+        return self._memo(f"priority:{level}", lambda: _priority_id_for_level(level))
+
+    # -- stats --
+
+    def record(self, automation_type: str, started: float, stats: Dict[str, Any],
+               error: Optional[str] = None) -> None:
+        import time
+        from datetime import datetime, timezone
+        _DUTY_RUN_STATS[automation_type] = {
+            **stats,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "error": error,
+        }
+
+    def finish(self, ran: List[str]) -> None:
+        import time
+        from datetime import datetime, timezone
+        _LAST_AUTOMATIONS_RUN.clear()
+        _LAST_AUTOMATIONS_RUN.update({
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "duties": ran,
+            "load_ms": dict(self.load_ms),
+        })
+
+
+def _group_by(rows: List[Dict[str, Any]], key: str) -> Dict[Any, List[Dict[str, Any]]]:
+    out: Dict[Any, List[Dict[str, Any]]] = {}
+    for r in rows:
+        out.setdefault(r.get(key), []).append(r)
+    return out
 
 
-def run_duty(spec: DutySpec) -> tuple:
+def _task_differs(current: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+    """Whether writing `desired` would change the stored automated task."""
+    for key, want in desired.items():
+        have = current.get(key)
+        if key == "managers_ids":
+            if sorted(map(str, have or [])) != sorted(map(str, want or [])):
+                return True
+        elif have != want:
+            return True
+    return False
+
+
+def _apply_task_updates(rows: List[Dict[str, Any]]) -> None:
+    """Per-task updates [{task_id, <columns>}] in one apply_automation_task_updates()
+    call; per-row updates while the function is missing."""
+    if not rows:
+        return
+    try:
+        supabase.rpc("apply_automation_task_updates", {"p_rows": rows}).execute()
+        return
+    except Exception as e:
+        logger.warning("[AUTOMATIONS] bulk task update failed, per-row fallback: %s", e)
+    for r in rows:
+        data = {k: v for k, v in r.items() if k != "task_id"}
+        supabase.table("tasks").update(data).eq("task_id", r["task_id"]).execute()
+
+
+def run_duty(spec: DutySpec, run: Optional[DutyRunContext] = None) -> tuple:
     """Generic duty runner. Returns (tasks_created, tasks_updated).
 
     Does NOT check is_enabled (matches the legacy runners; the enabled gate lives
     in trigger_duty and in the scheduler's selection of which duties to run).
     Raises on hard errors so /automations/run can report them.
+
+    `run` carries the datasets shared with the other duties of the same run; a
+    standalone call gets its own. Desired tasks are diffed against the existing
+    ones in memory: new ones are inserted in one call, changed ones updated in
+    one call, unchanged ones left alone, obsolete ones deleted in one call.
     """
+    import time
+    run = run or DutyRunContext()
     atype = spec.automation_type
     logger.info("[AUTOMATIONS] Running %s...", atype)
 
-    settings_resp = supabase.table("automation_settings").select("*").eq(
-        "automation_type", atype
-    ).execute()
-    settings = settings_resp.data[0] if settings_resp.data else {}
+    started = time.perf_counter()
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    try:
+        _run_duty(spec, run, stats)
+    except Exception as e:
+        run.record(atype, started, stats, error=repr(e))
+        raise
+    run.record(atype, started, stats)
+    logger.info("[AUTOMATIONS] %s done: %s created, %s updated, %s unchanged, %s removed",
+                atype, stats["created"], stats["updated"], stats["unchanged"], stats["deleted"])
+    return (stats["created"], stats["updated"])
 
-    existing_resp = supabase.table("tasks").select(
-        "task_id, project_id, created_at"
-    ).eq("automation_type", atype).eq("is_automated", True).execute()
-    existing_tasks = {t["project_id"]: t for t in (existing_resp.data or [])}
 
-    ctx = DutyContext(settings=settings, existing_tasks=existing_tasks)
+def _run_duty(spec: DutySpec, run: DutyRunContext, stats: Dict[str, int]) -> None:
+    atype = spec.automation_type
+    settings = run.settings(atype)
+    existing_tasks = {t["project_id"]: t for t in run.automated_tasks(atype)}
+
+    ctx = DutyContext(settings=settings, existing_tasks=existing_tasks, run=run)
     tasks_by_project = spec.collect(ctx) or {}
 
     # Legacy safety: an empty result never deletes existing tasks (guards against a
     # transient empty read wiping the whole cluster).
     if not tasks_by_project:
-        return (0, 0)
+        return
 
     multi = spec.resolve_managers is not None
     default_owner_id = settings.get("default_owner_id")
@@ -1631,34 +1972,22 @@ def run_duty(spec: DutySpec) -> tuple:
         mid = settings.get("default_manager_id")
         base_manager_ids = [mid] if mid else []
 
-    department_id = _resolve_duty_department(settings, spec.department_hint)
-    not_started_status_id = _resolve_not_started_status_id()
-    duty_priority_id = _priority_id_for_level(settings.get("default_priority"))
+    department_id = run.department_for(settings, spec.department_hint)
+    not_started_status_id = run.not_started_status_id()
+    duty_priority_id = run.priority_id(settings.get("default_priority"))
     from datetime import datetime
     start_today = datetime.utcnow().date().isoformat()
-    # Scope each per-project duty task to that project's workspace (one batched read).
-    project_company: Dict[Any, Any] = {}
-    pids = [pid for pid in tasks_by_project.keys() if pid]
-    if pids:
-        try:
-            rows = (supabase.table("projects").select("project_id, source_company")
-                    .in_("project_id", pids).execute().data) or []
-            project_company = {r.get("project_id"): r.get("source_company") for r in rows}
-        except Exception as exc:
-            logger.debug("[AUTOMATIONS] %s: project company lookup failed: %s", atype, exc)
+    projects = run.projects()
 
-    created = 0
-    updated = 0
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
 
     for project_id, dtask in tasks_by_project.items():
-        override_resp = supabase.table("automation_owner_overrides").select(
-            "owner_id, manager_id"
-        ).eq("automation_type", atype).eq("project_id", project_id).execute()
+        override = run.override(atype, project_id)
 
         owner_id = default_owner_id
         manager_ids = list(base_manager_ids)
-        if override_resp.data:
-            override = override_resp.data[0]
+        if override:
             owner_id = override.get("owner_id") or default_owner_id
             # A project-level manager override pins the task to that single user.
             if override.get("manager_id"):
@@ -1666,7 +1995,8 @@ def run_duty(spec: DutySpec) -> tuple:
 
         legacy_manager = manager_ids[0] if manager_ids else None
 
-        if project_id in existing_tasks:
+        existing = existing_tasks.get(project_id)
+        if existing:
             update_data: Dict[str, Any] = {
                 "task_description": dtask.description,
                 "task_notes": dtask.notes,
@@ -1677,10 +2007,10 @@ def run_duty(spec: DutySpec) -> tuple:
             if multi:
                 update_data["managers_ids"] = manager_ids
                 update_data["manager"] = legacy_manager
-            supabase.table("tasks").update(update_data).eq(
-                "task_id", existing_tasks[project_id]["task_id"]
-            ).execute()
-            updated += 1
+            if _task_differs(existing, update_data):
+                updates.append({"task_id": existing["task_id"], **update_data})
+            else:
+                stats["unchanged"] += 1
         else:
             new_task: Dict[str, Any] = {
                 "task_description": dtask.description,
@@ -1694,24 +2024,28 @@ def run_duty(spec: DutySpec) -> tuple:
                 "is_automated": True,
                 "automation_metadata": dtask.metadata,
                 "start_date": start_today,
+                # Scope each per-project duty task to that project's workspace.
+                "company_management": (projects.get(project_id) or {}).get("source_company"),
             }
             if duty_priority_id:
                 new_task["task_priority"] = duty_priority_id
-            if project_company.get(project_id):
-                new_task["company_management"] = project_company[project_id]
             if multi:
                 new_task["managers_ids"] = manager_ids
-            supabase.table("tasks").insert(new_task).execute()
-            created += 1
+            inserts.append(new_task)
 
-    if spec.cleanup_obsolete:
-        for project_id, task in existing_tasks.items():
-            if project_id not in tasks_by_project:
-                supabase.table("tasks").delete().eq("task_id", task["task_id"]).execute()
-                logger.info("[AUTOMATIONS] %s: removed obsolete task for project %s", atype, project_id)
+    # Bulk inserts need identical keys on every row (all built above the same way).
+    if inserts:
+        supabase.table("tasks").insert(inserts).execute()
+        stats["created"] = len(inserts)
+    _apply_task_updates(updates)
+    stats["updated"] = len(updates)
 
-    logger.info("[AUTOMATIONS] %s done: %s created, %s updated", atype, created, updated)
-    return (created, updated)
+    if spec.cleanup_obsolete:
+        obsolete = [t["task_id"] for pid, t in existing_tasks.items() if pid not in tasks_by_project]
+        if obsolete:
+            supabase.table("tasks").delete().in_("task_id", obsolete).execute()
+            stats["deleted"] = len(obsolete)
+            logger.info("[AUTOMATIONS] %s: removed %s obsolete tasks", atype, len(obsolete))
 
 
 def trigger_duty(automation_type: str) -> None:
@@ -1722,12 +2056,10 @@ def trigger_duty(automation_type: str) -> None:
         if not spec:
             logger.warning("[AUTOMATIONS] trigger_duty: unknown duty %s", automation_type)
             return
-        enabled_resp = supabase.table("automation_settings").select("is_enabled").eq(
-            "automation_type", automation_type
-        ).execute()
-        if not (enabled_resp.data and enabled_resp.data[0].get("is_enabled")):
+        run = DutyRunContext()
+        if not run.settings(automation_type).get("is_enabled"):
             return
-        run_duty(spec)
+        run_duty(spec, run)
     except Exception as e:  # never block the calling write path
         logger.error("[AUTOMATIONS] trigger_duty(%s) failed: %s", automation_type, repr(e))
 
@@ -1747,6 +2079,8 @@ def run_automations(payload: AutomationsRunRequest) -> Dict[str, Any]:
     - pending_expenses_auth: Crea tareas para proyectos con gastos pendientes de autorización
     - pending_invoices: Crea tareas para facturas pendientes por enviar
     - overdue_tasks: Crea alertas para tareas vencidas
+
+    Todas comparten un DutyRunContext: los datos comunes se leen una sola vez.
     """
     logger.info(f"[AUTOMATIONS] Running automations: {payload.automations}")
 
@@ -1754,6 +2088,8 @@ def run_automations(payload: AutomationsRunRequest) -> Dict[str, Any]:
     tasks_updated = 0
     errors = []
     skipped = []
+    ran: List[str] = []
+    run = DutyRunContext()
 
     try:
         for automation_id in payload.automations:
@@ -1762,36 +2098,44 @@ def run_automations(payload: AutomationsRunRequest) -> Dict[str, Any]:
                 # explicitly disabled, regardless of what the caller passed. (An
                 # absent settings row falls through to run, matching legacy.)
                 try:
-                    en = (supabase.table("automation_settings").select("is_enabled")
-                          .eq("automation_type", automation_id).limit(1).execute().data) or []
+                    enabled = run.settings(automation_id).get("is_enabled")
                 except Exception:
-                    en = []
-                if en and en[0].get("is_enabled") is False:
+                    enabled = None
+                if enabled is False:
                     logger.info("[AUTOMATIONS] %s skipped (disabled)", automation_id)
                     skipped.append(automation_id)
                     continue
-                created, updated = run_duty(DUTY_REGISTRY[automation_id])
+                created, updated = run_duty(DUTY_REGISTRY[automation_id], run)
                 tasks_created += created
                 tasks_updated += updated
+                ran.append(automation_id)
             elif automation_id == "manual_responsibilities":
-                created, updated = _run_manual_responsibilities()
+                created, updated = _run_manual_responsibilities(run)
                 tasks_created += created
                 tasks_updated += updated
+                ran.append(automation_id)
             elif automation_id == "pending_invoices":
                 # TODO: Implementar logica para facturas pendientes
                 logger.info(f"[AUTOMATIONS] pending_invoices: Not implemented yet")
             else:
                 errors.append(f"Unknown automation: {automation_id}")
 
+        run.finish(ran)
         return {
             "success": True,
             "tasks_created": tasks_created,
             "tasks_updated": tasks_updated,
             "skipped": skipped if skipped else None,
-            "errors": errors if errors else None
+            "errors": errors if errors else None,
+            "timings": {
+                "total_ms": _LAST_AUTOMATIONS_RUN.get("duration_ms"),
+                "load_ms": _LAST_AUTOMATIONS_RUN.get("load_ms"),
+                "duties_ms": {a: (_DUTY_RUN_STATS.get(a) or {}).get("duration_ms") for a in ran},
+            },
         }
 
     except Exception as e:
+        run.finish(ran)
         logger.error(f"[AUTOMATIONS] ERROR: {repr(e)}")
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Automation error: {e}") from e
@@ -1843,9 +2187,7 @@ def run_automations(payload: AutomationsRunRequest) -> Dict[str, Any]:
 def _collect_pending_expenses_auth(ctx: DutyContext) -> Dict[Any, DutyTask]:
     """One task per project with expenses pending authorization (auth_status
     null/false). Role-managed (Accounting Manager) via DutySpec.resolve_managers."""
-    expenses = supabase.table("expenses_manual_COGS").select(
-        "expense_id, project, Amount"
-    ).or_("auth_status.is.null,auth_status.eq.false").eq("is_deleted", False).execute().data or []
+    expenses = ctx.run.pending_expenses()
     logger.info("[AUTOMATIONS] Found %s pending expenses", len(expenses))
     if not expenses:
         return {}
@@ -1862,14 +2204,9 @@ def _collect_pending_expenses_auth(ctx: DutyContext) -> Dict[Any, DutyTask]:
     if not by_project:
         return {}
 
-    projects_response = supabase.table("projects").select(
-        "project_id, project_name"
-    ).in_("project_id", list(by_project.keys())).execute()
-    projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
-
     out: Dict[Any, DutyTask] = {}
     for project_id, data in by_project.items():
-        project_name = projects_map.get(project_id, {}).get("project_name", "Unknown Project")
+        project_name = ctx.run.project_name(project_id)
         count, total = data["count"], data["total"]
         out[project_id] = DutyTask(
             description=f"Gastos pendientes por autorizar en {project_name}",
@@ -1890,7 +2227,7 @@ def _collect_pending_expenses_auth(ctx: DutyContext) -> Dict[Any, DutyTask]:
 MANUAL_RESPONSIBILITY_TYPE = "manual_responsibility"
 
 
-def _resolve_responsibility_assignees(resp: Dict[str, Any]) -> tuple:
+def _resolve_responsibility_assignees(resp: Dict[str, Any], run: Optional[DutyRunContext] = None) -> tuple:
     """(owner_id, manager_ids) for a responsibility.
 
     - responsible_type='user': owner_id=that user (so it shows in /my-work too).
@@ -1900,11 +2237,8 @@ def _resolve_responsibility_assignees(resp: Dict[str, Any]) -> tuple:
     if rtype == "user" and resp.get("responsible_user_id"):
         return resp["responsible_user_id"], []
     if rtype == "role" and resp.get("responsible_role_id") is not None:
-        users = supabase.table("users").select("user_id").eq(
-            "user_rol", resp["responsible_role_id"]
-        ).execute()
-        ids = [u["user_id"] for u in (users.data or []) if u.get("user_id")]
-        return None, ids
+        run = run or DutyRunContext()
+        return None, run.user_ids_for_role(resp["responsible_role_id"])
     return None, []
 
 
@@ -1934,17 +2268,12 @@ def _responsibility_recurrence_due(recurrence: str, last_generated_at) -> bool:
     return delta >= intervals.get(recurrence, timedelta.max)
 
 
-def _active_project_ids() -> List[str]:
+def _active_project_ids(run: Optional[DutyRunContext] = None) -> List[str]:
     """Project ids that are not in a closed/finished state (best-effort heuristic)."""
-    try:
-        rows = supabase.table("projects").select(
-            "project_id, project_status(status)"
-        ).execute().data or []
-    except Exception:
-        rows = supabase.table("projects").select("project_id").execute().data or []
+    run = run or DutyRunContext()
     closed_markers = ("complete", "done", "closed", "cancel", "archiv")
     ids: List[str] = []
-    for p in rows:
+    for p in run.projects().values():
         rel = p.get("project_status")
         status_name = ""
         if isinstance(rel, dict):
@@ -1964,17 +2293,22 @@ def trigger_manual_responsibilities() -> None:
         logger.error("[AUTOMATIONS] trigger_manual_responsibilities failed: %s", repr(e))
 
 
-def _run_manual_responsibilities() -> tuple:
+def _run_manual_responsibilities(run: Optional[DutyRunContext] = None) -> tuple:
     """Generate/refresh tasks for enabled manual responsibilities.
 
     Returns (tasks_created, tasks_updated). Defensive: if the `responsibilities`
-    table is not migrated yet, returns (0, 0) without raising.
+    table is not migrated yet, returns (0, 0) without raising. Existing tasks,
+    projects and role members come from the shared run context; writes are
+    batched (one insert, one bulk update of changed tasks, one
+    last_generated_at update).
     """
+    import time
     from datetime import datetime, timezone
     logger.info("[AUTOMATIONS] Running manual_responsibilities...")
 
-    tasks_created = 0
-    tasks_updated = 0
+    run = run or DutyRunContext()
+    started = time.perf_counter()
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
 
     try:
         try:
@@ -1989,12 +2323,17 @@ def _run_manual_responsibilities() -> tuple:
             return (0, 0)
 
         # "not started" status for new tasks.
-        status_response = supabase.table("tasks_status").select(
-            "task_status_id"
-        ).ilike("task_status", "not started").execute()
-        not_started_status_id = (
-            status_response.data[0]["task_status_id"] if status_response.data else None
-        )
+        not_started_status_id = run.not_started_status_id()
+
+        # Existing tasks for every responsibility, keyed by (responsibility, project).
+        existing_by_key = {
+            (t.get("automation_source_id"), t.get("project_id")): t
+            for t in run.automated_tasks(MANUAL_RESPONSIBILITY_TYPE)
+        }
+
+        inserts: List[Dict[str, Any]] = []
+        updates: List[Dict[str, Any]] = []
+        due_ids: List[Any] = []
 
         for resp in rows:
             rid = resp.get("responsibility_id")
@@ -2002,56 +2341,44 @@ def _run_manual_responsibilities() -> tuple:
             scope = (resp.get("project_scope") or "none").strip().lower()
             due = _responsibility_recurrence_due(recurrence, resp.get("last_generated_at"))
 
-            owner_id, manager_ids = _resolve_responsibility_assignees(resp)
+            owner_id, manager_ids = _resolve_responsibility_assignees(resp, run)
             legacy_manager = manager_ids[0] if manager_ids else None
 
             # Which projects this responsibility spawns tasks for.
             if scope == "specific" and resp.get("project_id"):
                 target_projects: List[Optional[str]] = [resp["project_id"]]
             elif scope == "all_active":
-                target_projects = list(_active_project_ids()) or [None]
+                target_projects = list(_active_project_ids(run)) or [None]
             else:
                 target_projects = [None]  # standalone task, no project
 
-            # Existing tasks for this responsibility, keyed by project_id.
-            existing = supabase.table("tasks").select("task_id, project_id").eq(
-                "automation_type", MANUAL_RESPONSIBILITY_TYPE
-            ).eq("automation_source_id", rid).execute().data or []
-            existing_by_project = {t.get("project_id"): t for t in existing}
-
-            # Project names for nicer descriptions.
-            names: Dict[str, str] = {}
-            proj_ids = [p for p in target_projects if p]
-            if proj_ids:
-                pr = supabase.table("projects").select(
-                    "project_id, project_name"
-                ).in_("project_id", proj_ids).execute().data or []
-                names = {p["project_id"]: p.get("project_name") for p in pr}
-
             title = resp.get("title") or "Responsibility"
             notes = f"{AUTOMATION_MARKER}:manual_responsibility"
             if resp.get("description"):
                 notes += f" | {resp['description']}"
 
             for pid in target_projects:
-                description = title if not pid else f"{title} — {names.get(pid, 'Project')}"
-                ex = existing_by_project.get(pid)
+                description = title if not pid else f"{title} — {(run.projects().get(pid) or {}).get('project_name') or 'Project'}"
+                ex = existing_by_key.get((rid, pid))
 
                 if ex and (recurrence == "none" or not due):
                     # Standing or not-yet-due task: refresh assignment so role
                     # membership / config changes propagate without duplicating.
-                    supabase.table("tasks").update({
+                    desired = {
                         "task_description": description,
                         "task_notes": notes,
                         "managers_ids": manager_ids,
                         "manager": legacy_manager,
                         "Owner_id": owner_id,
                         "task_department": resp.get("department_id"),
-                    }).eq("task_id", ex["task_id"]).execute()
-                    tasks_updated += 1
+                    }
+                    if _task_differs(ex, desired):
+                        updates.append({"task_id": ex["task_id"], **desired})
+                    else:
+                        stats["unchanged"] += 1
                 elif due:
                     # First generation, or a recurring period came due -> new task.
-                    supabase.table("tasks").insert({
+                    inserts.append({
                         "task_description": description,
                         "task_notes": notes,
                         "project_id": pid,
@@ -2068,21 +2395,29 @@ def _run_manual_responsibilities() -> tuple:
                             "priority": resp.get("priority"),
                             "recurrence": recurrence,
                         },
-                    }).execute()
-                    tasks_created += 1
+                    })
 
             if due:
-                supabase.table("responsibilities").update({
-                    "last_generated_at": datetime.now(timezone.utc).isoformat()
-                }).eq("responsibility_id", rid).execute()
-
+                due_ids.append(rid)
+
+        if inserts:
+            supabase.table("tasks").insert(inserts).execute()
+        _apply_task_updates(updates)
+        if due_ids:
+            supabase.table("responsibilities").update({
+                "last_generated_at": datetime.now(timezone.utc).isoformat()
+            }).in_("responsibility_id", due_ids).execute()
+
+        stats["created"], stats["updated"] = len(inserts), len(updates)
+        run.record("manual_responsibilities", started, stats)
         logger.info(
-            "[AUTOMATIONS] manual_responsibilities done: %s created, %s updated",
-            tasks_created, tasks_updated,
+            "[AUTOMATIONS] manual_responsibilities done: %s created, %s updated, %s unchanged",
+            stats["created"], stats["updated"], stats["unchanged"],
         )
-        return (tasks_created, tasks_updated)
+        return (stats["created"], stats["updated"])
 
     except Exception as e:
+        run.record("manual_responsibilities", started, stats, error=repr(e))
         logger.error("[AUTOMATIONS] ERROR in manual_responsibilities: %s", repr(e))
         logger.debug(traceback.format_exc())
         raise
@@ -2134,9 +2469,7 @@ def _run_manual_responsibilities() -> tuple:
 def _collect_pending_expenses_categorize(ctx: DutyContext) -> Dict[Any, DutyTask]:
     """One task per project with uncategorized expenses (expense_category null/empty).
     Single-manager (default_manager_id) -- no DutySpec.resolve_managers."""
-    expenses = supabase.table("expenses_manual_COGS").select(
-        "expense_id, project, Amount"
-    ).or_("expense_category.is.null,expense_category.eq.").eq("is_deleted", False).execute().data or []
+    expenses = ctx.run.uncategorized_expenses()
     logger.info("[AUTOMATIONS] Found %s uncategorized expenses", len(expenses))
     if not expenses:
         return {}
@@ -2153,14 +2486,9 @@ def _collect_pending_expenses_categorize(ctx: DutyContext) -> Dict[Any, DutyTask
     if not by_project:
         return {}
 
-    projects_response = supabase.table("projects").select(
-        "project_id, project_name"
-    ).in_("project_id", list(by_project.keys())).execute()
-    projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
-
     out: Dict[Any, DutyTask] = {}
     for project_id, data in by_project.items():
-        project_name = projects_map.get(project_id, {}).get("project_name", "Unknown Project")
+        project_name = ctx.run.project_name(project_id)
         count, total = data["count"], data["total"]
         out[project_id] = DutyTask(
             description=f"Gastos pendientes por categorizar en {project_name}",
@@ -2218,20 +2546,13 @@ def _collect_pending_health_check(ctx: DutyContext) -> Dict[Any, DutyTask]:
     derived from ctx.existing_tasks (created_at)."""
     from datetime import datetime, timedelta
 
-    projects = supabase.table("projects").select(
-        "project_id, project_name, budget"
-    ).eq("is_active", True).execute().data or []
+    projects = [p for p in ctx.run.projects().values() if p.get("is_active") is True]
     logger.info("[AUTOMATIONS] Found %s active projects", len(projects))
     if not projects:
         return {}
 
-    project_ids = [p["project_id"] for p in projects]
-    expenses = supabase.table("expenses_manual_COGS").select(
-        "project, Amount"
-    ).in_("project", project_ids).eq("is_deleted", False).execute().data or []
-
     expenses_by_project: Dict[str, float] = {}
-    for exp in expenses:
+    for exp in ctx.run.expenses():
         pid = exp.get("project")
         if pid:
             expenses_by_project[pid] = expenses_by_project.get(pid, 0) + float(exp.get("Amount") or 0)
@@ -2324,20 +2645,12 @@ def _collect_overdue_tasks(ctx: DutyContext) -> Dict[Any, DutyTask]:
     (default_manager_id)."""
     from datetime import datetime, timezone
 
-    # Status ids that count as finished -> excluded from "overdue".
-    statuses = supabase.table("tasks_status").select(
-        "task_status_id, task_status"
-    ).execute().data or []
-    done_status_ids = {
-        s["task_status_id"] for s in statuses
-        if any(k in (s.get("task_status") or "").lower() for k in ("done", "complete"))
-    }
+    # Status ids that count as finished ("done"/"complete") -> excluded from "overdue".
+    done_status_ids = ctx.run.done_status_ids()
 
     # Only non-automated tasks (boolean filter is reliable; dates/status applied
     # below in Python because deadline/due_date may be text or timestamps).
-    tasks = supabase.table("tasks").select(
-        "task_id, project_id, deadline, due_date, task_status, is_automated"
-    ).eq("is_automated", False).execute().data or []
+    tasks = ctx.run.work_tasks()
 
     today = datetime.now(timezone.utc).date()
     by_project: Dict[str, Dict] = {}
@@ -2364,14 +2677,9 @@ def _collect_overdue_tasks(ctx: DutyContext) -> Dict[Any, DutyTask]:
     if not by_project:
         return {}
 
-    projects_response = supabase.table("projects").select(
-        "project_id, project_name"
-    ).in_("project_id", list(by_project.keys())).execute()
-    projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
-
     out: Dict[Any, DutyTask] = {}
     for project_id, data in by_project.items():
-        project_name = projects_map.get(project_id, {}).get("project_name", "Unknown Project")
+        project_name = ctx.run.project_name(project_id)
         count = data["count"]
         oldest = data["oldest"].isoformat()
         days_overdue = (today - data["oldest"]).days
@@ -2421,12 +2729,81 @@ class WorkloadSettings(BaseModel):
     days_per_week: int = 6
 
 
+# Declared before /my-work/{user_id} so "team-overview" isn't captured as a user id.
+@router.get("/my-work/team-overview")
+def get_team_workload_overview(hours_per_day: float = 8.0, days_per_week: int = 6) -> Dict[str, Any]:
+    """
+    Devuelve resumen de carga de trabajo de todo el equipo.
+    Solo accesible por Coordination/Management roles.
+
+    Lee las filas owner de my_work_items (una sola lectura); si la proyección
+    no está disponible, cae a la consulta directa sobre tasks.
+
+    Returns:
+        Lista de usuarios con su carga de trabajo actual.
+    """
+    logger.info("[MY-WORK] GET /pipeline/my-work/team-overview")
+
+    try:
+        from datetime import datetime
+
+        lk = get_lookups()
+        users = list(lk["users"].values())
+        if not users:
+            return {"team": []}
+
+        by_owner = my_work_projection.owner_items()
+        if by_owner is None:
+            by_owner = my_work_projection.live_owner_items()
+
+        today = datetime.utcnow().date()
+        capacity_hours_week = hours_per_day * days_per_week
+
+        team_data = []
+        for u in users:
+            tasks = by_owner.get(u["user_id"], [])
+            total_hours = sum(t.get("estimated_hours") or my_work_projection.DEFAULT_TASK_HOURS for t in tasks)
+            overdue_count = sum(1 for t in tasks if my_work_projection.deadline_flags(t, today)["is_overdue"])
+            utilization = (total_hours / capacity_hours_week * 100) if capacity_hours_week > 0 else 0
+            team_data.append({
+                "user_id": u["user_id"],
+                "user_name": u.get("user_name"),
+                "avatar_color": u.get("avatar_color"),
+                "photo": u.get("user_photo"),
+                "tasks_count": len(tasks),
+                "total_hours": round(total_hours, 1),
+                "overdue_count": overdue_count,
+                "utilization_percent": round(utilization, 1),
+                "status": _workload_status(utilization),
+            })
+
+        # Ordenar por utilización (más cargados primero)
+        team_data.sort(key=lambda x: x["utilization_percent"], reverse=True)
+
+        return {
+            "team": team_data,
+            "settings": {
+                "hours_per_day": hours_per_day,
+                "days_per_week": days_per_week,
+                "capacity_hours_week": capacity_hours_week,
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"[MY-WORK] ERROR in team-overview: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
+
+
 @router.get("/my-work/{user_id}")
 def get_my_work_data(user_id: str, hours_per_day: float = 8.0, days_per_week: int = 6) -> Dict[str, Any]:
     """
     Devuelve las tareas del usuario para la página My Work con cálculo de workload.
 
-    Solo incluye tareas con status "Not Started" o "Working on It".
+    Solo incluye tareas con status "Not Started" o "Working on It", como owner
+    o manager (managers_ids[] o manager legacy). Las tareas salen de la
+    proyección my_work_items (una lectura por user_id, mantenida por trigger
+    en tasks); los nombres salen de pipeline_lookups.
     Calcula:
     - Carga de trabajo total (horas asignadas)
     - Capacidad disponible basada en hours_per_day y days_per_week
@@ -2440,64 +2817,21 @@ def get_my_work_data(user_id: str, hours_per_day: float = 8.0, days_per_week: in
     logger.info(f"[MY-WORK] GET /pipeline/my-work/{user_id}")
 
     try:
-        from datetime import datetime, timedelta
-
-        # 1. Obtener status IDs para filtrar
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-        status_name_map = {s["task_status_id"]: s["task_status"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        if not valid_status_ids:
-            return {"tasks": [], "workload": {}}
-
-        # 2. Obtener tareas del usuario (owner + manager) con status válidos.
-        #    Incluye tareas donde el usuario es manager (managers_ids[] o manager
-        #    legacy), no solo owner, para que las responsabilidades de rol-compartido
-        #    aparezcan en el widget de carga, no solo en el feed del dashboard.
-        tasks_by_id: Dict[str, Dict] = {}
-
-        def _collect(query_builder, role: str) -> None:
-            """Run a tasks query and merge rows by task_id (first role wins)."""
-            try:
-                rows = query_builder.in_("task_status", valid_status_ids).execute().data or []
-            except Exception as _exc:  # missing column on older DBs, etc.
-                logger.debug("[MY-WORK] query (%s) skipped: %s", role, _exc)
-                return
-            for row in rows:
-                tid = row.get("task_id")
-                if not tid:
-                    continue
-                if tid not in tasks_by_id:
-                    row["_role"] = role
-                    tasks_by_id[tid] = row
-
-        # Owner first so it wins the role label over manager when both match.
-        _collect(supabase.table("tasks").select("*").eq("Owner_id", user_id), "owner")
-        _collect(supabase.table("tasks").select("*").contains("managers_ids", [user_id]), "manager")
-        _collect(supabase.table("tasks").select("*").eq("manager", user_id), "manager")
+        from datetime import datetime
 
-        # Sort by deadline ascending, tasks without a deadline last.
-        tasks = sorted(
-            tasks_by_id.values(),
-            key=lambda t: (t.get("deadline") is None, t.get("deadline") or ""),
-        )
+        tasks = my_work_projection.user_items(user_id)
+        if tasks is None:
+            tasks = my_work_projection.live_user_items(user_id)
 
         logger.info(f"[MY-WORK] Found {len(tasks)} tasks for user (owner + manager)")
 
+        capacity_hours_week = hours_per_day * days_per_week
         if not tasks:
             return {
                 "tasks": [],
                 "workload": {
                     "total_hours": 0,
-                    "capacity_hours_week": hours_per_day * days_per_week,
+                    "capacity_hours_week": capacity_hours_week,
                     "utilization_percent": 0,
                     "status": "underloaded",
                     "overdue_count": 0,
@@ -2505,132 +2839,26 @@ def get_my_work_data(user_id: str, hours_per_day: float = 8.0, days_per_week: in
                 }
             }
 
-        # 3. Obtener datos relacionados
-        project_ids = list(set(t.get("project_id") for t in tasks if t.get("project_id")))
-        projects_map = {}
-        if project_ids:
-            projects_response = supabase.table("projects").select(
-                "project_id, project_name"
-            ).in_("project_id", project_ids).execute()
-            projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
-
-        priority_ids = list(set(t.get("task_priority") for t in tasks if t.get("task_priority")))
-        priorities_map = {}
-        if priority_ids:
-            priorities_response = supabase.table("tasks_priority").select(
-                "priority_id, priority"
-            ).in_("priority_id", priority_ids).execute()
-            priorities_map = {p["priority_id"]: p for p in (priorities_response.data or [])}
-
-        # Task types
-        type_ids = list(set(t.get("task_type") for t in tasks if t.get("task_type")))
-        types_map = {}
-        if type_ids:
-            types_response = supabase.table("task_types").select(
-                "type_id, type_name"
-            ).in_("type_id", type_ids).execute()
-            types_map = {t["type_id"]: t for t in (types_response.data or [])}
-
-        # 4. Calcular workload
-        now = datetime.utcnow()
-        today = now.date()
-        week_from_now = today + timedelta(days=7)
-
-        total_estimated_hours = 0
-        overdue_count = 0
-        due_soon_count = 0
+        lk = lookups_for(tasks)
+        today = datetime.utcnow().date()
+        enriched_tasks = [my_work_projection.enrich(t, lk, today) for t in tasks]
 
-        enriched_tasks = []
-        for task in tasks:
-            project_id = task.get("project_id")
-            priority_id = task.get("task_priority")
-            status_id = task.get("task_status")
-            type_id = task.get("task_type")
+        total_estimated_hours = sum(t["estimated_hours"] for t in enriched_tasks)
+        overdue_count = sum(1 for t in enriched_tasks if t["is_overdue"])
+        due_soon_count = sum(1 for t in enriched_tasks if t["is_due_soon"])
+        automated_count = sum(1 for t in enriched_tasks if t["is_automated"])
 
-            project_info = projects_map.get(project_id, {})
-            priority_info = priorities_map.get(priority_id, {})
-            type_info = types_map.get(type_id, {})
+        utilization_percent = (total_estimated_hours / capacity_hours_week * 100) if capacity_hours_week > 0 else 0
 
-            # Check if task is automated (has [AUTOMATED] in notes or specific type)
-            task_notes = task.get("task_notes") or ""
-            type_name = type_info.get("type_name", "")
-            is_automated = "[AUTOMATED]" in task_notes or type_name.lower() == "automated"
+        # Lista de tipos únicos para filtros
+        unique_types = {}
+        for t in enriched_tasks:
+            type_id = t.get("type_id")
+            if type_id and type_id not in unique_types:
+                unique_types[type_id] = t.get("type_name") or "Unknown"
 
-            # Duración estimada (default 2 horas si no está especificada)
-            duration = task.get("estimated_hours") or 2.0
-            total_estimated_hours += duration
-
-            # Verificar fechas
-            deadline_str = task.get("deadline") or task.get("due_date")
-            is_overdue = False
-            is_due_soon = False
-
-            if deadline_str:
-                try:
-                    deadline_date = datetime.fromisoformat(deadline_str.replace("Z", "")).date()
-                    if deadline_date < today:
-                        is_overdue = True
-                        overdue_count += 1
-                    elif deadline_date <= week_from_now:
-                        is_due_soon = True
-                        due_soon_count += 1
-                except Exception as _exc:
-                    logger.debug("Suppressed: %s", _exc)
-
-            enriched_tasks.append({
-                "task_id": task.get("task_id"),
-                "task_description": task.get("task_description"),
-                "project_id": project_id,
-                "project_name": project_info.get("project_name"),
-                "priority_id": priority_id,
-                "priority_name": priority_info.get("priority"),
-                "status_id": status_id,
-                "status_name": status_name_map.get(status_id),
-                "type_id": type_id,
-                "type_name": type_name,
-                "role": task.get("_role", "owner"),  # owner | manager
-                "is_automated": is_automated,
-                "due_date": task.get("due_date"),
-                "deadline": task.get("deadline"),
-                "estimated_hours": duration,
-                "time_start": task.get("time_start"),
-                "is_overdue": is_overdue,
-                "is_due_soon": is_due_soon,
-                "created_at": task.get("created_at"),
-                # Position data for canvas (stored or default)
-                "canvas_x": task.get("canvas_x"),
-                "canvas_y": task.get("canvas_y"),
-            })
-
-        # 5. Calcular métricas de workload
-        capacity_hours_week = hours_per_day * days_per_week
-        utilization_percent = (total_estimated_hours / capacity_hours_week * 100) if capacity_hours_week > 0 else 0
-
-        # Determinar status de carga
-        if utilization_percent > 120:
-            workload_status = "critical"  # Sobrecargado severamente
-        elif utilization_percent > 100:
-            workload_status = "overloaded"  # Sobrecargado
-        elif utilization_percent > 80:
-            workload_status = "optimal"  # Carga óptima
-        elif utilization_percent > 50:
-            workload_status = "normal"  # Normal
-        else:
-            workload_status = "underloaded"  # Subcargado
-
-        # 6. Generar lista de tipos únicos para filtros
-        unique_types = {}
-        automated_count = 0
-        for t in enriched_tasks:
-            type_id = t.get("type_id")
-            type_name = t.get("type_name") or "Unknown"
-            if type_id and type_id not in unique_types:
-                unique_types[type_id] = type_name
-            if t.get("is_automated"):
-                automated_count += 1
-
-        task_types = [{"id": k, "name": v} for k, v in unique_types.items()]
-        task_types.sort(key=lambda x: x["name"])
+        task_types = [{"id": k, "name": v} for k, v in unique_types.items()]
+        task_types.sort(key=lambda x: x["name"])
 
         return {
             "tasks": enriched_tasks,
@@ -2639,7 +2867,7 @@ def get_my_work_data(user_id: str, hours_per_day: float = 8.0, days_per_week: in
                 "total_hours": round(total_estimated_hours, 1),
                 "capacity_hours_week": capacity_hours_week,
                 "utilization_percent": round(utilization_percent, 1),
-                "status": workload_status,
+                "status": _workload_status(utilization_percent),
                 "overdue_count": overdue_count,
                 "due_soon_count": due_soon_count,
                 "automated_count": automated_count,
@@ -2654,123 +2882,6 @@ def get_my_work_data(user_id: str, hours_per_day: float = 8.0, days_per_week: in
         raise HTTPException(status_code=500, detail=f"Error: {e}") from e
 
 
-@router.get("/my-work/team-overview")
-def get_team_workload_overview(hours_per_day: float = 8.0, days_per_week: int = 6) -> Dict[str, Any]:
-    """
-    Devuelve resumen de carga de trabajo de todo el equipo.
-    Solo accesible por Coordination/Management roles.
-
-    Returns:
-        Lista de usuarios con su carga de trabajo actual.
-    """
-    logger.info("[MY-WORK] GET /pipeline/my-work/team-overview")
-
-    try:
-        from datetime import datetime, timedelta
-
-        # 1. Obtener todos los usuarios activos
-        users_response = supabase.table("users").select(
-            "user_id, user_name, avatar_color, user_photo"
-        ).execute()
-        users = users_response.data or []
-
-        if not users:
-            return {"team": []}
-
-        # 2. Obtener status válidos
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        if not valid_status_ids:
-            return {"team": [{"user_id": u["user_id"], "user_name": u["user_name"], "tasks_count": 0, "total_hours": 0, "status": "underloaded"} for u in users]}
-
-        # 3. Obtener todas las tareas activas
-        tasks_response = supabase.table("tasks").select(
-            "task_id, Owner_id, estimated_hours, deadline, due_date"
-        ).in_("task_status", valid_status_ids).execute()
-        tasks = tasks_response.data or []
-
-        # 4. Agrupar por usuario
-        now = datetime.utcnow()
-        today = now.date()
-        capacity_hours_week = hours_per_day * days_per_week
-
-        user_workload: Dict[str, Dict] = {u["user_id"]: {
-            "user_id": u["user_id"],
-            "user_name": u["user_name"],
-            "avatar_color": u.get("avatar_color"),
-            "photo": u.get("user_photo"),
-            "tasks_count": 0,
-            "total_hours": 0,
-            "overdue_count": 0,
-        } for u in users}
-
-        for task in tasks:
-            owner_id = task.get("Owner_id")
-            if owner_id not in user_workload:
-                continue
-
-            duration = task.get("estimated_hours") or 2.0
-            user_workload[owner_id]["tasks_count"] += 1
-            user_workload[owner_id]["total_hours"] += duration
-
-            # Check overdue
-            deadline_str = task.get("deadline") or task.get("due_date")
-            if deadline_str:
-                try:
-                    deadline_date = datetime.fromisoformat(deadline_str.replace("Z", "")).date()
-                    if deadline_date < today:
-                        user_workload[owner_id]["overdue_count"] += 1
-                except Exception as _exc:
-                    logger.debug("Suppressed: %s", _exc)
-
-        # 5. Calcular status para cada usuario
-        team_data = []
-        for user_id, data in user_workload.items():
-            utilization = (data["total_hours"] / capacity_hours_week * 100) if capacity_hours_week > 0 else 0
-
-            if utilization > 120:
-                status = "critical"
-            elif utilization > 100:
-                status = "overloaded"
-            elif utilization > 80:
-                status = "optimal"
-            elif utilization > 50:
-                status = "normal"
-            else:
-                status = "underloaded"
-
-            team_data.append({
-                **data,
-                "total_hours": round(data["total_hours"], 1),
-                "utilization_percent": round(utilization, 1),
-                "status": status,
-            })
-
-        # Ordenar por utilización (más cargados primero)
-        team_data.sort(key=lambda x: x["utilization_percent"], reverse=True)
-
-        return {
-            "team": team_data,
-            "settings": {
-                "hours_per_day": hours_per_day,
-                "days_per_week": days_per_week,
-                "capacity_hours_week": capacity_hours_week,
-            }
-        }
-
-    except Exception as e:
-        logger.error(f"[MY-WORK] ERROR in team-overview: {repr(e)}")
-        logger.debug(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
-
-
 @router.get("/automations/status")
 def get_automations_status() -> Dict[str, Any]:
     """
@@ -2780,27 +2891,21 @@ def get_automations_status() -> Dict[str, Any]:
         - pending_expenses_auth: Conteo de proyectos con gastos pendientes
         - pending_invoices: Conteo de facturas pendientes
         - overdue_tasks: Conteo de tareas vencidas
+        - duties: ultima ejecucion de cada duty en este proceso (duracion,
+          creadas/actualizadas/sin cambios/eliminadas, error)
+        - last_run: ultima corrida de /automations/run (duracion total y
+          tiempo de carga de cada dataset compartido)
     """
     try:
-        # Pending expenses count
-        expenses_response = supabase.table("expenses_manual_COGS").select(
-            "project", count="exact"
-        ).or_("auth_status.is.null,auth_status.eq.false").eq("is_deleted", False).execute()
-
-        pending_expenses_count = expenses_response.count if expenses_response.count else 0
+        run = DutyRunContext()
 
-        # Get unique projects with pending expenses
-        expenses_data = supabase.table("expenses_manual_COGS").select(
-            "project"
-        ).or_("auth_status.is.null,auth_status.eq.false").eq("is_deleted", False).execute()
-
-        unique_projects = set(
-            e.get("project") for e in (expenses_data.data or []) if e.get("project")
-        )
+        # Pending expenses (count + unique projects): one paged, filtered read.
+        pending = run.pending_expenses()
+        unique_projects = set(e.get("project") for e in pending if e.get("project"))
 
         # Overdue tasks count -- reuse the duty's collect logic (no settings needed).
         try:
-            overdue_items = _collect_overdue_tasks(DutyContext(settings={}, existing_tasks={}))
+            overdue_items = _collect_overdue_tasks(DutyContext(settings={}, existing_tasks={}, run=run))
             overdue_count = sum(int(it.metadata.get("count", 0)) for it in overdue_items.values())
             overdue_projects = len(overdue_items)
         except Exception as _exc:
@@ -2810,7 +2915,7 @@ def get_automations_status() -> Dict[str, Any]:
 
         return {
             "pending_expenses_auth": {
-                "expenses_count": pending_expenses_count,
+                "expenses_count": len(pending),
                 "projects_count": len(unique_projects),
             },
             "pending_invoices": {
@@ -2819,7 +2924,9 @@ def get_automations_status() -> Dict[str, Any]:
             "overdue_tasks": {
                 "count": overdue_count,
                 "projects_count": overdue_projects,
-            }
+            },
+            "duties": {k: dict(v) for k, v in _DUTY_RUN_STATS.items()},
+            "last_run": dict(_LAST_AUTOMATIONS_RUN) or None,
         }
 
     except Exception as e:
@@ -3421,6 +3528,9 @@ def get_automation_tasks_grouped() -> Dict[str, Any]:
 
 
 # ====== WORKLOAD SCHEDULING ENDPOINTS ======
+# Capacities, days off and open tasks are loaded once per request by
+# api/services/workload_scheduler.py, which also does the working-day
+# arithmetic and the (bulk) queue recalculation.
 
 class UserCapacityUpdate(BaseModel):
     """Model for updating user capacity settings."""
@@ -3436,6 +3546,30 @@ class ScheduleTaskRequest(BaseModel):
     force_reschedule: bool = False
 
 
+class RecalculateTeamRequest(BaseModel):
+    """Model for recalculating several queues at once (None = whole team)."""
+    user_ids: Optional[List[str]] = None
+    dry_run: bool = False
+
+
+class RecalculateDownstreamRequest(BaseModel):
+    """Model for rescheduling only what depends on some changed tasks."""
+    task_ids: List[str]
+    dry_run: bool = False
+
+
+def _workload_status(utilization: float) -> str:
+    if utilization > 120:
+        return "critical"
+    if utilization > 100:
+        return "overloaded"
+    if utilization > 80:
+        return "optimal"
+    if utilization > 50:
+        return "normal"
+    return "underloaded"
+
+
 @router.get("/workload/user/{user_id}")
 def get_user_workload(user_id: str) -> Dict[str, Any]:
     """
@@ -3450,72 +3584,40 @@ def get_user_workload(user_id: str) -> Dict[str, Any]:
     try:
         from datetime import datetime, timedelta
 
-        # Get user info
-        user_response = supabase.table("users").select(
-            "user_id, user_name, avatar_color"
-        ).eq("user_id", user_id).single().execute()
-
-        if not user_response.data:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        user = user_response.data
-
-        # Get user capacity settings
-        capacity_response = supabase.table("user_capacity_settings").select("*").eq(
-            "user_id", user_id
-        ).execute()
-
-        capacity = capacity_response.data[0] if capacity_response.data else {
-            "hours_per_day": 8.0,
-            "days_per_week": 5,
-            "working_days": [1, 2, 3, 4, 5],
-            "buffer_percent": 20,
-        }
-
-        hours_per_day = capacity.get("hours_per_day", 8.0)
-        days_per_week = capacity.get("days_per_week", 5)
-        buffer_percent = capacity.get("buffer_percent", 20)
-        effective_hours = hours_per_day * (100 - buffer_percent) / 100
-
-        # Get active tasks for user
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-        status_name_map = {s["task_status_id"]: s["task_status"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        tasks_response = supabase.table("tasks").select(
-            "task_id, task_description, project_id, estimated_hours, deadline, due_date, "
-            "scheduled_start_date, scheduled_end_date, queue_position, auto_linked, "
-            "blocked_by_task_id, task_status, task_priority, created_at"
-        ).eq("Owner_id", user_id).in_("task_status", valid_status_ids).order(
-            "queue_position", desc=False
-        ).execute()
-        tasks = tasks_response.data or []
-
-        # Get related data
-        project_ids = list(set(t.get("project_id") for t in tasks if t.get("project_id")))
-        projects_map = {}
-        if project_ids:
-            projects_response = supabase.table("projects").select(
-                "project_id, project_name"
-            ).in_("project_id", project_ids).execute()
-            projects_map = {p["project_id"]: p for p in (projects_response.data or [])}
+        lk = get_lookups()
+        user = lk["users"].get(user_id)
+        if not user:
+            # Not in the lookup snapshot yet (e.g. created in the last TTL).
+            user_response = supabase.table("users").select(
+                "user_id, user_name, avatar_color"
+            ).eq("user_id", user_id).execute()
+            if not user_response.data:
+                raise HTTPException(status_code=404, detail="User not found")
+            user = user_response.data[0]
+
+        ctx = workload_scheduler.load_context(
+            [user_id],
+            task_columns=(
+                "task_id, Owner_id, task_description, project_id, estimated_hours, deadline, due_date, "
+                "scheduled_start_date, scheduled_end_date, queue_position, auto_linked, "
+                "blocked_by_task_id, task_status, task_priority, created_at"
+            ),
+        )
+        today = ctx["today"]
+        entry = workload_scheduler.user_entry(ctx, user_id)
+        cap = entry["capacity"]
+        cal = entry["calendar"]
+        tasks = sorted(
+            entry["tasks"],
+            key=lambda t: (t.get("queue_position") is None, t.get("queue_position") or 0),
+        )
 
-        priority_ids = list(set(t.get("task_priority") for t in tasks if t.get("task_priority")))
-        priorities_map = {}
-        if priority_ids:
-            priorities_response = supabase.table("tasks_priority").select(
-                "priority_id, priority"
-            ).in_("priority_id", priority_ids).execute()
-            priorities_map = {p["priority_id"]: p for p in (priorities_response.data or [])}
+        hours_per_day = cap.hours_per_day
+        days_per_week = cap.days_per_week
+        buffer_percent = cap.buffer_percent
+        effective_hours = cap.effective_hours
 
         # Calculate workload metrics
-        today = datetime.utcnow().date()
         total_hours = 0
         overdue_count = 0
         due_soon_count = 0
@@ -3542,14 +3644,13 @@ def get_user_workload(user_id: str) -> Dict[str, Any]:
                 except Exception as _exc:
                     logger.debug("Suppressed: %s", _exc)
 
-            status_id = task.get("task_status")
-            status_name = status_name_map.get(status_id, "")
+            status_name = lk["status_names"].get(task.get("task_status"), "")
 
             task_data = {
                 "task_id": task.get("task_id"),
                 "task_description": task.get("task_description"),
                 "project_id": task.get("project_id"),
-                "project_name": projects_map.get(task.get("project_id"), {}).get("project_name"),
+                "project_name": lk["projects"].get(task.get("project_id"), {}).get("project_name"),
                 "estimated_hours": duration,
                 "deadline": task.get("deadline"),
                 "due_date": task.get("due_date"),
@@ -3559,7 +3660,7 @@ def get_user_workload(user_id: str) -> Dict[str, Any]:
                 "auto_linked": task.get("auto_linked", False),
                 "blocked_by_task_id": task.get("blocked_by_task_id"),
                 "status_name": status_name,
-                "priority_name": priorities_map.get(task.get("task_priority"), {}).get("priority"),
+                "priority_name": lk["priorities"].get(task.get("task_priority"), {}).get("priority"),
                 "is_overdue": is_overdue,
                 "is_due_soon": is_due_soon,
             }
@@ -3573,31 +3674,11 @@ def get_user_workload(user_id: str) -> Dict[str, Any]:
         weekly_capacity = hours_per_day * days_per_week
         effective_weekly_capacity = weekly_capacity * (100 - buffer_percent) / 100
         utilization = (total_hours / effective_weekly_capacity * 100) if effective_weekly_capacity > 0 else 0
+        workload_status = _workload_status(utilization)
 
-        # Determine workload status
-        if utilization > 120:
-            workload_status = "critical"
-        elif utilization > 100:
-            workload_status = "overloaded"
-        elif utilization > 80:
-            workload_status = "optimal"
-        elif utilization > 50:
-            workload_status = "normal"
-        else:
-            workload_status = "underloaded"
-
-        # Calculate days to clear backlog
+        # Days to clear backlog / next available date (working days, minus time off)
         days_to_clear = int(total_hours / effective_hours) if effective_hours > 0 else 0
-
-        # Calculate next available date (accounting for weekends)
-        working_days = capacity.get("working_days", [1, 2, 3, 4, 5])
-        next_available = today
-        days_remaining = days_to_clear
-
-        while days_remaining > 0:
-            next_available = next_available + timedelta(days=1)
-            if next_available.weekday() + 1 in working_days:  # weekday() is 0=Mon, we use 1=Mon
-                days_remaining -= 1
+        next_available, _ = workload_scheduler.next_available(total_hours, cap, cal, today)
 
         # Calculate burnout risk (0-100)
         burnout_risk = min(100, int(
@@ -3615,7 +3696,7 @@ def get_user_workload(user_id: str) -> Dict[str, Any]:
             "capacity": {
                 "hours_per_day": hours_per_day,
                 "days_per_week": days_per_week,
-                "working_days": working_days,
+                "working_days": list(cap.working_days),
                 "buffer_percent": buffer_percent,
                 "weekly_capacity": weekly_capacity,
                 "effective_weekly_capacity": round(effective_weekly_capacity, 1),
@@ -3652,61 +3733,25 @@ def get_team_workload() -> Dict[str, Any]:
     logger.info("[WORKLOAD] GET /workload/team")
 
     try:
-        from datetime import datetime, timedelta
-
-        # Get all users
-        users_response = supabase.table("users").select(
-            "user_id, user_name, avatar_color"
-        ).execute()
-        users = users_response.data or []
+        from datetime import datetime
 
+        lk = get_lookups()
+        users = list(lk["users"].values())
         if not users:
             return {"team": []}
 
-        # Get all capacity settings
-        capacity_response = supabase.table("user_capacity_settings").select("*").execute()
-        capacity_map = {c["user_id"]: c for c in (capacity_response.data or [])}
-
-        # Get valid status IDs
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        # Get all active tasks
-        tasks_response = supabase.table("tasks").select(
-            "task_id, Owner_id, estimated_hours, deadline, due_date, task_status"
-        ).in_("task_status", valid_status_ids).execute()
-        tasks = tasks_response.data or []
-
-        # Group tasks by owner
-        tasks_by_user = {}
-        for task in tasks:
-            owner_id = task.get("Owner_id")
-            if owner_id:
-                if owner_id not in tasks_by_user:
-                    tasks_by_user[owner_id] = []
-                tasks_by_user[owner_id].append(task)
-
-        today = datetime.utcnow().date()
+        ctx = workload_scheduler.load_context()
+        today = ctx["today"]
         team_data = []
 
         for user in users:
             user_id = user.get("user_id")
-            user_tasks = tasks_by_user.get(user_id, [])
+            entry = workload_scheduler.user_entry(ctx, user_id)
+            cap = entry["capacity"]
+            user_tasks = entry["tasks"]
 
-            # Get capacity
-            capacity = capacity_map.get(user_id, {})
-            hours_per_day = capacity.get("hours_per_day", 8.0)
-            days_per_week = capacity.get("days_per_week", 5)
-            buffer_percent = capacity.get("buffer_percent", 20)
-
-            weekly_capacity = hours_per_day * days_per_week
-            effective_capacity = weekly_capacity * (100 - buffer_percent) / 100
+            weekly_capacity = cap.hours_per_day * cap.days_per_week
+            effective_capacity = weekly_capacity * (100 - cap.buffer_percent) / 100
 
             # Calculate metrics
             total_hours = sum(t.get("estimated_hours") or 2.0 for t in user_tasks)
@@ -3724,20 +3769,10 @@ def get_team_workload() -> Dict[str, Any]:
 
             utilization = (total_hours / effective_capacity * 100) if effective_capacity > 0 else 0
 
-            if utilization > 120:
-                status = "critical"
-            elif utilization > 100:
-                status = "overloaded"
-            elif utilization > 80:
-                status = "optimal"
-            elif utilization > 50:
-                status = "normal"
-            else:
-                status = "underloaded"
-
             # Days to clear
-            effective_hours_day = hours_per_day * (100 - buffer_percent) / 100
+            effective_hours_day = cap.effective_hours
             days_to_clear = int(total_hours / effective_hours_day) if effective_hours_day > 0 else 0
+            next_available, _ = workload_scheduler.next_available(total_hours, cap, entry["calendar"], today)
 
             team_data.append({
                 "user_id": user_id,
@@ -3747,9 +3782,10 @@ def get_team_workload() -> Dict[str, Any]:
                 "total_hours": round(total_hours, 1),
                 "weekly_capacity": round(effective_capacity, 1),
                 "utilization_percent": round(utilization, 1),
-                "status": status,
+                "status": _workload_status(utilization),
                 "overdue_count": overdue_count,
                 "days_to_clear": days_to_clear,
+                "next_available_date": str(next_available),
             })
 
         # Sort by utilization (most loaded first)
@@ -3820,12 +3856,10 @@ def schedule_task(data: ScheduleTaskRequest) -> Dict[str, Any]:
     logger.info(f"[WORKLOAD] POST /workload/schedule-task - task_id: {data.task_id}")
 
     try:
-        from datetime import datetime, timedelta
-
         # Get the task
-        task_response = supabase.table("tasks").select("*").eq(
-            "task_id", data.task_id
-        ).single().execute()
+        task_response = supabase.table("tasks").select(
+            "task_id, Owner_id, estimated_hours"
+        ).eq("task_id", data.task_id).single().execute()
 
         if not task_response.data:
             raise HTTPException(status_code=404, detail="Task not found")
@@ -3836,74 +3870,36 @@ def schedule_task(data: ScheduleTaskRequest) -> Dict[str, Any]:
         if not owner_id:
             raise HTTPException(status_code=400, detail="Task has no owner assigned")
 
-        # Get owner's capacity
-        capacity_response = supabase.table("user_capacity_settings").select("*").eq(
-            "user_id", owner_id
-        ).execute()
-
-        capacity = capacity_response.data[0] if capacity_response.data else {
-            "hours_per_day": 8.0,
-            "days_per_week": 5,
-            "working_days": [1, 2, 3, 4, 5],
-            "buffer_percent": 20,
-        }
-
-        hours_per_day = capacity.get("hours_per_day", 8.0)
-        buffer_percent = capacity.get("buffer_percent", 20)
-        working_days = capacity.get("working_days", [1, 2, 3, 4, 5])
-        effective_hours = hours_per_day * (100 - buffer_percent) / 100
+        ctx = workload_scheduler.load_context([owner_id])
+        today = ctx["today"]
+        entry = workload_scheduler.user_entry(ctx, owner_id)
+        cap = entry["capacity"]
 
         estimated_hours = task.get("estimated_hours") or 2.0
 
-        # Get valid status IDs
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        # Get owner's current tasks (excluding this one)
-        existing_tasks = supabase.table("tasks").select(
-            "task_id, estimated_hours, scheduled_end_date, queue_position"
-        ).eq("Owner_id", owner_id).in_(
-            "task_status", valid_status_ids
-        ).neq("task_id", data.task_id).order("queue_position", desc=False).execute()
-
-        existing = existing_tasks.data or []
+        # Owner's current queue (excluding this task)
+        existing = sorted(
+            (t for t in entry["tasks"] if t.get("task_id") != data.task_id),
+            key=lambda t: (t.get("queue_position") is None, t.get("queue_position") or 0),
+        )
 
         # Calculate total pending hours
         total_pending_hours = sum(t.get("estimated_hours") or 2.0 for t in existing)
 
-        # Find the last task in queue (potential blocker)
-        blocking_task_id = None
-        if existing:
-            blocking_task_id = existing[-1].get("task_id")
-
-        # Calculate start date (after current backlog clears)
-        today = datetime.utcnow().date()
-        days_to_clear = int(total_pending_hours / effective_hours) if effective_hours > 0 else 0
-
-        start_date = today
-        days_remaining = days_to_clear
-        while days_remaining > 0:
-            start_date = start_date + timedelta(days=1)
-            # Convert Python weekday (0=Mon) to our format (1=Mon)
-            if (start_date.weekday() + 1) in working_days:
-                days_remaining -= 1
-
-        # Calculate end date
-        task_days = int(estimated_hours / effective_hours) if effective_hours > 0 else 1
-        task_days = max(1, task_days)
-
-        end_date = start_date
-        days_remaining = task_days
-        while days_remaining > 0:
-            end_date = end_date + timedelta(days=1)
-            if (end_date.weekday() + 1) in working_days:
-                days_remaining -= 1
+        # Find the last task in queue (potential blocker). The auto link is
+        # skipped when the blocker already depends on this task.
+        blocking_task_id = existing[-1].get("task_id") if existing else None
+        if blocking_task_id:
+            try:
+                dependency_graph.check_new_dependency(blocking_task_id, data.task_id)
+            except dependency_graph.DependencyCycleError as cycle:
+                logger.info(f"[WORKLOAD] auto-link skipped: {cycle}")
+                blocking_task_id = None
+
+        # Start after the current backlog clears; end after the task's own days
+        start_date, end_date = workload_scheduler.next_available(
+            total_pending_hours, cap, entry["calendar"], today, estimated_hours
+        )
 
         # Get next queue position
         max_position = max((t.get("queue_position") or 0 for t in existing), default=0)
@@ -3930,13 +3926,15 @@ def schedule_task(data: ScheduleTaskRequest) -> Dict[str, Any]:
 
             if not existing_dep.data:
                 # Create dependency
-                supabase.table("task_dependencies").insert({
+                created = supabase.table("task_dependencies").insert({
                     "predecessor_task_id": blocking_task_id,
                     "successor_task_id": data.task_id,
                     "dependency_type": "finish_to_start",
                     "is_auto_generated": True,
                 }).execute()
                 dependency_created = True
+                if created.data:
+                    dependency_graph.on_dependency_added(created.data[0])
 
         # Update the task
         supabase.table("tasks").update(update_data).eq("task_id", data.task_id).execute()
@@ -3970,108 +3968,91 @@ def recalculate_user_schedule(user_id: str) -> Dict[str, Any]:
     logger.info(f"[WORKLOAD] POST /workload/recalculate/{user_id}")
 
     try:
-        from datetime import datetime, timedelta
+        result = workload_scheduler.schedule_users([user_id])
+        scheduled = result["users"].get(user_id) or {}
 
-        # Get user capacity
-        capacity_response = supabase.table("user_capacity_settings").select("*").eq(
-            "user_id", user_id
-        ).execute()
+        if not scheduled.get("tasks_scheduled"):
+            return {"success": True, "tasks_scheduled": 0}
 
-        capacity = capacity_response.data[0] if capacity_response.data else {
-            "hours_per_day": 8.0,
-            "working_days": [1, 2, 3, 4, 5],
-            "buffer_percent": 20,
+        return {
+            "success": True,
+            "user_id": user_id,
+            "tasks_scheduled": scheduled["tasks_scheduled"],
+            "tasks_changed": result["tasks_changed"],
+            "schedule_ends": scheduled["schedule_ends"],
         }
 
-        hours_per_day = capacity.get("hours_per_day", 8.0)
-        working_days = capacity.get("working_days", [1, 2, 3, 4, 5])
-        buffer_percent = capacity.get("buffer_percent", 20)
-        effective_hours = hours_per_day * (100 - buffer_percent) / 100
-
-        # Get valid status IDs
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        # Get tasks ordered by priority and deadline
-        tasks_response = supabase.table("tasks").select(
-            "task_id, estimated_hours, deadline, task_priority"
-        ).eq("Owner_id", user_id).in_(
-            "task_status", valid_status_ids
-        ).order("deadline", desc=False).execute()
+    except Exception as e:
+        logger.error(f"[WORKLOAD] ERROR: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
 
-        tasks = tasks_response.data or []
 
-        if not tasks:
-            return {"success": True, "tasks_scheduled": 0}
+@router.post("/workload/recalculate-team")
+def recalculate_team_schedule(data: Optional[RecalculateTeamRequest] = None) -> Dict[str, Any]:
+    """
+    Recalculate the queues of several users (default: everyone) in one pass.
+    dry_run=true returns the plan without writing it.
+    """
+    data = data or RecalculateTeamRequest()
+    logger.info(f"[WORKLOAD] POST /workload/recalculate-team users={len(data.user_ids or []) or 'all'}")
 
-        # Schedule tasks sequentially
-        today = datetime.utcnow().date()
-        current_date = today
-        hours_remaining_today = effective_hours
-        scheduled_count = 0
-        previous_task_id = None
-
-        for idx, task in enumerate(tasks):
-            task_hours = task.get("estimated_hours") or 2.0
-
-            # Find start date (must be a working day)
-            while (current_date.weekday() + 1) not in working_days:
-                current_date = current_date + timedelta(days=1)
-                hours_remaining_today = effective_hours
-
-            start_date = current_date
-
-            # Calculate end date
-            hours_needed = task_hours
-            end_date = current_date
-
-            while hours_needed > 0:
-                if hours_needed <= hours_remaining_today:
-                    hours_remaining_today -= hours_needed
-                    hours_needed = 0
-                else:
-                    hours_needed -= hours_remaining_today
-                    # Move to next working day
-                    end_date = end_date + timedelta(days=1)
-                    while (end_date.weekday() + 1) not in working_days:
-                        end_date = end_date + timedelta(days=1)
-                    hours_remaining_today = effective_hours
-
-            # Update task
-            update_data = {
-                "scheduled_start_date": str(start_date),
-                "scheduled_end_date": str(end_date),
-                "queue_position": idx + 1,
-                "scheduling_status": "scheduled",
+    try:
+        import time
+        t0 = time.perf_counter()
+        result = workload_scheduler.schedule_users(data.user_ids, persist=not data.dry_run)
+        users = {
+            uid: {
+                "tasks_scheduled": u["tasks_scheduled"],
+                "schedule_ends": u["schedule_ends"],
+                **({"plan": u["plan"]} if data.dry_run else {}),
             }
+            for uid, u in result["users"].items()
+        }
+        return {
+            "success": True,
+            "dry_run": data.dry_run,
+            "users_scheduled": len(users),
+            "tasks_scheduled": result["tasks_scheduled"],
+            "tasks_changed": result["tasks_changed"],
+            "tasks_written": result["tasks_written"],
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "users": users,
+        }
 
-            # Link to previous task if exists
-            if previous_task_id:
-                update_data["blocked_by_task_id"] = previous_task_id
-                update_data["auto_linked"] = True
+    except Exception as e:
+        logger.error(f"[WORKLOAD] ERROR in recalculate-team: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
 
-            supabase.table("tasks").update(update_data).eq("task_id", task["task_id"]).execute()
-            scheduled_count += 1
 
-            # Update for next iteration
-            current_date = end_date
-            previous_task_id = task["task_id"]
+@router.post("/workload/recalculate-downstream")
+def recalculate_downstream_schedule(data: RecalculateDownstreamRequest) -> Dict[str, Any]:
+    """
+    Reschedule after a change to some tasks (completion, new estimate,
+    priority): only those tasks, their dependency descendants and the rest
+    of the affected queues are replanned, not the owners' whole queues.
+    """
+    logger.info(f"[WORKLOAD] POST /workload/recalculate-downstream tasks={len(data.task_ids)}")
 
+    try:
+        import time
+        t0 = time.perf_counter()
+        result = workload_scheduler.schedule_downstream(data.task_ids, persist=not data.dry_run)
         return {
             "success": True,
-            "user_id": user_id,
-            "tasks_scheduled": scheduled_count,
-            "schedule_ends": str(current_date),
+            "dry_run": data.dry_run,
+            "users": result["users"],
+            "tasks_affected": result["tasks_affected"],
+            "tasks_scheduled": result["tasks_scheduled"],
+            "tasks_changed": result["tasks_changed"],
+            "tasks_written": result["tasks_written"],
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+            **({"plan": result["plan"]} if data.dry_run else {}),
         }
 
     except Exception as e:
-        logger.error(f"[WORKLOAD] ERROR: {repr(e)}")
+        logger.error(f"[WORKLOAD] ERROR in recalculate-downstream: {repr(e)}")
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error: {e}") from e
 
@@ -4085,62 +4066,18 @@ def get_next_available_slot(user_id: str, estimated_hours: float = 2.0) -> Dict[
     logger.info(f"[WORKLOAD] GET /workload/next-available/{user_id}")
 
     try:
-        from datetime import datetime, timedelta
-
-        # Get user capacity
-        capacity_response = supabase.table("user_capacity_settings").select("*").eq(
-            "user_id", user_id
-        ).execute()
-
-        capacity = capacity_response.data[0] if capacity_response.data else {
-            "hours_per_day": 8.0,
-            "working_days": [1, 2, 3, 4, 5],
-            "buffer_percent": 20,
-        }
-
-        hours_per_day = capacity.get("hours_per_day", 8.0)
-        working_days = capacity.get("working_days", [1, 2, 3, 4, 5])
-        buffer_percent = capacity.get("buffer_percent", 20)
-        effective_hours = hours_per_day * (100 - buffer_percent) / 100
-
-        # Get valid status IDs
-        statuses_response = supabase.table("tasks_status").select(
-            "task_status_id, task_status"
-        ).execute()
-        status_map = {s["task_status"].lower(): s["task_status_id"] for s in (statuses_response.data or [])}
-
-        not_started_id = status_map.get("not started")
-        working_id = status_map.get("working on it")
-        valid_status_ids = [s for s in [not_started_id, working_id] if s]
-
-        # Get pending hours
-        tasks_response = supabase.table("tasks").select("estimated_hours").eq(
-            "Owner_id", user_id
-        ).in_("task_status", valid_status_ids).execute()
+        ctx = workload_scheduler.load_context(
+            [user_id], task_columns="task_id, Owner_id, estimated_hours"
+        )
+        today = ctx["today"]
+        entry = workload_scheduler.user_entry(ctx, user_id)
+        cap = entry["capacity"]
 
-        total_pending = sum(t.get("estimated_hours") or 2.0 for t in (tasks_response.data or []))
+        total_pending = sum(t.get("estimated_hours") or 2.0 for t in entry["tasks"])
 
-        # Calculate available date
-        today = datetime.utcnow().date()
-        days_to_clear = int(total_pending / effective_hours) if effective_hours > 0 else 0
-
-        available_date = today
-        days_remaining = days_to_clear
-        while days_remaining > 0:
-            available_date = available_date + timedelta(days=1)
-            if (available_date.weekday() + 1) in working_days:
-                days_remaining -= 1
-
-        # Calculate end date for new task
-        task_days = int(estimated_hours / effective_hours) if effective_hours > 0 else 1
-        task_days = max(1, task_days)
-
-        end_date = available_date
-        days_remaining = task_days
-        while days_remaining > 0:
-            end_date = end_date + timedelta(days=1)
-            if (end_date.weekday() + 1) in working_days:
-                days_remaining -= 1
+        available_date, end_date = workload_scheduler.next_available(
+            total_pending, cap, entry["calendar"], today, estimated_hours
+        )
 
         return {
             "user_id": user_id,
@@ -4149,7 +4086,7 @@ def get_next_available_slot(user_id: str, estimated_hours: float = 2.0) -> Dict[
             "available_start_date": str(available_date),
             "estimated_end_date": str(end_date),
             "days_until_available": (available_date - today).days,
-            "effective_hours_per_day": round(effective_hours, 1),
+            "effective_hours_per_day": round(cap.effective_hours, 1),
         }
 
     except Exception as e:
@@ -4160,33 +4097,40 @@ def get_next_available_slot(user_id: str, estimated_hours: float = 2.0) -> Dict[
 
 # ====== TASK DEPENDENCIES ENDPOINTS ======
 
+class DependencyCreate(BaseModel):
+    """Model for creating a task dependency."""
+    predecessor_task_id: str
+    successor_task_id: str
+    dependency_type: str = "finish_to_start"
+    lag_hours: float = 0
+    created_by: Optional[str] = None
+    reschedule: bool = True
+
+    @field_validator("dependency_type")
+    @classmethod
+    def _known_type(cls, v: str) -> str:
+        if v not in dependency_graph.DEPENDENCY_TYPES:
+            raise ValueError(f"dependency_type must be one of {', '.join(dependency_graph.DEPENDENCY_TYPES)}")
+        return v
+
+
 @router.get("/dependencies")
-def get_all_dependencies(project_id: Optional[str] = None) -> Dict[str, Any]:
+def get_all_dependencies(project_id: Optional[str] = None, analysis: bool = False) -> Dict[str, Any]:
     """
     Returns task dependencies for the Operation Manager timeline.
-    Optionally filter by project_id (via tasks table join).
+    Optionally filter by project_id; those are served from the project's
+    cached dependency graph. analysis=true (with project_id) adds the
+    topological order, cycles, critical path and per-task slack.
     """
     try:
-        query = supabase.table("task_dependencies").select(
-            "dependency_id, predecessor_task_id, successor_task_id, "
-            "dependency_type, lag_hours, is_auto_generated"
-        )
-
         if project_id:
-            # Get task IDs for the project first, then filter dependencies
-            tasks_resp = supabase.table("tasks").select("task_id").eq(
-                "project_id", project_id
-            ).execute()
-            task_ids = [t["task_id"] for t in (tasks_resp.data or [])]
-            if not task_ids:
-                return {"dependencies": []}
-            # Filter where predecessor OR successor is in this project
-            query = query.or_(
-                f"predecessor_task_id.in.({','.join(task_ids)}),"
-                f"successor_task_id.in.({','.join(task_ids)})"
-            )
+            graph = dependency_graph.get_graph(project_id)
+            result: Dict[str, Any] = {"dependencies": [e.to_row() for e in graph.edges()]}
+            if analysis:
+                result["analysis"] = graph.analysis()
+            return result
 
-        resp = query.execute()
+        resp = supabase.table("task_dependencies").select(dependency_graph.DEPENDENCY_COLUMNS).execute()
         return {"dependencies": resp.data or []}
 
     except Exception as e:
@@ -4195,6 +4139,86 @@ def get_all_dependencies(project_id: Optional[str] = None) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Error: {e}") from e
 
 
+@router.post("/dependencies")
+def create_dependency(data: DependencyCreate) -> Dict[str, Any]:
+    """
+    Creates a dependency after checking it doesn't close a cycle (409 with
+    the offending path if it does), then reschedules the successor and
+    everything downstream of it.
+    """
+    logger.info(f"[DEPENDENCIES] POST {data.predecessor_task_id} -> {data.successor_task_id}")
+
+    try:
+        try:
+            dependency_graph.check_new_dependency(data.predecessor_task_id, data.successor_task_id)
+        except dependency_graph.DependencyCycleError as cycle:
+            raise HTTPException(status_code=409, detail={"error": str(cycle), "cycle": cycle.path}) from cycle
+
+        existing = supabase.table("task_dependencies").select("dependency_id").eq(
+            "predecessor_task_id", data.predecessor_task_id
+        ).eq("successor_task_id", data.successor_task_id).execute()
+        if existing.data:
+            raise HTTPException(status_code=409, detail="Dependency already exists")
+
+        row = {
+            "predecessor_task_id": data.predecessor_task_id,
+            "successor_task_id": data.successor_task_id,
+            "dependency_type": data.dependency_type,
+            "lag_hours": data.lag_hours,
+            "is_auto_generated": False,
+        }
+        if data.created_by:
+            row["created_by"] = data.created_by
+        created = supabase.table("task_dependencies").insert(row).execute()
+        dependency = created.data[0] if created.data else row
+        dependency_graph.on_dependency_added(dependency)
+
+        schedule = None
+        if data.reschedule:
+            result = workload_scheduler.schedule_downstream([data.successor_task_id])
+            schedule = {k: result[k] for k in ("tasks_affected", "tasks_changed", "tasks_written")}
+
+        return {"success": True, "dependency": dependency, "schedule": schedule}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[DEPENDENCIES] ERROR creating dependency: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
+
+
+@router.delete("/dependencies/{dependency_id}")
+def delete_dependency(dependency_id: str, reschedule: bool = True) -> Dict[str, Any]:
+    """Deletes a dependency and reschedules what was downstream of it."""
+    logger.info(f"[DEPENDENCIES] DELETE {dependency_id}")
+
+    try:
+        existing = supabase.table("task_dependencies").select(
+            "predecessor_task_id, successor_task_id"
+        ).eq("dependency_id", dependency_id).execute()
+        if not existing.data:
+            raise HTTPException(status_code=404, detail="Dependency not found")
+        dep = existing.data[0]
+
+        supabase.table("task_dependencies").delete().eq("dependency_id", dependency_id).execute()
+        dependency_graph.on_dependency_removed(dep["predecessor_task_id"], dep["successor_task_id"])
+
+        schedule = None
+        if reschedule:
+            result = workload_scheduler.schedule_downstream([dep["successor_task_id"]])
+            schedule = {k: result[k] for k in ("tasks_affected", "tasks_changed", "tasks_written")}
+
+        return {"success": True, "dependency_id": dependency_id, "schedule": schedule}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[DEPENDENCIES] ERROR deleting dependency: {repr(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {e}") from e
+
+
 # ====== TASK WORKFLOW ENDPOINTS ======
 
 def _log_workflow_event(
@@ -4388,6 +4412,7 @@ def approve_task(task_id: str, payload: TaskApproveRequest) -> Dict[str, Any]:
             raise HTTPException(status_code=500, detail="Failed to update original task")
 
         updated_task = original_response.data[0]
+        dependency_graph.on_task_written(updated_task)
 
         # 4. Mark review task as done (if exists and different from original)
         review_task_completed = False
@@ -4518,6 +4543,7 @@ def reject_task(task_id: str, payload: TaskRejectRequest) -> Dict[str, Any]:
             raise HTTPException(status_code=500, detail="Failed to update original task")
 
         updated_task = original_response.data[0]
+        dependency_graph.on_task_written(updated_task)
 
         # 5. Mark review task as done (rejection processed)
         if review_task_id and review_task_id != original_task_id and done_status_id:
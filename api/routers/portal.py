@@ -233,7 +233,18 @@ def post_client_message(
         sender = u[0] if u else None
     except Exception:
         sender = None
-    return _shape_client_message(msg, sender)
+    shaped = _shape_client_message(msg, sender)
+
+    # Unread badges + live streams, as POST /messages does. Both best-effort.
+    from api.routers.messages import publish_message_events
+    from api.services import unread_counters
+
+    unread_counters.record_message(msg)
+    try:
+        publish_message_events(shaped, user_id)
+    except Exception as e:
+        logger.warning("[portal] message event publish failed (non-blocking): %s", e)
+    return shaped
 
 
 # ============================================================
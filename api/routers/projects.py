@@ -8,6 +8,7 @@ from api.auth import require_internal
 from pydantic import BaseModel
 
 from api.supabase_client import supabase
+from api.services import pipeline_lookups
 from api.services.vault_service import create_default_folders
 
 logger = logging.getLogger(__name__)
@@ -90,6 +91,7 @@ def create_project(payload: ProjectCreate):
 
         # ===== INSERCIÓN =====
         res = supabase.table("projects").insert(data).execute()
+        pipeline_lookups.invalidate()
 
         # Create default Vault folders for the new project
         try:
@@ -318,6 +320,7 @@ def delete_project(project_id: str):
 
         # Eliminar el proyecto
         supabase.table("projects").delete().eq("project_id", project_id).execute()
+        pipeline_lookups.invalidate()
 
         return {"message": "Project deleted successfully"}
 
@@ -372,6 +375,7 @@ def update_project(project_id: str, payload: ProjectUpdate):
             .eq("project_id", project_id)
             .execute()
         )
+        pipeline_lookups.invalidate()
 
         return {
             "message": "Project updated",
@@ -5,6 +5,11 @@ from pydantic import BaseModel
 from api.supabase_client import supabase
 from typing import Optional, List
 from datetime import datetime
+import asyncio
+import bisect
+import logging
+import re
+import time
 
 # Import QBO service functions
 from services.qbo_service import (
@@ -12,17 +17,20 @@ from services.qbo_service import (
     exchange_code_for_tokens,
     get_connection_status,
     disconnect,
-    fetch_all_purchases,
     fetch_all_bills,
-    fetch_all_vendor_credits,
-    fetch_all_journal_entries,
-    fetch_all_invoices,
-    fetch_all_sales_receipts,
+    stream_transactions,
+    fetch_changes,
+    get_sync_watermark,
+    set_sync_watermark,
+    CDC_MAX_LOOKBACK,
+    CDC_MAX_OBJECTS,
     fetch_project_catalog,
     fetch_accounts_metadata,
     fetch_budgets
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(dependencies=[Depends(require_internal)], prefix="/qbo", tags=["QBO Integration"])
 
 
@@ -138,7 +146,8 @@ async def qbo_sync_expenses(
     realm_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    replace_all: Optional[bool] = False
+    replace_all: Optional[bool] = False,
+    incremental: Optional[bool] = False
 ):
     """
     Syncs expenses from QuickBooks to the local database.
@@ -151,100 +160,318 @@ async def qbo_sync_expenses(
     - start_date: Filter transactions from this date (YYYY-MM-DD)
     - end_date: Filter transactions until this date (YYYY-MM-DD)
     - replace_all: If true, deletes all existing expenses before importing
+    - incremental: If true, only applies what changed in QBO since the last
+      successful sync (Change Data Capture): changed transactions are
+      re-upserted (stale lines removed) and deleted ones are removed. Falls back
+      to a full sync when there is no watermark, it is older than QBO's
+      CDC lookback window, or CDC hit its 1000-object cap for an entity
+      (deletions past the cap can't be read). The change set is applied
+      whole, so start_date / end_date don't apply to an incremental run.
+
+    Only an unwindowed full sync or a completed incremental run advances the
+    watermark; a date-windowed full sync leaves it where it was, since
+    changes outside the window were not read. An unwindowed full sync also
+    removes local lines QBO no longer has (deleted transactions, lines
+    removed from edited ones), so the watermark it writes is a true mirror.
+
+    Each entity is paged with STARTPOSITION (no 1000-row truncation) and the four
+    entities are fetched concurrently; "fetch" reports pages/rows/latency per entity.
     """
     try:
-        # Fetch project catalog for bucketing
-        project_catalog = await fetch_project_catalog(realm_id)
+        sync_start = time.perf_counter()
+        sync_started_at = datetime.utcnow()
+
+        fallback_reason = None
+        if incremental and not replace_all:
+            watermark = _read_watermark(realm_id, _EXPENSES_SCOPE)
+            if watermark is None:
+                fallback_reason = "no previous sync recorded"
+            elif sync_started_at - watermark > CDC_MAX_LOOKBACK:
+                fallback_reason = f"last sync {watermark.isoformat()} is older than the CDC window"
+            else:
+                try:
+                    return await _incremental_expense_sync(
+                        realm_id, watermark, sync_started_at, sync_start
+                    )
+                except _CdcIncomplete as e:
+                    fallback_reason = str(e)
+
+        # Project catalog (bucketing) + account metadata (enrichment)
+        project_catalog, accounts_meta = await asyncio.gather(
+            fetch_project_catalog(realm_id),
+            fetch_accounts_metadata(realm_id),
+        )
         project_ids = set(project_catalog.keys())
 
-        # Fetch account metadata for enrichment
-        accounts_meta = await fetch_accounts_metadata(realm_id)
-
-        # Fetch all transaction types
-        all_lines = []
-
-        # Bills
-        bills = await fetch_all_bills(realm_id, start_date, end_date)
-        all_lines.extend(extract_expense_lines(bills, "Bill", project_ids, project_catalog, accounts_meta))
-
-        # Purchases
-        purchases = await fetch_all_purchases(realm_id, start_date, end_date)
-        all_lines.extend(extract_expense_lines(purchases, "Purchase", project_ids, project_catalog, accounts_meta))
+        # All transaction types concurrently, each streamed page by page
+        # (the per-realm gate in qbo_service caps in-flight requests)
+        streamed = await asyncio.gather(*[
+            _stream_txn_lines(realm_id, entity, start_date, end_date, extract_expense_lines,
+                              project_ids, project_catalog, accounts_meta)
+            for entity in _EXPENSE_ENTITIES
+        ])
+        all_lines = [line for lines, _, _ in streamed for line in lines]
+        txn_counts = {entity: count for entity, (_, count, _) in zip(_EXPENSE_ENTITIES, streamed)}
+        fetch_stats = {entity: stats for entity, (_, _, stats) in zip(_EXPENSE_ENTITIES, streamed)}
+        fetch_ms = int((time.perf_counter() - sync_start) * 1000)
 
-        # Vendor Credits
-        vendor_credits = await fetch_all_vendor_credits(realm_id, start_date, end_date)
-        all_lines.extend(extract_expense_lines(vendor_credits, "VendorCredit", project_ids, project_catalog, accounts_meta))
-
-        # Journal Entries
-        journal_entries = await fetch_all_journal_entries(realm_id, start_date, end_date)
-        all_lines.extend(extract_expense_lines(journal_entries, "JournalEntry", project_ids, project_catalog, accounts_meta))
-
-        # Deduplicate by GlobalLineUID
-        seen = set()
-        deduped = []
-        for line in all_lines:
-            uid = line.get("global_line_uid")
-            if uid and uid not in seen:
-                seen.add(uid)
-                deduped.append(line)
+        deduped = _dedupe_lines(all_lines)
 
         # Import to database
         if replace_all:
             supabase.table("qbo_expenses").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
 
-        # Upsert in batches
-        now = datetime.utcnow().isoformat()
-        batch_size = 500
-        imported_count = 0
-
-        for i in range(0, len(deduped), batch_size):
-            batch = deduped[i:i + batch_size]
-            for row in batch:
-                row["imported_at"] = now
-
-            supabase.table("qbo_expenses").upsert(
-                batch,
-                on_conflict="global_line_uid"
-            ).execute()
-            imported_count += len(batch)
-
-        # Create mappings for new projects
-        unique_customers = {}
-        for line in deduped:
-            if line.get("bucket") == "PROJECT" and line.get("qbo_customer_id"):
-                cid = line["qbo_customer_id"]
-                if cid not in unique_customers:
-                    unique_customers[cid] = line.get("qbo_customer_name", "")
-
-        new_mappings = 0
-        for qbo_id, qbo_name in unique_customers.items():
-            existing = supabase.table("qbo_project_mapping").select("id").eq("qbo_customer_id", qbo_id).execute()
-            if not existing.data:
-                supabase.table("qbo_project_mapping").insert({
-                    "qbo_customer_id": qbo_id,
-                    "qbo_customer_name": qbo_name,
-                    "auto_matched": False
-                }).execute()
-                new_mappings += 1
+        _upsert_lines(deduped)
+        new_mappings = _ensure_project_mappings(deduped)
+        advance_watermark = not (start_date or end_date)
+        lines_removed = 0
+        if advance_watermark:
+            if not replace_all:
+                keep_uids = {line["global_line_uid"] for line in deduped}
+                for entity in _EXPENSE_ENTITIES:
+                    lines_removed += _prune_missing_lines(entity, keep_uids)
+            _write_watermark(realm_id, _EXPENSES_SCOPE, sync_started_at, "full")
 
         return {
             "message": "Sync completed",
             "realm_id": realm_id,
+            "mode": "full",
+            "fallback_reason": fallback_reason,
+            "watermark_advanced": advance_watermark,
             "total_raw_lines": len(all_lines),
             "total_imported": len(deduped),
+            "lines_removed": lines_removed,
             "transactions": {
-                "bills": len(bills),
-                "purchases": len(purchases),
-                "vendor_credits": len(vendor_credits),
-                "journal_entries": len(journal_entries)
+                "bills": txn_counts["Bill"],
+                "purchases": txn_counts["Purchase"],
+                "vendor_credits": txn_counts["VendorCredit"],
+                "journal_entries": txn_counts["JournalEntry"]
             },
-            "new_project_mappings": new_mappings
+            "new_project_mappings": new_mappings,
+            "fetch": fetch_stats,
+            "fetch_ms": fetch_ms,
+            "total_ms": int((time.perf_counter() - sync_start) * 1000)
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class _CdcIncomplete(Exception):
+    """The CDC change set was capped; a full sync has to take over."""
+
+
+async def _incremental_expense_sync(realm_id, watermark, sync_started_at, sync_start):
+    """
+    CDC path of /qbo/sync: apply only what changed since `watermark`.
+    Every change is applied whatever its TxnDate (the watermark is realm-wide,
+    so anything skipped here would never be fetched again), and the watermark
+    only moves once the whole change set is written. Raises _CdcIncomplete,
+    before writing anything, when CDC capped an entity.
+    """
+    cdc_stats = {}
+    changes = await fetch_changes(realm_id, list(_EXPENSE_ENTITIES), watermark, cdc_stats)
+    if cdc_stats["capped"]:
+        raise _CdcIncomplete(
+            f"CDC returned {CDC_MAX_OBJECTS}+ changes for {', '.join(cdc_stats['capped'])}"
+        )
+    project_catalog, accounts_meta = await asyncio.gather(
+        fetch_project_catalog(realm_id), fetch_accounts_metadata(realm_id),
+    )
+    project_ids = set(project_catalog.keys())
+    fetch_ms = int((time.perf_counter() - sync_start) * 1000)
+
+    all_lines = []
+    changed_by_entity = {}
+    for entity in _EXPENSE_ENTITIES:
+        txns = changes[entity]["changed"]
+        changed_by_entity[entity] = txns
+        all_lines.extend(extract_expense_lines(txns, entity, project_ids, project_catalog, accounts_meta))
+
+    deduped = _dedupe_lines(all_lines)
+    _upsert_lines(deduped)
+
+    # Lines removed from an edited transaction, then fully deleted transactions
+    keep_uids = {line["global_line_uid"] for line in deduped}
+    stale_removed = 0
+    deleted_removed = 0
+    for entity in _EXPENSE_ENTITIES:
+        changed_ids = [str(t.get("Id", "")) for t in changed_by_entity[entity] if t.get("Id")]
+        stale_removed += _delete_txn_lines(entity, changed_ids, keep_uids)
+        deleted_removed += _delete_txn_lines(entity, [i for i in changes[entity]["deleted"] if i])
+
+    new_mappings = _ensure_project_mappings(deduped)
+    _write_watermark(realm_id, _EXPENSES_SCOPE, sync_started_at, "incremental")
+
+    return {
+        "message": "Incremental sync completed",
+        "realm_id": realm_id,
+        "mode": "incremental",
+        "changed_since": cdc_stats.get("changed_since"),
+        "total_raw_lines": len(all_lines),
+        "total_imported": len(deduped),
+        "transactions": {
+            entity: {
+                "changed": len(changed_by_entity[entity]),
+                "deleted": len(changes[entity]["deleted"]),
+            }
+            for entity in _EXPENSE_ENTITIES
+        },
+        "lines_removed": {"stale": stale_removed, "deleted_txns": deleted_removed},
+        "new_project_mappings": new_mappings,
+        "fetch": cdc_stats,
+        "fetch_ms": fetch_ms,
+        "total_ms": int((time.perf_counter() - sync_start) * 1000)
+    }
+
+
+_EXPENSES_SCOPE = "expenses"
+
+
+def _read_watermark(realm_id, scope):
+    try:
+        return get_sync_watermark(realm_id, scope)
+    except Exception as e:
+        logger.warning("[QBO] Could not read sync watermark for %s/%s: %s", realm_id, scope, e)
+        return None
+
+
+def _write_watermark(realm_id, scope, synced_at, mode):
+    # A missing qbo_sync_state table must not fail an otherwise good sync
+    try:
+        set_sync_watermark(realm_id, scope, synced_at, mode)
+    except Exception as e:
+        logger.warning("[QBO] Could not store sync watermark for %s/%s: %s", realm_id, scope, e)
+
+
+def _dedupe_lines(lines):
+    """Keep the first line per global_line_uid (drops lines without one)."""
+    seen = set()
+    deduped = []
+    for line in lines:
+        uid = line.get("global_line_uid")
+        if uid and uid not in seen:
+            seen.add(uid)
+            deduped.append(line)
+    return deduped
+
+
+def _upsert_lines(lines, batch_size=500):
+    """Upsert qbo_expenses rows in batches keyed on global_line_uid."""
+    now = datetime.utcnow().isoformat()
+    imported_count = 0
+    for i in range(0, len(lines), batch_size):
+        batch = lines[i:i + batch_size]
+        for row in batch:
+            row["imported_at"] = now
+
+        supabase.table("qbo_expenses").upsert(
+            batch,
+            on_conflict="global_line_uid"
+        ).execute()
+        imported_count += len(batch)
+    return imported_count
+
+
+def _delete_txn_lines(txn_type, txn_ids, keep_uids=None, chunk_size=200):
+    """
+    Delete qbo_expenses lines belonging to the given transactions, except the
+    uids in keep_uids. Returns how many lines were removed.
+    """
+    keep_uids = keep_uids or set()
+    removed = 0
+    for i in range(0, len(txn_ids), chunk_size):
+        chunk = txn_ids[i:i + chunk_size]
+        rows = supabase.table("qbo_expenses") \
+            .select("global_line_uid") \
+            .eq("txn_type", txn_type) \
+            .in_("txn_id", chunk) \
+            .execute().data or []
+        doomed = [r["global_line_uid"] for r in rows if r.get("global_line_uid") not in keep_uids]
+        for j in range(0, len(doomed), chunk_size):
+            supabase.table("qbo_expenses").delete().in_("global_line_uid", doomed[j:j + chunk_size]).execute()
+        removed += len(doomed)
+    return removed
+
+
+def _prune_missing_lines(txn_type, keep_uids, page_size=1000, chunk_size=200):
+    """
+    Delete qbo_expenses lines of txn_type whose uid is not in keep_uids (the
+    complete set a full sync just read). Returns how many lines were removed.
+    """
+    doomed = []
+    offset = 0
+    while True:
+        rows = supabase.table("qbo_expenses") \
+            .select("global_line_uid") \
+            .eq("txn_type", txn_type) \
+            .order("global_line_uid") \
+            .range(offset, offset + page_size - 1) \
+            .execute().data or []
+        doomed.extend(r["global_line_uid"] for r in rows
+                      if r.get("global_line_uid") and r["global_line_uid"] not in keep_uids)
+        if len(rows) < page_size:
+            break
+        offset += page_size
+    for j in range(0, len(doomed), chunk_size):
+        supabase.table("qbo_expenses").delete().in_("global_line_uid", doomed[j:j + chunk_size]).execute()
+    return len(doomed)
+
+
+def _ensure_project_mappings(lines, chunk_size=200):
+    """
+    Create an (unmapped) qbo_project_mapping row for each new PROJECT customer.
+    Set-based: one chunked lookup of the existing ids, diff in memory, one bulk insert.
+    """
+    unique_customers = {}
+    for line in lines:
+        if line.get("bucket") == "PROJECT" and line.get("qbo_customer_id"):
+            cid = line["qbo_customer_id"]
+            if cid not in unique_customers:
+                unique_customers[cid] = line.get("qbo_customer_name", "")
+
+    if not unique_customers:
+        return 0
+
+    ids = list(unique_customers)
+    existing = set()
+    for i in range(0, len(ids), chunk_size):
+        resp = supabase.table("qbo_project_mapping") \
+            .select("qbo_customer_id") \
+            .in_("qbo_customer_id", ids[i:i + chunk_size]) \
+            .execute()
+        existing.update(r["qbo_customer_id"] for r in (resp.data or []))
+
+    new_rows = [
+        {"qbo_customer_id": qbo_id, "qbo_customer_name": qbo_name, "auto_matched": False}
+        for qbo_id, qbo_name in unique_customers.items()
+        if qbo_id not in existing
+    ]
+    if new_rows:
+        supabase.table("qbo_project_mapping").insert(new_rows).execute()
+    return len(new_rows)
+
+
+_EXPENSE_ENTITIES = ("Bill", "Purchase", "VendorCredit", "JournalEntry")
+_REVENUE_ENTITIES = ("Invoice", "SalesReceipt")
+
+
+async def _stream_txn_lines(realm_id, entity, start_date, end_date, extractor,
+                            project_ids, project_catalog, accounts_meta):
+    """
+    Stream one QBO entity page by page and extract its lines as pages arrive,
+    so raw transactions never pile up in memory.
+    Returns (lines, transaction_count, {pages, rows, ms, slowest_page_ms}).
+    """
+    stats = {}
+    lines = []
+    txn_count = 0
+    async for page in stream_transactions(realm_id, entity, start_date, end_date, stats):
+        txn_count += len(page)
+        lines.extend(extractor(page, entity, project_ids, project_catalog, accounts_meta))
+    return lines, txn_count, stats
+
+
 def extract_expense_lines(txns, txn_type, project_ids, project_catalog, accounts_meta):
     """
     Extract expense lines from QBO transactions.
@@ -841,6 +1068,68 @@ def delete_project_mapping(qbo_customer_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _normalize_name(s):
+    if not s:
+        return ""
+    return " ".join(s.lower().replace("-", " ").replace("_", " ").split())
+
+
+class _ProjectNameMatcher:
+    """
+    Name -> NGM project lookup built once per auto-match request.
+
+    Same rules as before (exact normalized name, else one name contained in
+    the other), but evaluated without scanning every project per candidate:
+      - exact         -> dict lookup
+      - project in X  -> one compiled alternation over all project names,
+                         tried at every offset of X; the longest name found
+                         wins ("Oak Street" over "Oak"), wherever it starts
+      - X in project  -> one substring search over a newline-joined blob of
+                         project names, offset mapped back with bisect
+    """
+
+    def __init__(self, projects):
+        self.exact = {}
+        for p in projects:
+            key = _normalize_name(p.get("project_name"))
+            if key and key not in self.exact:
+                self.exact[key] = p
+
+        names = sorted(self.exact, key=len, reverse=True)
+        self._contained = re.compile("|".join(re.escape(n) for n in names)) if names else None
+
+        self._names = names
+        self._starts = []
+        offset = 0
+        for n in names:
+            self._starts.append(offset)
+            offset += len(n) + 1
+        self._blob = "\n".join(names)
+
+    def match(self, name):
+        key = _normalize_name(name)
+        if not key:
+            return None
+        if key in self.exact:
+            return self.exact[key]
+        if self._contained is not None:
+            # Names are tried longest first, so match() at an offset returns
+            # the longest name starting there; keep the longest overall.
+            best = ""
+            for i in range(len(key)):
+                if len(key) - i <= len(best):
+                    break
+                m = self._contained.match(key, i)
+                if m and len(m.group(0)) > len(best):
+                    best = m.group(0)
+            if best:
+                return self.exact[best]
+        idx = self._blob.find(key)
+        if idx >= 0 and "\n" not in key:
+            return self.exact[self._names[bisect.bisect_right(self._starts, idx) - 1]]
+        return None
+
+
 @router.post("/mapping/auto-match")
 def auto_match_projects():
     """
@@ -869,47 +1158,26 @@ def auto_match_projects():
         if not projects:
             return {"message": "No NGM projects found", "matched": 0}
 
-        # Crear mapa normalizado de proyectos
-        def normalize(s):
-            if not s:
-                return ""
-            return s.lower().strip().replace("-", " ").replace("_", " ")
-
-        projects_normalized = {
-            normalize(p["project_name"]): p for p in projects
-        }
-
+        matcher = _ProjectNameMatcher(projects)
+        matches = {}  # project_id -> [qbo_customer_id, ...]
         matched_count = 0
 
         for mapping in unmapped:
-            qbo_name = mapping.get("qbo_customer_name", "")
-            qbo_normalized = normalize(qbo_name)
+            project = matcher.match(mapping.get("qbo_customer_name", ""))
+            if project:
+                matches.setdefault(project["project_id"], []).append(mapping["qbo_customer_id"])
+                matched_count += 1
 
-            # Buscar coincidencia exacta primero
-            if qbo_normalized in projects_normalized:
-                project = projects_normalized[qbo_normalized]
+        # One update per matched project instead of one per mapping
+        for project_id, customer_ids in matches.items():
+            for i in range(0, len(customer_ids), 200):
                 supabase.table("qbo_project_mapping") \
                     .update({
-                        "ngm_project_id": project["project_id"],
+                        "ngm_project_id": project_id,
                         "auto_matched": True
                     }) \
-                    .eq("qbo_customer_id", mapping["qbo_customer_id"]) \
+                    .in_("qbo_customer_id", customer_ids[i:i + 200]) \
                     .execute()
-                matched_count += 1
-                continue
-
-            # Buscar coincidencia parcial (contiene)
-            for norm_name, project in projects_normalized.items():
-                if norm_name in qbo_normalized or qbo_normalized in norm_name:
-                    supabase.table("qbo_project_mapping") \
-                        .update({
-                            "ngm_project_id": project["project_id"],
-                            "auto_matched": True
-                        }) \
-                        .eq("qbo_customer_id", mapping["qbo_customer_id"]) \
-                        .execute()
-                    matched_count += 1
-                    break
 
         return {
             "message": f"Auto-match completed",
@@ -1334,19 +1602,22 @@ async def auto_match_budgets(realm_id: str):
         if not projects:
             return {"message": "No NGM projects found", "matched": 0}
 
-        # Normalize function
-        def normalize(s):
-            if not s:
-                return ""
-            return s.lower().strip().replace("-", " ").replace("_", " ")
+        matcher = _ProjectNameMatcher(projects)
 
-        # Create normalized project map
-        projects_normalized = {
-            normalize(p["project_name"]): p for p in projects
-        }
+        # Existing mappings for these budgets, loaded once
+        budget_ids = [str(b.get("Id", "")) for b in qbo_budgets if b.get("Id")]
+        existing = {}
+        for i in range(0, len(budget_ids), 200):
+            resp = supabase.table("qbo_budget_mapping") \
+                .select("qbo_budget_id, ngm_project_id") \
+                .in_("qbo_budget_id", budget_ids[i:i + 200]) \
+                .execute()
+            for row in (resp.data or []):
+                existing[row["qbo_budget_id"]] = row
 
         matched_count = 0
-        created_count = 0
+        new_rows = []
+        updates = {}  # project_id -> [qbo_budget_id, ...]
 
         for budget in qbo_budgets:
             budget_id = str(budget.get("Id", ""))
@@ -1364,49 +1635,38 @@ async def auto_match_budgets(realm_id: str):
                 except:
                     pass
 
-            budget_normalized = normalize(budget_name)
+            matched_project = matcher.match(budget_name)
 
-            # Try exact match first
-            matched_project = None
-            if budget_normalized in projects_normalized:
-                matched_project = projects_normalized[budget_normalized]
-            else:
-                # Try partial match
-                for norm_name, project in projects_normalized.items():
-                    if norm_name in budget_normalized or budget_normalized in norm_name:
-                        matched_project = project
-                        break
-
-            # Check if mapping exists
-            existing = supabase.table("qbo_budget_mapping") \
-                .select("id, ngm_project_id") \
-                .eq("qbo_budget_id", budget_id) \
-                .execute()
-
-            if existing.data:
+            if budget_id in existing:
                 # Already has mapping - only update if currently unmapped and we found a match
-                if not existing.data[0].get("ngm_project_id") and matched_project:
-                    supabase.table("qbo_budget_mapping") \
-                        .update({
-                            "ngm_project_id": matched_project["project_id"],
-                            "auto_matched": True
-                        }) \
-                        .eq("qbo_budget_id", budget_id) \
-                        .execute()
+                if not existing[budget_id].get("ngm_project_id") and matched_project:
+                    updates.setdefault(matched_project["project_id"], []).append(budget_id)
                     matched_count += 1
             else:
-                # Create new mapping
-                supabase.table("qbo_budget_mapping").insert({
+                new_rows.append({
                     "qbo_budget_id": budget_id,
                     "qbo_budget_name": budget_name,
                     "qbo_fiscal_year": fiscal_year,
                     "ngm_project_id": matched_project["project_id"] if matched_project else None,
                     "auto_matched": matched_project is not None
-                }).execute()
-                created_count += 1
+                })
+                existing[budget_id] = new_rows[-1]
                 if matched_project:
                     matched_count += 1
 
+        if new_rows:
+            supabase.table("qbo_budget_mapping").insert(new_rows).execute()
+        created_count = len(new_rows)
+
+        for project_id, ids in updates.items():
+            supabase.table("qbo_budget_mapping") \
+                .update({
+                    "ngm_project_id": project_id,
+                    "auto_matched": True
+                }) \
+                .in_("qbo_budget_id", ids) \
+                .execute()
+
         return {
             "message": "Auto-match completed",
             "total_budgets": len(qbo_budgets),
@@ -1751,22 +2011,23 @@ async def sync_qbo_revenue(
     Los almacena en qbo_expenses con signed_amount positivo y is_income=true.
     """
     try:
-        # Fetch project catalog for bucketing
-        project_catalog = await fetch_project_catalog(realm_id)
-        project_ids = set(project_catalog.keys())
-
-        # Fetch account metadata
-        accounts_meta = await fetch_accounts_metadata(realm_id)
-
-        all_lines = []
+        sync_start = time.perf_counter()
 
-        # Invoices
-        invoices = await fetch_all_invoices(realm_id, start_date, end_date)
-        all_lines.extend(extract_revenue_lines(invoices, "Invoice", project_ids, project_catalog, accounts_meta))
+        project_catalog, accounts_meta = await asyncio.gather(
+            fetch_project_catalog(realm_id),
+            fetch_accounts_metadata(realm_id),
+        )
+        project_ids = set(project_catalog.keys())
 
-        # Sales Receipts
-        sales_receipts = await fetch_all_sales_receipts(realm_id, start_date, end_date)
-        all_lines.extend(extract_revenue_lines(sales_receipts, "SalesReceipt", project_ids, project_catalog, accounts_meta))
+        # Invoices + Sales Receipts concurrently, streamed page by page
+        streamed = await asyncio.gather(*[
+            _stream_txn_lines(realm_id, entity, start_date, end_date, extract_revenue_lines,
+                              project_ids, project_catalog, accounts_meta)
+            for entity in _REVENUE_ENTITIES
+        ])
+        all_lines = [line for lines, _, _ in streamed for line in lines]
+        txn_counts = {entity: count for entity, (_, count, _) in zip(_REVENUE_ENTITIES, streamed)}
+        fetch_stats = {entity: stats for entity, (_, _, stats) in zip(_REVENUE_ENTITIES, streamed)}
 
         # Deduplicate
         seen = set()
@@ -1798,9 +2059,11 @@ async def sync_qbo_revenue(
             "realm_id": realm_id,
             "total_imported": len(deduped),
             "transactions": {
-                "invoices": len(invoices),
-                "sales_receipts": len(sales_receipts)
-            }
+                "invoices": txn_counts["Invoice"],
+                "sales_receipts": txn_counts["SalesReceipt"]
+            },
+            "fetch": fetch_stats,
+            "total_ms": int((time.perf_counter() - sync_start) * 1000)
         }
 
     except Exception as e:
@@ -205,8 +205,8 @@ def _get_image_dimensions(file_content: bytes):
         return (0, 0)
 
 
-def _call_vision(prompt: str, img_b64: str, media_type: str, max_tokens: int = 2000):
-    raw = gpt.heavy(
+async def _call_vision(prompt: str, img_b64: str, media_type: str, max_tokens: int = 2000):
+    raw = await gpt.heavy_async(
         system=prompt,
         user=[{"type": "image_url", "image_url": {
             "url": f"data:{media_type};base64,{img_b64}",
@@ -264,7 +264,7 @@ async def analyze_floorplan(
         max_tokens = 2000 + len(requested_layers) * 1500
         max_tokens = min(max_tokens, 16000)
 
-        parsed = _call_vision(prompt, img_b64, file.content_type, max_tokens=max_tokens)
+        parsed = await _call_vision(prompt, img_b64, file.content_type, max_tokens=max_tokens)
 
         # Extract response sections
         scale_data = parsed.get("scale", {})
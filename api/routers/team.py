@@ -9,6 +9,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 
 from api.supabase_client import supabase
+from api.services import pipeline_lookups
 from utils.auth import hash_password
 
 router = APIRouter(dependencies=[Depends(require_internal)], prefix="/team", tags=["team"])
@@ -331,6 +332,7 @@ def create_user(payload: UserCreate) -> Dict[str, Any]:
         ins = supabase.table("users").insert(insert_obj).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Supabase insert failed: {e}")
+    pipeline_lookups.invalidate()
 
     if not ins.data:
         raise HTTPException(status_code=500, detail="Insert succeeded but returned no data")
@@ -382,6 +384,7 @@ def update_user(user_id: str, payload: UserUpdate) -> Dict[str, Any]:
         upd = supabase.table("users").update(update_obj).eq("user_id", user_id).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Supabase update failed: {e}")
+    pipeline_lookups.invalidate()
 
     # If user_id doesn't exist, PostgREST returns empty array
     if upd.data == []:
@@ -401,6 +404,7 @@ def delete_user(user_id: str) -> Dict[str, Any]:
         res = supabase.table("users").delete().eq("user_id", user_id).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Supabase delete failed: {e}")
+    pipeline_lookups.invalidate()
 
     if res.data == []:
         raise HTTPException(status_code=404, detail="User not found")
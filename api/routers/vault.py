@@ -8,8 +8,8 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Query, Depends, Request
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import gc
 import logging
+import os
 
 from api.auth import get_current_user
 from api.services.vault_service import (
@@ -20,6 +20,7 @@ from api.services.vault_service import (
     get_file,
     upload_file,
     store_chunk,
+    get_upload_status,
     assemble_chunks,
     list_versions,
     create_version,
@@ -39,6 +40,15 @@ logger = logging.getLogger(__name__)
 MAX_UPLOAD_BYTES = 50 * 1024 * 1024  # 50 MB
 
 
+def _stream_size(file: UploadFile) -> int:
+    """Size of an uploaded file from its spooled temp file (without reading it)."""
+    src = file.file
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    src.seek(0)
+    return size
+
+
 def _check_content_length(request: Request, max_bytes: int = MAX_UPLOAD_BYTES):
     """Reject oversized uploads early using the Content-Length header (before reading the body)."""
     cl = request.headers.get("content-length")
@@ -180,19 +190,17 @@ async def api_upload_file(
     # Reject oversized payloads before reading the body into memory
     _check_content_length(request, MAX_UPLOAD_BYTES)
 
-    file_content = None
     try:
-        file_content = await file.read()
-
         # Hard limit at 50MB for single upload
-        if len(file_content) > MAX_UPLOAD_BYTES:
+        if _stream_size(file) > MAX_UPLOAD_BYTES:
             raise HTTPException(
                 status_code=413,
                 detail="File too large for single upload. Use chunked upload for files over 50MB.",
             )
 
+        # The spooled upload is streamed to storage, never read into memory
         result = upload_file(
-            file_content=file_content,
+            file_content=file.file,
             filename=file.filename or "untitled",
             content_type=file.content_type or "application/octet-stream",
             parent_id=parent_id,
@@ -205,9 +213,6 @@ async def api_upload_file(
     except Exception as e:
         logger.error("[Vault] Upload error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        del file_content
-        gc.collect()
 
 
 # ====== CHUNKED UPLOAD ======
@@ -221,17 +226,27 @@ async def api_upload_chunk(
     current_user: dict = Depends(get_current_user),
 ):
     """Store a single chunk for a chunked upload."""
-    chunk_data = None
     try:
-        chunk_data = await file.read()
-        result = store_chunk(upload_id, chunk_index, chunk_data)
+        result = store_chunk(upload_id, chunk_index, file.file)
         result["total_chunks"] = total_chunks
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("[Vault] Chunk upload error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        del chunk_data
+
+
+@router.get("/upload-status/{upload_id}")
+async def api_upload_status(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Chunks already stored for an upload, so an interrupted upload can resume."""
+    try:
+        return get_upload_status(upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/upload-complete", status_code=201)
@@ -256,7 +271,7 @@ async def api_upload_complete(
             user_id=current_user["user_id"],
         )
         return result
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("[Vault] Assemble chunks error: %s", e)
@@ -289,12 +304,10 @@ async def api_create_version(
     """Upload a new version of an existing file."""
     _check_content_length(request, MAX_UPLOAD_BYTES)
 
-    file_content = None
     try:
-        file_content = await file.read()
         result = create_version(
             file_id=file_id,
-            file_content=file_content,
+            file_content=file.file,
             filename=file.filename or "untitled",
             content_type=file.content_type or "application/octet-stream",
             user_id=current_user["user_id"],
@@ -306,9 +319,6 @@ async def api_create_version(
     except Exception as e:
         logger.error("[Vault] Create version error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        del file_content
-        gc.collect()
 
 
 @router.post("/files/{file_id}/restore/{version_id}")
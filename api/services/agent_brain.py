@@ -36,6 +36,9 @@ _cooldowns: Dict[str, float] = {}
 COOLDOWN_SECONDS = 5
 _COOLDOWN_MAX_SIZE = 200
 
+# Routing decisions for identical (prompt, text) are reused for this long.
+_ROUTE_CACHE_TTL = 120
+
 
 def _check_cooldown(user_id: str, agent_name: str) -> bool:
     """Return True if the user can invoke this agent (cooldown expired)."""
@@ -501,9 +504,15 @@ async def _route(
             cleaned = re.sub(r"\s*```$", "", cleaned)
         return json.loads(cleaned)
 
+    # Repeated commands against an unchanged context (same prompt + text) route
+    # the same way; reuse the decision briefly. Attachments are never cached:
+    # two uploads can share a filename but not their content.
+    route_cache_ttl = None if attachments else _ROUTE_CACHE_TTL
+
     try:
         # Step 1: Try gpt-5-mini (fast, cheap)
-        raw = await gpt.mini_async(system_prompt, user_text, json_mode=True, max_tokens=300)
+        raw = await gpt.mini_async(system_prompt, user_text, json_mode=True, max_tokens=300,
+                                   cache_ttl=route_cache_ttl)
         if raw:
             try:
                 parsed = _parse_routing_json(raw)
@@ -517,7 +526,8 @@ async def _route(
 
         # Step 2: Fallback to gpt-5.2 (heavy, reliable)
         raw = await gpt.heavy_async(system_prompt, user_text, temperature=0.1,
-                                    max_tokens=300, json_mode=True)
+                                    max_tokens=300, json_mode=True,
+                                    cache_ttl=route_cache_ttl)
         if raw:
             try:
                 return _parse_routing_json(raw)
@@ -1870,7 +1880,8 @@ async def _builtin_process_receipt(params: Dict[str, Any]) -> Dict[str, Any]:
         # 5. Run OCR scan
         from services.receipt_scanner import scan_receipt
         logger.info("%s Running OCR scan...", tag)
-        scan_result = scan_receipt(
+        scan_result = await asyncio.to_thread(
+            scan_receipt,
             file_content=file_content,
             file_type=file_type,
             model="heavy",
@@ -1,8 +1,9 @@
 """
 AI usage ledger — token + estimated cost logging for every OpenAI call.
 
-Writes one row per call into the `ai_usage` table (fire-and-forget, never
-raises, never blocks the AI call). Read back by api/routers/ai_usage.py for the
+Queues one row per call for the `ai_usage` table; rows are bulk-inserted by
+the shared telemetry buffer (api/services/telemetry_buffer.py), so logging
+never raises and never adds a DB round-trip to the AI call. Read back by api/routers/ai_usage.py for the
 IT > "AI Usage" page.
 
 Two ways to attribute a call to a feature/company:
@@ -21,7 +22,7 @@ import logging
 from contextlib import contextmanager
 from typing import Optional
 
-from api.supabase_client import supabase
+from api.services.telemetry_buffer import get_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -35,8 +36,8 @@ PRICING = {
 # Per-request attribution context (feature / company_id / user_id).
 _ctx: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("ai_usage_ctx", default=None)
 
-# Keep references to fire-and-forget background logging tasks so they aren't GC'd.
-_bg_tasks: set = set()
+# Batched writer for ai_usage rows (flushed by the app's background task).
+_buffer = get_buffer("ai_usage")
 
 
 def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
@@ -61,6 +62,11 @@ def clear_ai_context() -> None:
     _ctx.set(None)
 
 
+def get_ai_context() -> Optional[dict]:
+    """Current attribution context (feature / company_id / user_id) or None."""
+    return _ctx.get()
+
+
 @contextmanager
 def ai_context(feature: Optional[str] = None, company_id: Optional[str] = None,
                user_id: Optional[str] = None):
@@ -101,7 +107,7 @@ def log_ai_usage(model: str, input_tokens: int = 0, output_tokens: int = 0,
                  latency_ms: Optional[int] = None, success: bool = True,
                  feature: Optional[str] = None, company_id: Optional[str] = None,
                  user_id: Optional[str] = None, source: Optional[str] = None) -> None:
-    """Insert one ai_usage row. Fire-and-forget; never raises."""
+    """Queue one ai_usage row for the batched writer. Never raises or blocks."""
     try:
         ctx = _ctx.get() or {}
         in_tok = int(input_tokens or 0)
@@ -125,23 +131,12 @@ def log_ai_usage(model: str, input_tokens: int = 0, output_tokens: int = 0,
             row["user_id"] = uid
         if source:
             row["source"] = source
-        supabase.table("ai_usage").insert(row).execute()
+        _buffer.enqueue(row)
     except Exception as exc:  # noqa: BLE001 — telemetry must never break the call
         logger.warning("[AI Usage] Failed to log: %s", exc)
 
 
 def log_ai_usage_bg(**kwargs) -> None:
-    """Non-blocking variant for async/user-facing paths. Resolves the
-    attribution context immediately, then offloads the insert to a thread."""
-    ctx = _ctx.get() or {}
-    kwargs.setdefault("feature", ctx.get("feature"))
-    kwargs.setdefault("company_id", ctx.get("company_id"))
-    kwargs.setdefault("user_id", ctx.get("user_id"))
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        log_ai_usage(**kwargs)
-        return
-    task = loop.create_task(asyncio.to_thread(log_ai_usage, **kwargs))
-    _bg_tasks.add(task)
-    task.add_done_callback(_bg_tasks.discard)
+    """Alias kept for async call sites. log_ai_usage only enqueues now, so it
+    is already non-blocking and resolves the attribution context at call time."""
+    log_ai_usage(**kwargs)
@@ -370,10 +370,12 @@ async def create_dashboard_notification(
         logger.error("[BudgetMonitor] Error creating dashboard notification: %s", e)
 
 
-async def send_push_notification_for_alert(user_id: str, alert: Dict):
-    """Send Firebase push notification for budget alert."""
+async def send_push_notification_for_alert(user_ids: List[str], alert: Dict):
+    """Send one Firebase push fan-out for a budget alert to every user in user_ids."""
+    if not user_ids:
+        return
     try:
-        from api.services.firebase_notifications import send_push_notification
+        from api.services.firebase_notifications import send_push_to_users
 
         # Emoji based on alert type
         emoji_map = {
@@ -384,8 +386,8 @@ async def send_push_notification_for_alert(user_id: str, alert: Dict):
         }
         emoji = emoji_map.get(alert["alert_type"], "📊")
 
-        await send_push_notification(
-            user_id=user_id,
+        await send_push_to_users(
+            user_ids,
             title=f"{emoji} {alert['title']}",
             body=alert["message"][:200],
             data={
@@ -401,8 +403,10 @@ async def send_push_notification_for_alert(user_id: str, alert: Dict):
 
 
 async def notify_recipients(alert: Dict, recipients: List[Dict]):
-    """Send notifications to all recipients based on their preferences."""
+    """Send notifications to all recipients based on their preferences.
+    Push goes out as a single multi-user send after preferences are applied."""
     notified_user_ids = []
+    push_user_ids = []
 
     for recipient in recipients:
         user_id = recipient.get("user_id")
@@ -424,14 +428,16 @@ async def notify_recipients(alert: Dict, recipients: List[Dict]):
 
         notified_user_ids.append(user_id)
 
-        # Send push notification if enabled
+        # Collect push recipients (sent together below)
         if recipient.get("notify_push", True):
-            await send_push_notification_for_alert(user_id, alert)
+            push_user_ids.append(user_id)
 
         # Create dashboard notification if enabled
         if recipient.get("notify_dashboard", True):
             await create_dashboard_notification(user_id, alert)
 
+    await send_push_notification_for_alert(push_user_ids, alert)
+
     return notified_user_ids
 
 
@@ -544,7 +550,7 @@ async def check_project_budgets(
             logger.info("[BudgetMonitor] Alert sent: %s to %s users", alert['title'], len(notified))
 
             # Post to project accounting channel as Daneel
-            post_alert_to_channel(alert)
+            await asyncio.to_thread(post_alert_to_channel, alert)
 
     return alerts_sent
 
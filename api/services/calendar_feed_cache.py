@@ -0,0 +1,175 @@
+# api/services/calendar_feed_cache.py
+# ============================================================================
+# Rendered ICS feed cache for /calendar/feed.ics
+# ============================================================================
+# Calendar apps poll subscription feeds every few minutes. Instead of a token
+# lookup + last_used_at write + two event queries + attendee fetch + ICS
+# rebuild per poll, the router keeps:
+#
+#   _tokens  token   -> user_id (+ when last_used_at was last written, so the
+#                       write happens at most once per TOUCH_INTERVAL)
+#   _feeds   user_id -> rendered body, gzip body, strong ETags, Last-Modified
+#
+# Any calendar event / attendee change calls invalidate(), which bumps a
+# generation counter: entries rendered under an older generation are stale.
+# Team events are visible to everyone, so invalidation is global rather than
+# per user. Other workers only see their own invalidations; FEED_TTL bounds
+# how long they can serve an outdated feed (and a revoked token).
+#
+# Config: CALENDAR_FEED_CACHE_TTL_S (300), CALENDAR_FEED_TOKEN_TTL_S (300),
+#         CALENDAR_FEED_TOUCH_INTERVAL_S (3600)
+# ============================================================================
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+FEED_TTL = int(os.getenv("CALENDAR_FEED_CACHE_TTL_S", "300"))
+TOKEN_TTL = int(os.getenv("CALENDAR_FEED_TOKEN_TTL_S", "300"))
+TOUCH_INTERVAL = int(os.getenv("CALENDAR_FEED_TOUCH_INTERVAL_S", "3600"))
+
+_feeds: Dict[str, Dict[str, Any]] = {}
+_tokens: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_generation = 0
+_hits = 0
+_misses = 0
+
+
+# -- invalidation --
+
+def invalidate() -> None:
+    """Some calendar event or attendee changed: every rendered feed is stale."""
+    global _generation
+    with _lock:
+        # Entries stay until purged so an unchanged re-render keeps its
+        # Last-Modified; get() ignores them from now on.
+        _generation += 1
+
+
+def generation() -> int:
+    """Capture before querying; pass to put() so a render that raced with a
+    write is never stored as current."""
+    return _generation
+
+
+# -- tokens --
+
+def _parse_ts(value: Any) -> float:
+    if not value:
+        return 0.0
+    try:
+        d = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if d.tzinfo is None:
+            d = d.replace(tzinfo=timezone.utc)
+        return d.timestamp()
+    except ValueError:
+        return 0.0
+
+
+def resolve_token(token: str) -> Optional[str]:
+    """user_id for a feed token (None if unknown). Touches last_used_at at most
+    once per TOUCH_INTERVAL per token."""
+    now = time.time()
+    entry = _tokens.get(token)
+    if entry is None or now - entry["ts"] >= TOKEN_TTL:
+        res = (
+            supabase.table("user_calendar_tokens")
+            .select("user_id, last_used_at")
+            .eq("token", token)
+            .limit(1)
+            .execute()
+        )
+        if not res.data:
+            _tokens.pop(token, None)
+            return None
+        row = res.data[0]
+        touched = entry["touched"] if entry else _parse_ts(row.get("last_used_at"))
+        entry = {"user_id": str(row["user_id"]), "ts": now, "touched": touched}
+        _tokens[token] = entry
+
+    if now - entry["touched"] >= TOUCH_INTERVAL:
+        entry["touched"] = now
+        try:
+            supabase.table("user_calendar_tokens").update(
+                {"last_used_at": datetime.now(timezone.utc).isoformat()}
+            ).eq("token", token).execute()
+        except Exception as e:
+            logger.debug("[CalendarFeed] last_used_at touch failed: %s", e)
+    return entry["user_id"]
+
+
+def forget_user_tokens(user_id: str) -> None:
+    """A token was revoked: drop the user's cached tokens and feed."""
+    with _lock:
+        for tok in [t for t, e in _tokens.items() if e["user_id"] == user_id]:
+            del _tokens[tok]
+        _feeds.pop(user_id, None)
+
+
+# -- rendered feeds --
+
+def get(user_id: str) -> Optional[Dict[str, Any]]:
+    """Current rendered feed for the user, or None if it must be rebuilt."""
+    global _hits, _misses
+    entry = _feeds.get(user_id)
+    if entry and entry["gen"] == _generation and time.time() - entry["ts"] < FEED_TTL:
+        _hits += 1
+        return entry
+    _misses += 1
+    return None
+
+
+def put(user_id: str, body: str, gen: int) -> Dict[str, Any]:
+    """Store a freshly rendered feed. Last-Modified only moves when the body
+    actually changed, so TTL re-renders keep answering If-Modified-Since."""
+    raw = body.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()[:32]
+    now = time.time()
+    with _lock:
+        prev = _feeds.get(user_id)
+        last_modified = prev["last_modified"] if prev and prev["digest"] == digest else int(now)
+        entry = {
+            "ts": now,
+            "gen": gen,
+            "digest": digest,
+            "body": raw,
+            "gzip": gzip.compress(raw, compresslevel=6),
+            "etag": f'"{digest}"',
+            "etag_gzip": f'"{digest}-gz"',
+            "last_modified": last_modified,
+        }
+        if gen == _generation:
+            _feeds[user_id] = entry
+    return entry
+
+
+# -- maintenance --
+
+def purge_expired() -> None:
+    """Drop feeds and tokens past their TTL (called from the memory sweep)."""
+    now = time.time()
+    with _lock:
+        for uid in [u for u, e in _feeds.items() if e["gen"] != _generation or now - e["ts"] >= FEED_TTL]:
+            del _feeds[uid]
+        for tok in [t for t, e in _tokens.items() if now - e["ts"] >= TOKEN_TTL]:
+            del _tokens[tok]
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "feeds": len(_feeds),
+        "tokens": len(_tokens),
+        "generation": _generation,
+        "hits": _hits,
+        "misses": _misses,
+    }
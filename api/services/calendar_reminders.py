@@ -0,0 +1,113 @@
+# api/services/calendar_reminders.py
+# ============================================================================
+# Materialized reminder schedule for calendar events
+# ============================================================================
+# calendar_events.next_reminder_at is when the event's next reminder fires and
+# next_reminder_occurrence is the occurrence (start time) it announces; both
+# are NULL when nothing is left to remind about. They are written:
+#
+#   * on create / update (refresh) when start_at, rrule, rrule_until or
+#     reminder_minutes change, and after a Google pull changes an event
+#   * by the cron dispatcher after each fire (advance to the next occurrence)
+#
+# so /calendar/cron/dispatch-reminders is one range read on the partial index
+# instead of expanding every recurring series on every tick.
+#
+# Migration: sql/calendar_reminder_schedule.sql
+# ============================================================================
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.services.rrule_lite import next_occurrence, parse_rrule, with_until
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+# Changing any of these on an event invalidates its schedule.
+SCHEDULE_FIELDS = ("start_at", "rrule", "rrule_until", "reminder_minutes")
+
+
+def _parse_iso(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        d = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if d.tzinfo is None:
+            d = d.replace(tzinfo=timezone.utc)
+        return d
+    except ValueError:
+        return None
+
+
+def next_reminder(row: Dict[str, Any], after: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """(fire_at, occurrence) of the first reminder firing strictly after `after`."""
+    try:
+        minutes = int(row.get("reminder_minutes") or 0)
+    except (TypeError, ValueError):
+        return None
+    start = _parse_iso(row.get("start_at"))
+    if minutes <= 0 or not start:
+        return None
+    delta = timedelta(minutes=minutes)
+
+    rule = parse_rrule(row.get("rrule"))
+    if not rule:
+        # One-off (or a malformed stored rrule, which the UI treats as one-off).
+        return (start - delta, start) if start - delta > after else None
+
+    rule = with_until(rule, _parse_iso(row.get("rrule_until")))
+    # fire_at > after  <=>  occurrence > after + delta
+    occ = next_occurrence(rule, start, after + delta, horizon_days=None)
+    return (occ - delta, occ) if occ else None
+
+
+def schedule_fields(row: Dict[str, Any], after: Optional[datetime] = None) -> Dict[str, Optional[str]]:
+    """The next_reminder_* column values for `row` as of `after` (default now)."""
+    nxt = next_reminder(row, after or datetime.now(timezone.utc))
+    return {
+        "next_reminder_at": nxt[0].isoformat() if nxt else None,
+        "next_reminder_occurrence": nxt[1].isoformat() if nxt else None,
+    }
+
+
+def save_schedules(rows: Iterable[Dict[str, Any]]) -> int:
+    """Persist [{event_id, next_reminder_at, next_reminder_occurrence}, ...].
+
+    One RPC for the whole batch; falls back to per-row updates if the function
+    is missing. Returns rows written. Never raises.
+    """
+    rows = [r for r in rows if r.get("event_id")]
+    if not rows:
+        return 0
+    try:
+        res = supabase.rpc("set_calendar_reminder_schedule", {"p_rows": rows}).execute()
+        return int(res.data or 0)
+    except Exception as e:
+        logger.warning("[CalendarReminders] bulk schedule write failed, per-row fallback: %s", e)
+    written = 0
+    for r in rows:
+        try:
+            supabase.table("calendar_events").update({
+                "next_reminder_at": r.get("next_reminder_at"),
+                "next_reminder_occurrence": r.get("next_reminder_occurrence"),
+            }).eq("event_id", r["event_id"]).execute()
+            written += 1
+        except Exception as e:
+            logger.warning("[CalendarReminders] schedule write failed for %s: %s", r.get("event_id"), e)
+    return written
+
+
+def refresh(event_rows: Iterable[Dict[str, Any]]) -> int:
+    """Recompute and store the schedule for full calendar_events rows."""
+    now = datetime.now(timezone.utc)
+    updates: List[Dict[str, Any]] = []
+    for row in event_rows or []:
+        if not row or not row.get("event_id"):
+            continue
+        # Nothing scheduled and nothing to schedule: skip the write.
+        if not row.get("reminder_minutes") and not row.get("next_reminder_at"):
+            continue
+        updates.append({"event_id": str(row["event_id"]), **schedule_fields(row, now)})
+    return save_schedules(updates)
@@ -11,6 +11,7 @@
 # 2. Manual trigger: POST /daneel/auto-auth/run
 # ============================================================================
 
+import asyncio
 import logging
 import re
 import os
@@ -2345,7 +2346,8 @@ async def trigger_auto_auth_check(expense_id: str, project_id: str):
                 paired = next((e for e in same_vendor
                                if (e.get("expense_id") or e.get("id")) == dup_result.paired_expense_id), None)
                 if paired:
-                    gpt_result = gpt_resolve_ambiguous(
+                    gpt_result = await asyncio.to_thread(
+                        gpt_resolve_ambiguous,
                         expense, paired, lookups,
                         min_confidence=int(cfg.get("daneel_gpt_fallback_confidence", 75)),
                     )
@@ -77,10 +77,12 @@ RULES:
 # ============================================================================
 
 def _call_gpt(system_prompt: str, user_content: str, max_tokens: int = 500,
-              temperature: float = 0.4, json_mode: bool = False) -> Optional[str]:
+              temperature: float = 0.4, json_mode: bool = False,
+              cache_ttl: Optional[float] = None) -> Optional[str]:
     """Sync GPT call via gpt-5-mini. Returns None on failure."""
     from api.services.gpt_client import gpt
-    return gpt.mini(system_prompt, user_content, json_mode=json_mode, max_tokens=max_tokens)
+    return gpt.mini(system_prompt, user_content, json_mode=json_mode, max_tokens=max_tokens,
+                    cache_ttl=cache_ttl)
 
 
 # ============================================================================
@@ -707,6 +709,10 @@ def craft_followup_message(pending_items: list, lookups: dict,
 # 3. REPLY INTERPRETATION
 # ============================================================================
 
+_SHORT_REPLY_MAX_CHARS = 40
+_REPLY_CACHE_TTL = 24 * 3600
+
+
 def interpret_reply(reply_text: str, context: dict) -> dict:
     """
     Interpret a human reply to Daneel's message.
@@ -724,6 +730,9 @@ def interpret_reply(reply_text: str, context: dict) -> dict:
         max_tokens=300,
         temperature=0.1,
         json_mode=True,
+        # Short acknowledgements ("ok", "yes", "done") in the same context
+        # always interpret the same way.
+        cache_ttl=_REPLY_CACHE_TTL if len(reply_text.strip()) <= _SHORT_REPLY_MAX_CHARS else None,
     )
 
     if result:
@@ -0,0 +1,523 @@
+# api/services/dependency_graph.py
+# ============================================================================
+# Per-project task dependency DAG for /pipeline/dependencies and workload
+# ============================================================================
+# task_dependencies rows used to be served raw and re-read on every request.
+# This keeps one ProjectGraph per project in memory with:
+#
+#   * cycle detection: add_edge() refuses an edge whose successor already
+#     reaches its predecessor and reports the offending path; cycles that
+#     are already in the table are listed by analysis()
+#   * topological order, cached; adding an edge that agrees with the cached
+#     order or removing any edge keeps it, only a contradicting edge drops it
+#   * critical path (CPM) in working hours: earliest/latest start and
+#     finish, slack per task. Durations are estimated_hours (default 2h),
+#     0 for closed tasks. Dependency types:
+#         finish_to_start   succ.start  >= pred.finish + lag
+#         start_to_start    succ.start  >= pred.start  + lag
+#         finish_to_finish  succ.finish >= pred.finish + lag
+#         start_to_finish   succ.finish >= pred.start  + lag
+#   * descendants(), which lets workload_scheduler.schedule_downstream()
+#     replan only what a change can move
+#
+# Edges to tasks of another project are kept (the other end becomes an
+# external node), but cycles are only detected within the graphs loaded.
+#
+# Freshness: the /pipeline task and dependency endpoints apply their writes
+# to the cached graphs (on_task_written / on_task_deleted /
+# on_dependency_added / on_dependency_removed); DEPENDENCY_GRAPH_TTL_S
+# (default 300s) only covers other workers and writers that bypass the API,
+# so check_new_dependency() reloads the graphs it validates against. Owners
+# used for rescheduling are always read from tasks, not from here.
+# ============================================================================
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from api.services.pipeline_lookups import closed_status_ids
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_HOURS = 2.0
+DEPENDENCY_TYPES = ("finish_to_start", "start_to_start", "finish_to_finish", "start_to_finish")
+
+TASK_COLUMNS = "task_id, project_id, Owner_id, estimated_hours, task_status"
+DEPENDENCY_COLUMNS = (
+    "dependency_id, predecessor_task_id, successor_task_id, "
+    "dependency_type, lag_hours, is_auto_generated"
+)
+
+_TTL = int(os.getenv("DEPENDENCY_GRAPH_TTL_S", "300"))
+_IN_CHUNK = 200
+_PAGE_SIZE = 1000
+_EPS = 1e-9
+
+
+class DependencyCycleError(ValueError):
+    """Adding the dependency would close a cycle; path runs successor -> predecessor."""
+
+    def __init__(self, path: List[str]):
+        self.path = path
+        super().__init__("Dependency would create a cycle: " + " -> ".join(path))
+
+
+@dataclass
+class Edge:
+    predecessor: str
+    successor: str
+    dependency_type: str = "finish_to_start"
+    lag_hours: float = 0.0
+    is_auto_generated: bool = False
+    dependency_id: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Edge":
+        kind = row.get("dependency_type") or "finish_to_start"
+        return cls(
+            predecessor=row["predecessor_task_id"],
+            successor=row["successor_task_id"],
+            dependency_type=kind if kind in DEPENDENCY_TYPES else "finish_to_start",
+            lag_hours=float(row.get("lag_hours") or 0),
+            is_auto_generated=bool(row.get("is_auto_generated")),
+            dependency_id=row.get("dependency_id"),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "dependency_id": self.dependency_id,
+            "predecessor_task_id": self.predecessor,
+            "successor_task_id": self.successor,
+            "dependency_type": self.dependency_type,
+            "lag_hours": self.lag_hours,
+            "is_auto_generated": self.is_auto_generated,
+        }
+
+
+class ProjectGraph:
+    """Tasks of one project plus every dependency touching them."""
+
+    def __init__(self, project_id: Optional[str]):
+        self.project_id = project_id
+        self.loaded_at = time.time()
+        self.nodes: Dict[str, Dict[str, Any]] = {}  # task_id -> hours, owner, project_id, closed
+        self.succ: Dict[str, Dict[str, Edge]] = {}
+        self.pred: Dict[str, Dict[str, Edge]] = {}
+        self._order: Optional[List[str]] = None
+        self._pos: Dict[str, int] = {}
+        self._cyclic: Set[str] = set()
+        self._cpm: Optional[Dict[str, Any]] = None
+
+    # -- mutation --
+
+    def set_task(self, row: Dict[str, Any], closed: Iterable[str] = ()) -> None:
+        tid = row["task_id"]
+        closed_flag = row.get("task_status") in set(closed)
+        node = {
+            "hours": 0.0 if closed_flag else float(row.get("estimated_hours") or DEFAULT_TASK_HOURS),
+            "owner": row.get("Owner_id"),
+            "project_id": row.get("project_id"),
+            "closed": closed_flag,
+        }
+        if self.nodes.get(tid) != node:
+            self._ensure(tid)
+            self.nodes[tid] = node
+            self._cpm = None
+
+    def _ensure(self, tid: str) -> None:
+        if tid in self.nodes:
+            return
+        self.nodes[tid] = {"hours": DEFAULT_TASK_HOURS, "owner": None, "project_id": None, "closed": False}
+        self.succ.setdefault(tid, {})
+        self.pred.setdefault(tid, {})
+        if self._order is not None:
+            # An isolated node can go anywhere in a valid order.
+            self._pos[tid] = len(self._order)
+            self._order.append(tid)
+        self._cpm = None
+
+    def add_edge(self, edge: Edge, check: bool = True) -> None:
+        p, s = edge.predecessor, edge.successor
+        if p == s:
+            raise DependencyCycleError([s, p])
+        if check:
+            path = self.path(s, p)
+            if path:
+                raise DependencyCycleError(path + [s])
+        self._ensure(p)
+        self._ensure(s)
+        self.succ[p][s] = edge
+        self.pred[s][p] = edge
+        if self._order is not None and not (
+            p in self._pos and s in self._pos and self._pos[p] < self._pos[s]
+        ):
+            self._order = None
+        self._cpm = None
+
+    def remove_edge(self, predecessor: str, successor: str) -> Optional[Edge]:
+        edge = self.succ.get(predecessor, {}).pop(successor, None)
+        self.pred.get(successor, {}).pop(predecessor, None)
+        if edge is not None:
+            # The cached order stays valid; a removed edge may break a cycle, though.
+            if self._cyclic:
+                self._order = None
+            self._cpm = None
+        return edge
+
+    # -- queries --
+
+    def edges(self) -> List[Edge]:
+        return [e for out in self.succ.values() for e in out.values()]
+
+    def path(self, start: str, target: str) -> Optional[List[str]]:
+        """Some path start -> ... -> target along successors, or None."""
+        if start not in self.succ or target not in self.nodes:
+            return None
+        parent: Dict[str, Optional[str]] = {start: None}
+        queue = deque([start])
+        while queue:
+            cur = queue.popleft()
+            if cur == target:
+                out = []
+                while cur is not None:
+                    out.append(cur)
+                    cur = parent[cur]
+                return out[::-1]
+            for nxt in self.succ.get(cur, ()):
+                if nxt not in parent:
+                    parent[nxt] = cur
+                    queue.append(nxt)
+        return None
+
+    def would_create_cycle(self, predecessor: str, successor: str) -> bool:
+        return predecessor == successor or self.path(successor, predecessor) is not None
+
+    def descendants(self, task_ids: Iterable[str]) -> Set[str]:
+        """Every task reachable from task_ids (excluding them unless reachable)."""
+        seen: Set[str] = set()
+        queue = deque(t for t in task_ids if t in self.succ)
+        while queue:
+            for nxt in self.succ.get(queue.popleft(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return seen
+
+    def topological_order(self) -> List[str]:
+        """Kahn's algorithm, cached. Tasks on a cycle are left out (see cyclic())."""
+        if self._order is None:
+            indeg = {t: len(self.pred.get(t, ())) for t in self.nodes}
+            queue = deque(sorted(t for t, n in indeg.items() if n == 0))
+            order: List[str] = []
+            while queue:
+                cur = queue.popleft()
+                order.append(cur)
+                for nxt in self.succ.get(cur, ()):
+                    indeg[nxt] -= 1
+                    if indeg[nxt] == 0:
+                        queue.append(nxt)
+            self._cyclic = set(self.nodes) - set(order)
+            self._order = order
+            self._pos = {t: i for i, t in enumerate(order)}
+        return self._order
+
+    def cyclic(self) -> Set[str]:
+        self.topological_order()
+        return set(self._cyclic)
+
+    def cycles(self) -> List[List[str]]:
+        """One representative cycle per group of tasks stuck in cycles."""
+        left = self.cyclic()
+        out: List[List[str]] = []
+        while left:
+            start = min(left)
+            # Walk predecessors inside the cyclic set until a task repeats.
+            seen: Dict[str, int] = {}
+            walk: List[str] = []
+            cur = start
+            while cur not in seen:
+                seen[cur] = len(walk)
+                walk.append(cur)
+                cur = next((p for p in sorted(self.pred.get(cur, ())) if p in left), None)
+                if cur is None:
+                    break
+            if cur is not None:
+                cycle = walk[seen[cur]:][::-1]
+                out.append(cycle + [cycle[0]])
+                left -= set(cycle)
+            left -= set(walk)
+        return out
+
+    def schedule(self) -> Dict[str, Any]:
+        """CPM over the acyclic part, in working hours from project start. Cached."""
+        if self._cpm is not None:
+            return self._cpm
+        order = self.topological_order()
+        dur = {t: self.nodes[t]["hours"] for t in order}
+        es: Dict[str, float] = {}
+        driver: Dict[str, Optional[str]] = {}
+        for t in order:
+            start, by = 0.0, None
+            for p, e in self.pred.get(t, {}).items():
+                if p not in es:
+                    continue
+                if e.dependency_type == "start_to_start":
+                    bound = es[p] + e.lag_hours
+                elif e.dependency_type == "finish_to_finish":
+                    bound = es[p] + dur[p] + e.lag_hours - dur[t]
+                elif e.dependency_type == "start_to_finish":
+                    bound = es[p] + e.lag_hours - dur[t]
+                else:
+                    bound = es[p] + dur[p] + e.lag_hours
+                if bound > start + _EPS:
+                    start, by = bound, p
+            es[t], driver[t] = start, by
+        finish = max((es[t] + dur[t] for t in order), default=0.0)
+
+        lf: Dict[str, float] = {}
+        for t in reversed(order):
+            late = finish
+            for s, e in self.succ.get(t, {}).items():
+                if s not in lf:
+                    continue
+                ls_s = lf[s] - dur[s]
+                if e.dependency_type == "start_to_start":
+                    bound = ls_s - e.lag_hours + dur[t]
+                elif e.dependency_type == "finish_to_finish":
+                    bound = lf[s] - e.lag_hours
+                elif e.dependency_type == "start_to_finish":
+                    bound = lf[s] - e.lag_hours + dur[t]
+                else:
+                    bound = ls_s - e.lag_hours
+                late = min(late, bound)
+            lf[t] = late
+
+        tasks = {}
+        for t in order:
+            slack = lf[t] - dur[t] - es[t]
+            tasks[t] = {
+                "earliest_start": round(es[t], 2),
+                "earliest_finish": round(es[t] + dur[t], 2),
+                "latest_start": round(lf[t] - dur[t], 2),
+                "latest_finish": round(lf[t], 2),
+                "slack_hours": round(max(slack, 0.0), 2),
+                "critical": slack <= _EPS,
+            }
+
+        # Critical path: back from the task finishing last along the
+        # predecessors that actually set each start.
+        path: List[str] = []
+        if order:
+            cur: Optional[str] = max(order, key=lambda t: (es[t] + dur[t], -self._pos[t]))
+            while cur is not None:
+                path.append(cur)
+                cur = driver.get(cur)
+        self._cpm = {"project_hours": round(finish, 2), "critical_path": path[::-1], "tasks": tasks}
+        return self._cpm
+
+    def analysis(self) -> Dict[str, Any]:
+        cpm = self.schedule()
+        return {
+            "project_id": self.project_id,
+            "tasks_count": len(self.nodes),
+            "dependencies_count": sum(len(v) for v in self.succ.values()),
+            "topological_order": list(self.topological_order()),
+            "cycles": self.cycles(),
+            **cpm,
+        }
+
+
+# ====================================================================
+# Cache
+# ====================================================================
+
+_lock = threading.Lock()
+_graphs: Dict[str, ProjectGraph] = {}
+_stats: Dict[str, int] = {"loads": 0, "hits": 0, "incremental_updates": 0}
+
+
+def _chunks(ids: List[str]):
+    for i in range(0, len(ids), _IN_CHUNK):
+        yield ids[i:i + _IN_CHUNK]
+
+
+def _fetch_all(build, *order_cols: str) -> List[Dict[str, Any]]:
+    """Every row of the query build() returns, paged past the 1000-row cap."""
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        q = build()
+        for col in order_cols:
+            q = q.order(col)
+        batch = q.range(offset, offset + _PAGE_SIZE - 1).execute().data or []
+        rows.extend(batch)
+        if len(batch) < _PAGE_SIZE:
+            return rows
+        offset += _PAGE_SIZE
+
+
+def _load(project_id: str) -> ProjectGraph:
+    tasks = _fetch_all(
+        lambda: supabase.table("tasks").select(TASK_COLUMNS).eq("project_id", project_id),
+        "task_id",
+    )
+    ids = [t["task_id"] for t in tasks if t.get("task_id")]
+    deps: Dict[Any, Dict[str, Any]] = {}
+    for col in ("successor_task_id", "predecessor_task_id"):
+        for chunk in _chunks(ids):
+            rows = _fetch_all(
+                lambda: supabase.table("task_dependencies").select(DEPENDENCY_COLUMNS).in_(col, chunk),
+                "predecessor_task_id", "successor_task_id",
+            )
+            for r in rows:
+                deps[r.get("dependency_id") or (r["predecessor_task_id"], r["successor_task_id"])] = r
+
+    known = set(ids)
+    external = sorted({
+        tid for r in deps.values()
+        for tid in (r["predecessor_task_id"], r["successor_task_id"]) if tid not in known
+    })
+    for chunk in _chunks(external):
+        tasks.extend(supabase.table("tasks").select(TASK_COLUMNS).in_("task_id", chunk).execute().data or [])
+
+    closed = closed_status_ids()
+    graph = ProjectGraph(project_id)
+    for t in tasks:
+        graph.set_task(t, closed)
+    for r in deps.values():
+        if r["predecessor_task_id"] == r["successor_task_id"]:
+            continue
+        graph.add_edge(Edge.from_row(r), check=False)
+    cyclic = graph.cyclic()
+    if cyclic:
+        logger.warning("[DependencyGraph] project %s has %d task(s) on dependency cycles", project_id, len(cyclic))
+    return graph
+
+
+def get_graph(project_id: str, refresh: bool = False) -> ProjectGraph:
+    """The project's graph, loaded at most once per TTL."""
+    graph = _graphs.get(project_id)
+    if not refresh and graph is not None and time.time() - graph.loaded_at < _TTL:
+        _stats["hits"] += 1
+        return graph
+    with _lock:
+        graph = _graphs.get(project_id)
+        if not refresh and graph is not None and time.time() - graph.loaded_at < _TTL:
+            return graph
+        graph = _load(project_id)
+        _graphs[project_id] = graph
+        _stats["loads"] += 1
+        return graph
+
+
+def invalidate(project_id: Optional[str] = None) -> None:
+    if project_id is None:
+        _graphs.clear()
+    else:
+        _graphs.pop(project_id, None)
+
+
+def graphs_for_tasks(task_ids: Iterable[str], refresh: bool = False) -> Dict[str, ProjectGraph]:
+    """Graphs of the projects the tasks belong to (one tasks read for ids
+    no cached graph owns yet). refresh=True reloads them from the tables."""
+    task_ids = [t for t in dict.fromkeys(task_ids) if t]
+    project_ids: Set[str] = set()
+    unknown = []
+    for tid in task_ids:
+        pid = next(
+            (g.project_id for g in list(_graphs.values())
+             if tid in g.nodes and g.nodes[tid].get("project_id") == g.project_id),
+            None,
+        )
+        if pid:
+            project_ids.add(pid)
+        else:
+            unknown.append(tid)
+    for chunk in _chunks(unknown):
+        rows = supabase.table("tasks").select("task_id, project_id").in_("task_id", chunk).execute().data or []
+        project_ids.update(r["project_id"] for r in rows if r.get("project_id"))
+    return {pid: get_graph(pid, refresh=refresh) for pid in sorted(project_ids)}
+
+
+def check_new_dependency(predecessor: str, successor: str) -> None:
+    """Raise DependencyCycleError if predecessor -> successor closes a cycle.
+
+    Checked against freshly loaded graphs: a cached one can miss edges added
+    by another worker or outside the API within the TTL."""
+    if predecessor == successor:
+        raise DependencyCycleError([successor, predecessor])
+    for graph in graphs_for_tasks([predecessor, successor], refresh=True).values():
+        path = graph.path(successor, predecessor)
+        if path:
+            raise DependencyCycleError(path + [successor])
+
+
+def downstream(task_ids: Iterable[str]) -> Set[str]:
+    task_ids = list(task_ids)
+    out: Set[str] = set()
+    for graph in graphs_for_tasks(task_ids).values():
+        out |= graph.descendants(task_ids)
+    return out
+
+
+def on_task_written(row: Dict[str, Any]) -> None:
+    """Apply a created / updated tasks row (as returned by the write) to every
+    cached graph that holds the task or its project. A task that moved to
+    another project drops both projects' graphs: their edges must be reloaded."""
+    tid = row.get("task_id")
+    if not tid or not _graphs:
+        return
+    new_pid = row.get("project_id")
+    homes = {
+        pid for pid, g in list(_graphs.items())
+        if tid in g.nodes and g.nodes[tid].get("project_id") == g.project_id
+    }
+    if homes and new_pid not in homes:
+        for pid in homes | {new_pid}:
+            invalidate(pid)
+    closed = closed_status_ids()
+    for graph in list(_graphs.values()):
+        if tid in graph.nodes or (new_pid and graph.project_id == new_pid):
+            graph.set_task(row, closed)
+            _stats["incremental_updates"] += 1
+
+
+def on_task_deleted(task_id: str) -> None:
+    """Drop the graphs that hold a deleted task (its dependency rows go too)."""
+    for pid, graph in list(_graphs.items()):
+        if task_id in graph.nodes:
+            invalidate(pid)
+
+
+def on_dependency_added(row: Dict[str, Any]) -> None:
+    """Apply a new task_dependencies row to every cached graph it touches."""
+    edge = Edge.from_row(row)
+    for graph in list(_graphs.values()):
+        if edge.predecessor in graph.nodes or edge.successor in graph.nodes:
+            try:
+                graph.add_edge(edge, check=False)
+            except DependencyCycleError:
+                continue
+            _stats["incremental_updates"] += 1
+            if graph.cyclic():
+                logger.warning("[DependencyGraph] dependency %s -> %s closed a cycle in project %s",
+                               edge.predecessor, edge.successor, graph.project_id)
+
+
+def on_dependency_removed(predecessor: str, successor: str) -> None:
+    for graph in list(_graphs.values()):
+        if graph.remove_edge(predecessor, successor) is not None:
+            _stats["incremental_updates"] += 1
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "projects": len(_graphs),
+        "tasks": sum(len(g.nodes) for g in _graphs.values()),
+    }
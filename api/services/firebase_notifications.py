@@ -3,17 +3,32 @@
 # ============================================================================
 # Sends push notifications via Firebase Cloud Messaging (FCM)
 # Used to notify users when they are @mentioned in messages
+#
+# Multi-recipient sends (send_push_to_users) load every recipient's tokens in
+# one query, send FCM multicasts of up to 500 tokens and deactivate all
+# rejected tokens in one update. send_push_notification (one user) is a thin
+# wrapper over it.
+#
+# Transport: FCM by default; PUSH_TRANSPORT=stub (or set_transport()) swaps in
+# StubTransport, which records messages instead of calling Firebase
+# (benchmarks/push_fanout.py drives the send path through it).
 
 import os
+import time
 import asyncio
 import logging
-from typing import List, Optional
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
 import firebase_admin
 from firebase_admin import credentials, messaging
 from supabase import create_client, Client
 
 logger = logging.getLogger(__name__)
 
+FCM_MULTICAST_LIMIT = 500   # FCM cap on tokens per multicast
+_ID_CHUNK = 200             # ids per IN (...) filter, keeps the URL short
+_TOKEN_CHUNK = 100          # FCM tokens are ~160 chars
+
 # ============================================================================
 # Firebase Admin SDK Initialization
 # ============================================================================
@@ -59,6 +74,75 @@ def initialize_firebase():
     return False
 
 
+# ============================================================================
+# Transports
+# ============================================================================
+
+class FCMTransport:
+    """Real delivery through the Firebase Admin SDK."""
+
+    name = "fcm"
+
+    def ready(self) -> bool:
+        return initialize_firebase()
+
+    def send_multicast(self, message: "messaging.MulticastMessage"):
+        """Blocking FCM call. send_each_for_multicast (firebase-admin >= 6.2)
+        uses the v1 API per token over one connection; send_multicast is the
+        legacy batch endpoint kept only as a fallback for older SDKs."""
+        send = getattr(messaging, "send_each_for_multicast", None) or messaging.send_multicast
+        return send(message)
+
+
+class StubTransport:
+    """Local stand-in: records every multicast, reports tokens listed in
+    `invalid_tokens` as unregistered and everything else as delivered."""
+
+    name = "stub"
+
+    def __init__(self, invalid_tokens: Iterable[str] = ()):
+        self.invalid_tokens = set(invalid_tokens)
+        self.sent: List[dict] = []
+
+    def ready(self) -> bool:
+        return True
+
+    def send_multicast(self, message: "messaging.MulticastMessage"):
+        notification = message.notification
+        self.sent.append({
+            "tokens": list(message.tokens),
+            "title": notification.title if notification else None,
+            "body": notification.body if notification else None,
+            "data": dict(message.data or {}),
+        })
+        responses = []
+        for token in message.tokens:
+            if token in self.invalid_tokens:
+                exc = messaging.UnregisteredError("Requested entity was not found.")
+                responses.append(SimpleNamespace(success=False, exception=exc, message_id=None))
+            else:
+                responses.append(SimpleNamespace(success=True, exception=None, message_id=f"stub-{len(self.sent)}"))
+        return SimpleNamespace(
+            responses=responses,
+            success_count=sum(1 for r in responses if r.success),
+            failure_count=sum(1 for r in responses if not r.success),
+        )
+
+
+_transport = StubTransport() if os.getenv("PUSH_TRANSPORT", "fcm").strip().lower() == "stub" else FCMTransport()
+
+
+def get_transport():
+    return _transport
+
+
+def set_transport(transport):
+    """Swap the delivery transport (e.g. StubTransport in tests). Returns the previous one."""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
 # ============================================================================
 # Supabase Client
 # ============================================================================
@@ -91,21 +175,180 @@ async def get_user_push_tokens(user_id: str) -> List[str]:
 
 async def deactivate_invalid_token(fcm_token: str):
     """Mark a token as inactive (when it's no longer valid)."""
+    await deactivate_invalid_tokens([fcm_token])
+
+
+async def get_push_tokens_for_users(user_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Active FCM tokens for many users at once: {user_id: [token, ...]}."""
+    ids = list(dict.fromkeys(str(u) for u in user_ids if u))
+    tokens: Dict[str, List[str]] = {}
+    if not ids:
+        return tokens
     try:
         supabase = get_supabase()
-        supabase.table("push_tokens") \
-            .update({"is_active": False}) \
-            .eq("fcm_token", fcm_token) \
-            .execute()
-        logger.info(f"[Firebase] Deactivated invalid token")
+        for i in range(0, len(ids), _ID_CHUNK):
+            result = supabase.table("push_tokens") \
+                .select("user_id, fcm_token") \
+                .in_("user_id", ids[i:i + _ID_CHUNK]) \
+                .eq("is_active", True) \
+                .execute()
+            for row in (result.data or []):
+                tokens.setdefault(str(row["user_id"]), []).append(row["fcm_token"])
+    except Exception as e:
+        logger.error(f"[Firebase] Error getting tokens for {len(ids)} users: {e}")
+    return tokens
+
+
+async def deactivate_invalid_tokens(fcm_tokens: Iterable[str]) -> int:
+    """Mark many tokens inactive in one update per chunk. Returns tokens sent."""
+    tokens = list(dict.fromkeys(t for t in fcm_tokens if t))
+    if not tokens:
+        return 0
+    try:
+        supabase = get_supabase()
+        for i in range(0, len(tokens), _TOKEN_CHUNK):
+            supabase.table("push_tokens") \
+                .update({"is_active": False}) \
+                .in_("fcm_token", tokens[i:i + _TOKEN_CHUNK]) \
+                .execute()
+        logger.info(f"[Firebase] Deactivated {len(tokens)} invalid tokens")
+        return len(tokens)
     except Exception as e:
-        logger.error(f"[Firebase] Error deactivating token: {e}")
+        logger.error(f"[Firebase] Error deactivating {len(tokens)} tokens: {e}")
+        return 0
 
 
 # ============================================================================
 # Send Push Notification
 # ============================================================================
 
+def _payload_data(data: Optional[dict], sender_name: Optional[str], avatar_color: Optional[str]) -> dict:
+    # Shallow copy to avoid mutating caller's dict
+    payload_data = dict(data) if data else {}
+    payload_data["play_sound"] = "true"
+    if sender_name:
+        payload_data["sender_name"] = sender_name
+    if avatar_color:
+        payload_data["avatar_color"] = avatar_color
+    # Ensure all values are strings (FCM requirement)
+    return {k: str(v) for k, v in payload_data.items()}
+
+
+def _webpush_config(tag: str, link: str) -> "messaging.WebpushConfig":
+    return messaging.WebpushConfig(
+        notification=messaging.WebpushNotification(
+            icon="/assets/img/greenblack_icon.png",
+            badge="/assets/img/greenblack_icon.png",
+            tag=tag,
+            renotify=True,
+            require_interaction=True
+        ),
+        fcm_options=messaging.WebpushFCMOptions(link=link)
+    )
+
+
+def _is_invalid_token_error(exc: Optional[Exception]) -> bool:
+    return isinstance(exc, (messaging.UnregisteredError, messaging.SenderIdMismatchError))
+
+
+async def send_push_to_users(
+    user_ids: Iterable[str],
+    title: str,
+    body: str,
+    data: Optional[dict] = None,
+    sender_name: Optional[str] = None,
+    avatar_color: Optional[str] = None,
+    tag: str = "ngm-mention",
+    tokens_by_user: Optional[Dict[str, List[str]]] = None,
+) -> dict:
+    """
+    Send the same notification to every device of every user in `user_ids`.
+
+    One token query for all recipients (skip it by passing `tokens_by_user`),
+    multicasts of up to FCM_MULTICAST_LIMIT tokens, one bulk deactivation of
+    unregistered / mismatched tokens.
+
+    Returns delivery stats:
+        recipients, users_with_tokens, tokens, sent, failed, invalid_pruned,
+        notified_user_ids (users with >= 1 successful delivery), ms
+    """
+    started = time.perf_counter()
+    ids = list(dict.fromkeys(str(u) for u in user_ids if u))
+    stats = {
+        "recipients": len(ids), "users_with_tokens": 0, "tokens": 0,
+        "sent": 0, "failed": 0, "invalid_pruned": 0, "notified_user_ids": [], "ms": 0,
+    }
+    if not ids:
+        return stats
+    transport = get_transport()
+    if not transport.ready():
+        logger.error("[Firebase] Cannot send notification - not initialized")
+        return stats
+
+    if tokens_by_user is None:
+        tokens_by_user = await get_push_tokens_for_users(ids)
+
+    owners: List[str] = []
+    tokens: List[str] = []
+    for uid in ids:
+        user_tokens = tokens_by_user.get(uid) or []
+        if user_tokens:
+            stats["users_with_tokens"] += 1
+        for token in user_tokens:
+            owners.append(uid)
+            tokens.append(token)
+    stats["tokens"] = len(tokens)
+
+    if not tokens:
+        logger.info(f"[Firebase] No push tokens for {len(ids)} recipients")
+        stats["ms"] = int((time.perf_counter() - started) * 1000)
+        return stats
+
+    payload_data = _payload_data(data, sender_name, avatar_color)
+    notification = messaging.Notification(title=title, body=body)
+    webpush = _webpush_config(tag, payload_data.get("url", "/messages.html"))
+
+    loop = asyncio.get_event_loop()
+    notified = set()
+    invalid: List[str] = []
+
+    for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+        chunk = tokens[start:start + FCM_MULTICAST_LIMIT]
+        message = messaging.MulticastMessage(
+            tokens=chunk,
+            notification=notification,
+            data=payload_data,
+            webpush=webpush,
+        )
+        try:
+            # Blocking HTTP — run in thread pool to keep the event loop free
+            batch = await loop.run_in_executor(None, transport.send_multicast, message)
+        except Exception as e:
+            logger.error(f"[Firebase] Multicast of {len(chunk)} tokens failed: {e}")
+            stats["failed"] += len(chunk)
+            continue
+
+        for offset, resp in enumerate(batch.responses):
+            if resp.success:
+                stats["sent"] += 1
+                notified.add(owners[start + offset])
+            else:
+                stats["failed"] += 1
+                if _is_invalid_token_error(resp.exception):
+                    invalid.append(chunk[offset])
+
+    if invalid:
+        stats["invalid_pruned"] = await deactivate_invalid_tokens(invalid)
+
+    stats["notified_user_ids"] = [uid for uid in ids if uid in notified]
+    stats["ms"] = int((time.perf_counter() - started) * 1000)
+    logger.info(
+        f"[Firebase] Multicast '{tag}': {stats['sent']}/{stats['tokens']} tokens, "
+        f"{len(notified)}/{len(ids)} users, {len(invalid)} invalid, {stats['ms']}ms"
+    )
+    return stats
+
+
 async def send_push_notification(
     user_id: str,
     title: str,
@@ -130,74 +373,16 @@ async def send_push_notification(
     Returns:
         True if at least one notification was sent successfully
     """
-    if not initialize_firebase():
-        logger.error("[Firebase] Cannot send notification - not initialized")
-        return False
-
-    tokens = await get_user_push_tokens(user_id)
-
-    if not tokens:
-        logger.info(f"[Firebase] No push tokens for user {user_id}")
-        return False
-
-    # Build notification payload
-    notification = messaging.Notification(
+    stats = await send_push_to_users(
+        [user_id],
         title=title,
-        body=body
+        body=body,
+        data=data,
+        sender_name=sender_name,
+        avatar_color=avatar_color,
+        tag=tag,
     )
-
-    # Build data payload (shallow copy to avoid mutating caller's dict)
-    payload_data = dict(data) if data else {}
-    payload_data["play_sound"] = "true"
-    if sender_name:
-        payload_data["sender_name"] = sender_name
-    if avatar_color:
-        payload_data["avatar_color"] = avatar_color
-
-    # Ensure all values are strings (FCM requirement)
-    payload_data = {k: str(v) for k, v in payload_data.items()}
-
-    loop = asyncio.get_event_loop()
-    success_count = 0
-
-    for token in tokens:
-        try:
-            message = messaging.Message(
-                notification=notification,
-                data=payload_data,
-                token=token,
-                webpush=messaging.WebpushConfig(
-                    notification=messaging.WebpushNotification(
-                        icon="/assets/img/greenblack_icon.png",
-                        badge="/assets/img/greenblack_icon.png",
-                        tag=tag,
-                        renotify=True,
-                        require_interaction=True
-                    ),
-                    fcm_options=messaging.WebpushFCMOptions(
-                        link=payload_data.get("url", "/messages.html")
-                    )
-                )
-            )
-
-            # messaging.send() is synchronous — run in thread pool to avoid
-            # blocking the event loop while waiting for Firebase HTTP response
-            response = await loop.run_in_executor(None, messaging.send, message)
-            logger.info(f"[Firebase] Notification sent: {response}")
-            success_count += 1
-
-        except messaging.UnregisteredError:
-            logger.warning(f"[Firebase] Token unregistered, deactivating")
-            await deactivate_invalid_token(token)
-
-        except messaging.SenderIdMismatchError:
-            logger.error(f"[Firebase] Sender ID mismatch for token")
-            await deactivate_invalid_token(token)
-
-        except Exception as e:
-            logger.error(f"[Firebase] Error sending to token: {e}")
-
-    return success_count > 0
+    return bool(stats["notified_user_ids"])
 
 
 # ============================================================================
@@ -210,7 +395,9 @@ async def notify_mentioned_users(
     message_preview: str,
     channel_name: str,
     message_url: Optional[str] = None,
-    avatar_color: Optional[str] = None
+    avatar_color: Optional[str] = None,
+    tokens_by_user: Optional[Dict[str, List[str]]] = None,
+    delivery: Optional[dict] = None,
 ) -> int:
     """
     Send push notifications to all mentioned users.
@@ -222,6 +409,8 @@ async def notify_mentioned_users(
         channel_name: Name of the channel/thread
         message_url: URL to open when notification is clicked
         avatar_color: Color for sender's avatar
+        tokens_by_user: Pre-fetched tokens (skips the token query)
+        delivery: Optional dict; receives the send stats under "mentions"
 
     Returns:
         Number of users successfully notified
@@ -241,21 +430,20 @@ async def notify_mentioned_users(
         "url": message_url or "/messages.html"
     }
 
-    notified_count = 0
-
-    for user_id in mentioned_user_ids:
-        success = await send_push_notification(
-            user_id=user_id,
-            title=title,
-            body=body,
-            data=data,
-            sender_name=sender_name,
-            avatar_color=avatar_color
-        )
-        if success:
-            notified_count += 1
+    stats = await send_push_to_users(
+        mentioned_user_ids,
+        title=title,
+        body=body,
+        data=data,
+        sender_name=sender_name,
+        avatar_color=avatar_color,
+        tokens_by_user=tokens_by_user,
+    )
+    notified_count = len(stats["notified_user_ids"])
 
     logger.info(f"[Firebase] Notified {notified_count}/{len(mentioned_user_ids)} mentioned users")
+    if delivery is not None:
+        delivery["mentions"] = stats
     return notified_count
 
 
@@ -270,7 +458,9 @@ async def notify_message_recipients(
     channel_name: str,
     channel_type: str,
     message_url: Optional[str] = None,
-    avatar_color: Optional[str] = None
+    avatar_color: Optional[str] = None,
+    tokens_by_user: Optional[Dict[str, List[str]]] = None,
+    delivery: Optional[dict] = None,
 ) -> int:
     """
     Send push notifications to DM/group message recipients.
@@ -283,6 +473,8 @@ async def notify_message_recipients(
         channel_type: "direct" or "group"
         message_url: URL to open when notification is clicked
         avatar_color: Color for sender's avatar
+        tokens_by_user: Pre-fetched tokens (skips the token query)
+        delivery: Optional dict; receives the send stats under "recipients"
 
     Returns:
         Number of users successfully notified
@@ -307,22 +499,21 @@ async def notify_message_recipients(
         "url": message_url or "/messages.html"
     }
 
-    notified_count = 0
-
-    for user_id in recipient_user_ids:
-        success = await send_push_notification(
-            user_id=user_id,
-            title=title,
-            body=body,
-            data=data,
-            sender_name=sender_name,
-            avatar_color=avatar_color,
-            tag=f"ngm-msg-{channel_name[:20]}"
-        )
-        if success:
-            notified_count += 1
+    stats = await send_push_to_users(
+        recipient_user_ids,
+        title=title,
+        body=body,
+        data=data,
+        sender_name=sender_name,
+        avatar_color=avatar_color,
+        tag=f"ngm-msg-{channel_name[:20]}",
+        tokens_by_user=tokens_by_user,
+    )
+    notified_count = len(stats["notified_user_ids"])
 
     logger.info(f"[Firebase] Notified {notified_count}/{len(recipient_user_ids)} {channel_type} recipients")
+    if delivery is not None:
+        delivery["recipients"] = stats
     return notified_count
 
 
@@ -415,25 +606,16 @@ async def notify_expense_authorizers(
     if pending_count > 0:
         data["pending_count"] = str(pending_count)
 
-    notified_count = 0
-    notified_users = []
-
-    for user in authorizers:
-        user_id = user.get("user_id")
-        if not user_id:
-            continue
-
-        success = await send_push_notification(
-            user_id=user_id,
-            title=title,
-            body=body,
-            data=data,
-            sender_name=sender_name
-        )
-
-        if success:
-            notified_count += 1
-            notified_users.append(user.get("user_name", "Unknown"))
+    names = {str(u["user_id"]): u.get("user_name", "Unknown") for u in authorizers if u.get("user_id")}
+    stats = await send_push_to_users(
+        list(names),
+        title=title,
+        body=body,
+        data=data,
+        sender_name=sender_name
+    )
+    notified_users = [names[uid] for uid in stats["notified_user_ids"]]
+    notified_count = len(notified_users)
 
     logger.info(f"[Firebase] Expense reminder sent to {notified_count}/{len(authorizers)} authorizers")
 
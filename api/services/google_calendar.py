@@ -27,12 +27,17 @@ from __future__ import annotations
 import logging
 import os
 import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlencode
 
 import httpx
 
+from api.services import calendar_feed_cache, calendar_reminders
 from api.supabase_client import supabase
 
 logger = logging.getLogger(__name__)
@@ -168,22 +173,23 @@ def _refresh_access_token(refresh_token: str) -> Dict[str, Any]:
         "refresh_token": refresh_token,
         "grant_type": "refresh_token",
     }
-    with httpx.Client(timeout=15) as client:
-        res = client.post(_TOKEN_URL, data=data)
-        if res.status_code >= 400:
-            raise GoogleSyncError(f"Token refresh failed: {res.status_code} {res.text}")
-        return res.json()
-
-
-def _get_valid_access_token(user_id: str) -> Tuple[str, str]:
-    """Return (access_token, calendar_id). Refreshes if access_token is stale."""
-    row_res = (
-        supabase.table("google_calendar_tokens")
-        .select("*").eq("user_id", user_id).limit(1).execute()
-    )
-    if not row_res.data:
-        raise GoogleSyncError("User has not connected Google Calendar")
-    row = row_res.data[0]
+    res = _http().post(_TOKEN_URL, data=data, timeout=15)
+    if res.status_code >= 400:
+        raise GoogleSyncError(f"Token refresh failed: {res.status_code} {res.text}")
+    return res.json()
+
+
+def _get_valid_access_token(user_id: str, row: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+    """Return (access_token, calendar_id). Refreshes if access_token is stale.
+    Pass the user's google_calendar_tokens row to skip the lookup."""
+    if row is None:
+        row_res = (
+            supabase.table("google_calendar_tokens")
+            .select("*").eq("user_id", user_id).limit(1).execute()
+        )
+        if not row_res.data:
+            raise GoogleSyncError("User has not connected Google Calendar")
+        row = row_res.data[0]
     expires_at_str = row.get("token_expires_at")
     expires_at = _parse_iso(expires_at_str) or datetime.now(timezone.utc)
     if expires_at - datetime.now(timezone.utc) < timedelta(seconds=60):
@@ -250,7 +256,7 @@ def status_for_user(user_id: str) -> Dict[str, Any]:
         return {"configured": False, "connected": False}
     res = (
         supabase.table("google_calendar_tokens")
-        .select("google_user_email, calendar_id, last_synced_at, connected_at")
+        .select("*")
         .eq("user_id", user_id).limit(1).execute()
     )
     if not res.data:
@@ -278,6 +284,9 @@ def status_for_user(user_id: str) -> Dict[str, Any]:
         "email": row.get("google_user_email"),
         "calendar_id": row.get("calendar_id"),
         "last_synced_at": row.get("last_synced_at"),
+        "last_sync_ms": row.get("last_sync_ms"),
+        "last_sync_counts": row.get("last_sync_counts"),
+        "last_sync_error": row.get("last_sync_error"),
         "connected_at": row.get("connected_at"),
         "realtime": realtime,
         "watch_expires_at": watch_expires_at,
@@ -690,7 +699,9 @@ def pull_single_event(user_id: str, event_id: str) -> Optional[Dict[str, Any]]:
         return None
 
     patch = _google_to_local_patch(g)
-    supabase.table("calendar_events").update(patch).eq("event_id", event_id).execute()
+    upd = supabase.table("calendar_events").update(patch).eq("event_id", event_id).execute()
+    calendar_reminders.refresh(upd.data or [])
+    calendar_feed_cache.invalidate()
     supabase.table("calendar_sync_mappings").update({
         "google_etag": g.get("etag"),
         "sync_status": "synced",
@@ -727,20 +738,53 @@ def push_delete(user_id: str, event_id: str) -> None:
 # ============================================================================
 # Pull (Google -> local) — incremental via syncToken
 # ============================================================================
+# pull_sync fetches one user's delta over the shared HTTP client and applies
+# it with a handful of bulk statements (_apply_pulled_events). sync_users runs
+# many users at once on a bounded thread pool (GOOGLE_SYNC_WORKERS) and returns
+# per-user duration + counts, which are also stored on google_calendar_tokens
+# (last_sync_ms / last_sync_counts / last_sync_error).
+
+SYNC_WORKERS = int(os.getenv("GOOGLE_SYNC_WORKERS", "8"))
+_APPLY_CHUNK = 200
+
+_http_client: Optional[httpx.Client] = None
+_http_lock = threading.Lock()
+
+
+def _http() -> httpx.Client:
+    """Process-wide Google API client (connection reuse across users/threads)."""
+    global _http_client
+    if _http_client is None:
+        with _http_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    timeout=20,
+                    limits=httpx.Limits(max_connections=SYNC_WORKERS * 2, max_keepalive_connections=SYNC_WORKERS),
+                )
+    return _http_client
+
 
-def pull_sync(user_id: str) -> Dict[str, int]:
+def pull_sync(user_id: str, token_row: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
     """Pull the user's Google events into the local DB. Idempotent — uses the
     stored sync_token for delta sync; on token expiry (410) restarts from a
-    seed window."""
+    seed window. The new sync_token is stored only once every pulled event
+    applied; otherwise the next pull re-reads the same delta. `token_row`
+    (the user's google_calendar_tokens row) saves a lookup when the caller
+    already has it."""
+    empty = {"created": 0, "updated": 0, "deleted": 0, "skipped": 0}
     if not is_google_configured():
-        return {"created": 0, "updated": 0, "deleted": 0, "skipped": 0}
+        return dict(empty)
 
-    access, calendar_id = _get_valid_access_token(user_id)
-    tok_row_res = (
-        supabase.table("google_calendar_tokens").select("sync_token")
-        .eq("user_id", user_id).limit(1).execute()
-    )
-    sync_token = (tok_row_res.data[0].get("sync_token") if tok_row_res.data else None)
+    started = time.monotonic()
+    access, calendar_id = _get_valid_access_token(user_id, token_row)
+    if token_row is not None:
+        sync_token = token_row.get("sync_token")
+    else:
+        tok_row_res = (
+            supabase.table("google_calendar_tokens").select("sync_token")
+            .eq("user_id", user_id).limit(1).execute()
+        )
+        sync_token = (tok_row_res.data[0].get("sync_token") if tok_row_res.data else None)
 
     headers = {"Authorization": f"Bearer {access}"}
     base_params: Dict[str, Any] = {"singleEvents": "false", "showDeleted": "true", "maxResults": 250}
@@ -749,26 +793,26 @@ def pull_sync(user_id: str) -> Dict[str, int]:
         items: List[Dict[str, Any]] = []
         page_token: Optional[str] = None
         next_sync_token: Optional[str] = None
-        with httpx.Client(timeout=20) as client:
-            while True:
-                p = dict(params)
-                if page_token:
-                    p["pageToken"] = page_token
-                res = client.get(
-                    f"{_CAL_BASE}/calendars/{calendar_id}/events",
-                    headers=headers, params=p,
-                )
-                if res.status_code == 410:
-                    # Sync token expired; signal caller to restart.
-                    return [], None, "__expired__"
-                if res.status_code >= 400:
-                    raise GoogleSyncError(f"events.list failed: {res.status_code} {res.text}")
-                payload = res.json()
-                items.extend(payload.get("items") or [])
-                page_token = payload.get("nextPageToken")
-                if not page_token:
-                    next_sync_token = payload.get("nextSyncToken")
-                    break
+        client = _http()
+        while True:
+            p = dict(params)
+            if page_token:
+                p["pageToken"] = page_token
+            res = client.get(
+                f"{_CAL_BASE}/calendars/{calendar_id}/events",
+                headers=headers, params=p,
+            )
+            if res.status_code == 410:
+                # Sync token expired; signal caller to restart.
+                return [], None, "__expired__"
+            if res.status_code >= 400:
+                raise GoogleSyncError(f"events.list failed: {res.status_code} {res.text}")
+            payload = res.json()
+            items.extend(payload.get("items") or [])
+            page_token = payload.get("nextPageToken")
+            if not page_token:
+                next_sync_token = payload.get("nextSyncToken")
+                break
         return items, next_sync_token, None
 
     if sync_token:
@@ -779,77 +823,238 @@ def pull_sync(user_id: str) -> Dict[str, int]:
         seed_from = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
         items, next_token, _ = fetch({**base_params, "timeMin": seed_from})
 
-    counts = {"created": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    try:
+        counts = _apply_pulled_events(user_id, calendar_id, items)
+    except Exception:
+        logger.exception("pull_sync: applying %d events failed for %s, retrying one by one",
+                         len(items), user_id)
+        counts = _apply_pulled_events_one_by_one(user_id, calendar_id, items)
+    counts["fetched"] = len(items)
+
+    update_row: Dict[str, Any] = {
+        "last_sync_ms": int((time.monotonic() - started) * 1000),
+        "last_sync_counts": counts,
+        "last_sync_error": None,
+    }
+    if counts.get("errors"):
+        # Keep the old cursor so the next pull re-reads this delta (applying
+        # is idempotent on the Google event id) instead of losing it.
+        update_row["last_sync_error"] = f"{counts['errors']} of {len(items)} pulled events failed to apply"
+    else:
+        update_row["last_synced_at"] = datetime.now(timezone.utc).isoformat()
+        if next_token:
+            update_row["sync_token"] = next_token
+    try:
+        supabase.table("google_calendar_tokens").update(update_row).eq("user_id", user_id).execute()
+    except Exception:
+        # Stats columns missing (migration not run yet): keep the cursor moving.
+        for k in ("last_sync_ms", "last_sync_counts", "last_sync_error"):
+            update_row.pop(k)
+        if update_row:
+            supabase.table("google_calendar_tokens").update(update_row).eq("user_id", user_id).execute()
+
+    return counts
+
+
+def _apply_pulled_events_one_by_one(user_id: str, calendar_id: str,
+                                    items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Fallback when the batch apply fails: each event on its own, so one bad
+    event can't take the rest down. Failures are counted under "errors"."""
+    counts = {"created": 0, "updated": 0, "deleted": 0, "skipped": 0, "errors": 0}
+    latest: Dict[str, Dict[str, Any]] = {}
     for g in items:
+        if g.get("id"):
+            latest[g["id"]] = g          # later pages win
+        else:
+            counts["skipped"] += 1
+    for gid, g in latest.items():
         try:
-            r = _apply_pulled_event(user_id, calendar_id, g)
-            counts[r] = counts.get(r, 0) + 1
+            one = _apply_pulled_events(user_id, calendar_id, [g])
         except Exception:
-            logger.exception("pull_sync: failed on event %s", g.get("id"))
+            logger.exception("pull_sync: failed on event %s", gid)
+            counts["errors"] += 1
+            continue
+        for k, v in one.items():
+            counts[k] = counts.get(k, 0) + v
+    return counts
 
-    update_row: Dict[str, Any] = {"last_synced_at": datetime.now(timezone.utc).isoformat()}
-    if next_token:
-        update_row["sync_token"] = next_token
-    supabase.table("google_calendar_tokens").update(update_row).eq("user_id", user_id).execute()
 
-    return counts
+def sync_users(user_ids: Optional[List[str]] = None, workers: int = SYNC_WORKERS) -> Dict[str, Any]:
+    """pull_sync many users concurrently (all connected users by default).
 
+    Token rows are loaded in one query and handed to each worker. Returns
+    {"totals": {...}, "users": [{user_id, ms, fetched, created, ..., error}]}.
+    """
+    q = supabase.table("google_calendar_tokens").select("*")
+    if user_ids is not None:
+        if not user_ids:
+            return {"totals": {"users": 0}, "users": []}
+        q = q.in_("user_id", list(user_ids))
+    rows = q.execute().data or []
+
+    def run(row: Dict[str, Any]) -> Dict[str, Any]:
+        uid = str(row["user_id"])
+        started = time.monotonic()
+        try:
+            counts = pull_sync(uid, row)
+            return {"user_id": uid, "ms": int((time.monotonic() - started) * 1000), **counts, "error": None}
+        except Exception as e:
+            ms = int((time.monotonic() - started) * 1000)
+            logger.warning("sync_users: pull_sync failed for %s: %s", uid, e)
+            try:
+                supabase.table("google_calendar_tokens").update({
+                    "last_sync_ms": ms,
+                    "last_sync_error": str(e)[:500],
+                }).eq("user_id", uid).execute()
+            except Exception:
+                pass
+            return {"user_id": uid, "ms": ms, "error": str(e)[:200]}
 
-def _apply_pulled_event(user_id: str, calendar_id: str, g: Dict[str, Any]) -> str:
-    """Apply one Google event to our DB. Returns 'created'|'updated'|'deleted'|'skipped'."""
-    gid = g.get("id")
-    if not gid:
-        return "skipped"
+    results: List[Dict[str, Any]] = []
+    if rows:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(rows)))) as pool:
+            results = list(pool.map(run, rows))
 
-    map_res = (
-        supabase.table("calendar_sync_mappings").select("*")
-        .eq("google_calendar_id", calendar_id).eq("google_event_id", gid).limit(1).execute()
-    )
-    mapping = map_res.data[0] if map_res.data else None
+    totals: Dict[str, Any] = {"users": len(rows), "errors": 0}
+    for k in ("fetched", "created", "updated", "deleted", "skipped"):
+        totals[k] = sum(int(r.get(k) or 0) for r in results)
+    totals["errors"] = sum(1 for r in results if r.get("error")) + sum(int(r.get("errors") or 0) for r in results)
+    totals["max_ms"] = max((r["ms"] for r in results), default=0)
+    return {"totals": totals, "users": results}
 
-    if g.get("status") == "cancelled":
-        if mapping:
-            supabase.table("calendar_events").delete().eq("event_id", mapping["event_id"]).execute()
-            # Mapping cascades.
-            return "deleted"
-        return "skipped"
 
-    patch = _google_to_local_patch(g)
-    now_iso = datetime.now(timezone.utc).isoformat()
+def _apply_pulled_events(user_id: str, calendar_id: str, items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Apply a batch of Google events to our DB, keyed on the Google event id.
 
-    if mapping:
-        # Compare etag: if unchanged, skip.
-        if mapping.get("google_etag") == g.get("etag"):
-            return "skipped"
-        supabase.table("calendar_events").update(patch).eq("event_id", mapping["event_id"]).execute()
-        supabase.table("calendar_sync_mappings").update({
+    One mapping lookup per 200 ids, then: one delete for cancellations, one
+    patch RPC + one mapping upsert for changed events, one insert for new
+    events + one mapping upsert that ignores ids another sync already mapped
+    (the losing local rows are removed). Returns created/updated/deleted/
+    skipped counts."""
+    counts = {"created": 0, "updated": 0, "deleted": 0, "skipped": 0}
+
+    latest: Dict[str, Dict[str, Any]] = {}
+    for g in items:
+        if g.get("id"):
+            latest[g["id"]] = g          # later pages win
+        else:
+            counts["skipped"] += 1
+    if not latest:
+        return counts
+
+    gids = list(latest)
+    mappings: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(gids), _APPLY_CHUNK):
+        res = (
+            supabase.table("calendar_sync_mappings").select("event_id, google_event_id, google_etag")
+            .eq("google_calendar_id", calendar_id)
+            .in_("google_event_id", gids[i:i + _APPLY_CHUNK])
+            .execute()
+        )
+        for m in res.data or []:
+            mappings[m["google_event_id"]] = m
+
+    now_iso = datetime.now(timezone.utc).isoformat()
+    to_delete: List[str] = []
+    patches: List[Dict[str, Any]] = []
+    mapping_updates: List[Dict[str, Any]] = []
+    new_rows: List[Dict[str, Any]] = []
+    new_mappings: List[Dict[str, Any]] = []
+
+    for gid, g in latest.items():
+        mapping = mappings.get(gid)
+        if g.get("status") == "cancelled":
+            if mapping:
+                to_delete.append(str(mapping["event_id"]))
+            else:
+                counts["skipped"] += 1
+            continue
+        patch = _google_to_local_patch(g)
+        if not patch.get("start_at") or not patch.get("end_at"):
+            counts["skipped"] += 1
+            continue
+        if mapping:
+            # Compare etag: if unchanged, skip.
+            if mapping.get("google_etag") == g.get("etag"):
+                counts["skipped"] += 1
+                continue
+            patches.append({"event_id": str(mapping["event_id"]), **patch})
+            mapping_updates.append({
+                "event_id": str(mapping["event_id"]),
+                "google_event_id": gid,
+                "google_calendar_id": calendar_id,
+                "google_etag": g.get("etag"),
+                "sync_status": "synced",
+                "last_synced_at": now_iso,
+            })
+            continue
+        # New event from Google — create locally. The id is minted here so the
+        # mapping can be built without relying on RETURNING order.
+        event_id = str(uuid.uuid4())
+        new_rows.append({
+            **patch,
+            "event_id": event_id,
+            "created_by": user_id,
+            "visibility": "private",   # Google-originated events default to private locally
+        })
+        new_mappings.append({
+            "event_id": event_id,
+            "google_event_id": gid,
+            "google_calendar_id": calendar_id,
             "google_etag": g.get("etag"),
+            "sync_source": "google",
             "sync_status": "synced",
             "last_synced_at": now_iso,
-        }).eq("event_id", mapping["event_id"]).execute()
-        return "updated"
-
-    # New event from Google — create locally.
-    new_row = {
-        **patch,
-        "created_by": user_id,
-        "visibility": "private",   # Google-originated events default to private locally
-    }
-    ins = supabase.table("calendar_events").insert(new_row).execute()
-    if not ins.data:
-        return "skipped"
-    event_id = ins.data[0]["event_id"]
-    supabase.table("calendar_sync_mappings").insert({
-        "event_id": event_id,
-        "google_event_id": gid,
-        "google_calendar_id": calendar_id,
-        "google_etag": g.get("etag"),
-        "sync_source": "google",
-        "sync_status": "synced",
-        "last_synced_at": now_iso,
-        "last_local_update_at": None,
-    }).execute()
-    return "created"
+            "last_local_update_at": None,
+        })
+
+    if to_delete:
+        # Mappings cascade.
+        supabase.table("calendar_events").delete().in_("event_id", to_delete).execute()
+        counts["deleted"] = len(to_delete)
+
+    if patches:
+        updated_rows = _patch_events(patches)
+        supabase.table("calendar_sync_mappings").upsert(mapping_updates, on_conflict="event_id").execute()
+        # start_at / rrule may have moved: reschedule any local reminder.
+        calendar_reminders.refresh(updated_rows)
+        counts["updated"] = len(patches)
+
+    if new_rows:
+        supabase.table("calendar_events").insert(new_rows).execute()
+        won = (
+            supabase.table("calendar_sync_mappings")
+            .upsert(new_mappings, on_conflict="google_calendar_id,google_event_id", ignore_duplicates=True)
+            .execute()
+        )
+        won_ids = {str(m["event_id"]) for m in (won.data or [])}
+        # A concurrent sync (webhook + cron) mapped the same Google event first.
+        losers = [r["event_id"] for r in new_rows if r["event_id"] not in won_ids]
+        if losers:
+            supabase.table("calendar_events").delete().in_("event_id", losers).execute()
+        counts["created"] = len(won_ids)
+        counts["skipped"] += len(losers)
+
+    if to_delete or patches or new_rows:
+        calendar_feed_cache.invalidate()
+    return counts
+
+
+def _patch_events(patches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply per-event patches in one RPC; returns the updated rows. Falls back
+    to one update per event if the function isn't deployed."""
+    try:
+        res = supabase.rpc("apply_calendar_event_patches", {"p_rows": patches}).execute()
+        return res.data or []
+    except Exception as e:
+        logger.warning("bulk event patch failed, per-row fallback: %s", e)
+    rows: List[Dict[str, Any]] = []
+    for p in patches:
+        patch = dict(p)
+        event_id = patch.pop("event_id")
+        upd = supabase.table("calendar_events").update(patch).eq("event_id", event_id).execute()
+        rows.extend(upd.data or [])
+    return rows
 
 
 # ============================================================================
@@ -0,0 +1,244 @@
+# api/services/gpt_cache.py
+# ============================================================================
+# Prompt-level response cache for deterministic GPT calls
+# ============================================================================
+# Opt-in: callers pass cache_ttl=<seconds> to gpt.mini / gpt.heavy (or their
+# async / fallback variants). Calls without cache_ttl never touch the cache.
+#
+# Key: sha256 of (model, sha256(instructions), sha256(input), json_mode,
+# variant) where variant carries output-shaping knobs (max_tokens,
+# temperature) so two calls only share an answer if they'd ask the same thing.
+#
+# Storage:
+#   - Memory  -> LRU (OrderedDict) bounded by GPT_CACHE_MAX_ENTRIES, per-entry TTL
+#   - Postgres -> optional second level (table gpt_response_cache), enabled
+#                with GPT_CACHE_DB=1 so warm answers survive deploys and are
+#                shared across workers. See sql/create_gpt_response_cache.sql.
+#
+# Stats (per feature from the ai_usage context): hits, misses, hit rate and the
+# estimated USD a hit saved (tokens of the original call priced via PRICING).
+# Surfaced in GET /ai-usage/summary under "cache".
+# ============================================================================
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from api.services.ai_usage import estimate_cost, get_ai_context
+
+logger = logging.getLogger(__name__)
+
+# ── Configuration ────────────────────────────────────────────────
+MAX_ENTRIES = int(os.getenv("GPT_CACHE_MAX_ENTRIES", "2000"))
+MAX_TTL_S = 7 * 24 * 3600
+DB_ENABLED = os.getenv("GPT_CACHE_DB", "").lower() in ("1", "true", "yes")
+_TABLE = "gpt_response_cache"
+
+
+def _sha(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-level (memory LRU + optional Postgres) GPT response cache."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, db_enabled: bool = DB_ENABLED):
+        self.max_entries = max_entries
+        self.db_enabled = db_enabled
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "cost_saved_usd": 0.0}
+        )
+
+    # -- keys --
+
+    @staticmethod
+    def key(model: str, instructions: str, input: Any, json_mode: bool,
+            variant: str = "") -> str:
+        raw = "|".join((model, _sha(instructions), _sha(input),
+                        "json" if json_mode else "text", variant))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # -- memory level --
+
+    def _mem_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _mem_put(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # -- db level --
+
+    def _db_get(self, key: str) -> Optional[dict]:
+        try:
+            from api.supabase_client import supabase
+            rows = (
+                supabase.table(_TABLE)
+                .select("model, response, input_tokens, output_tokens, expires_at")
+                .eq("cache_key", key)
+                .gt("expires_at", datetime.now(timezone.utc).isoformat())
+                .limit(1)
+                .execute()
+                .data
+            ) or []
+        except Exception as exc:  # noqa: BLE001 — cache must never break the call
+            logger.warning("[GPT cache] DB read failed: %s", exc)
+            return None
+        if not rows:
+            return None
+        row = rows[0]
+        try:
+            expires = datetime.fromisoformat(str(row["expires_at"]).replace("Z", "+00:00")).timestamp()
+        except (TypeError, ValueError):
+            expires = time.time() + 60
+        return {
+            "text": row.get("response"),
+            "model": row.get("model"),
+            "input_tokens": int(row.get("input_tokens") or 0),
+            "output_tokens": int(row.get("output_tokens") or 0),
+            "expires": expires,
+        }
+
+    def _db_put(self, key: str, entry: dict) -> None:
+        try:
+            from api.supabase_client import supabase
+            supabase.table(_TABLE).upsert({
+                "cache_key": key,
+                "model": entry["model"],
+                "response": entry["text"],
+                "input_tokens": entry["input_tokens"],
+                "output_tokens": entry["output_tokens"],
+                "expires_at": datetime.fromtimestamp(entry["expires"], tz=timezone.utc).isoformat(),
+            }, on_conflict="cache_key").execute()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("[GPT cache] DB write failed: %s", exc)
+
+    # -- accounting --
+
+    def _record(self, entry: Optional[dict]) -> None:
+        feature = (get_ai_context() or {}).get("feature") or "unknown"
+        with self._lock:
+            bucket = self._stats[feature]
+            if entry is None:
+                bucket["misses"] += 1
+            else:
+                bucket["hits"] += 1
+                bucket["cost_saved_usd"] += estimate_cost(
+                    entry["model"], entry["input_tokens"], entry["output_tokens"])
+
+    # -- public API --
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._mem_get(key)
+        if entry is None and self.db_enabled:
+            entry = self._db_get(key)
+            if entry is not None:
+                self._mem_put(key, entry)
+        self._record(entry)
+        return entry["text"] if entry else None
+
+    async def get_async(self, key: str) -> Optional[str]:
+        entry = self._mem_get(key)
+        if entry is None and self.db_enabled:
+            entry = await asyncio.to_thread(self._db_get, key)
+            if entry is not None:
+                self._mem_put(key, entry)
+        self._record(entry)
+        return entry["text"] if entry else None
+
+    def _entry(self, text: str, model: str, input_tokens: int, output_tokens: int,
+               ttl: float) -> dict:
+        return {
+            "text": text,
+            "model": model,
+            "input_tokens": int(input_tokens or 0),
+            "output_tokens": int(output_tokens or 0),
+            "expires": time.time() + min(float(ttl), MAX_TTL_S),
+        }
+
+    def put(self, key: str, text: str, model: str, input_tokens: int,
+            output_tokens: int, ttl: float) -> None:
+        entry = self._entry(text, model, input_tokens, output_tokens, ttl)
+        self._mem_put(key, entry)
+        if self.db_enabled:
+            self._db_put(key, entry)
+
+    async def put_async(self, key: str, text: str, model: str, input_tokens: int,
+                        output_tokens: int, ttl: float) -> None:
+        entry = self._entry(text, model, input_tokens, output_tokens, ttl)
+        self._mem_put(key, entry)
+        if self.db_enabled:
+            await asyncio.to_thread(self._db_put, key, entry)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            stale = [k for k, v in self._entries.items() if v["expires"] <= now]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Per-feature hit rate + cost saved since process start."""
+        with self._lock:
+            snapshot = {f: dict(v) for f, v in self._stats.items()}
+            entries = len(self._entries)
+        by_feature = []
+        hits = misses = 0
+        saved = 0.0
+        for feature, s in snapshot.items():
+            lookups = s["hits"] + s["misses"]
+            hits += s["hits"]
+            misses += s["misses"]
+            saved += s["cost_saved_usd"]
+            by_feature.append({
+                "feature": feature,
+                "hits": int(s["hits"]),
+                "misses": int(s["misses"]),
+                "hit_rate": round(s["hits"] / lookups, 4) if lookups else 0.0,
+                "cost_saved_usd": round(s["cost_saved_usd"], 6),
+            })
+        by_feature.sort(key=lambda x: x["cost_saved_usd"], reverse=True)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "db_enabled": self.db_enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "cost_saved_usd": round(saved, 6),
+            "by_feature": by_feature,
+        }
+
+
+response_cache = ResponseCache()
@@ -19,17 +19,36 @@
 #
 #   # Fallback (mini first, heavy if confidence < threshold)
 #   result = await gpt.with_fallback_async("Route this.", input_text, min_confidence=0.9)
+#
+#   # Opt-in response cache for deterministic prompts (see gpt_cache.py)
+#   result = gpt.mini("You match names.", query, cache_ttl=3600)
+#
+# Every call is governed by a per-model gate (see gpt_limits.py): bounded
+# concurrency, token-bucket RPM, jittered retries on 429/5xx and a total
+# deadline. In async code always use the *_async variants (or run the sync
+# caller via asyncio.to_thread). A sync call made on the event loop thread is
+# counted (loop_blocking_sync_calls), warned, and never waits: it gets one
+# attempt if a slot and a rate token are free right now and fails otherwise,
+# because blocking the loop would also stall the async calls holding the slots.
 # ============================================================================
 
+import asyncio
 import os
 import json
 import logging
 import time
-from typing import Optional, Union
+from typing import Any, Callable, Optional, Union
 
-from openai import OpenAI, AsyncOpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+import httpx
 
 from api.services.ai_usage import log_ai_usage, log_ai_usage_bg
+from api.services.gpt_cache import response_cache
+from api.services.gpt_limits import (
+    DEFAULT_TIMEOUT_S, MAX_RETRIES, DeadlineExceeded, ModelGate,
+    attempt_timeout, backoff_delay, get_stats, is_retryable,
+    on_event_loop_thread, register_model,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +66,21 @@ def _usage_tokens(resp, in_field: str, out_field: str):
 MINI_MODEL = "gpt-5-mini"
 HEAVY_MODEL = "gpt-5.2"
 
+# ── Per-model gates (concurrency + RPM, see gpt_limits) ──────────
+_mini_gate = register_model(MINI_MODEL, "mini", default_concurrency=8, default_rpm=300)
+_heavy_gate = register_model(HEAVY_MODEL, "heavy", default_concurrency=4, default_rpm=120)
+
+# Without an explicit deadline a call may spend this multiple of its
+# per-attempt timeout on queueing + retries before giving up.
+_DEADLINE_FACTOR = 2.5
+
+# Keep-alive pool shared by every call on a client (TLS handshakes reused).
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16,
+                            keepalive_expiry=60.0)
+
 # ── Singleton clients ────────────────────────────────────────────
+# max_retries=0: retries are owned by _invoke/_invoke_async so they respect
+# the per-model gate and the caller's deadline.
 _sync_client: Optional[OpenAI] = None
 _async_client: Optional[AsyncOpenAI] = None
 
@@ -58,7 +91,8 @@ def _get_sync() -> OpenAI:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not configured")
-        _sync_client = OpenAI(api_key=api_key, timeout=30.0)
+        _sync_client = OpenAI(api_key=api_key, timeout=DEFAULT_TIMEOUT_S, max_retries=0,
+                              http_client=DefaultHttpxClient(limits=_HTTP_LIMITS))
     return _sync_client
 
 
@@ -68,14 +102,124 @@ def _get_async() -> AsyncOpenAI:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not configured")
-        _async_client = AsyncOpenAI(api_key=api_key, timeout=30.0)
+        _async_client = AsyncOpenAI(api_key=api_key, timeout=DEFAULT_TIMEOUT_S, max_retries=0,
+                                    http_client=DefaultAsyncHttpxClient(limits=_HTTP_LIMITS))
     return _async_client
 
 
+# ── Governed invocation (gate + rate limit + retries + deadline) ─
+
+def _deadline_at(timeout: Optional[float], deadline: Optional[float]) -> float:
+    budget = deadline if deadline else (timeout or DEFAULT_TIMEOUT_S) * _DEADLINE_FACTOR
+    return time.monotonic() + budget
+
+
+def _invoke(gate: ModelGate, create: Callable[..., Any], kwargs: dict,
+            timeout: Optional[float], deadline: Optional[float]) -> Any:
+    """Run a sync OpenAI create() under the model gate. Raises on final failure."""
+    on_loop = on_event_loop_thread()
+    if on_loop:
+        # Waiting on the loop thread would also stall the async calls that hold
+        # this model's slots, so they could never release them: no queueing,
+        # no rate-limit sleep, no retry backoff. Callers in async code should
+        # use the *_async variants.
+        if gate.note_loop_blocking() == 1:
+            logger.warning("[GPT] sync %s call on the event loop thread; use the async variant",
+                           gate.model)
+        if not gate.try_acquire():
+            raise DeadlineExceeded(f"{gate.model}: no free slot for a sync call on the event loop")
+    end = _deadline_at(timeout, deadline)
+    if not on_loop:
+        gate.acquire(end)
+    try:
+        attempt = 0
+        while True:
+            wait = gate.rate_wait()
+            if wait:
+                if on_loop or time.monotonic() + wait >= end:
+                    raise DeadlineExceeded(f"{gate.model}: rate limit wait exceeds deadline")
+                time.sleep(wait)
+            try:
+                return create(**kwargs, timeout=attempt_timeout(timeout, end))
+            except Exception as e:
+                if on_loop or attempt >= MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt, e)
+                if time.monotonic() + delay >= end:
+                    raise
+                attempt += 1
+                gate.note_retry()
+                logger.info("[GPT] %s retry %d/%d in %.2fs: %s",
+                            gate.model, attempt, MAX_RETRIES, delay, e)
+                time.sleep(delay)
+    finally:
+        gate.release()
+
+
+async def _invoke_async(gate: ModelGate, create: Callable[..., Any], kwargs: dict,
+                        timeout: Optional[float], deadline: Optional[float]) -> Any:
+    """Async twin of _invoke; every wait is an await, never a blocking sleep."""
+    end = _deadline_at(timeout, deadline)
+    await gate.acquire_async(end)
+    try:
+        attempt = 0
+        while True:
+            wait = gate.rate_wait()
+            if wait:
+                if time.monotonic() + wait >= end:
+                    raise DeadlineExceeded(f"{gate.model}: rate limit wait exceeds deadline")
+                await asyncio.sleep(wait)
+            try:
+                return await create(**kwargs, timeout=attempt_timeout(timeout, end))
+            except Exception as e:
+                if attempt >= MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt, e)
+                if time.monotonic() + delay >= end:
+                    raise
+                attempt += 1
+                gate.note_retry()
+                logger.info("[GPT] %s retry %d/%d in %.2fs: %s",
+                            gate.model, attempt, MAX_RETRIES, delay, e)
+                await asyncio.sleep(delay)
+    finally:
+        gate.release()
+
+
+def _mini_kwargs(instructions: str, input: str, json_mode: bool, max_tokens: int) -> dict:
+    inst = instructions
+    if json_mode:
+        inst += "\n\nReturn ONLY valid JSON. No markdown, no explanation, no code fences."
+    return {
+        "model": MINI_MODEL,
+        "instructions": inst,
+        "input": input,
+        "max_output_tokens": max_tokens,
+    }
+
+
+def _heavy_kwargs(system: str, user: Union[str, list], temperature: float,
+                  max_tokens: int, json_mode: bool) -> dict:
+    kwargs = {
+        "model": HEAVY_MODEL,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+        "temperature": temperature,
+        "max_completion_tokens": max_tokens,
+    }
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
+
+
 # ── Mini tier (gpt-5-mini via responses API) ─────────────────────
 
 def mini(instructions: str, input: str, json_mode: bool = False,
-         max_tokens: int = 400, timeout: Optional[float] = None) -> Optional[str]:
+         max_tokens: int = 400, timeout: Optional[float] = None,
+         deadline: Optional[float] = None,
+         cache_ttl: Optional[float] = None) -> Optional[str]:
     """Sync call to gpt-5-mini via responses API.
 
     Args:
@@ -83,36 +227,38 @@ def mini(instructions: str, input: str, json_mode: bool = False,
         input: User message content.
         json_mode: If True, appends JSON-only instruction.
         max_tokens: Max output tokens.
-        timeout: Override default 30s timeout (e.g. 90 for large OCR prompts).
+        timeout: Per-attempt timeout (default GPT_TIMEOUT_S, e.g. 90 for large OCR prompts).
+        deadline: Total seconds for queueing + retries (default 2.5x timeout).
+        cache_ttl: Opt-in response cache lifetime in seconds (deterministic prompts only).
 
     Returns:
         Response text or None on failure.
     """
+    cache_key = None
+    if cache_ttl:
+        cache_key = response_cache.key(MINI_MODEL, instructions, input, json_mode, f"max={max_tokens}")
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("[GPT:mini] %s CACHE HIT", MINI_MODEL)
+            return cached
     t0 = time.monotonic()
     try:
         client = _get_sync()
-        inst = instructions
-        if json_mode:
-            inst += "\n\nReturn ONLY valid JSON. No markdown, no explanation, no code fences."
-        kwargs = {
-            "model": MINI_MODEL,
-            "instructions": inst,
-            "input": input,
-            "max_output_tokens": max_tokens,
-        }
-        if timeout:
-            kwargs["timeout"] = timeout
-        r = client.responses.create(**kwargs)
+        kwargs = _mini_kwargs(instructions, input, json_mode, max_tokens)
+        r = _invoke(_mini_gate, client.responses.create, kwargs, timeout, deadline)
         text = r.output_text if hasattr(r, "output_text") else ""
         result = text.strip() if text and text.strip() else None
         ms = int((time.monotonic() - t0) * 1000)
         in_tok, out_tok = _usage_tokens(r, "input_tokens", "output_tokens")
+        if cache_key and result:
+            response_cache.put(cache_key, result, MINI_MODEL, in_tok, out_tok, cache_ttl)
         log_ai_usage(model=MINI_MODEL, input_tokens=in_tok, output_tokens=out_tok,
                      latency_ms=ms, success=bool(result))
         logger.info("[GPT:mini] %s %dms %s", MINI_MODEL, ms, "OK" if result else "EMPTY")
         return result
     except Exception as e:
         ms = int((time.monotonic() - t0) * 1000)
+        _mini_gate.note_failure()
         log_ai_usage(model=MINI_MODEL, latency_ms=ms, success=False)
         logger.warning("[GPT:mini] %s %dms FAIL: %s", MINI_MODEL, ms, e)
         return None
@@ -120,33 +266,35 @@ def mini(instructions: str, input: str, json_mode: bool = False,
 
 async def mini_async(instructions: str, input: str, json_mode: bool = False,
                      max_tokens: int = 400,
-                     timeout: Optional[float] = None) -> Optional[str]:
+                     timeout: Optional[float] = None,
+                     deadline: Optional[float] = None,
+                     cache_ttl: Optional[float] = None) -> Optional[str]:
     """Async call to gpt-5-mini via responses API."""
+    cache_key = None
+    if cache_ttl:
+        cache_key = response_cache.key(MINI_MODEL, instructions, input, json_mode, f"max={max_tokens}")
+        cached = await response_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("[GPT:mini_async] %s CACHE HIT", MINI_MODEL)
+            return cached
     t0 = time.monotonic()
     try:
         client = _get_async()
-        inst = instructions
-        if json_mode:
-            inst += "\n\nReturn ONLY valid JSON. No markdown, no explanation, no code fences."
-        kwargs = {
-            "model": MINI_MODEL,
-            "instructions": inst,
-            "input": input,
-            "max_output_tokens": max_tokens,
-        }
-        if timeout:
-            kwargs["timeout"] = timeout
-        r = await client.responses.create(**kwargs)
+        kwargs = _mini_kwargs(instructions, input, json_mode, max_tokens)
+        r = await _invoke_async(_mini_gate, client.responses.create, kwargs, timeout, deadline)
         text = r.output_text if hasattr(r, "output_text") else ""
         result = text.strip() if text and text.strip() else None
         ms = int((time.monotonic() - t0) * 1000)
         in_tok, out_tok = _usage_tokens(r, "input_tokens", "output_tokens")
+        if cache_key and result:
+            await response_cache.put_async(cache_key, result, MINI_MODEL, in_tok, out_tok, cache_ttl)
         log_ai_usage_bg(model=MINI_MODEL, input_tokens=in_tok, output_tokens=out_tok,
                         latency_ms=ms, success=bool(result))
         logger.info("[GPT:mini_async] %s %dms %s", MINI_MODEL, ms, "OK" if result else "EMPTY")
         return result
     except Exception as e:
         ms = int((time.monotonic() - t0) * 1000)
+        _mini_gate.note_failure()
         log_ai_usage_bg(model=MINI_MODEL, latency_ms=ms, success=False)
         logger.warning("[GPT:mini_async] %s %dms FAIL: %s", MINI_MODEL, ms, e)
         return None
@@ -156,7 +304,9 @@ async def mini_async(instructions: str, input: str, json_mode: bool = False,
 
 def heavy(system: str, user: Union[str, list], temperature: float = 0.1,
           max_tokens: int = 500, json_mode: bool = False,
-          timeout: Optional[float] = None) -> Optional[str]:
+          timeout: Optional[float] = None,
+          deadline: Optional[float] = None,
+          cache_ttl: Optional[float] = None) -> Optional[str]:
     """Sync call to gpt-5.2 via chat.completions.
 
     Args:
@@ -165,33 +315,33 @@ def heavy(system: str, user: Union[str, list], temperature: float = 0.1,
         temperature: Sampling temperature (0.0-2.0).
         max_tokens: Max output tokens.
         json_mode: If True, uses response_format json_object.
-        timeout: Override default 30s timeout (e.g. 120 for Vision OCR).
+        timeout: Per-attempt timeout (default GPT_TIMEOUT_S, e.g. 120 for Vision OCR).
+        deadline: Total seconds for queueing + retries (default 2.5x timeout).
+        cache_ttl: Opt-in response cache lifetime in seconds (deterministic prompts only).
 
     Returns:
         Response text or None on failure.
     """
+    cache_key = None
+    if cache_ttl:
+        cache_key = response_cache.key(HEAVY_MODEL, system, user, json_mode,
+                                       f"max={max_tokens};t={temperature}")
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("[GPT:heavy] %s CACHE HIT", HEAVY_MODEL)
+            return cached
     t0 = time.monotonic()
     try:
         client = _get_sync()
-        kwargs = {
-            "model": HEAVY_MODEL,
-            "messages": [
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            "temperature": temperature,
-            "max_completion_tokens": max_tokens,
-        }
-        if json_mode:
-            kwargs["response_format"] = {"type": "json_object"}
-        if timeout:
-            kwargs["timeout"] = timeout
-        r = client.chat.completions.create(**kwargs)
+        kwargs = _heavy_kwargs(system, user, temperature, max_tokens, json_mode)
+        r = _invoke(_heavy_gate, client.chat.completions.create, kwargs, timeout, deadline)
         text = r.choices[0].message.content
         result = text.strip() if text and text.strip() else None
         ms = int((time.monotonic() - t0) * 1000)
         vision = isinstance(user, list)
         in_tok, out_tok = _usage_tokens(r, "prompt_tokens", "completion_tokens")
+        if cache_key and result:
+            response_cache.put(cache_key, result, HEAVY_MODEL, in_tok, out_tok, cache_ttl)
         log_ai_usage(model=HEAVY_MODEL, input_tokens=in_tok, output_tokens=out_tok,
                      latency_ms=ms, success=bool(result), source="vision" if vision else None)
         logger.info("[GPT:heavy] %s %dms %s%s", HEAVY_MODEL, ms,
@@ -199,6 +349,7 @@ def heavy(system: str, user: Union[str, list], temperature: float = 0.1,
         return result
     except Exception as e:
         ms = int((time.monotonic() - t0) * 1000)
+        _heavy_gate.note_failure()
         log_ai_usage(model=HEAVY_MODEL, latency_ms=ms, success=False)
         logger.warning("[GPT:heavy] %s %dms FAIL: %s", HEAVY_MODEL, ms, e)
         return None
@@ -207,30 +358,31 @@ def heavy(system: str, user: Union[str, list], temperature: float = 0.1,
 async def heavy_async(system: str, user: Union[str, list],
                       temperature: float = 0.1, max_tokens: int = 500,
                       json_mode: bool = False,
-                      timeout: Optional[float] = None) -> Optional[str]:
+                      timeout: Optional[float] = None,
+                      deadline: Optional[float] = None,
+                      cache_ttl: Optional[float] = None) -> Optional[str]:
     """Async call to gpt-5.2 via chat.completions."""
+    cache_key = None
+    if cache_ttl:
+        cache_key = response_cache.key(HEAVY_MODEL, system, user, json_mode,
+                                       f"max={max_tokens};t={temperature}")
+        cached = await response_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("[GPT:heavy_async] %s CACHE HIT", HEAVY_MODEL)
+            return cached
     t0 = time.monotonic()
     try:
         client = _get_async()
-        kwargs = {
-            "model": HEAVY_MODEL,
-            "messages": [
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            "temperature": temperature,
-            "max_completion_tokens": max_tokens,
-        }
-        if json_mode:
-            kwargs["response_format"] = {"type": "json_object"}
-        if timeout:
-            kwargs["timeout"] = timeout
-        r = await client.chat.completions.create(**kwargs)
+        kwargs = _heavy_kwargs(system, user, temperature, max_tokens, json_mode)
+        r = await _invoke_async(_heavy_gate, client.chat.completions.create, kwargs,
+                                timeout, deadline)
         text = r.choices[0].message.content
         result = text.strip() if text and text.strip() else None
         ms = int((time.monotonic() - t0) * 1000)
         vision = isinstance(user, list)
         in_tok, out_tok = _usage_tokens(r, "prompt_tokens", "completion_tokens")
+        if cache_key and result:
+            await response_cache.put_async(cache_key, result, HEAVY_MODEL, in_tok, out_tok, cache_ttl)
         log_ai_usage_bg(model=HEAVY_MODEL, input_tokens=in_tok, output_tokens=out_tok,
                         latency_ms=ms, success=bool(result), source="vision" if vision else None)
         logger.info("[GPT:heavy_async] %s %dms %s%s", HEAVY_MODEL, ms,
@@ -238,6 +390,7 @@ async def heavy_async(system: str, user: Union[str, list],
         return result
     except Exception as e:
         ms = int((time.monotonic() - t0) * 1000)
+        _heavy_gate.note_failure()
         log_ai_usage_bg(model=HEAVY_MODEL, latency_ms=ms, success=False)
         logger.warning("[GPT:heavy_async] %s %dms FAIL: %s", HEAVY_MODEL, ms, e)
         return None
@@ -246,13 +399,15 @@ async def heavy_async(system: str, user: Union[str, list],
 # ── Fallback pattern (mini -> heavy if low confidence) ───────────
 
 def with_fallback(instructions: str, input: str, min_confidence: float = 0.9,
-                  max_tokens: int = 400, temperature_heavy: float = 0.1) -> Optional[str]:
+                  max_tokens: int = 400, temperature_heavy: float = 0.1,
+                  cache_ttl: Optional[float] = None) -> Optional[str]:
     """Sync: Try mini first; if confidence < threshold, retry with heavy.
 
     The JSON response MUST contain a 'confidence' field (0.0-1.0).
     """
     # Step 1: Try mini
-    result_text = mini(instructions, input, json_mode=True, max_tokens=max_tokens)
+    result_text = mini(instructions, input, json_mode=True, max_tokens=max_tokens,
+                       cache_ttl=cache_ttl)
     if result_text:
         try:
             parsed = json.loads(result_text)
@@ -268,7 +423,7 @@ def with_fallback(instructions: str, input: str, min_confidence: float = 0.9,
     # Step 2: Fallback to heavy
     system = instructions + "\n\nReturn ONLY valid JSON. No markdown, no explanation."
     result_text = heavy(system, input, temperature=temperature_heavy,
-                        max_tokens=max_tokens, json_mode=True)
+                        max_tokens=max_tokens, json_mode=True, cache_ttl=cache_ttl)
     if result_text:
         logger.info("[GPT:fallback] heavy responded")
     return result_text
@@ -277,10 +432,12 @@ def with_fallback(instructions: str, input: str, min_confidence: float = 0.9,
 async def with_fallback_async(instructions: str, input: str,
                               min_confidence: float = 0.9,
                               max_tokens: int = 400,
-                              temperature_heavy: float = 0.1) -> Optional[str]:
+                              temperature_heavy: float = 0.1,
+                              cache_ttl: Optional[float] = None) -> Optional[str]:
     """Async: Try mini first; if confidence < threshold, retry with heavy."""
     # Step 1: Try mini
-    result_text = await mini_async(instructions, input, json_mode=True, max_tokens=max_tokens)
+    result_text = await mini_async(instructions, input, json_mode=True, max_tokens=max_tokens,
+                                   cache_ttl=cache_ttl)
     if result_text:
         try:
             parsed = json.loads(result_text)
@@ -296,7 +453,7 @@ async def with_fallback_async(instructions: str, input: str,
     # Step 2: Fallback to heavy
     system = instructions + "\n\nReturn ONLY valid JSON. No markdown, no explanation."
     result_text = await heavy_async(system, input, temperature=temperature_heavy,
-                                    max_tokens=max_tokens, json_mode=True)
+                                    max_tokens=max_tokens, json_mode=True, cache_ttl=cache_ttl)
     if result_text:
         logger.info("[GPT:fallback] heavy responded")
     return result_text
@@ -313,6 +470,8 @@ class _GPTNamespace:
     heavy_async = staticmethod(heavy_async)
     with_fallback = staticmethod(with_fallback)
     with_fallback_async = staticmethod(with_fallback_async)
+    stats = staticmethod(get_stats)
+    cache = response_cache
     MINI_MODEL = MINI_MODEL
     HEAVY_MODEL = HEAVY_MODEL
 
@@ -0,0 +1,294 @@
+# api/services/gpt_limits.py
+# ============================================================================
+# GPT call governance - concurrency, rate limiting, retries, deadlines
+# ============================================================================
+# Every mini/heavy call in gpt_client goes through a per-model ModelGate:
+#
+#   1. Token bucket   -> smooths bursts to the model's requests-per-minute.
+#   2. Semaphore      -> bounds in-flight calls per model (shared by sync
+#                        threads and async tasks; one process-wide budget).
+#   3. Retry policy   -> 429 / 5xx / timeouts / connection errors retried with
+#                        full-jitter exponential backoff, honoring Retry-After.
+#   4. Deadline       -> total wall-clock budget for queueing + all attempts;
+#                        each attempt's HTTP timeout is clipped to what's left.
+#
+# Limits are env-tunable (per model tier):
+#   GPT_MAX_CONCURRENCY_MINI / GPT_MAX_CONCURRENCY_HEAVY   (default 8 / 4)
+#   GPT_RPM_MINI / GPT_RPM_HEAVY                           (default 300 / 120)
+#   GPT_MAX_RETRIES                                        (default 3)
+#   GPT_TIMEOUT_S                                          (default 30)
+#
+# Live counters (in-flight, queued, retries, throttled) are exposed through
+# get_stats() and surfaced by GET /ai-usage/live.
+# ============================================================================
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.1, float(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+# ── Configuration ────────────────────────────────────────────────
+DEFAULT_TIMEOUT_S = _env_float("GPT_TIMEOUT_S", 30.0)
+MAX_RETRIES = _env_int("GPT_MAX_RETRIES", 3)
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 8.0
+_ASYNC_POLL_S = 0.05            # async waiters re-check the gate at this cadence
+
+# HTTP status codes worth retrying (throttled / transient upstream failures)
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call's total deadline runs out before it could complete."""
+
+
+# ── Token bucket ─────────────────────────────────────────────────
+
+class TokenBucket:
+    """Thread-safe token bucket. reserve() books a slot and returns how long
+    the caller must wait before using it (0 when a token is available)."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+# ── Per-model gate ───────────────────────────────────────────────
+
+class ModelGate:
+    """Concurrency cap + rate limit + counters for one model.
+
+    The slot counter is guarded by a threading.Condition so sync callers (in
+    worker threads) and async callers (on any event loop) share one budget.
+    Async waiters poll instead of blocking the loop.
+    """
+
+    def __init__(self, model: str, max_concurrency: int, rpm: int):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate_per_s=rpm / 60.0, capacity=max(1.0, rpm / 60.0 * 5))
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.deadline_exceeded = 0
+        self.failures = 0
+        self.loop_blocking = 0
+
+    # -- slots --
+
+    def _try_take(self) -> bool:
+        if self.in_flight < self.max_concurrency:
+            self.in_flight += 1
+            self.calls += 1
+            return True
+        return False
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now (never waits)."""
+        with self._cond:
+            return self._try_take()
+
+    def acquire(self, deadline: float) -> None:
+        with self._cond:
+            if self._try_take():
+                return
+            self.queued += 1
+            try:
+                while not self._try_take():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.deadline_exceeded += 1
+                        raise DeadlineExceeded(f"{self.model}: timed out waiting for a slot")
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+
+    async def acquire_async(self, deadline: float) -> None:
+        with self._cond:
+            if self._try_take():
+                return
+            self.queued += 1
+        try:
+            while True:
+                if time.monotonic() >= deadline:
+                    with self._cond:
+                        self.deadline_exceeded += 1
+                    raise DeadlineExceeded(f"{self.model}: timed out waiting for a slot")
+                await asyncio.sleep(_ASYNC_POLL_S)
+                with self._cond:
+                    if self._try_take():
+                        return
+        finally:
+            with self._cond:
+                self.queued -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify()
+
+    # -- rate limit --
+
+    def rate_wait(self) -> float:
+        wait = self.bucket.reserve()
+        if wait > 0:
+            with self._cond:
+                self.throttled += 1
+        return wait
+
+    # -- counters --
+
+    def note_retry(self) -> None:
+        with self._cond:
+            self.retries += 1
+
+    def note_failure(self) -> None:
+        with self._cond:
+            self.failures += 1
+
+    def note_loop_blocking(self) -> int:
+        with self._cond:
+            self.loop_blocking += 1
+            return self.loop_blocking
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "model": self.model,
+                "max_concurrency": self.max_concurrency,
+                "rpm": round(self.bucket.rate * 60),
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "deadline_exceeded": self.deadline_exceeded,
+                "failures": self.failures,
+                "loop_blocking_sync_calls": self.loop_blocking,
+            }
+
+
+_gates: Dict[str, ModelGate] = {}
+_gates_lock = threading.Lock()
+
+
+def register_model(model: str, tier: str, default_concurrency: int, default_rpm: int) -> ModelGate:
+    """Create (once) the gate for `model`, reading GPT_*_<TIER> env overrides."""
+    with _gates_lock:
+        gate = _gates.get(model)
+        if gate is None:
+            gate = ModelGate(
+                model,
+                max_concurrency=_env_int(f"GPT_MAX_CONCURRENCY_{tier.upper()}", default_concurrency),
+                rpm=_env_int(f"GPT_RPM_{tier.upper()}", default_rpm),
+            )
+            _gates[model] = gate
+        return gate
+
+
+def get_gate(model: str) -> ModelGate:
+    gate = _gates.get(model)
+    if gate is None:
+        gate = register_model(model, "default", 4, 120)
+    return gate
+
+
+def get_stats() -> Dict[str, dict]:
+    """Snapshot of every gate's counters, keyed by model."""
+    return {m: g.stats() for m, g in list(_gates.items())}
+
+
+# ── Retry policy ─────────────────────────────────────────────────
+
+def is_retryable(exc: Exception) -> bool:
+    """True for throttling, 5xx, timeouts and connection drops."""
+    try:
+        import openai
+    except ImportError:  # pragma: no cover - openai is a hard dependency
+        return False
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError,
+                        openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status in _RETRY_STATUS
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def backoff_delay(attempt: int, exc: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff; a server Retry-After wins when present."""
+    hinted = _retry_after(exc) if exc is not None else None
+    if hinted is not None and 0 <= hinted <= 60:
+        return hinted + random.uniform(0, BACKOFF_BASE_S)
+    return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def attempt_timeout(timeout: Optional[float], deadline: float) -> float:
+    """Per-attempt HTTP timeout: the caller's timeout, clipped to the deadline."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("call deadline exhausted")
+    return min(timeout or DEFAULT_TIMEOUT_S, remaining)
+
+
+def on_event_loop_thread() -> bool:
+    """True when the current thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
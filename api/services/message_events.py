@@ -0,0 +1,315 @@
+# api/services/message_events.py
+# ============================================================================
+# Real-time fan-out for the Messages module (feeds GET /messages/stream)
+# ============================================================================
+# Routers publish small JSON events; every open stream whose user is in the
+# audience receives them. Event types:
+#
+#   message   new message / thread reply        {channel_key, message}
+#   reaction  reactions changed on a message    {channel_key, message_id, reactions}
+#   unread    unread-count change               {channel_key, delta} | {channel_key, count}
+#   mention   the user was @mentioned           {channel_key, message_id, sender_name, preview}
+#   resync    the stream dropped events; refetch via REST
+#
+# Audience: a list of user_ids, or None for "every connected user" (project
+# channels and broadcasts without read_roles). Routers resolve it with
+# messages.get_channel_audience, which applies the read endpoints' rules;
+# only internal accounts can open a stream.
+#
+# Hubs (MESSAGE_EVENTS_BACKEND):
+#   local     (default) in-process; correct for a single worker
+#   postgres  publish = pg_notify on SUPABASE_DB_URL, every worker LISTENs and
+#             delivers to its own streams. Falls back to local delivery if the
+#             connection cannot be made.
+#
+# Backpressure: each stream owns a bounded queue (MESSAGE_STREAM_QUEUE). A
+# slow consumer that fills it loses the queued events and receives a single
+# `resync` instead, so one stuck tab never grows memory or blocks publishers.
+#
+# publish() is thread-safe: the sync (threadpool) endpoints call it directly.
+# ============================================================================
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.getenv("MESSAGE_EVENTS_BACKEND", "local").strip().lower()
+QUEUE_SIZE = int(os.getenv("MESSAGE_STREAM_QUEUE", "100"))
+HEARTBEAT_S = float(os.getenv("MESSAGE_STREAM_HEARTBEAT_S", "20"))
+MAX_STREAMS_PER_USER = int(os.getenv("MESSAGE_STREAM_MAX_PER_USER", "10"))
+
+PG_CHANNEL = "ngm_message_events"
+# NOTIFY payloads are capped at 8000 bytes; larger events go out slimmed
+# (message body dropped) and clients refetch the message.
+_PG_PAYLOAD_MAX = 7500
+_PG_RECONNECT_S = 30
+
+
+class Subscription:
+    """One open stream: a bounded event queue owned by the hub's loop."""
+
+    def __init__(self, user_id: str, max_queue: int = QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.connected_at = time.time()
+        self.delivered = 0
+        self.overflows = 0
+
+    def offer(self, event: dict) -> None:
+        """Enqueue without blocking; on overflow replace the backlog with a resync."""
+        try:
+            self.queue.put_nowait(event)
+            self.delivered += 1
+            return
+        except asyncio.QueueFull:
+            pass
+        self.overflows += 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"type": "resync", "reason": "overflow"})
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """Next event, or None after `timeout` seconds (time for a heartbeat)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalHub:
+    """In-process fan-out: user_id -> open subscriptions."""
+
+    name = "local"
+
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+
+    # -- lifecycle --
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self) -> None:
+        with self._lock:
+            subs = [s for group in self._subs.values() for s in group]
+        for sub in subs:
+            sub.offer({"type": "resync", "reason": "shutdown"})
+
+    # -- subscribers --
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Register a stream; None when the user already has too many open."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        with self._lock:
+            group = self._subs.setdefault(user_id, set())
+            if len(group) >= MAX_STREAMS_PER_USER:
+                return None
+            sub = Subscription(user_id)
+            group.add(sub)
+            return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            group = self._subs.get(sub.user_id)
+            if group is not None:
+                group.discard(sub)
+                if not group:
+                    del self._subs[sub.user_id]
+
+    def has_listeners(self) -> bool:
+        """Whether a publish can reach any stream (lets callers skip lookups)."""
+        with self._lock:
+            return bool(self._subs)
+
+    # -- fan-out --
+
+    def publish(self, event: dict, user_ids: Optional[Iterable[str]] = None,
+                exclude: Optional[str] = None) -> None:
+        """Send `event` to `user_ids` (None = everyone connected) minus `exclude`."""
+        targets = None if user_ids is None else [str(u) for u in user_ids if u and str(u) != exclude]
+        if targets is not None and not targets:
+            return
+        self.published += 1
+        self._dispatch(event, targets, exclude)
+
+    def _dispatch(self, event: dict, targets: Optional[List[str]], exclude: Optional[str]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._deliver, event, targets, exclude)
+        except RuntimeError:  # loop shutting down
+            pass
+
+    def _deliver(self, event: dict, targets: Optional[List[str]], exclude: Optional[str] = None) -> None:
+        with self._lock:
+            if targets is None:
+                subs = [s for uid, group in self._subs.items() if uid != exclude for s in group]
+            else:
+                subs = [s for uid in targets for s in self._subs.get(uid, ())]
+        for sub in subs:
+            sub.offer(event)
+        self.delivered += len(subs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            streams = sum(len(g) for g in self._subs.values())
+            users = len(self._subs)
+            overflows = sum(s.overflows for g in self._subs.values() for s in g)
+        return {
+            "backend": self.name,
+            "users": users,
+            "streams": streams,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": overflows,
+        }
+
+
+class PostgresHub(LocalHub):
+    """LISTEN/NOTIFY fan-out so every worker sees every worker's events."""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self._dsn = dsn
+        self._listen_conn = None
+        self._notify_conn = None
+        self._notify_lock: Optional[asyncio.Lock] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self.notify_failures = 0
+
+    async def start(self) -> None:
+        await super().start()
+        self._notify_lock = asyncio.Lock()
+        await self._connect()
+        self._watch_task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        try:
+            self._listen_conn = await asyncpg.connect(self._dsn)
+            await self._listen_conn.add_listener(PG_CHANNEL, self._on_notify)
+            self._notify_conn = await asyncpg.connect(self._dsn)
+            logger.info("[MessageEvents] listening on %s", PG_CHANNEL)
+        except Exception as exc:
+            logger.warning("[MessageEvents] LISTEN setup failed, delivering locally: %s", exc)
+            await self._close()
+
+    async def _close(self) -> None:
+        for conn in (self._listen_conn, self._notify_conn):
+            if conn is not None:
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+        self._listen_conn = self._notify_conn = None
+
+    @property
+    def connected(self) -> bool:
+        return (self._listen_conn is not None and not self._listen_conn.is_closed()
+                and self._notify_conn is not None and not self._notify_conn.is_closed())
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(_PG_RECONNECT_S)
+            if not self.connected:
+                await self._close()
+                await self._connect()
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        await super().stop()
+        await self._close()
+
+    def has_listeners(self) -> bool:
+        return self.connected or super().has_listeners()
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+        self._deliver(data.get("event") or {}, data.get("to"), data.get("exclude"))
+
+    def _dispatch(self, event: dict, targets: Optional[List[str]], exclude: Optional[str]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if not self.connected:
+            super()._dispatch(event, targets, exclude)
+            return
+        envelope = {"event": event, "to": targets, "exclude": exclude}
+        payload = json.dumps(envelope, default=str)
+        if len(payload) > _PG_PAYLOAD_MAX:
+            slim = {k: v for k, v in event.items() if k not in ("message", "reactions", "preview")}
+            slim["partial"] = True
+            payload = json.dumps(dict(envelope, event=slim), default=str)
+        try:
+            asyncio.run_coroutine_threadsafe(self._notify(payload, event, targets, exclude), loop)
+        except RuntimeError:
+            pass
+
+    async def _notify(self, payload: str, event: dict, targets: Optional[List[str]],
+                      exclude: Optional[str]) -> None:
+        try:
+            async with self._notify_lock:
+                await self._notify_conn.execute("SELECT pg_notify($1, $2)", PG_CHANNEL, payload)
+        except Exception as exc:
+            self.notify_failures += 1
+            logger.warning("[MessageEvents] pg_notify failed, delivering locally: %s", exc)
+            self._deliver(event, targets, exclude)
+
+    def stats(self) -> dict:
+        out = super().stats()
+        out["connected"] = self.connected
+        out["notify_failures"] = self.notify_failures
+        return out
+
+
+def _make_hub() -> LocalHub:
+    if BACKEND == "postgres":
+        dsn = os.getenv("SUPABASE_DB_URL")
+        if dsn:
+            return PostgresHub(dsn)
+        logger.warning("[MessageEvents] MESSAGE_EVENTS_BACKEND=postgres but SUPABASE_DB_URL unset; using local hub")
+    return LocalHub()
+
+
+hub: LocalHub = _make_hub()
+
+
+def publish(event: dict, user_ids: Optional[Iterable[str]] = None,
+            exclude: Optional[str] = None) -> None:
+    """Module-level shortcut used by the routers. Never raises."""
+    try:
+        hub.publish(event, user_ids, exclude)
+    except Exception as exc:
+        logger.debug("[MessageEvents] publish failed: %s", exc)
+
+
+async def start() -> None:
+    await hub.start()
+
+
+async def stop() -> None:
+    await hub.stop()
+
+
+def get_stats() -> dict:
+    return hub.stats()
@@ -0,0 +1,199 @@
+# api/services/my_work_projection.py
+# ============================================================================
+# "My Work" feed reads for /pipeline/my-work/*
+# ============================================================================
+# my_work_items (sql/my_work_items.sql) holds one row per (user, open task)
+# the user works on, as owner or manager, maintained by a trigger on tasks.
+# Every task write (create, patch, start, approve, reject, duties, scheduler)
+# goes through that trigger, so the feed is one primary-key read instead of
+# three tasks queries plus status/project/priority/type lookups per page load.
+#
+#   user_items(uid)  -> [task row + "_role"] for one user
+#   owner_items()    -> {owner_id: [task row]} for the team overview
+#
+# Both return None when the projection can't be read (migration not applied
+# yet), and callers fall back to the live tasks queries (live_user_items /
+# live_owner_items). Names are resolved from pipeline_lookups in enrich().
+# ============================================================================
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from api.services.pipeline_lookups import get_lookups
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUS_NAMES = ("not started", "working on it")
+DEFAULT_TASK_HOURS = 2.0
+_PAGE_SIZE = 1000  # PostgREST max rows per select
+
+_stats: Dict[str, int] = {"projection_reads": 0, "live_reads": 0, "fallbacks": 0}
+
+
+def active_status_ids() -> List[str]:
+    lk = get_lookups()
+    by_name = {(s.get("task_status") or "").lower(): s["task_status_id"] for s in lk["statuses"]}
+    return [by_name[n] for n in ACTIVE_STATUS_NAMES if n in by_name]
+
+
+def _sort_by_deadline(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Deadline ascending, tasks without a deadline last.
+    return sorted(tasks, key=lambda t: (t.get("deadline") is None, t.get("deadline") or ""))
+
+
+# ====================================================================
+# Projection reads
+# ====================================================================
+
+def user_items(user_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Open tasks for one user from my_work_items, or None if unavailable."""
+    try:
+        rows = (
+            supabase.table("my_work_items").select("role, task")
+            .eq("user_id", user_id).execute().data or []
+        )
+    except Exception as e:
+        _stats["fallbacks"] += 1
+        logger.warning("[MY-WORK] projection read failed, using live tasks: %s", e)
+        return None
+    _stats["projection_reads"] += 1
+    tasks = []
+    for r in rows:
+        task = dict(r.get("task") or {})
+        if task.get("task_id"):
+            task["_role"] = r.get("role") or "owner"
+            tasks.append(task)
+    return _sort_by_deadline(tasks)
+
+
+def owner_items() -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """Open tasks grouped by owner from my_work_items, or None if unavailable.
+    Paged: it covers every owner, well past the 1000-row cap."""
+    rows: List[Dict[str, Any]] = []
+    try:
+        offset = 0
+        while True:
+            batch = (
+                supabase.table("my_work_items").select("user_id, task")
+                .eq("role", "owner").order("user_id").order("task_id")
+                .range(offset, offset + _PAGE_SIZE - 1).execute().data or []
+            )
+            rows.extend(batch)
+            if len(batch) < _PAGE_SIZE:
+                break
+            offset += _PAGE_SIZE
+    except Exception as e:
+        _stats["fallbacks"] += 1
+        logger.warning("[MY-WORK] projection read failed, using live tasks: %s", e)
+        return None
+    _stats["projection_reads"] += 1
+    by_owner: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        by_owner.setdefault(r.get("user_id"), []).append(r.get("task") or {})
+    return by_owner
+
+
+# ====================================================================
+# Live fallbacks (pre-projection behaviour)
+# ====================================================================
+
+def live_user_items(user_id: str) -> List[Dict[str, Any]]:
+    """Owner + manager (managers_ids[] or legacy manager) open tasks straight
+    from tasks. Owner wins the role label when both match."""
+    _stats["live_reads"] += 1
+    status_ids = active_status_ids()
+    if not status_ids:
+        return []
+    tasks_by_id: Dict[str, Dict[str, Any]] = {}
+
+    def collect(query_builder, role: str) -> None:
+        try:
+            rows = query_builder.in_("task_status", status_ids).execute().data or []
+        except Exception as exc:  # missing column on older DBs, etc.
+            logger.debug("[MY-WORK] query (%s) skipped: %s", role, exc)
+            return
+        for row in rows:
+            tid = row.get("task_id")
+            if tid and tid not in tasks_by_id:
+                row["_role"] = role
+                tasks_by_id[tid] = row
+
+    collect(supabase.table("tasks").select("*").eq("Owner_id", user_id), "owner")
+    collect(supabase.table("tasks").select("*").contains("managers_ids", [user_id]), "manager")
+    collect(supabase.table("tasks").select("*").eq("manager", user_id), "manager")
+    return _sort_by_deadline(list(tasks_by_id.values()))
+
+
+def live_owner_items() -> Dict[str, List[Dict[str, Any]]]:
+    _stats["live_reads"] += 1
+    status_ids = active_status_ids()
+    if not status_ids:
+        return {}
+    rows = (
+        supabase.table("tasks").select("task_id, Owner_id, estimated_hours, deadline, due_date")
+        .in_("task_status", status_ids).execute().data or []
+    )
+    by_owner: Dict[str, List[Dict[str, Any]]] = {}
+    for t in rows:
+        if t.get("Owner_id"):
+            by_owner.setdefault(t["Owner_id"], []).append(t)
+    return by_owner
+
+
+# ====================================================================
+# Read-time fields
+# ====================================================================
+
+def deadline_flags(task: Dict[str, Any], today: date) -> Dict[str, bool]:
+    """is_overdue / is_due_soon (within 7 days) from deadline, else due_date.
+    Computed per read so the projection never goes stale at midnight."""
+    deadline_str = task.get("deadline") or task.get("due_date")
+    flags = {"is_overdue": False, "is_due_soon": False}
+    if deadline_str:
+        try:
+            deadline_date = datetime.fromisoformat(str(deadline_str).replace("Z", "")).date()
+            if deadline_date < today:
+                flags["is_overdue"] = True
+            elif deadline_date <= today + timedelta(days=7):
+                flags["is_due_soon"] = True
+        except Exception as exc:
+            logger.debug("Suppressed: %s", exc)
+    return flags
+
+
+def enrich(task: Dict[str, Any], lk: Dict[str, Any], today: date) -> Dict[str, Any]:
+    """One My Work item (the shape /pipeline/my-work/{user_id} returns)."""
+    project_id = task.get("project_id")
+    priority_id = task.get("task_priority")
+    status_id = task.get("task_status")
+    type_id = task.get("task_type")
+    type_name = (lk["types"].get(type_id) or {}).get("type_name", "")
+    task_notes = task.get("task_notes") or ""
+    return {
+        "task_id": task.get("task_id"),
+        "task_description": task.get("task_description"),
+        "project_id": project_id,
+        "project_name": (lk["projects"].get(project_id) or {}).get("project_name"),
+        "priority_id": priority_id,
+        "priority_name": (lk["priorities"].get(priority_id) or {}).get("priority"),
+        "status_id": status_id,
+        "status_name": lk["status_names"].get(status_id),
+        "type_id": type_id,
+        "type_name": type_name,
+        "role": task.get("_role", "owner"),  # owner | manager
+        "is_automated": "[AUTOMATED]" in task_notes or type_name.lower() == "automated",
+        "due_date": task.get("due_date"),
+        "deadline": task.get("deadline"),
+        "estimated_hours": task.get("estimated_hours") or DEFAULT_TASK_HOURS,
+        "time_start": task.get("time_start"),
+        **deadline_flags(task, today),
+        "created_at": task.get("created_at"),
+        "canvas_x": task.get("canvas_x"),
+        "canvas_y": task.get("canvas_y"),
+    }
+
+
+def stats() -> Dict[str, int]:
+    return dict(_stats)
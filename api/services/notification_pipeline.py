@@ -0,0 +1,188 @@
+# api/services/notification_pipeline.py
+# ============================================================================
+# Background fan-out pipeline for push notifications
+# ============================================================================
+# Message posts used to resolve recipients, look up tokens and call FCM in a
+# per-request BackgroundTask. Jobs now go onto one bounded queue drained by a
+# few long-lived workers, so a post to a large group returns immediately and
+# a burst of posts cannot pile up unbounded FCM work.
+#
+#   submit(fn, *args, **kw)  -> O(1), thread-safe (sync endpoints call it from
+#                               the threadpool); False when the queue is full
+#   workers                  -> NOTIFY_WORKERS coroutines awaiting fn(*args)
+#   record(kind, ref, stats) -> per-message delivery stats (last NOTIFY_STATS_KEEP
+#                               kept in memory, totals since start)
+#   shutdown                 -> stop() drains what is queued, bounded by a timeout
+#
+# Outside the server (scripts) no workers run and submit() executes the job
+# inline.
+#
+# Config: NOTIFY_WORKERS (2), NOTIFY_QUEUE_MAX (1000), NOTIFY_STATS_KEEP (200)
+# ============================================================================
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("NOTIFY_WORKERS", "2"))
+MAX_QUEUE = int(os.getenv("NOTIFY_QUEUE_MAX", "1000"))
+STATS_KEEP = int(os.getenv("NOTIFY_STATS_KEEP", "200"))
+_DRAIN_TIMEOUT_S = 10
+
+_COUNTERS = ("recipients", "tokens", "sent", "failed", "invalid_pruned")
+
+
+class NotificationPipeline:
+    """Bounded job queue + worker pool + delivery stats."""
+
+    def __init__(self, workers: int = WORKERS, max_queue: int = MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._lock = threading.Lock()
+        self.recent: deque = deque(maxlen=STATS_KEEP)
+        self.totals: Dict[str, int] = {k: 0 for k in _COUNTERS}
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+
+    # -- producer side --
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> bool:
+        """Queue `await fn(*args, **kwargs)`. Never raises."""
+        job = (fn, args, kwargs, time.monotonic())
+        if not self.running:
+            return self._run_inline(job)
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, job)
+        except RuntimeError:  # loop closed
+            return self._run_inline(job)
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _enqueue(self, job) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            with self._lock:
+                self.rejected += 1
+            logger.warning("[NotifyPipeline] queue full (%d), dropping %s",
+                           self.max_queue, getattr(job[0], "__name__", job[0]))
+
+    def _run_inline(self, job) -> bool:
+        fn, args, kwargs, _ = job
+        try:
+            asyncio.get_running_loop().create_task(fn(*args, **kwargs))
+        except RuntimeError:
+            try:
+                asyncio.run(fn(*args, **kwargs))
+            except Exception as exc:
+                logger.warning("[NotifyPipeline] inline job failed: %s", exc)
+                return False
+        return True
+
+    # -- consumer side --
+
+    async def _worker(self) -> None:
+        while True:
+            fn, args, kwargs, queued_at = await self._queue.get()
+            try:
+                await fn(*args, **kwargs)
+                with self._lock:
+                    self.completed += 1
+            except Exception as exc:  # noqa: BLE001 — one bad job must not kill a worker
+                with self._lock:
+                    self.errors += 1
+                logger.warning("[NotifyPipeline] %s failed after %.0fms in queue: %s",
+                               getattr(fn, "__name__", fn), (time.monotonic() - queued_at) * 1000, exc)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), _DRAIN_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logger.warning("[NotifyPipeline] %d jobs still queued at shutdown", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -- delivery stats --
+
+    def record(self, kind: str, ref_id: Optional[str], delivery: Dict[str, dict]) -> dict:
+        """Store one fan-out's stats ({phase: send_push_to_users stats})."""
+        entry: Dict[str, Any] = {"kind": kind, "ref_id": ref_id, "at": time.time()}
+        for k in _COUNTERS + ("ms",):
+            entry[k] = sum(int(s.get(k) or 0) for s in delivery.values())
+        entry["phases"] = {
+            phase: {k: s.get(k) for k in _COUNTERS + ("ms",)} for phase, s in delivery.items()
+        }
+        with self._lock:
+            self.recent.append(entry)
+            for k in _COUNTERS:
+                self.totals[k] += entry[k]
+        return entry
+
+    def stats(self, recent: int = 20) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "workers": len(self._tasks),
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "totals": dict(self.totals),
+                # [-0:] would be the whole list
+                "recent": list(self.recent)[-recent:][::-1] if recent > 0 else [],
+            }
+
+
+pipeline = NotificationPipeline()
+
+
+def submit(fn: Callable, *args, **kwargs) -> bool:
+    return pipeline.submit(fn, *args, **kwargs)
+
+
+def record(kind: str, ref_id: Optional[str], delivery: Dict[str, dict]) -> dict:
+    return pipeline.record(kind, ref_id, delivery)
+
+
+def start() -> None:
+    """Start the workers (call from app startup)."""
+    pipeline.start()
+
+
+async def stop() -> None:
+    """Drain and stop the workers (call from app shutdown)."""
+    await pipeline.stop()
+
+
+def get_stats(recent: int = 20) -> dict:
+    return pipeline.stats(recent)
@@ -32,6 +32,49 @@ def _resolve_name(user_id: Optional[str]) -> Optional[str]:
         return None
 
 
+def _build_rows(
+    recipient_ids: Iterable[str],
+    *,
+    type: str,
+    module: str,
+    actor_id: Optional[str] = None,
+    actor_name: Optional[str] = None,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[str] = None,
+    deep_link: Optional[str] = None,
+    preview: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """One notifications row per recipient (skipping the actor / blanks / dupes)."""
+    actor = str(actor_id) if actor_id else None
+    seen = set()
+    targets: List[str] = []
+    for rid in (recipient_ids or []):
+        rid = str(rid).strip()
+        if not rid or rid == actor or rid in seen:
+            continue
+        seen.add(rid)
+        targets.append(rid)
+    if not targets:
+        return []
+
+    if actor_name is None and actor:
+        actor_name = _resolve_name(actor)
+
+    return [{
+        "user_id": rid,
+        "type": type,
+        "module": module,
+        "reference_type": reference_type,
+        "reference_id": str(reference_id) if reference_id else None,
+        "deep_link": deep_link,
+        "preview": (preview or "")[:280] or None,
+        "actor_id": actor,
+        "actor_name": actor_name,
+        "context": context or {},
+    } for rid in targets]
+
+
 def create_notifications(
     recipient_ids: Iterable[str],
     *,
@@ -50,38 +93,38 @@ def create_notifications(
     Returns the number of rows inserted. Never raises.
     """
     try:
-        actor = str(actor_id) if actor_id else None
-        seen = set()
-        targets: List[str] = []
-        for rid in (recipient_ids or []):
-            rid = str(rid).strip()
-            if not rid or rid == actor or rid in seen:
-                continue
-            seen.add(rid)
-            targets.append(rid)
-        if not targets:
+        rows = _build_rows(
+            recipient_ids, type=type, module=module, actor_id=actor_id,
+            actor_name=actor_name, reference_type=reference_type,
+            reference_id=reference_id, deep_link=deep_link, preview=preview,
+            context=context,
+        )
+        if not rows:
             return 0
+        supabase.table("notifications").insert(rows).execute()
+        return len(rows)
+    except Exception as e:
+        logger.debug("[Notifications] create failed (non-blocking): %s", e)
+        return 0
 
-        if actor_name is None and actor:
-            actor_name = _resolve_name(actor)
-
-        rows = [{
-            "user_id": rid,
-            "type": type,
-            "module": module,
-            "reference_type": reference_type,
-            "reference_id": str(reference_id) if reference_id else None,
-            "deep_link": deep_link,
-            "preview": (preview or "")[:280] or None,
-            "actor_id": actor,
-            "actor_name": actor_name,
-            "context": context or {},
-        } for rid in targets]
 
+def create_notifications_batch(items: Iterable[Dict[str, Any]]) -> int:
+    """Several create_notifications() calls in one insert.
+
+    Each item is {"recipient_ids": [...], **create_notifications kwargs}.
+    Returns the number of rows inserted. Never raises.
+    """
+    try:
+        rows: List[Dict[str, Any]] = []
+        for item in items:
+            kwargs = dict(item)
+            rows.extend(_build_rows(kwargs.pop("recipient_ids", None) or [], **kwargs))
+        if not rows:
+            return 0
         supabase.table("notifications").insert(rows).execute()
         return len(rows)
     except Exception as e:
-        logger.debug("[Notifications] create failed (non-blocking): %s", e)
+        logger.debug("[Notifications] batch create failed (non-blocking): %s", e)
         return 0
 
 
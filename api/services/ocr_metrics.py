@@ -1,6 +1,7 @@
 """
 Shared OCR metrics logger.
-Inserts one row per scan into the `ocr_metrics` table.
+Queues one row per scan for the `ocr_metrics` table; rows are bulk-inserted by
+the shared telemetry buffer (api/services/telemetry_buffer.py).
 
 Usage (from any service):
     from api.services.ocr_metrics import log_ocr_metric
@@ -28,10 +29,12 @@ import time
 from typing import Optional
 from contextlib import contextmanager
 
-from api.supabase_client import supabase
+from api.services.telemetry_buffer import get_buffer
 
 logger = logging.getLogger(__name__)
 
+_buffer = get_buffer("ocr_metrics")
+
 
 def log_ocr_metric(
     agent: str,
@@ -52,7 +55,7 @@ def log_ocr_metric(
     receipt_url: Optional[str] = None,
     metadata: Optional[dict] = None,
 ):
-    """Insert a single OCR metric row. Fire-and-forget (never raises)."""
+    """Queue a single OCR metric row for the batched writer (never raises)."""
     try:
         row = {
             "agent": agent,
@@ -89,8 +92,8 @@ def log_ocr_metric(
         if metadata is not None:
             row["metadata"] = metadata
 
-        supabase.table("ocr_metrics").insert(row).execute()
-        logger.info(f"[OCR Metrics] {agent}/{extraction_method} logged")
+        _buffer.enqueue(row)
+        logger.info(f"[OCR Metrics] {agent}/{extraction_method} queued")
     except Exception as exc:
         logger.warning(f"[OCR Metrics] Failed to log: {exc}")
 
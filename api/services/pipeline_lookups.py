@@ -0,0 +1,122 @@
+# api/services/pipeline_lookups.py
+# ================================
+# Shared lookup tables for Pipeline task enrichment
+# ================================
+# Every board / my-work / workload read used to re-select statuses, users,
+# projects, companies, priorities, completed statuses and task types to turn ids
+# into names. They change rarely, so they are loaded together once per
+# PIPELINE_LOOKUP_TTL_S (default 120s) per process and shared by all
+# readers. The project, user and company endpoints call invalidate() after a
+# write; lookups_for(tasks) also reloads (at most every
+# PIPELINE_LOOKUP_MISS_RELOAD_S, default 5s) when tasks reference a status,
+# user or project the snapshot doesn't have yet, which covers rows written
+# by another worker or outside the API.
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+_TTL = int(os.getenv("PIPELINE_LOOKUP_TTL_S", "120"))
+_MISS_RELOAD_S = float(os.getenv("PIPELINE_LOOKUP_MISS_RELOAD_S", "5"))
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {"ts": 0.0, "data": None}
+
+
+def _is_closed_status(name: Optional[str]) -> bool:
+    n = (name or "").lower()
+    return "done" in n or "complete" in n
+
+
+def _load() -> Dict[str, Any]:
+    statuses = (
+        supabase.table("tasks_status").select("task_status_id, task_status")
+        .order("task_status").execute().data or []
+    )
+    users = supabase.table("users").select("user_id, user_name, avatar_color, user_photo").execute().data or []
+    projects = supabase.table("projects").select("project_id, project_name").execute().data or []
+    companies = supabase.table("companies").select("id, name").execute().data or []
+    priorities = supabase.table("tasks_priority").select("priority_id, priority").execute().data or []
+    completed = (
+        supabase.table("task_completed_status").select("completed_status_id, completed_status")
+        .execute().data or []
+    )
+    types = supabase.table("task_types").select("type_id, type_name").execute().data or []
+    return {
+        "statuses": statuses,
+        "status_names": {s["task_status_id"]: s["task_status"] for s in statuses},
+        "closed_status_ids": [s["task_status_id"] for s in statuses if _is_closed_status(s.get("task_status"))],
+        "users": {u["user_id"]: u for u in users},
+        "projects": {p["project_id"]: p for p in projects},
+        "companies": {c["id"]: c for c in companies},
+        "priorities": {p["priority_id"]: p for p in priorities},
+        "completed": {c["completed_status_id"]: c for c in completed},
+        "types": {t["type_id"]: t for t in types},
+    }
+
+
+def get_lookups() -> Dict[str, Any]:
+    """All lookup maps (see _load). Refreshed at most once per TTL."""
+    now = time.time()
+    data = _cache["data"]
+    if data is not None and now - _cache["ts"] < _TTL:
+        return data
+    with _lock:
+        if _cache["data"] is not None and time.time() - _cache["ts"] < _TTL:
+            return _cache["data"]
+        try:
+            data = _load()
+        except Exception as e:
+            if _cache["data"] is None:
+                raise
+            # Serve the previous snapshot rather than failing the board.
+            logger.warning("[PipelineLookups] refresh failed, serving stale: %s", e)
+            return _cache["data"]
+        _cache["data"] = data
+        _cache["ts"] = time.time()
+        return data
+
+
+def invalidate() -> None:
+    """Force the next get_lookups() to reload."""
+    _cache["ts"] = 0.0
+
+
+def _references_missing(lk: Dict[str, Any], tasks: List[Dict[str, Any]]) -> bool:
+    for t in tasks:
+        sid, owner, pid = t.get("task_status"), t.get("Owner_id"), t.get("project_id")
+        if (sid and sid not in lk["status_names"]) or (owner and owner not in lk["users"]) \
+                or (pid and pid not in lk["projects"]):
+            return True
+    return False
+
+
+def lookups_for(tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """get_lookups(), reloaded first when `tasks` reference a status, user or
+    project missing from the snapshot. Rate-limited, so a dangling id can't
+    force a reload on every request."""
+    lk = get_lookups()
+    if _references_missing(lk, tasks) and time.time() - _cache["ts"] >= _MISS_RELOAD_S:
+        invalidate()
+        lk = get_lookups()
+    return lk
+
+
+def closed_status_ids() -> List[str]:
+    return list(get_lookups()["closed_status_ids"])
+
+
+def stats() -> Dict[str, Any]:
+    data = _cache["data"]
+    return {
+        "loaded": data is not None,
+        "age_s": round(time.time() - _cache["ts"], 1) if data is not None else None,
+        "users": len(data["users"]) if data else 0,
+        "projects": len(data["projects"]) if data else 0,
+    }
@@ -10,16 +10,25 @@ Supports the subset used by the calendar module:
 
 Public API:
     parse_rrule(text)                    -> dict | None
+    with_until(rule, until)              -> rule with UNTIL tightened
+    iter_occurrences(rule, master_start, window_start=None, window_end=None)
+                                         -> lazy iterator of datetimes
     expand_occurrences(rule, master_start, window_start, window_end) -> list[datetime]
+    next_occurrence(rule, master_start, after, horizon_days=60) -> datetime | None
 
 All datetimes are timezone-aware (UTC). The caller passes tz-aware Pythons in,
-and gets tz-aware Pythons back. Cap of 366 occurrences applied to bound work.
+and gets tz-aware Pythons back. Expansion jumps straight to the requested
+window (O(occurrences in window), not O(age of the series)); expand_occurrences
+caps its list at 366 occurrences.
+
+benchmarks/rrule_check.py cross-checks the expander against dateutil.rrule.
 """
 from __future__ import annotations
 
 import re
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
 
 _WEEKDAY_TO_NUM = {"SU": 6, "MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5}
 # In Python, weekday() returns 0=Mon..6=Sun. We use that consistently.
@@ -78,100 +87,129 @@ def parse_rrule(text: Optional[str]) -> Optional[Dict[str, Any]]:
     return {"freq": freq, "interval": interval, "byday": byday, "until": until, "count": count}
 
 
-def expand_occurrences(
+def with_until(rule: Optional[Dict[str, Any]], until: Optional[datetime]) -> Optional[Dict[str, Any]]:
+    """Tighten the rule's UNTIL with an external bound (calendar_events.rrule_until)."""
+    if not rule or until is None:
+        return rule
+    if rule.get("until") is None or until < rule["until"]:
+        return {**rule, "until": until}
+    return rule
+
+
+def iter_occurrences(
     rule: Dict[str, Any],
     master_start: datetime,
-    window_start: datetime,
-    window_end: datetime,
-) -> List[datetime]:
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None,
+) -> Iterator[datetime]:
+    """Yield occurrences in [window_start, window_end] in order, lazily.
+
+    Jumps straight to the window arithmetically instead of stepping from
+    master_start, so cost depends on the window, not on the series' age.
+    COUNT counts from master_start (RFC 5545), UNTIL is inclusive. With no
+    window_end the iterator runs until UNTIL / COUNT ends the series (or
+    forever) — bound it with islice or a break.
+    """
     if not rule:
-        return []
-    if window_end < window_start:
-        return []
-    if master_start.tzinfo is None or window_start.tzinfo is None or window_end.tzinfo is None:
-        raise ValueError("expand_occurrences requires tz-aware datetimes")
+        return
+    for dt in (master_start, window_start, window_end):
+        if dt is not None and dt.tzinfo is None:
+            raise ValueError("iter_occurrences requires tz-aware datetimes")
 
-    out: List[datetime] = []
-    limit = min(_HARD_CAP, rule.get("count") or _HARD_CAP)
-    until_cap = window_end
+    end = window_end
     rule_until = rule.get("until")
-    if rule_until is not None and rule_until < until_cap:
-        until_cap = rule_until
-
-    interval = int(rule.get("interval") or 1)
-    freq = rule["freq"]
+    if rule_until is not None and (end is None or rule_until < end):
+        end = rule_until
+    start = window_start if window_start is not None and window_start > master_start else master_start
+    if end is not None and end < start:
+        return
 
-    def push(dt: datetime) -> None:
-        if dt >= window_start and dt <= until_cap:
-            out.append(dt)
+    count = rule.get("count")
+    interval = max(1, int(rule.get("interval") or 1))
+    freq = rule.get("freq")
 
     if freq == "DAILY":
-        cur = master_start
-        i = 0
-        while cur <= until_cap and len(out) < limit and i < _HARD_CAP:
-            push(cur)
-            cur = cur + timedelta(days=interval)
-            i += 1
-        return out
+        step = timedelta(days=interval)
+        k = -((master_start - start) // step)       # ceil((start - master) / step)
+        while count is None or k < count:
+            occ = master_start + k * step
+            if end is not None and occ > end:
+                return
+            yield occ
+            k += 1
+        return
 
     if freq == "WEEKLY":
-        # Anchor to start of master's week (Monday-anchored to match Python weekday()).
+        # Weeks are Monday-anchored (WKST=MO) and keep master_start's time of day.
+        days = sorted(set(rule.get("byday") or [])) or [master_start.weekday()]
         anchor = master_start - timedelta(days=master_start.weekday())
-        anchor = anchor.replace(hour=master_start.hour, minute=master_start.minute, second=0, microsecond=0)
-        days = sorted(rule.get("byday") or []) or [master_start.weekday()]
-        week_idx = 0
-        emitted = 0
-        while emitted < limit and week_idx < _HARD_CAP:
-            week_start = anchor + timedelta(weeks=week_idx * interval)
-            if week_start > until_cap:
-                break
-            for dow in days:
-                occ = week_start + timedelta(days=dow)
-                if occ < master_start:
+        first_week = [d for d in days if anchor + timedelta(days=d) >= master_start]
+        step = timedelta(weeks=interval)
+        w = max(0, (start - anchor) // step)
+        while True:
+            week_start = anchor + w * step
+            if end is not None and week_start > end:
+                return
+            # Series index of this week's first occurrence (for COUNT).
+            idx = 0 if w == 0 else len(first_week) + (w - 1) * len(days)
+            for d in (first_week if w == 0 else days):
+                if count is not None and idx >= count:
+                    return
+                occ = week_start + timedelta(days=d)
+                idx += 1
+                if occ < start:
                     continue
-                if occ > until_cap:
-                    break
-                push(occ)
-                emitted += 1
-                if emitted >= limit:
-                    break
-            week_idx += 1
-        return out
+                if end is not None and occ > end:
+                    return
+                yield occ
+            w += 1
 
     if freq == "MONTHLY":
-        day = master_start.day
-        hour = master_start.hour
-        minute = master_start.minute
-        i = 0
-        while i < _HARD_CAP and len(out) < limit:
-            year = master_start.year
-            month = master_start.month + i * interval
-            year += (month - 1) // 12
-            month = ((month - 1) % 12) + 1
-            last_day = _last_day_of_month(year, month)
-            occ = datetime(
-                year, month, min(day, last_day), hour, minute, 0,
-                tzinfo=master_start.tzinfo,
+        # Day-of-month is clamped to short months (Jan 31 -> Feb 28), like the
+        # frontend expander; RFC 5545 would skip those months instead.
+        months = (start.year - master_start.year) * 12 + (start.month - master_start.month)
+        i = max(0, months // interval)
+        while count is None or i < count:
+            month = master_start.month - 1 + i * interval
+            year = master_start.year + month // 12
+            month = month % 12 + 1
+            occ = master_start.replace(
+                year=year, month=month, day=min(master_start.day, _last_day_of_month(year, month)),
             )
-            if occ > until_cap:
-                break
-            push(occ)
+            if end is not None and occ > end:
+                return
+            if occ >= start:
+                yield occ
             i += 1
-        return out
+        return
 
-    return out
+
+def expand_occurrences(
+    rule: Dict[str, Any],
+    master_start: datetime,
+    window_start: datetime,
+    window_end: datetime,
+) -> List[datetime]:
+    """Occurrences in [window_start, window_end] (at most _HARD_CAP)."""
+    if not rule:
+        return []
+    if window_end < window_start:
+        return []
+    if master_start.tzinfo is None or window_start.tzinfo is None or window_end.tzinfo is None:
+        raise ValueError("expand_occurrences requires tz-aware datetimes")
+    return list(islice(iter_occurrences(rule, master_start, window_start, window_end), _HARD_CAP))
 
 
 def next_occurrence(
     rule: Dict[str, Any],
     master_start: datetime,
     after: datetime,
-    horizon_days: int = 60,
+    horizon_days: Optional[int] = 60,
 ) -> Optional[datetime]:
-    """Find the first occurrence strictly after `after` within `horizon_days`.
-    Returns None if no occurrence falls in the window."""
-    window_end = after + timedelta(days=horizon_days)
-    for occ in expand_occurrences(rule, master_start, after, window_end):
+    """Find the first occurrence strictly after `after` within `horizon_days`
+    (None = no horizon). Returns None if no occurrence falls in the window."""
+    window_end = after + timedelta(days=horizon_days) if horizon_days is not None else None
+    for occ in iter_occurrences(rule, master_start, after, window_end):
         if occ > after:
             return occ
     return None
@@ -0,0 +1,256 @@
+# api/services/telemetry_buffer.py
+# ============================================================================
+# Batched, non-blocking telemetry writer
+# ============================================================================
+# Telemetry rows (ai_usage, ocr_metrics) are appended to an in-memory queue
+# and written in bulk by a background task, so logging never adds a DB
+# round-trip to a user request.
+#
+#   enqueue(row)  -> O(1), never blocks, never raises
+#   flusher       -> every FLUSH_INTERVAL_S, or sooner once BATCH_SIZE rows
+#                    are waiting, inserts up to BATCH_SIZE rows per call
+#   overflow      -> when MAX_QUEUE rows are waiting, new rows are dropped and
+#                    counted (telemetry loss is preferable to memory growth)
+#   failures      -> a batch PostgREST rejects (bad value, missing column) is
+#                    bisected so the good rows land and the bad ones are
+#                    dropped with a log; any other error holds the batch for
+#                    retry, and after MAX_ATTEMPTS flushes it is dropped, so
+#                    one batch can never stall the queue behind it
+#   shutdown      -> stop_all() drains every buffer; atexit covers scripts
+#
+# Outside the server (scripts, cron one-offs) no flusher runs; a full batch
+# is flushed inline and the remainder at interpreter exit.
+#
+# Config: TELEMETRY_BATCH_SIZE (100), TELEMETRY_FLUSH_INTERVAL_S (5),
+#         TELEMETRY_MAX_QUEUE (10000), TELEMETRY_MAX_ATTEMPTS (5)
+# ============================================================================
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "100"))
+FLUSH_INTERVAL_S = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_S", "5"))
+MAX_QUEUE = int(os.getenv("TELEMETRY_MAX_QUEUE", "10000"))
+MAX_ATTEMPTS = int(os.getenv("TELEMETRY_MAX_ATTEMPTS", "5"))
+_POLL_S = 0.25
+
+# PostgREST connection errors; every other PGRST code is a request error.
+_TRANSIENT_PGRST = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+def _is_rejected(exc: Exception) -> bool:
+    """True when the rows themselves were refused (retrying can't help):
+    data exceptions (22xxx), constraint violations (23xxx), undefined
+    column/table (42xxx) and PostgREST request errors (PGRSTxxx)."""
+    from postgrest.exceptions import APIError
+
+    if not isinstance(exc, APIError):
+        return False
+    code = str(exc.code or "")
+    if code.startswith("PGRST"):
+        return code not in _TRANSIENT_PGRST
+    return code[:2] in ("22", "23", "42")
+
+
+class TelemetryBuffer:
+    """Bounded queue of rows for one table, flushed in bulk."""
+
+    def __init__(self, table: str, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_S, max_queue: int = MAX_QUEUE):
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(self.batch_size, max_queue)
+        self._rows: deque = deque()
+        self._retry: Optional[List[dict]] = None   # batch held after a transient failure
+        self._attempts = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_flush = time.monotonic()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    # -- producer side --
+
+    def enqueue(self, row: dict) -> None:
+        with self._lock:
+            if len(self._rows) >= self.max_queue:
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    logger.warning("[Telemetry:%s] queue full, %d rows dropped so far",
+                                   self.table, self.dropped)
+                return
+            self._rows.append(row)
+            self.enqueued += 1
+            pending = len(self._rows)
+        if pending >= self.batch_size and not self.running:
+            self.flush()
+
+    # -- consumer side --
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _take(self) -> List[dict]:
+        if self._retry is not None:
+            batch, self._retry = self._retry, None
+            return batch
+        self._attempts = 0
+        with self._lock:
+            n = min(self.batch_size, len(self._rows))
+            return [self._rows.popleft() for _ in range(n)]
+
+    def _insert(self, rows: List[dict]) -> None:
+        from api.supabase_client import supabase
+
+        supabase.table(self.table).insert(rows).execute()
+
+    def _isolate(self, batch: List[dict]) -> int:
+        """Bisect a rejected batch: insert the chunks that go through, drop
+        the single rows that don't. Returns rows written. On any other error
+        the rows not yet written are left in self._retry and it re-raises."""
+        written = 0
+        stack = [batch]
+        while stack:
+            chunk = stack.pop()
+            try:
+                self._insert(chunk)
+            except Exception as exc:  # noqa: BLE001
+                if not _is_rejected(exc):
+                    self.written += written
+                    self._retry = chunk + [r for c in reversed(stack) for r in c]
+                    raise
+                if len(chunk) == 1:
+                    self.dropped += 1
+                    logger.warning("[Telemetry:%s] dropping rejected row: %r", self.table, chunk[0])
+                else:
+                    mid = len(chunk) // 2
+                    stack += [chunk[mid:], chunk[:mid]]
+                continue
+            written += len(chunk)
+        return written
+
+    def flush(self, retry_failed: bool = True) -> int:
+        """Write every queued row (in batch_size chunks). Returns rows written."""
+        written = 0
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    try:
+                        self._insert(batch)
+                        n = len(batch)
+                    except Exception as exc:  # noqa: BLE001
+                        if not _is_rejected(exc):
+                            raise
+                        self.failed_batches += 1
+                        logger.warning("[Telemetry:%s] %d rows rejected (%s), isolating bad rows",
+                                       self.table, len(batch), exc)
+                        n = self._isolate(batch)
+                except Exception as exc:  # noqa: BLE001 — telemetry must never raise
+                    self.failed_batches += 1
+                    self._attempts += 1
+                    pending, self._retry = (self._retry or batch), None
+                    if retry_failed and self._attempts < MAX_ATTEMPTS:
+                        logger.warning("[Telemetry:%s] insert of %d rows failed (attempt %d/%d): %s",
+                                       self.table, len(pending), self._attempts, MAX_ATTEMPTS, exc)
+                        self._retry = pending
+                    else:
+                        self.dropped += len(pending)
+                        logger.error("[Telemetry:%s] dropping %d rows after %d failed attempts: %s",
+                                     self.table, len(pending), self._attempts, exc)
+                    break
+                written += n
+                self.written += n
+        return written
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(_POLL_S)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            pending = bool(self._rows) or self._retry is not None
+            if pending and (due or len(self._rows) >= self.batch_size):
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("[Telemetry:%s] flush loop error: %s", self.table, exc)
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush, False)
+
+    def stats(self) -> dict:
+        return {
+            "table": self.table,
+            "queued": len(self._rows) + len(self._retry or ()),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+            "running": self.running,
+        }
+
+
+_buffers: Dict[str, TelemetryBuffer] = {}
+_registry_lock = threading.Lock()
+
+
+def get_buffer(table: str) -> TelemetryBuffer:
+    """Shared buffer for `table` (created on first use)."""
+    with _registry_lock:
+        buf = _buffers.get(table)
+        if buf is None:
+            buf = TelemetryBuffer(table)
+            _buffers[table] = buf
+        return buf
+
+
+def start_all() -> None:
+    """Start a flusher for every buffer (call from app startup)."""
+    for buf in list(_buffers.values()):
+        buf.start()
+
+
+async def stop_all() -> None:
+    """Stop flushers and drain every buffer (call from app shutdown)."""
+    for buf in list(_buffers.values()):
+        await buf.stop()
+
+
+def get_stats() -> Dict[str, dict]:
+    return {t: b.stats() for t, b in list(_buffers.items())}
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    for buf in list(_buffers.values()):
+        if buf._rows or buf._retry:
+            try:
+                buf.flush(retry_failed=False)
+            except Exception:
+                pass
@@ -0,0 +1,80 @@
+# api/services/unread_counters.py
+# ================================
+# Per-(user, channel_key) unread counters
+# ================================
+# Backed by channel_unread_counts (sql/create_channel_unread_counts.sql). Every
+# message-creating path calls record_message() once the row exists; the SQL
+# function resolves the audience (members for custom/direct/group, every user
+# otherwise) and bumps all counters in one statement. /messages/unread-counts
+# then reads the user's rows instead of recounting messages.
+#
+# Counting rules match the get_unread_counts RPC: only top-level, non-deleted
+# messages count, so thread replies never move a channel badge.
+# Best-effort: a counter failure must never break sending a message.
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+
+def record_message(message: Dict[str, Any]) -> int:
+    """+1 unread for the new message's audience. Returns counters touched."""
+    message_id = message.get("id")
+    if not message_id or message.get("reply_to_id"):
+        return 0
+    try:
+        res = supabase.rpc("bump_unread_counts", {"p_message_id": str(message_id)}).execute()
+        return int(res.data or 0)
+    except Exception as e:
+        logger.warning("[UnreadCounters] bump failed for message %s: %s", message_id, e)
+        return 0
+
+
+def release_message(message_id: str) -> int:
+    """-1 for users who had not read a message that is being soft-deleted."""
+    try:
+        res = supabase.rpc("release_unread_for_message", {"p_message_id": str(message_id)}).execute()
+        return int(res.data or 0)
+    except Exception as e:
+        logger.warning("[UnreadCounters] release failed for message %s: %s", message_id, e)
+        return 0
+
+
+def reset(user_id: str, channel_key: str) -> None:
+    """Channel read: the user's counter goes back to zero."""
+    try:
+        supabase.table("channel_unread_counts").upsert(
+            {
+                "user_id": user_id,
+                "channel_key": channel_key,
+                "unread_count": 0,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            on_conflict="user_id,channel_key",
+        ).execute()
+    except Exception as e:
+        logger.warning("[UnreadCounters] reset failed for %s/%s: %s", user_id, channel_key, e)
+
+
+def clear_channel(channel_key: str) -> None:
+    """Channel cleared (messages hard-deleted): drop every counter for it."""
+    try:
+        supabase.table("channel_unread_counts").delete().eq("channel_key", channel_key).execute()
+    except Exception as e:
+        logger.warning("[UnreadCounters] clear failed for %s: %s", channel_key, e)
+
+
+def get_counts(user_id: str) -> Dict[str, int]:
+    """{channel_key: unread_count} for the user's non-zero counters (PK range read).
+
+    Raises on DB errors so the caller can fall back to the recount RPC."""
+    res = supabase.table("channel_unread_counts") \
+        .select("channel_key, unread_count") \
+        .eq("user_id", user_id) \
+        .gt("unread_count", 0) \
+        .execute()
+    return {row["channel_key"]: row["unread_count"] for row in (res.data or [])}
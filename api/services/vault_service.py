@@ -4,22 +4,48 @@
 # ================================
 # Handles file/folder CRUD, versioning, chunked uploads,
 # search, and duplicate detection for the Vault module.
-
+#
+# File content never has to fit in memory: streams are staged to disk
+# under CHUNK_TEMP_DIR while being hashed, chunked uploads are assembled
+# on disk the same way, and storage uploads read from the file (6 MB parts
+# over the resumable endpoint for large files, one streamed request
+# otherwise). Duplicates and restores are server-side storage copies.
+
+import base64
 import gc
 import hashlib
 import logging
 import os
+import re
 import shutil
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+import httpx
 
-from api.supabase_client import supabase
+from api.supabase_client import SUPABASE_SERVICE_ROLE_KEY, SUPABASE_URL, supabase
 
 logger = logging.getLogger(__name__)
 
 VAULT_BUCKET = "vault"
-CHUNK_TEMP_DIR = os.path.join(os.environ.get("TEMP", "/tmp"), "vault_uploads")
+CHUNK_TEMP_DIR = os.getenv("VAULT_CHUNK_TEMP_DIR") or os.path.join(os.environ.get("TEMP", "/tmp"), "vault_uploads")
+# Chunked uploads with no activity for this long are treated as abandoned.
+UPLOAD_MAX_AGE_S = int(os.getenv("VAULT_UPLOAD_MAX_AGE_S", str(24 * 3600)))
+# Files at least this large use the resumable (TUS) storage endpoint.
+RESUMABLE_UPLOADS = os.getenv("VAULT_RESUMABLE_UPLOADS", "1").lower() not in ("0", "false", "no")
+RESUMABLE_MIN_BYTES = int(os.getenv("VAULT_RESUMABLE_MIN_BYTES", str(6 * 1024 * 1024)))
+
+_TUS_PART_BYTES = 6 * 1024 * 1024  # Supabase Storage requires 6 MB parts
+_TUS_RETRIES = 3
+_COPY_BLOCK = 1024 * 1024
+_STAGING_DIR = "_staging"
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+FileContent = Union[bytes, BinaryIO]
 
 
 # ============================================
@@ -119,6 +145,201 @@ def _compute_hash(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def _upload_dir(upload_id: str) -> str:
+    """Temp dir of a chunked upload (upload_id is client-supplied)."""
+    if not _UPLOAD_ID_RE.match(upload_id or "") or upload_id == _STAGING_DIR:
+        raise ValueError(f"Invalid upload_id: {upload_id!r}")
+    return os.path.join(CHUNK_TEMP_DIR, upload_id)
+
+
+def _copy_hashing(src: BinaryIO, dst: BinaryIO, digest) -> int:
+    """Copy src to dst in blocks, feeding digest. Returns bytes copied."""
+    size = 0
+    for block in iter(lambda: src.read(_COPY_BLOCK), b""):
+        digest.update(block)
+        dst.write(block)
+        size += len(block)
+    return size
+
+
+def _stage(file_content: FileContent) -> Tuple[Union[bytes, str], int, str, Optional[str]]:
+    """(content, size, sha256, staged_path) for an upload.
+
+    bytes are used as they are. A stream is copied to a temp file while
+    hashing, and content is then that file's path (staged_path, to be
+    removed by the caller).
+    """
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        data = bytes(file_content) if not isinstance(file_content, bytes) else file_content
+        return data, len(data), _compute_hash(data), None
+    staging = os.path.join(CHUNK_TEMP_DIR, _STAGING_DIR)
+    os.makedirs(staging, exist_ok=True)
+    path = os.path.join(staging, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    try:
+        if hasattr(file_content, "seek"):
+            file_content.seek(0)
+        with open(path, "wb") as out:
+            size = _copy_hashing(file_content, out, digest)
+    except Exception:
+        _remove_quietly(path)
+        raise
+    return path, size, digest.hexdigest(), path
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("[Vault] Failed to remove temp file %s: %s", path, e)
+
+
+_tus_client: Optional[httpx.Client] = None
+_tus_lock = threading.Lock()
+
+
+def _get_tus_client() -> httpx.Client:
+    global _tus_client
+    with _tus_lock:
+        if _tus_client is None:
+            _tus_client = httpx.Client(timeout=httpx.Timeout(120.0), follow_redirects=True)
+        return _tus_client
+
+
+def _tus_upload(bucket_path: str, path: str, size: int, content_type: str) -> None:
+    """Resumable upload of a local file (Supabase Storage TUS endpoint).
+
+    Sent in 6 MB parts; a failed part is retried from the offset the server
+    reports, so a dropped connection costs one part, not the whole file.
+    """
+    endpoint = f"{SUPABASE_URL.rstrip('/')}/storage/v1/upload/resumable"
+    headers = {
+        "authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "tus-resumable": "1.0.0",
+    }
+    metadata = {
+        "bucketName": VAULT_BUCKET,
+        "objectName": bucket_path,
+        "contentType": content_type,
+        "cacheControl": "3600",
+    }
+    client = _get_tus_client()
+    created = client.post(endpoint, headers={
+        **headers,
+        "x-upsert": "true",
+        "upload-length": str(size),
+        "upload-metadata": ",".join(
+            f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items()
+        ),
+    })
+    created.raise_for_status()
+    location = urljoin(endpoint, created.headers["location"])
+
+    offset = 0
+    failures = 0
+    with open(path, "rb") as fh:
+        while offset < size:
+            fh.seek(offset)
+            part = fh.read(_TUS_PART_BYTES)
+            try:
+                resp = client.patch(location, content=part, headers={
+                    **headers,
+                    "upload-offset": str(offset),
+                    "content-type": "application/offset+octet-stream",
+                })
+                resp.raise_for_status()
+                offset = int(resp.headers.get("upload-offset", offset + len(part)))
+                failures = 0
+            except httpx.HTTPError as e:
+                failures += 1
+                if failures > _TUS_RETRIES:
+                    raise
+                logger.info("[Vault] Resuming %s after part failure at %d: %s", bucket_path, offset, e)
+                head = client.head(location, headers=headers)
+                head.raise_for_status()
+                offset = int(head.headers["upload-offset"])
+
+
+def _put_object(bucket_path: str, content: Union[bytes, str], size: int, content_type: str) -> None:
+    """Upload bytes, or a local file by path without reading it into memory."""
+    if isinstance(content, str) and RESUMABLE_UPLOADS and size >= RESUMABLE_MIN_BYTES:
+        try:
+            _tus_upload(bucket_path, content, size, content_type)
+            return
+        except Exception as e:
+            logger.warning("[Vault] Resumable upload failed for %s, using a single request: %s", bucket_path, e)
+    file_options = {"content-type": content_type, "upsert": "true"}
+    if isinstance(content, str):
+        # An open file is streamed by the HTTP client in small blocks.
+        with open(content, "rb") as fh:
+            supabase.storage.from_(VAULT_BUCKET).upload(path=bucket_path, file=fh, file_options=file_options)
+    else:
+        supabase.storage.from_(VAULT_BUCKET).upload(path=bucket_path, file=content, file_options=file_options)
+
+
+def _copy_object(src_path: str, dst_path: str, content_type: str) -> None:
+    """Server-side copy; download + upload only if the copy is refused."""
+    try:
+        supabase.storage.from_(VAULT_BUCKET).copy(src_path, dst_path)
+        return
+    except Exception as e:
+        logger.warning("[Vault] Storage copy %s -> %s failed, re-uploading: %s", src_path, dst_path, e)
+    data = supabase.storage.from_(VAULT_BUCKET).download(src_path)
+    try:
+        _put_object(dst_path, data, len(data), content_type)
+    finally:
+        del data
+        gc.collect()
+
+
+def _create_file_records(
+    file_id: str,
+    filename: str,
+    content_type: str,
+    parent_id: Optional[str],
+    project_id: Optional[str],
+    user_id: Optional[str],
+    bucket_path: str,
+    size_bytes: int,
+    file_hash: Optional[str],
+) -> Dict[str, Any]:
+    """vault_files row + version 1 for an object already in storage."""
+    public_url = supabase.storage.from_(VAULT_BUCKET).get_public_url(bucket_path)
+
+    file_row = {
+        "id": file_id,
+        "name": filename,
+        "is_folder": False,
+        "parent_id": parent_id,
+        "project_id": project_id,
+        "bucket_path": bucket_path,
+        "mime_type": content_type,
+        "size_bytes": size_bytes,
+        "file_hash": file_hash,
+        "uploaded_by": user_id,
+    }
+    file_result = supabase.table("vault_files").insert(file_row).execute()
+
+    version_row = {
+        "file_id": file_id,
+        "version_number": 1,
+        "bucket_path": bucket_path,
+        "size_bytes": size_bytes,
+        "uploaded_by": user_id,
+        "comment": "Initial upload",
+    }
+    supabase.table("vault_file_versions").insert(version_row).execute()
+
+    data = file_result.data[0] if file_result.data else file_row
+    data["public_url"] = public_url
+    return data
+
+
 def _ensure_bucket():
     """Ensure the vault bucket exists."""
     try:
@@ -383,80 +604,78 @@ def get_file(file_id: str) -> Optional[Dict[str, Any]]:
 # ============================================
 
 def upload_file(
-    file_content: bytes,
+    file_content: FileContent,
     filename: str,
     content_type: str,
     parent_id: Optional[str],
     project_id: Optional[str],
     user_id: str,
 ) -> Dict[str, Any]:
-    """Upload a file and create v1."""
+    """Upload a file and create v1. file_content is bytes or a binary stream
+    (streams are staged to disk, not read into memory)."""
     _ensure_bucket()
 
     file_id = str(uuid.uuid4())
     ext = _get_extension(filename)
-    file_hash = _compute_hash(file_content)
-    size_bytes = len(file_content)
     bucket_path = _storage_path(project_id, file_id, 1, ext,
                                 parent_id=parent_id, filename=filename)
 
-    # Upload to Supabase Storage
-    supabase.storage.from_(VAULT_BUCKET).upload(
-        path=bucket_path,
-        file=file_content,
-        file_options={"content-type": content_type, "upsert": "true"},
-    )
-    # Note: file_content is owned by the caller; caller is responsible for cleanup.
-
-    public_url = supabase.storage.from_(VAULT_BUCKET).get_public_url(bucket_path)
-
-    # Create vault_files record
-    file_row = {
-        "id": file_id,
-        "name": filename,
-        "is_folder": False,
-        "parent_id": parent_id,
-        "project_id": project_id,
-        "bucket_path": bucket_path,
-        "mime_type": content_type,
-        "size_bytes": size_bytes,
-        "file_hash": file_hash,
-        "uploaded_by": user_id,
-    }
-    file_result = supabase.table("vault_files").insert(file_row).execute()
+    content, size_bytes, file_hash, staged = _stage(file_content)
+    try:
+        _put_object(bucket_path, content, size_bytes, content_type)
+    finally:
+        _remove_quietly(staged)
+    # Note: bytes file_content is owned by the caller; caller is responsible for cleanup.
 
-    # Create version 1
-    version_row = {
-        "file_id": file_id,
-        "version_number": 1,
-        "bucket_path": bucket_path,
-        "size_bytes": size_bytes,
-        "uploaded_by": user_id,
-        "comment": "Initial upload",
-    }
-    supabase.table("vault_file_versions").insert(version_row).execute()
-
-    data = file_result.data[0] if file_result.data else file_row
-    data["public_url"] = public_url
-    return data
+    return _create_file_records(file_id, filename, content_type, parent_id, project_id,
+                                user_id, bucket_path, size_bytes, file_hash)
 
 
 # ============================================
 # Chunked Upload (for > 50MB files)
 # ============================================
 
-def store_chunk(upload_id: str, chunk_index: int, chunk_data: bytes) -> Dict[str, Any]:
-    """Store a single chunk to temp directory."""
-    upload_dir = os.path.join(CHUNK_TEMP_DIR, upload_id)
+def store_chunk(upload_id: str, chunk_index: int, chunk_data: FileContent) -> Dict[str, Any]:
+    """Store a single chunk to temp directory (bytes or a binary stream).
+
+    Written under a temp name and renamed, so a chunk that failed halfway
+    is never taken as received; re-sending a chunk replaces it.
+    """
+    upload_dir = _upload_dir(upload_id)
     os.makedirs(upload_dir, exist_ok=True)
 
     chunk_path = os.path.join(upload_dir, f"chunk_{chunk_index:06d}")
-    with open(chunk_path, "wb") as f:
-        f.write(chunk_data)
+    partial_path = f"{chunk_path}.part"
+    try:
+        with open(partial_path, "wb") as f:
+            if isinstance(chunk_data, (bytes, bytearray, memoryview)):
+                f.write(chunk_data)
+            else:
+                shutil.copyfileobj(chunk_data, f, _COPY_BLOCK)
+        os.replace(partial_path, chunk_path)
+    except Exception:
+        _remove_quietly(partial_path)
+        raise
 
     return {"upload_id": upload_id, "chunk_index": chunk_index, "stored": True}
 
 
+def get_upload_status(upload_id: str) -> Dict[str, Any]:
+    """Chunks received so far, so an interrupted client can resume."""
+    upload_dir = _upload_dir(upload_id)
+    received: List[int] = []
+    size = 0
+    if os.path.isdir(upload_dir):
+        for name in os.listdir(upload_dir):
+            if name.startswith("chunk_") and not name.endswith(".part"):
+                try:
+                    received.append(int(name[len("chunk_"):]))
+                    size += os.path.getsize(os.path.join(upload_dir, name))
+                except (ValueError, OSError):
+                    continue
+    return {"upload_id": upload_id, "received_chunks": sorted(received), "received_bytes": size}
+
+
 def assemble_chunks(
     upload_id: str,
     filename: str,
@@ -466,70 +685,39 @@ def assemble_chunks(
     project_id: Optional[str],
     user_id: str,
 ) -> Dict[str, Any]:
-    """Assemble chunks into a complete file, upload to storage, create records."""
+    """Assemble chunks into a complete file, upload to storage, create records.
+
+    Chunks are concatenated into one file on disk and hashed on the way;
+    the upload then streams from that file. On failure the chunks are
+    kept so the client can call upload-complete again.
+    """
     _ensure_bucket()
 
-    upload_dir = os.path.join(CHUNK_TEMP_DIR, upload_id)
+    upload_dir = _upload_dir(upload_id)
 
-    # Assemble all chunks into a bytearray
-    assembled = bytearray()
     for i in range(total_chunks):
-        chunk_path = os.path.join(upload_dir, f"chunk_{i:06d}")
-        if not os.path.exists(chunk_path):
+        if not os.path.exists(os.path.join(upload_dir, f"chunk_{i:06d}")):
             raise FileNotFoundError(f"Missing chunk {i} for upload {upload_id}")
-        with open(chunk_path, "rb") as f:
-            assembled.extend(f.read())
 
-    # Convert to bytes and free the bytearray immediately
-    file_content = bytes(assembled)
-    del assembled
+    assembled_path = os.path.join(upload_dir, "assembled")
+    digest = hashlib.sha256()
+    size_bytes = 0
+    with open(assembled_path, "wb") as out:
+        for i in range(total_chunks):
+            with open(os.path.join(upload_dir, f"chunk_{i:06d}"), "rb") as f:
+                size_bytes += _copy_hashing(f, out, digest)
+    file_hash = digest.hexdigest()
 
     file_id = str(uuid.uuid4())
     ext = _get_extension(filename)
-    file_hash = _compute_hash(file_content)
-    size_bytes = len(file_content)
     bucket_path = _storage_path(project_id, file_id, 1, ext,
                                 parent_id=parent_id, filename=filename)
 
     # Upload assembled file to Supabase Storage
-    try:
-        supabase.storage.from_(VAULT_BUCKET).upload(
-            path=bucket_path,
-            file=file_content,
-            file_options={"content-type": content_type, "upsert": "true"},
-        )
-    finally:
-        # Free the large buffer as soon as the upload completes (or fails)
-        del file_content
-        gc.collect()
+    _put_object(bucket_path, assembled_path, size_bytes, content_type)
 
-    public_url = supabase.storage.from_(VAULT_BUCKET).get_public_url(bucket_path)
-
-    # Create vault_files record
-    file_row = {
-        "id": file_id,
-        "name": filename,
-        "is_folder": False,
-        "parent_id": parent_id,
-        "project_id": project_id,
-        "bucket_path": bucket_path,
-        "mime_type": content_type,
-        "size_bytes": size_bytes,
-        "file_hash": file_hash,
-        "uploaded_by": user_id,
-    }
-    file_result = supabase.table("vault_files").insert(file_row).execute()
-
-    # Create version 1
-    version_row = {
-        "file_id": file_id,
-        "version_number": 1,
-        "bucket_path": bucket_path,
-        "size_bytes": size_bytes,
-        "uploaded_by": user_id,
-        "comment": "Initial upload",
-    }
-    supabase.table("vault_file_versions").insert(version_row).execute()
+    data = _create_file_records(file_id, filename, content_type, parent_id, project_id,
+                                user_id, bucket_path, size_bytes, file_hash)
 
     # Cleanup temp chunks
     try:
@@ -537,11 +725,49 @@ def assemble_chunks(
     except Exception as e:
         logger.warning("[Vault] Failed to clean temp dir: %s", e)
 
-    data = file_result.data[0] if file_result.data else file_row
-    data["public_url"] = public_url
     return data
 
 
+def cleanup_stale_uploads(max_age_s: Optional[int] = None) -> Dict[str, int]:
+    """Remove chunked uploads with no activity for max_age_s (default
+    VAULT_UPLOAD_MAX_AGE_S) and leftover staging files under CHUNK_TEMP_DIR."""
+    max_age_s = UPLOAD_MAX_AGE_S if max_age_s is None else max_age_s
+    cutoff = time.time() - max_age_s
+    removed = {"uploads": 0, "staged_files": 0}
+    try:
+        entries = list(os.scandir(CHUNK_TEMP_DIR))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        try:
+            if entry.name == _STAGING_DIR and entry.is_dir():
+                for staged in os.scandir(entry.path):
+                    if staged.stat().st_mtime < cutoff:
+                        os.remove(staged.path)
+                        removed["staged_files"] += 1
+            elif entry.is_dir() and _newest_mtime(entry.path) < cutoff:
+                shutil.rmtree(entry.path)
+                removed["uploads"] += 1
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning("[Vault] Failed to clean %s: %s", entry.path, e)
+    if removed["uploads"] or removed["staged_files"]:
+        logger.info("[Vault] Removed %d abandoned upload(s), %d staged file(s)",
+                    removed["uploads"], removed["staged_files"])
+    return removed
+
+
+def _newest_mtime(path: str) -> float:
+    newest = os.stat(path).st_mtime
+    for entry in os.scandir(path):
+        try:
+            newest = max(newest, entry.stat().st_mtime)
+        except FileNotFoundError:
+            continue
+    return newest
+
+
 # ============================================
 # Versioning
 # ============================================
@@ -560,13 +786,13 @@ def list_versions(file_id: str) -> List[Dict[str, Any]]:
 
 def create_version(
     file_id: str,
-    file_content: bytes,
+    file_content: FileContent,
     filename: str,
     content_type: str,
     user_id: str,
     comment: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """Upload a new version of an existing file."""
+    """Upload a new version of an existing file (bytes or a binary stream)."""
     _ensure_bucket()
 
     # Get current file record
@@ -579,18 +805,16 @@ def create_version(
     next_version = (versions[0]["version_number"] + 1) if versions else 1
 
     ext = _get_extension(filename)
-    file_hash = _compute_hash(file_content)
-    size_bytes = len(file_content)
     bucket_path = _storage_path(file_rec.get("project_id"), file_id, next_version, ext,
                                 parent_id=file_rec.get("parent_id"), filename=filename)
 
     # Upload to storage
-    supabase.storage.from_(VAULT_BUCKET).upload(
-        path=bucket_path,
-        file=file_content,
-        file_options={"content-type": content_type, "upsert": "true"},
-    )
-    # Note: file_content is owned by the caller; caller is responsible for cleanup.
+    content, size_bytes, file_hash, staged = _stage(file_content)
+    try:
+        _put_object(bucket_path, content, size_bytes, content_type)
+    finally:
+        _remove_quietly(staged)
+    # Note: bytes file_content is owned by the caller; caller is responsible for cleanup.
 
     # Create version record
     version_row = {
@@ -629,12 +853,8 @@ def restore_version(file_id: str, version_id: str, user_id: str) -> Dict[str, An
 
     old_version = version_result.data[0]
 
-    # Download old version file
-    old_data = supabase.storage.from_(VAULT_BUCKET).download(old_version["bucket_path"])
-
     file_rec = get_file(file_id)
     if not file_rec:
-        del old_data
         raise ValueError(f"File {file_id} not found")
 
     # Create a new version with the old content
@@ -647,15 +867,9 @@ def restore_version(file_id: str, version_id: str, user_id: str) -> Dict[str, An
         parent_id=file_rec.get("parent_id"), filename=file_rec.get("name", ""),
     )
 
-    try:
-        supabase.storage.from_(VAULT_BUCKET).upload(
-            path=bucket_path,
-            file=old_data,
-            file_options={"content-type": file_rec.get("mime_type", "application/octet-stream"), "upsert": "true"},
-        )
-    finally:
-        del old_data
-        gc.collect()
+    # Copy the old version's object in storage (no download)
+    _copy_object(old_version["bucket_path"], bucket_path,
+                 file_rec.get("mime_type", "application/octet-stream"))
 
     version_row = {
         "file_id": file_id,
@@ -748,32 +962,26 @@ def soft_delete(file_id: str) -> Dict[str, Any]:
 
 
 def duplicate_file(file_id: str, user_id: str) -> Dict[str, Any]:
-    """Duplicate a file (creates a new file record pointing to the same storage)."""
+    """Duplicate a file (new file record plus a server-side copy of its object)."""
     file_rec = get_file(file_id)
     if not file_rec:
         raise ValueError(f"File {file_id} not found")
     if file_rec["is_folder"]:
         raise ValueError("Cannot duplicate folders")
 
-    # Download original
-    file_content = supabase.storage.from_(VAULT_BUCKET).download(file_rec["bucket_path"])
-
-    # Upload as new file with " (copy)" suffix
+    # New file with " (copy)" suffix; the object is copied inside storage
     base_name, ext = os.path.splitext(file_rec["name"])
     copy_name = f"{base_name} (copy){ext}"
+    content_type = file_rec.get("mime_type", "application/octet-stream")
 
-    try:
-        return upload_file(
-            file_content=file_content,
-            filename=copy_name,
-            content_type=file_rec.get("mime_type", "application/octet-stream"),
-            parent_id=file_rec.get("parent_id"),
-            project_id=file_rec.get("project_id"),
-            user_id=user_id,
-        )
-    finally:
-        del file_content
-        gc.collect()
+    new_id = str(uuid.uuid4())
+    bucket_path = _storage_path(file_rec.get("project_id"), new_id, 1, _get_extension(copy_name),
+                                parent_id=file_rec.get("parent_id"), filename=copy_name)
+    _copy_object(file_rec["bucket_path"], bucket_path, content_type)
+
+    return _create_file_records(new_id, copy_name, content_type, file_rec.get("parent_id"),
+                                file_rec.get("project_id"), user_id, bucket_path,
+                                file_rec.get("size_bytes") or 0, file_rec.get("file_hash"))
 
 
 # ============================================
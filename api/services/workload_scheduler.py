@@ -0,0 +1,619 @@
+# api/services/workload_scheduler.py
+# ============================================================================
+# Workload scheduling engine for /pipeline/workload/*
+# ============================================================================
+# Packs each owner's open tasks (Not Started / Working on It) into their
+# working days:
+#
+#   * WorkCalendar: working weekdays + days off (user_time_off) with
+#     arithmetic "N working days after D" (whole weeks are jumped, days off
+#     are counted with bisect) instead of stepping one timedelta(days=1) at a
+#     time
+#   * load_context(): capacities, days off and open tasks for any number of
+#     users in three reads (statuses come from pipeline_lookups)
+#   * plan_queue(): one owner's queue, in queue order, hours carried across
+#     day boundaries
+#   * schedule_users(): whole team in one pass, persisted with a single
+#     apply_task_schedule() call (sql/workload_bulk_schedule.sql); only rows
+#     whose schedule actually changed are written
+#   * explicit (non auto-generated) task_dependencies hold successors back:
+#     a task starts no earlier than the day after its finish_to_start
+#     predecessor ends (the predecessor's start for the other types)
+#   * schedule_downstream(): after a change to some tasks, replans only
+#     their dependency descendants (dependency_graph) and the affected tail
+#     of each owner's queue
+#
+# Working days use the user_capacity_settings convention (1=Mon .. 6=Sat,
+# 0 or 7=Sun).
+# ============================================================================
+
+import heapq
+import logging
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.services import dependency_graph
+from api.services.pipeline_lookups import get_lookups
+from api.supabase_client import supabase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOURS_PER_DAY = 8.0
+DEFAULT_DAYS_PER_WEEK = 5
+DEFAULT_WORKING_DAYS = [1, 2, 3, 4, 5]
+DEFAULT_BUFFER_PERCENT = 20
+DEFAULT_TASK_HOURS = 2.0
+
+ACTIVE_STATUS_NAMES = ("not started", "working on it")
+
+TASK_COLUMNS = (
+    "task_id, Owner_id, estimated_hours, deadline, due_date, queue_position, created_at, "
+    "scheduled_start_date, scheduled_end_date, blocked_by_task_id, auto_linked, scheduling_status"
+)
+
+_EPS = 1e-9
+_IN_CHUNK = 200
+_PAGE_SIZE = 1000  # PostgREST's default max rows per request
+# Cross-owner dependency chains settle one hop per pass.
+_MAX_PASSES = 25
+
+
+# ====================================================================
+# Capacity + calendar
+# ====================================================================
+
+@dataclass
+class Capacity:
+    hours_per_day: float = DEFAULT_HOURS_PER_DAY
+    days_per_week: int = DEFAULT_DAYS_PER_WEEK
+    working_days: Tuple[int, ...] = tuple(DEFAULT_WORKING_DAYS)
+    buffer_percent: int = DEFAULT_BUFFER_PERCENT
+
+    @property
+    def effective_hours(self) -> float:
+        return self.hours_per_day * (100 - self.buffer_percent) / 100
+
+    @classmethod
+    def from_row(cls, row: Optional[Dict[str, Any]]) -> "Capacity":
+        row = row or {}
+        hours = row.get("hours_per_day")
+        days = row.get("days_per_week")
+        buffer = row.get("buffer_percent")
+        return cls(
+            hours_per_day=float(hours) if hours is not None else DEFAULT_HOURS_PER_DAY,
+            days_per_week=int(days) if days is not None else DEFAULT_DAYS_PER_WEEK,
+            working_days=tuple(row.get("working_days") or DEFAULT_WORKING_DAYS),
+            buffer_percent=int(buffer) if buffer is not None else DEFAULT_BUFFER_PERCENT,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hours_per_day": self.hours_per_day,
+            "days_per_week": self.days_per_week,
+            "working_days": list(self.working_days),
+            "buffer_percent": self.buffer_percent,
+        }
+
+
+class WorkCalendar:
+    """Working weekdays minus individual days off."""
+
+    def __init__(self, working_days: Iterable[int], days_off: Iterable[date] = ()):
+        mask = [False] * 7  # indexed by date.weekday(), 0=Mon
+        for code in working_days or ():
+            try:
+                mask[(int(code) - 1) % 7] = True
+            except (TypeError, ValueError):
+                continue
+        if not any(mask):
+            # A calendar with no working days would never finish anything.
+            mask[:5] = [True] * 5
+        self._mask = tuple(mask)
+        self._per_week = sum(mask)
+        # Only days off that fall on a working weekday change anything.
+        self._off = sorted({d for d in days_off if mask[d.weekday()]})
+
+    def is_working(self, d: date) -> bool:
+        if not self._mask[d.weekday()]:
+            return False
+        i = bisect_left(self._off, d)
+        return not (i < len(self._off) and self._off[i] == d)
+
+    def _off_in(self, after: date, upto: date) -> int:
+        """Days off in (after, upto]."""
+        return bisect_right(self._off, upto) - bisect_right(self._off, after)
+
+    def _add_weekdays(self, d: date, n: int) -> date:
+        """n-th working weekday after d (n >= 1), ignoring days off."""
+        weeks, rem = divmod(n - 1, self._per_week)
+        d += timedelta(days=7 * weeks)
+        rem += 1
+        while True:
+            d += timedelta(days=1)
+            if self._mask[d.weekday()]:
+                rem -= 1
+                if rem == 0:
+                    return d
+
+    def add_working_days(self, d: date, n: int) -> date:
+        """The n-th working day after d (d itself for n <= 0)."""
+        if n <= 0:
+            return d
+        end = self._add_weekdays(d, n)
+        missed = self._off_in(d, end)
+        while missed:
+            nxt = self._add_weekdays(end, missed)
+            missed = self._off_in(end, nxt)
+            end = nxt
+        return end
+
+    def roll_forward(self, d: date) -> date:
+        """d if it is a working day, else the next one."""
+        return d if self.is_working(d) else self.add_working_days(d, 1)
+
+
+def expand_time_off(rows: Iterable[Dict[str, Any]], since: date) -> List[date]:
+    """user_time_off rows -> individual dates on or after `since`."""
+    out: List[date] = []
+    for r in rows or ():
+        try:
+            start = date.fromisoformat(str(r["start_date"])[:10])
+            end = date.fromisoformat(str(r["end_date"])[:10])
+        except (KeyError, TypeError, ValueError):
+            continue
+        d = max(start, since)
+        while d <= end:
+            out.append(d)
+            d += timedelta(days=1)
+    return out
+
+
+# ====================================================================
+# Planning (pure)
+# ====================================================================
+
+def task_hours(task: Dict[str, Any]) -> float:
+    return float(task.get("estimated_hours") or DEFAULT_TASK_HOURS)
+
+
+def queue_sort_key(task: Dict[str, Any]):
+    """Deadline first (undated last), then queue position, then age."""
+    deadline = task.get("deadline") or ""
+    qp = task.get("queue_position")
+    return (
+        not deadline,
+        str(deadline)[:10],
+        qp if qp is not None else math.inf,
+        str(task.get("created_at") or ""),
+    )
+
+
+def plan_queue(
+    tasks: List[Dict[str, Any]],
+    capacity: Capacity,
+    cal: WorkCalendar,
+    today: date,
+    not_before: Optional[Dict[str, date]] = None,
+) -> List[Dict[str, Any]]:
+    """Back-to-back schedule for one owner's open tasks.
+
+    Returns one row per task: task_id, scheduled_start_date,
+    scheduled_end_date (ISO dates), queue_position, blocked_by_task_id
+    (previous task in the queue) and auto_linked. A task with a
+    not_before date (see dependency_floors) later than the current day
+    waits aside while the tasks behind it go ahead, and is picked up
+    first once that day comes.
+    """
+    eff = capacity.effective_hours
+    if eff <= 0 or not tasks:
+        return []
+
+    queue = sorted(tasks, key=queue_sort_key)
+    waiting: List[Tuple[date, int, Dict[str, Any]]] = []  # heap by floor, then queue order
+    i = 0
+    day = cal.roll_forward(today)
+    left = eff
+    prev_id = None
+    out: List[Dict[str, Any]] = []
+    while i < len(queue) or waiting:
+        if left <= _EPS:
+            day = cal.add_working_days(day, 1)
+            left = eff
+        if waiting and waiting[0][0] <= day:
+            task = heapq.heappop(waiting)[2]
+        elif i < len(queue):
+            task = queue[i]
+            i += 1
+            floor = not_before.get(task["task_id"]) if not_before else None
+            if floor is not None and floor > day:
+                heapq.heappush(waiting, (floor, i, task))
+                continue
+        else:
+            # Only waiting tasks left: idle until the first one may start.
+            floor, _, task = heapq.heappop(waiting)
+            day = cal.roll_forward(floor)
+            left = eff
+        hours = task_hours(task)
+        start = day
+        if hours <= left + _EPS:
+            left -= hours
+        else:
+            over = hours - left
+            full_days = math.ceil(over / eff - _EPS)
+            day = cal.add_working_days(day, full_days)
+            left = eff * full_days - over
+        out.append({
+            "task_id": task["task_id"],
+            "scheduled_start_date": start.isoformat(),
+            "scheduled_end_date": day.isoformat(),
+            "queue_position": len(out) + 1,
+            "scheduling_status": "scheduled",
+            "blocked_by_task_id": prev_id,
+            "auto_linked": prev_id is not None,
+        })
+        prev_id = task["task_id"]
+    return out
+
+
+def next_available(
+    pending_hours: float,
+    capacity: Capacity,
+    cal: WorkCalendar,
+    today: date,
+    estimated_hours: Optional[float] = None,
+) -> Tuple[date, Optional[date]]:
+    """(start, end) for new work after `pending_hours` of backlog.
+
+    Whole days of backlog are skipped, as the workload endpoints have always
+    reported it; `end` is None unless estimated_hours is given.
+    """
+    eff = capacity.effective_hours
+    days_to_clear = int(pending_hours / eff) if eff > 0 else 0
+    start = cal.add_working_days(today, days_to_clear)
+    if estimated_hours is None:
+        return start, None
+    task_days = max(1, int(estimated_hours / eff) if eff > 0 else 1)
+    return start, cal.add_working_days(start, task_days)
+
+
+# ====================================================================
+# Loading
+# ====================================================================
+
+def active_status_ids() -> List[str]:
+    names = get_lookups()["status_names"]
+    return [sid for sid, name in names.items() if (name or "").lower() in ACTIVE_STATUS_NAMES]
+
+
+def _chunks(values: List[str]):
+    for i in range(0, len(values), _IN_CHUNK):
+        yield values[i:i + _IN_CHUNK]
+
+
+def _fetch_all(build, *order_cols: str) -> List[Dict[str, Any]]:
+    """Every row of the query build() returns, paged past the 1000-row cap
+    (a short read would plan, and write, truncated queues)."""
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        q = build()
+        for col in order_cols:
+            q = q.order(col)
+        batch = q.range(offset, offset + _PAGE_SIZE - 1).execute().data or []
+        rows.extend(batch)
+        if len(batch) < _PAGE_SIZE:
+            return rows
+        offset += _PAGE_SIZE
+
+
+def load_context(
+    user_ids: Optional[List[str]] = None,
+    today: Optional[date] = None,
+    task_columns: str = TASK_COLUMNS,
+) -> Dict[str, Any]:
+    """Capacities, calendars and open tasks for `user_ids` (None = everyone
+    who owns an open task or has capacity settings). task_columns must
+    include task_id and Owner_id."""
+    today = today or datetime.utcnow().date()
+    status_ids = active_status_ids()
+
+    def scoped(table: str, columns: str, user_col: str, order: tuple, extra=None) -> List[Dict[str, Any]]:
+        def build(chunk=None):
+            q = supabase.table(table).select(columns)
+            if chunk is not None:
+                q = q.in_(user_col, chunk)
+            return extra(q) if extra else q
+
+        if user_ids is None:
+            return _fetch_all(build, *order)
+        rows: List[Dict[str, Any]] = []
+        for chunk in _chunks(list(user_ids)):
+            rows.extend(_fetch_all(lambda: build(chunk), *order))
+        return rows
+
+    capacity_rows = scoped("user_capacity_settings", "*", "user_id", ("user_id",))
+    time_off_rows = scoped(
+        "user_time_off", "user_id, start_date, end_date", "user_id",
+        ("user_id", "start_date", "end_date"),
+        lambda q: q.gte("end_date", today.isoformat()),
+    )
+    tasks: List[Dict[str, Any]] = []
+    if status_ids:
+        tasks = scoped(
+            "tasks", task_columns, "Owner_id", ("task_id",),
+            lambda q: q.in_("task_status", status_ids),
+        )
+
+    tasks_by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for t in tasks:
+        if t.get("Owner_id"):
+            tasks_by_user.setdefault(t["Owner_id"], []).append(t)
+    off_by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for r in time_off_rows:
+        off_by_user.setdefault(r.get("user_id"), []).append(r)
+    capacity_by_user = {r["user_id"]: r for r in capacity_rows if r.get("user_id")}
+
+    if user_ids is None:
+        user_ids = sorted(set(tasks_by_user) | set(capacity_by_user) | (set(off_by_user) - {None}))
+
+    users: Dict[str, Dict[str, Any]] = {}
+    for uid in user_ids:
+        cap = Capacity.from_row(capacity_by_user.get(uid))
+        users[uid] = {
+            "capacity": cap,
+            "calendar": WorkCalendar(cap.working_days, expand_time_off(off_by_user.get(uid), today)),
+            "tasks": tasks_by_user.get(uid, []),
+        }
+    return {"today": today, "users": users}
+
+
+def user_entry(ctx: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    """ctx["users"][user_id], or defaults for a user with no capacity
+    settings, time off or open tasks."""
+    entry = ctx["users"].get(user_id)
+    if entry is None:
+        cap = Capacity()
+        entry = {"capacity": cap, "calendar": WorkCalendar(cap.working_days), "tasks": []}
+    return entry
+
+
+# ====================================================================
+# Dependencies
+# ====================================================================
+
+def explicit_dependencies() -> List[Dict[str, Any]]:
+    """Dependencies set by people (is_auto_generated = false). Auto links
+    only mirror queue order, which plan_queue already follows."""
+    try:
+        return _fetch_all(
+            lambda: supabase.table("task_dependencies")
+            .select("predecessor_task_id, successor_task_id, dependency_type, lag_hours")
+            .eq("is_auto_generated", False),
+            "predecessor_task_id", "successor_task_id",
+        )
+    except Exception as e:
+        logger.warning("[WorkloadScheduler] dependencies read failed, scheduling without them: %s", e)
+        return []
+
+
+def dependency_floors(
+    deps: Iterable[Dict[str, Any]],
+    starts: Dict[str, date],
+    ends: Dict[str, date],
+) -> Dict[str, date]:
+    """Earliest start day per successor, from predecessors with known dates.
+
+    finish_to_start waits for the day after the predecessor ends; the other
+    types, at day granularity, only wait for it to start. Positive lag adds
+    whole days of DEFAULT_HOURS_PER_DAY.
+    """
+    floors: Dict[str, date] = {}
+    for d in deps:
+        pred, succ = d.get("predecessor_task_id"), d.get("successor_task_id")
+        if (d.get("dependency_type") or "finish_to_start") == "finish_to_start":
+            anchor = ends.get(pred)
+            floor = anchor + timedelta(days=1) if anchor else None
+        else:
+            floor = starts.get(pred)
+        if floor is None:
+            continue
+        lag = float(d.get("lag_hours") or 0)
+        if lag > 0:
+            floor += timedelta(days=math.ceil(lag / DEFAULT_HOURS_PER_DAY))
+        if succ not in floors or floor > floors[succ]:
+            floors[succ] = floor
+    return floors
+
+
+def _stored_dates(deps: List[Dict[str, Any]], planned: set) -> Tuple[Dict[str, date], Dict[str, date]]:
+    """Current schedule of open predecessors this run doesn't replan."""
+    outside = sorted({d["predecessor_task_id"] for d in deps if d.get("predecessor_task_id") not in planned})
+    starts: Dict[str, date] = {}
+    ends: Dict[str, date] = {}
+    if not outside:
+        return starts, ends
+    open_ids = set(active_status_ids())
+    for chunk in _chunks(outside):
+        rows = (
+            supabase.table("tasks")
+            .select("task_id, task_status, scheduled_start_date, scheduled_end_date")
+            .in_("task_id", chunk).execute().data or []
+        )
+        for r in rows:
+            if r.get("task_status") not in open_ids:
+                continue  # finished predecessors hold nothing back
+            for key, out in (("scheduled_start_date", starts), ("scheduled_end_date", ends)):
+                if r.get(key):
+                    out[r["task_id"]] = date.fromisoformat(str(r[key])[:10])
+    return starts, ends
+
+
+def _plan_users(
+    users: Dict[str, Dict[str, Any]],
+    today: date,
+    deps: List[Dict[str, Any]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """plan_queue for every user, repeated until dependency floors settle."""
+    planned = {t["task_id"] for u in users.values() for t in u["tasks"]}
+    deps = [d for d in deps if d.get("successor_task_id") in planned]
+    fixed_starts, fixed_ends = _stored_dates(deps, planned) if deps else ({}, {})
+    floors = dependency_floors(deps, fixed_starts, fixed_ends)
+    plans: Dict[str, List[Dict[str, Any]]] = {}
+    for _ in range(_MAX_PASSES):
+        plans = {
+            uid: plan_queue(u["tasks"], u["capacity"], u["calendar"], today, floors)
+            for uid, u in users.items()
+        }
+        if not deps:
+            return plans
+        starts, ends = dict(fixed_starts), dict(fixed_ends)
+        for plan in plans.values():
+            for p in plan:
+                starts[p["task_id"]] = date.fromisoformat(p["scheduled_start_date"])
+                ends[p["task_id"]] = date.fromisoformat(p["scheduled_end_date"])
+        nxt = dependency_floors(deps, starts, ends)
+        if nxt == floors:
+            return plans
+        floors = nxt
+    logger.warning("[WorkloadScheduler] dependency floors did not settle (cycle?); using last pass")
+    return plans
+
+
+# ====================================================================
+# Persisting
+# ====================================================================
+
+_SCHEDULE_KEYS = ("scheduled_start_date", "scheduled_end_date", "queue_position",
+                  "scheduling_status", "blocked_by_task_id", "auto_linked")
+
+
+def _unchanged(current: Dict[str, Any], planned: Dict[str, Any]) -> bool:
+    for key in _SCHEDULE_KEYS:
+        a, b = current.get(key), planned.get(key)
+        if key in ("scheduled_start_date", "scheduled_end_date"):
+            a = str(a)[:10] if a else None
+        if key == "auto_linked":
+            a = bool(a)
+        if a != b:
+            return False
+    return True
+
+
+def save_schedule(rows: List[Dict[str, Any]]) -> int:
+    """Write planned rows. One RPC; per-row updates if the function is
+    missing. Returns rows written."""
+    if not rows:
+        return 0
+    try:
+        res = supabase.rpc("apply_task_schedule", {"p_rows": rows}).execute()
+        return int(res.data or 0)
+    except Exception as e:
+        logger.warning("[WorkloadScheduler] bulk schedule write failed, per-row fallback: %s", e)
+    written = 0
+    for r in rows:
+        try:
+            supabase.table("tasks").update(
+                {k: r[k] for k in _SCHEDULE_KEYS}
+            ).eq("task_id", r["task_id"]).execute()
+            written += 1
+        except Exception as e:
+            logger.warning("[WorkloadScheduler] schedule write failed for %s: %s", r.get("task_id"), e)
+    return written
+
+
+def schedule_users(
+    user_ids: Optional[List[str]] = None,
+    today: Optional[date] = None,
+    persist: bool = True,
+    ctx: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Recalculate the queues of `user_ids` (None = whole team) in one pass."""
+    ctx = ctx or load_context(user_ids, today)
+    today = ctx["today"]
+    plans = _plan_users(ctx["users"], today, explicit_dependencies())
+
+    per_user: Dict[str, Dict[str, Any]] = {}
+    changed: List[Dict[str, Any]] = []
+    for uid, u in ctx["users"].items():
+        plan = plans[uid]
+        current = {t["task_id"]: t for t in u["tasks"]}
+        changed.extend(p for p in plan if not _unchanged(current.get(p["task_id"], {}), p))
+        per_user[uid] = {
+            "tasks_scheduled": len(plan),
+            "schedule_ends": plan[-1]["scheduled_end_date"] if plan else str(today),
+            "plan": plan,
+        }
+
+    written = save_schedule(changed) if persist else 0
+    return {
+        "users": per_user,
+        "tasks_scheduled": sum(v["tasks_scheduled"] for v in per_user.values()),
+        "tasks_changed": len(changed),
+        "tasks_written": written,
+    }
+
+
+def schedule_downstream(
+    task_ids: Iterable[str],
+    today: Optional[date] = None,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """Replan only what a change to `task_ids` can move: the tasks, their
+    dependency descendants and, in each affected owner's queue, everything
+    from the first affected task on. Earlier queue entries and uninvolved
+    owners are neither read nor written."""
+    today = today or datetime.utcnow().date()
+    task_ids = [t for t in dict.fromkeys(task_ids) if t]
+    affected = set(task_ids) | dependency_graph.downstream(task_ids)
+    owner_of: Dict[str, Optional[str]] = {}
+    users: Dict[str, Dict[str, Any]] = {}
+
+    for _ in range(_MAX_PASSES):
+        # Owners straight from tasks (not the cached graphs), so a task that
+        # was just reassigned is replanned in its new owner's queue.
+        missing = [t for t in affected if t not in owner_of]
+        for chunk in _chunks(missing):
+            for r in supabase.table("tasks").select("task_id, Owner_id").in_("task_id", chunk).execute().data or []:
+                owner_of[r["task_id"]] = r.get("Owner_id")
+        owner_of.update({t: None for t in missing if t not in owner_of})
+
+        new_owners = sorted({o for t, o in owner_of.items() if o and t in affected} - set(users))
+        if new_owners:
+            users.update(load_context(new_owners, today)["users"])
+
+        tails = set()
+        for u in users.values():
+            queue = sorted(u["tasks"], key=queue_sort_key)
+            first = next((i for i, t in enumerate(queue) if t["task_id"] in affected), None)
+            if first is not None:
+                tails.update(t["task_id"] for t in queue[first:])
+        grown = tails - affected
+        grown |= dependency_graph.downstream(grown) - affected
+        if not grown and not new_owners:
+            break
+        affected |= grown
+
+    plans = _plan_users(users, today, explicit_dependencies())
+    changed: List[Dict[str, Any]] = []
+    planned: List[Dict[str, Any]] = []
+    for uid, plan in plans.items():
+        current = {t["task_id"]: t for t in users[uid]["tasks"]}
+        for p in plan:
+            if p["task_id"] not in affected:
+                continue
+            planned.append(p)
+            if not _unchanged(current.get(p["task_id"], {}), p):
+                changed.append(p)
+
+    written = save_schedule(changed) if persist else 0
+    return {
+        "tasks_affected": len(affected),
+        "users": sorted(users),
+        "tasks_scheduled": len(planned),
+        "tasks_changed": len(changed),
+        "tasks_written": written,
+        "plan": planned,
+    }
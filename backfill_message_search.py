@@ -0,0 +1,38 @@
+# Fill messages.search_tsv for rows written before sql/create_message_search.sql.
+#
+# Calls the backfill_message_search() RPC in batches until nothing is left, so
+# the table is never locked by one long UPDATE. Safe to re-run; new messages
+# are indexed by the trigger and never need this.
+#
+# Usage:
+#   .venv/Scripts/python.exe backfill_message_search.py               # 5000 rows per batch
+#   .venv/Scripts/python.exe backfill_message_search.py --batch 1000
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from supabase import create_client
+
+load_dotenv()
+
+sb = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+
+BATCH = int(sys.argv[sys.argv.index("--batch") + 1]) if "--batch" in sys.argv else 5000
+
+
+def main():
+    total = 0
+    started = time.time()
+    while True:
+        resp = sb.rpc("backfill_message_search", {"p_batch": BATCH}).execute()
+        filled = int(resp.data or 0)
+        if not filled:
+            break
+        total += filled
+        print(f"  indexed {total} messages ({time.time() - started:.1f}s)")
+    print(f"Done: {total} messages backfilled.")
+
+
+if __name__ == "__main__":
+    main()
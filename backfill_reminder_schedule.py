@@ -0,0 +1,54 @@
+# Fill calendar_events.next_reminder_at for recurring events written before
+# sql/calendar_reminder_schedule.sql (the migration itself backfills one-offs).
+#
+# Expands each series with the same rules the API uses
+# (api/services/calendar_reminders.py) and writes the schedules in batches.
+# Safe to re-run; events created or edited afterwards are scheduled by the API.
+#
+# Usage:
+#   .venv/Scripts/python.exe backfill_reminder_schedule.py            # write
+#   .venv/Scripts/python.exe backfill_reminder_schedule.py --dry-run  # count only
+
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from api.services import calendar_reminders  # noqa: E402  (needs env loaded)
+from api.supabase_client import supabase  # noqa: E402
+
+DRY_RUN = "--dry-run" in sys.argv
+BATCH = 500
+
+
+def main():
+    started = time.time()
+    res = (
+        supabase.table("calendar_events")
+        .select("event_id, start_at, rrule, rrule_until, reminder_minutes, next_reminder_at")
+        .not_.is_("reminder_minutes", "null")
+        .execute()
+    )
+    rows = res.data or []
+    print(f"{len(rows)} events with a reminder")
+
+    scheduled = 0
+    written = 0
+    for i in range(0, len(rows), BATCH):
+        chunk = rows[i:i + BATCH]
+        updates = [
+            {"event_id": r["event_id"], **calendar_reminders.schedule_fields(r)}
+            for r in chunk
+        ]
+        scheduled += sum(1 for u in updates if u["next_reminder_at"])
+        if not DRY_RUN:
+            written += calendar_reminders.save_schedules(updates)
+        print(f"  {min(i + BATCH, len(rows))}/{len(rows)} ({time.time() - started:.1f}s)")
+
+    print(f"Done: {scheduled} with an upcoming reminder, {written} rows written"
+          f"{' (dry run)' if DRY_RUN else ''}.")
+
+
+if __name__ == "__main__":
+    main()
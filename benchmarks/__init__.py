@@ -0,0 +1,13 @@
+# benchmarks/
+# ============================================================================
+# Offline benchmarks. Nothing in here talks to OpenAI or Supabase: recorded
+# model responses and an in-memory table store stand in for both, so the
+# suites run in CI and on a laptop with no credentials.
+#
+#   python -m benchmarks.ocr_bench      receipt OCR + categorization
+#   python -m benchmarks.rrule_check    rrule_lite vs dateutil.rrule
+#   python -m benchmarks.workload_schedule  workload scheduler vs day-by-day walk
+#   python -m benchmarks.dependency_graph   dependency DAG vs brute force, downstream replans
+#   python -m benchmarks.qbo_name_match     QBO auto-match name lookup vs brute force
+#   python -m benchmarks.push_fanout        push send path through StubTransport
+# ============================================================================
@@ -0,0 +1,245 @@
+# benchmarks/dependency_graph.py
+# ============================================================================
+# Dependency DAG — correctness cross-check + downstream rescheduling cost
+# ============================================================================
+# 1. Random graphs built edge by edge through ProjectGraph.add_edge() and
+#    checked against brute force:
+#
+#      cycle rejection        ==  DFS reachability successor -> predecessor
+#      topological_order()    respects every edge (cached order included)
+#      schedule() earliest    ==  Bellman-style relaxation of all edges
+#      critical_path          is a chain of edges whose hours add up to
+#                             project_hours, every task on it critical
+#
+# 2. One task changes in a team of --users x --tasks open tasks whose
+#    projects carry finish_to_start chains across owners:
+#
+#      full        workload_scheduler.schedule_users() (whole team)
+#      downstream  workload_scheduler.schedule_downstream([task])
+#
+#    starting from a stored schedule. Reports reads, tasks replanned and
+#    rows that would be written; the downstream rows must match the full
+#    pass.
+#
+# Usage:
+#   python -m benchmarks.dependency_graph
+#   python -m benchmarks.dependency_graph --cases 1000 --users 30 --tasks 200
+#
+# Exit code 1 on any mismatch.
+# ============================================================================
+
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import date
+
+from benchmarks.replay import FakeSupabase, install_supabase
+
+_DB = FakeSupabase()
+install_supabase(_DB)
+
+from api.services import dependency_graph as dg, pipeline_lookups, workload_scheduler as ws  # noqa: E402
+
+_STATUSES = [
+    {"task_status_id": "st-not-started", "task_status": "Not Started"},
+    {"task_status_id": "st-working", "task_status": "Working on It"},
+    {"task_status_id": "st-done", "task_status": "Done"},
+]
+_TYPES = dg.DEPENDENCY_TYPES
+
+
+# ====================================================================
+# Graph oracle
+# ====================================================================
+
+def _reaches(edges, start, target):
+    stack, seen = [start], {start}
+    while stack:
+        cur = stack.pop()
+        if cur == target:
+            return True
+        for nxt in edges.get(cur, ()):
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return False
+
+
+def _relaxed_starts(graph, ids, edges):
+    dur = {t: graph.nodes[t]["hours"] for t in ids}
+    es = {t: 0.0 for t in ids}
+    for _ in range(len(ids)):
+        for e in edges:
+            p, s = e.predecessor, e.successor
+            bound = {
+                "finish_to_start": es[p] + dur[p],
+                "start_to_start": es[p],
+                "finish_to_finish": es[p] + dur[p] - dur[s],
+                "start_to_finish": es[p] - dur[s],
+            }[e.dependency_type] + e.lag_hours
+            es[s] = max(es[s], bound)
+    return es
+
+
+def check(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+
+    def fail(msg):
+        nonlocal failures
+        failures += 1
+        if failures <= 10:
+            print("MISMATCH", msg)
+
+    for n in range(cases):
+        size = rng.randint(2, 30)
+        ids = [f"t{i}" for i in range(size)]
+        graph = dg.ProjectGraph("p")
+        for t in ids:
+            graph.set_task({"task_id": t, "project_id": "p",
+                            "estimated_hours": rng.choice((0.5, 1, 2, 4, 8, 16))})
+        succ, edges = {}, []
+        for _ in range(rng.randint(0, size * 2)):
+            p, s = rng.sample(ids, 2)
+            edge = dg.Edge(p, s, rng.choice(_TYPES), rng.choice((0, 0, 0, 2, 4)))
+            expect_cycle = _reaches(succ, s, p)
+            try:
+                graph.add_edge(edge)
+                got_cycle = False
+            except dg.DependencyCycleError:
+                got_cycle = True
+            if got_cycle != expect_cycle:
+                fail(f"#{n} cycle check {p}->{s}: {got_cycle} != {expect_cycle}")
+            if not got_cycle:
+                # A repeated pair replaces the earlier edge, as in the table.
+                edges = [e for e in edges if (e.predecessor, e.successor) != (p, s)] + [edge]
+                succ.setdefault(p, set()).add(s)
+            # The cached order must stay valid across incremental updates.
+            pos = {t: i for i, t in enumerate(graph.topological_order())}
+            if len(pos) != size or any(pos[e.predecessor] > pos[e.successor] for e in edges):
+                fail(f"#{n} topological order")
+                break
+
+        cpm = graph.schedule()
+        es = _relaxed_starts(graph, ids, edges)
+        for t in ids:
+            if abs(cpm["tasks"][t]["earliest_start"] - round(max(es[t], 0.0), 2)) > 1e-6:
+                fail(f"#{n} earliest_start {t}: {cpm['tasks'][t]['earliest_start']} != {es[t]}")
+                break
+        path = cpm["critical_path"]
+        linked = all(path[i + 1] in succ.get(path[i], ()) for i in range(len(path) - 1))
+        if not linked or not all(cpm["tasks"][t]["critical"] for t in path):
+            fail(f"#{n} critical path {path}")
+        if not any(e.dependency_type != "finish_to_start" or e.lag_hours for e in edges):
+            hours = sum(graph.nodes[t]["hours"] for t in path)
+            if abs(hours - cpm["project_hours"]) > 1e-6:
+                fail(f"#{n} critical path hours {hours} != {cpm['project_hours']}")
+    return failures
+
+
+# ====================================================================
+# Downstream vs full recalculation
+# ====================================================================
+
+def _seed(users, tasks_per_user, seed):
+    rng = random.Random(seed)
+    owners = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    projects = [f"proj-{i}" for i in range(max(1, users // 3))]
+    tasks, deps = [], []
+    by_project = {}
+    for o in owners:
+        for i in range(tasks_per_user):
+            pid = rng.choice(projects)
+            t = {
+                "task_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "Owner_id": o, "project_id": pid, "task_status": "st-not-started",
+                "estimated_hours": rng.choice((1, 2, 4, 8)), "queue_position": i + 1,
+                "deadline": None, "created_at": "2026-01-01T00:00:00+00:00",
+            }
+            tasks.append(t)
+            by_project.setdefault(pid, []).append(t["task_id"])
+    for pid, ids in by_project.items():
+        # A few short cross-owner chains per project.
+        for _ in range(max(1, len(ids) // 40)):
+            chain = rng.sample(ids, min(len(ids), 4))
+            for a, b in zip(chain, chain[1:]):
+                deps.append({
+                    "dependency_id": str(uuid.uuid4()), "predecessor_task_id": a, "successor_task_id": b,
+                    "dependency_type": "finish_to_start", "lag_hours": 0, "is_auto_generated": False,
+                })
+    _DB.tables = {
+        "tasks_status": _STATUSES, "users": [], "projects": [], "companies": [],
+        "tasks_priority": [], "task_completed_status": [], "task_types": [],
+        "user_capacity_settings": [], "user_time_off": [], "tasks": tasks,
+        "task_dependencies": deps,
+    }
+    return rng.choice(deps)["predecessor_task_id"] if deps else tasks[0]["task_id"]
+
+
+def _measure(label, fn):
+    _DB.reset_counters()
+    t0 = time.perf_counter()
+    result = fn()
+    cpu = time.perf_counter() - t0
+    print(f"  {label:<26} cpu {cpu * 1000:8.1f} ms   reads {sum(_DB.reads.values()):4d}   "
+          f"replanned {result['tasks_scheduled']:6d}   writes {result['tasks_changed']:6d}")
+    return result
+
+
+def compare(users, tasks_per_user, seed):
+    _seed(users, tasks_per_user, seed)
+    rng = random.Random(seed + 1)
+    today = date(2026, 10, 19)
+    pipeline_lookups.invalidate()
+    pipeline_lookups.get_lookups()
+
+    # Start from a stored schedule, then grow one task's estimate.
+    baseline = ws.schedule_users(None, today=today, persist=False)
+    by_id = {t["task_id"]: t for t in _DB.tables["tasks"]}
+    for u in baseline["users"].values():
+        for p in u["plan"]:
+            by_id[p["task_id"]].update(p)
+    changed = rng.choice(_DB.tables["tasks"])
+    changed["estimated_hours"] += 8
+    print(f"\n{users} users x {tasks_per_user} open tasks, "
+          f"{len(_DB.tables['task_dependencies'])} dependencies, one estimate changed")
+
+    full = _measure("full (schedule_users)", lambda: ws.schedule_users(None, today=today, persist=False))
+    dg.invalidate()
+    _measure("downstream, cold graphs", lambda: ws.schedule_downstream([changed["task_id"]], today=today, persist=False))
+    down = _measure("downstream, cached graphs",
+                    lambda: ws.schedule_downstream([changed["task_id"]], today=today, persist=False))
+
+    # Every row the full pass rewrites must be replanned, identically, downstream.
+    full_changed = {p["task_id"]: p for u in full["users"].values() for p in u["plan"]
+                    if not ws._unchanged(by_id[p["task_id"]], p)}
+    down_plan = {p["task_id"]: p for p in down["plan"]}
+    missing = [tid for tid, p in full_changed.items()
+               if tid not in down_plan
+               or (down_plan[tid]["scheduled_start_date"], down_plan[tid]["scheduled_end_date"])
+               != (p["scheduled_start_date"], p["scheduled_end_date"])]
+    if missing:
+        print(f"  {len(missing)} rows changed by the full pass are missing or differ downstream")
+    return len(missing)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cases", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--users", type=int, default=30)
+    ap.add_argument("--tasks", type=int, default=200, help="open tasks per user")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    failures = check(args.cases, args.seed)
+    print(f"{args.cases} random dependency graphs checked against brute force in "
+          f"{time.perf_counter() - t0:.1f}s: {failures} mismatches")
+    failures += compare(args.users, args.tasks, args.seed)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
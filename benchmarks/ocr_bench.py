@@ -0,0 +1,400 @@
+# benchmarks/ocr_bench.py
+# ============================================================================
+# Offline OCR / categorization benchmark
+# ============================================================================
+# Replays a fixture corpus of receipts through the real pipeline code:
+#
+#   extract_best      receipt_regex layer on its own (no GPT)
+#   super-fast        scan_receipt, regex only
+#   fast-beta         scan_receipt, regex -> gpt-5-mini fallback
+#   fast              scan_receipt, pdfplumber text -> gpt-5.2
+#   heavy             scan_receipt, vision -> gpt-5.2
+#   categorize        auto_categorize on the expected line items
+#
+# OpenAI and Supabase are replaced by benchmarks/replay.py: model answers come
+# from each fixture's "recorded" block, lookups from fixtures/lookups.json.
+# Everything the pipeline does locally (prompt building, vendor shortlist,
+# regex, JSON parsing, tax redistribution, gating) runs for real.
+#
+# Per mode it reports: local latency p50/p95 (our code only), estimated
+# end-to-end latency (local + recorded API time), input/output tokens and USD
+# cost per receipt, and field-level accuracy (vendor, date, bill_id, total,
+# item count, amounts, account).
+#
+# Usage:
+#   python -m benchmarks.ocr_bench                       # table + regression gate
+#   python -m benchmarks.ocr_bench --json out.json       # also write the report
+#   python -m benchmarks.ocr_bench --update-baseline     # accept current numbers
+#
+# Exit code 1 when a metric regresses against benchmarks/baseline.json:
+#   accuracy  any drop (beyond float noise) or more errors than the baseline
+#   tokens    input tokens per receipt up more than --token-tolerance (10%)
+#   latency   local p50 up more than --latency-tolerance (100%) AND > 25 ms;
+#             skipped with --no-latency-gate (noisy shared CI runners)
+#
+# Fixture format: see fixtures/receipts/*.json. "text" stands in for the
+# pdfplumber output; a fixture may instead set "pdf" to a path (relative to
+# the fixture) to exercise the real PDF extraction.
+# ============================================================================
+
+import argparse
+import base64
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_HERE = Path(__file__).resolve().parent
+_ROOT = _HERE.parent
+FIXTURES_DIR = _HERE / "fixtures"
+BASELINE_PATH = _HERE / "baseline.json"
+
+SCAN_MODES = ("super-fast", "fast-beta", "fast", "heavy")
+ALL_MODES = ("extract_best",) + SCAN_MODES + ("categorize",)
+
+_AMOUNT_TOL = 0.02
+_MIN_LATENCY_DELTA_MS = 25.0
+
+# Replayed calls must never queue behind the production rate limits.
+for _tier in ("MINI", "HEAVY"):
+    os.environ.setdefault(f"GPT_RPM_{_tier}", "100000")
+    os.environ.setdefault(f"GPT_MAX_CONCURRENCY_{_tier}", "64")
+
+
+# ── Fixtures ─────────────────────────────────────────────────────
+
+def load_fixtures(fixtures_dir: Path = FIXTURES_DIR, only: Optional[List[str]] = None) -> List[dict]:
+    cases = []
+    for path in sorted((fixtures_dir / "receipts").glob("*.json")):
+        case = json.loads(path.read_text(encoding="utf-8"))
+        if only and case["id"] not in only:
+            continue
+        if case.get("pdf"):
+            case["content"] = (path.parent / case["pdf"]).read_bytes()
+        else:
+            case["content"] = f"fixture:{case['id']}".encode("utf-8")
+        cases.append(case)
+    return cases
+
+
+def _seed_tables(fixtures_dir: Path) -> dict:
+    return json.loads((fixtures_dir / "lookups.json").read_text(encoding="utf-8"))
+
+
+# ── Pipeline wiring ──────────────────────────────────────────────
+
+def _wire(fixtures_dir: Path, cases: List[dict]):
+    """Install the offline stand-ins and return the receipt_scanner module."""
+    if str(_ROOT) not in sys.path:
+        sys.path.insert(0, str(_ROOT))
+
+    from benchmarks.replay import FakeSupabase, install
+    db = FakeSupabase(tables=_seed_tables(fixtures_dir))
+    install(db)
+
+    from services import receipt_scanner as rs
+
+    text_by_content = {c["content"]: c["text"] for c in cases if c.get("text") and not c.get("pdf")}
+    real_extract = rs.extract_text_from_pdf
+    real_to_images = rs._convert_pdf_to_images
+
+    def extract_text_from_pdf(file_content: bytes, min_chars: int = 100) -> tuple:
+        text = text_by_content.get(file_content)
+        if text is None:
+            return real_extract(file_content, min_chars)
+        return True, text
+
+    def convert_pdf_to_images(file_content: bytes):
+        if file_content in text_by_content:
+            return [base64.b64encode(file_content).decode("utf-8")]
+        return real_to_images(file_content)
+
+    rs.extract_text_from_pdf = extract_text_from_pdf
+    rs._convert_pdf_to_images = convert_pdf_to_images
+    return rs, db
+
+
+# ── Scoring ──────────────────────────────────────────────────────
+
+def _norm(value) -> str:
+    return str(value or "").strip().upper()
+
+
+def _amounts_score(got: List[float], expected: List[float]) -> float:
+    """Greedy one-to-one match within $0.02, over the larger of the two lists."""
+    if not expected and not got:
+        return 1.0
+    pool = list(got)
+    matched = 0
+    for exp in expected:
+        for i, g in enumerate(pool):
+            if abs(g - exp) <= _AMOUNT_TOL:
+                matched += 1
+                del pool[i]
+                break
+    return matched / max(len(expected), len(got))
+
+
+def score_scan(result: dict, expected: dict) -> Dict[str, float]:
+    expenses = result.get("expenses") or []
+    amounts = [float(e.get("amount") or 0) for e in expenses]
+    first = expenses[0] if expenses else {}
+    return {
+        "vendor": (sum(1 for e in expenses if e.get("vendor") == expected["vendor"]) / len(expenses))
+        if expenses else 0.0,
+        "date": float(first.get("date") == expected["date"]),
+        "bill_id": float(_norm(first.get("bill_id")) == _norm(expected["bill_id"])),
+        "total": float(abs(sum(amounts) - expected["total"]) <= _AMOUNT_TOL),
+        "items": float(len(expenses) == len(expected["amounts"])),
+        "amounts": _amounts_score(amounts, expected["amounts"]),
+    }
+
+
+def score_regex(meta: dict, expected: dict) -> Dict[str, float]:
+    """extract_best works pre-tax, so only header fields and counts are scored."""
+    gt = meta.get("grand_total")
+    return {
+        "date": float(meta.get("date") == expected["date"]),
+        "bill_id": float(_norm(meta.get("bill_id")) == _norm(expected["bill_id"])),
+        "total": float(gt is not None and abs(gt - expected["total"]) <= _AMOUNT_TOL),
+        "items": float(len(meta.get("line_items") or []) == len(expected["amounts"])),
+    }
+
+
+def score_categorize(result: dict, expenses: List[dict], expected: dict) -> Dict[str, float]:
+    by_row = {c["rowIndex"]: c for c in result.get("categorizations") or []}
+    hits = sum(
+        1 for e in expenses
+        if (by_row.get(e["rowIndex"]) or {}).get("account_id") == expected["accounts"].get(e["description"])
+    )
+    return {"account": hits / len(expenses) if expenses else 1.0}
+
+
+# ── Runner ───────────────────────────────────────────────────────
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _run_one(rs, case: dict, mode: str):
+    """Run one (case, mode). Returns (scores | None, error | None)."""
+    expected = case["expected"]
+    if mode == "extract_best":
+        from services.receipt_regex import clean_receipt_text, extract_best
+        meta, _ = extract_best(clean_receipt_text(case["text"]), filename=case.get("filename"))
+        return score_regex(meta, expected), None
+    if mode == "categorize":
+        expenses = [{"rowIndex": i, "description": d} for i, d in enumerate(expected["accounts"])]
+        result = rs.auto_categorize(case["stage"], expenses)
+        return score_categorize(result, expenses, expected), None
+    result = rs.scan_receipt(case["content"], case["file_type"], model=mode,
+                             filename=case.get("filename"))
+    return score_scan(result, expected), None
+
+
+def _applies(case: dict, mode: str) -> bool:
+    if mode == "extract_best":
+        return bool(case.get("text"))
+    if mode == "categorize":
+        return bool(case["expected"].get("accounts"))
+    return mode in case.get("modes", SCAN_MODES)
+
+
+def run(cases: List[dict], fixtures_dir: Path = FIXTURES_DIR, repeat: int = 3,
+        modes: Optional[List[str]] = None) -> dict:
+    from api.services.ai_usage import estimate_cost
+    rs, db = _wire(fixtures_dir, cases)
+    from benchmarks.replay import recorder
+
+    modes = list(modes or ALL_MODES)
+    report: Dict[str, dict] = {}
+
+    for mode in modes:
+        local_ms: List[float] = []
+        e2e_ms: List[float] = []
+        fields: Dict[str, List[float]] = {}
+        in_tok = out_tok = 0
+        cost = 0.0
+        errors: List[str] = []
+        receipts = 0
+
+        for case in cases:
+            if not _applies(case, mode):
+                continue
+            receipts += 1
+            for rep in range(max(1, repeat)):
+                recorder.use(case.get("recorded", {}), mode)
+                t0 = time.perf_counter()
+                try:
+                    scores, _ = _run_one(rs, case, mode)
+                    error = None
+                except Exception as exc:  # noqa: BLE001 — a failed mode is a data point
+                    scores, error = None, f"{case['id']}: {type(exc).__name__}: {exc}"[:200]
+                elapsed = (time.perf_counter() - t0) * 1000
+                calls = recorder.take_calls()
+                api_ms = sum(c["api_ms"] for c in calls)
+                local_ms.append(elapsed)
+                e2e_ms.append(elapsed + api_ms)
+
+                # Accuracy / tokens / cost are deterministic: count the first pass only.
+                if rep:
+                    continue
+                for c in calls:
+                    in_tok += c["input_tokens"]
+                    out_tok += c["output_tokens"]
+                    cost += estimate_cost(c["model"], c["input_tokens"], c["output_tokens"])
+                if error:
+                    errors.append(error)
+                    scores = None
+                for name in _field_names(mode):
+                    fields.setdefault(name, []).append((scores or {}).get(name, 0.0))
+
+        if not receipts:
+            continue
+        report[mode] = {
+            "receipts": receipts,
+            "errors": len(errors),
+            "error_samples": errors[:5],
+            "local_ms_p50": round(_pct(local_ms, 0.50), 2),
+            "local_ms_p95": round(_pct(local_ms, 0.95), 2),
+            "est_total_ms_p50": round(_pct(e2e_ms, 0.50), 1),
+            "input_tokens_per_receipt": round(in_tok / receipts, 1),
+            "output_tokens_per_receipt": round(out_tok / receipts, 1),
+            "cost_usd_per_receipt": round(cost / receipts, 6),
+            "accuracy": {k: round(statistics.mean(v), 4) for k, v in fields.items()},
+        }
+
+    return {
+        "fixtures": [c["id"] for c in cases],
+        "repeat": repeat,
+        "db_reads": dict(sorted(db.reads.items())),
+        "modes": report,
+    }
+
+
+def _field_names(mode: str) -> List[str]:
+    if mode == "extract_best":
+        return ["date", "bill_id", "total", "items"]
+    if mode == "categorize":
+        return ["account"]
+    return ["vendor", "date", "bill_id", "total", "items", "amounts"]
+
+
+# ── Regression gate ──────────────────────────────────────────────
+
+def compare(report: dict, baseline: dict, token_tol: float = 0.10,
+            latency_tol: float = 1.0, latency_gate: bool = True) -> List[str]:
+    """Human-readable list of regressions (empty = pass)."""
+    problems = []
+    for mode, base in (baseline.get("modes") or {}).items():
+        cur = report["modes"].get(mode)
+        if cur is None:
+            problems.append(f"{mode}: missing from this run")
+            continue
+        if cur["errors"] > base["errors"]:
+            problems.append(f"{mode}: errors {base['errors']} -> {cur['errors']}")
+        for field, was in base.get("accuracy", {}).items():
+            now = cur["accuracy"].get(field, 0.0)
+            if now < was - 1e-6:
+                problems.append(f"{mode}: {field} accuracy {was:.3f} -> {now:.3f}")
+        was_tok = base.get("input_tokens_per_receipt", 0)
+        now_tok = cur["input_tokens_per_receipt"]
+        if was_tok and now_tok > was_tok * (1 + token_tol):
+            problems.append(f"{mode}: input tokens/receipt {was_tok:.0f} -> {now_tok:.0f} "
+                            f"(+{(now_tok / was_tok - 1) * 100:.0f}%)")
+        if latency_gate:
+            was_ms = base.get("local_ms_p50", 0)
+            now_ms = cur["local_ms_p50"]
+            if now_ms > was_ms * (1 + latency_tol) and now_ms - was_ms > _MIN_LATENCY_DELTA_MS:
+                problems.append(f"{mode}: local p50 {was_ms:.1f}ms -> {now_ms:.1f}ms")
+    return problems
+
+
+def _baseline_view(report: dict) -> dict:
+    """What gets committed as the baseline (no per-machine noise beyond p50)."""
+    keep = ("receipts", "errors", "local_ms_p50", "input_tokens_per_receipt",
+            "output_tokens_per_receipt", "cost_usd_per_receipt", "accuracy")
+    return {
+        "fixtures": report["fixtures"],
+        "modes": {m: {k: v[k] for k in keep} for m, v in report["modes"].items()},
+    }
+
+
+# ── Output ───────────────────────────────────────────────────────
+
+def print_table(report: dict) -> None:
+    header = f"{'mode':<13}{'n':>3}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'e2e ms':>9}" \
+             f"{'in tok':>9}{'out tok':>9}{'$/rcpt':>10}  accuracy"
+    print(header)
+    print("-" * len(header))
+    for mode, r in report["modes"].items():
+        acc = " ".join(f"{k}={v:.2f}" for k, v in r["accuracy"].items())
+        print(f"{mode:<13}{r['receipts']:>3}{r['errors']:>5}{r['local_ms_p50']:>9.1f}"
+              f"{r['local_ms_p95']:>9.1f}{r['est_total_ms_p50']:>9.0f}"
+              f"{r['input_tokens_per_receipt']:>9.0f}{r['output_tokens_per_receipt']:>9.0f}"
+              f"{r['cost_usd_per_receipt']:>10.5f}  {acc}")
+        for sample in r["error_samples"]:
+            print(f"{'':<13}! {sample}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline OCR / categorization benchmark")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    parser.add_argument("--only", nargs="*", help="fixture ids to run")
+    parser.add_argument("--modes", nargs="*", choices=ALL_MODES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per receipt/mode")
+    parser.add_argument("--json", type=Path, help="write the full report here")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--token-tolerance", type=float, default=0.10)
+    parser.add_argument("--latency-tolerance", type=float, default=1.0)
+    parser.add_argument("--no-latency-gate", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    cases = load_fixtures(args.fixtures, args.only)
+    if not cases:
+        print(f"No fixtures found under {args.fixtures}")
+        return 2
+
+    report = run(cases, args.fixtures, repeat=args.repeat, modes=args.modes)
+    print_table(report)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(_baseline_view(report), indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("\nNo baseline; run with --update-baseline to create one.")
+        return 0
+
+    problems = compare(
+        report, json.loads(args.baseline.read_text(encoding="utf-8")),
+        token_tol=args.token_tolerance, latency_tol=args.latency_tolerance,
+        latency_gate=not args.no_latency_gate,
+    )
+    if problems:
+        print("\nREGRESSIONS vs baseline:")
+        for p in problems:
+            print(f"  - {p}")
+        return 1
+    print("\nNo regressions vs baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
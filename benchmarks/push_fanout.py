@@ -0,0 +1,151 @@
+# benchmarks/push_fanout.py
+# ============================================================================
+# Push fan-out through StubTransport — correctness + query/multicast counts
+# ============================================================================
+# Seeds push_tokens for --users recipients (0-3 active devices each, some
+# inactive rows, some tokens FCM will report as unregistered), swaps in
+# firebase_notifications.StubTransport and drives the real send path:
+#
+#   send_push_to_users      every active token of every recipient is sent
+#                           exactly once, in multicasts of <= 500 tokens,
+#                           after one token query per 200 recipients
+#   invalid tokens          counted as failed, deactivated in one update per
+#                           100 tokens, never reported as delivered
+#   notify_message_recipients / notify_mentioned_users
+#                           title / body / string-only data payload as built,
+#                           prefetched tokens_by_user skips the token query
+#   send_push_notification  True only for a user with a deliverable token
+#
+# Usage:
+#   python -m benchmarks.push_fanout
+#   python -m benchmarks.push_fanout --users 5000 --seed 3
+#
+# Needs firebase-admin (already in requirements.txt). Exit code 1 on any
+# mismatch.
+# ============================================================================
+
+import argparse
+import asyncio
+import math
+import random
+import sys
+import time
+
+from benchmarks.replay import FakeSupabase, install_supabase
+
+_DB = FakeSupabase()
+install_supabase(_DB)
+
+from api.services import firebase_notifications as fn  # noqa: E402
+
+
+def _seed(users, seed):
+    rng = random.Random(seed)
+    ids = [f"user-{i:05d}" for i in range(users)]
+    rows, invalid = [], set()
+    for uid in ids:
+        for d in range(rng.choice((0, 1, 1, 2, 3))):
+            token = f"tok-{uid}-{d}"
+            rows.append({"user_id": uid, "fcm_token": token, "is_active": True})
+            if rng.random() < 0.05:
+                invalid.add(token)
+        if rng.random() < 0.1:
+            rows.append({"user_id": uid, "fcm_token": f"old-{uid}", "is_active": False})
+    _DB.tables = {"push_tokens": rows}
+    active = {}
+    for r in rows:
+        if r["is_active"]:
+            active.setdefault(r["user_id"], []).append(r["fcm_token"])
+    return ids, active, invalid
+
+
+def check(users, seed):
+    ids, active, invalid = _seed(users, seed)
+    stub = fn.StubTransport(invalid_tokens=invalid)
+    previous = fn.set_transport(stub)
+    failures = 0
+
+    def expect(cond, msg):
+        nonlocal failures
+        if not cond:
+            failures += 1
+            print("MISMATCH", msg)
+
+    try:
+        # -- bulk send --
+        _DB.reset_counters()
+        t0 = time.perf_counter()
+        stats = asyncio.run(fn.send_push_to_users(ids, "Title", "Body", data={"n": 1, "url": "/x"}))
+        cpu = time.perf_counter() - t0
+
+        expected = [t for uid in ids for t in active.get(uid, ())]
+        sent = [t for m in stub.sent for t in m["tokens"]]
+        expect(sorted(sent) == sorted(expected), f"tokens sent {len(sent)} != active {len(expected)}")
+        expect(len(set(sent)) == len(sent), "a token was sent twice")
+        expect(all(len(m["tokens"]) <= fn.FCM_MULTICAST_LIMIT for m in stub.sent), "multicast over 500 tokens")
+        expect(len(stub.sent) == math.ceil(len(expected) / fn.FCM_MULTICAST_LIMIT),
+               f"{len(stub.sent)} multicasts for {len(expected)} tokens")
+        expect(_DB.reads.get("push_tokens", 0) == math.ceil(len(ids) / fn._ID_CHUNK),
+               f"{_DB.reads.get('push_tokens', 0)} token queries for {len(ids)} recipients")
+
+        bad = invalid & set(expected)
+        expect(stats["tokens"] == len(expected), f"stats tokens {stats['tokens']}")
+        expect(stats["sent"] == len(expected) - len(bad), f"stats sent {stats['sent']}")
+        expect(stats["failed"] == len(bad), f"stats failed {stats['failed']} != {len(bad)}")
+        expect(stats["invalid_pruned"] == len(bad), f"invalid_pruned {stats['invalid_pruned']}")
+        expect(_DB.writes.get("push_tokens:update", 0) == math.ceil(len(bad) / fn._TOKEN_CHUNK),
+               f"{_DB.writes.get('push_tokens:update', 0)} deactivation updates for {len(bad)} tokens")
+        reachable = {uid for uid in ids if any(t not in invalid for t in active.get(uid, ()))}
+        expect(set(stats["notified_user_ids"]) == reachable,
+               f"notified {len(stats['notified_user_ids'])} != reachable {len(reachable)}")
+        expect(all(isinstance(v, str) for m in stub.sent for v in m["data"].values()),
+               "non-string FCM data value")
+        print(f"send_push_to_users: {len(ids)} recipients, {len(expected)} tokens, "
+              f"{len(stub.sent)} multicasts, {sum(_DB.reads.values())} reads, "
+              f"{len(bad)} invalid pruned, {cpu * 1000:.1f} ms")
+
+        # -- message / mention wrappers with prefetched tokens --
+        sample = [uid for uid in ids if uid in reachable][:3]
+        prefetched = {uid: active[uid] for uid in sample}
+        stub.sent.clear()
+        _DB.reset_counters()
+        delivery = {}
+        n = asyncio.run(fn.notify_message_recipients(
+            sample, "Ana", "x" * 150, "Crew", "group", tokens_by_user=prefetched, delivery=delivery))
+        expect(n == len(sample), f"group notified {n} != {len(sample)}")
+        expect(_DB.reads.get("push_tokens", 0) == 0, "prefetched tokens were queried again")
+        expect(stub.sent and stub.sent[0]["title"] == "Ana in Crew", "group title")
+        expect(stub.sent and stub.sent[0]["body"] == "x" * 100 + "...", "group body preview")
+        expect(stub.sent and stub.sent[0]["data"].get("type") == "message", "group data type")
+        expect("recipients" in delivery, "delivery stats not recorded")
+
+        stub.sent.clear()
+        n = asyncio.run(fn.notify_mentioned_users(sample[:1], "Ana", "hi", "general"))
+        expect(n == 1 and stub.sent[0]["title"] == "Ana mentioned you", "mention notification")
+        expect(stub.sent and stub.sent[0]["data"].get("sender_name") == "Ana", "mention sender_name")
+
+        # -- single-user wrapper --
+        unreachable = next((uid for uid in ids if uid not in reachable), None)
+        expect(asyncio.run(fn.send_push_notification(sample[0], "t", "b")) is True,
+               "send_push_notification to a reachable user")
+        if unreachable:
+            expect(asyncio.run(fn.send_push_notification(unreachable, "t", "b")) is False,
+                   "send_push_notification to a user without a deliverable token")
+    finally:
+        fn.set_transport(previous)
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    failures = check(args.users, args.seed)
+    print(f"push fan-out via StubTransport: {failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# benchmarks/qbo_name_match.py
+# ============================================================================
+# QBO auto-match name lookup — _ProjectNameMatcher vs brute force
+# ============================================================================
+# Random project catalogs built from a small vocabulary (so names overlap:
+# "oak", "oak street", "pine oak street", ...) and random QBO customer names,
+# checked against the rule the matcher documents:
+#
+#   exact normalized name            -> that project
+#   else project names inside X      -> the longest one
+#   else X inside a project name     -> a project whose name contains X
+#   else                             -> None
+#
+# A few fixed cases pin down overlapping names where the longest match does
+# not start leftmost ("pine oak street" with "pine" and "oak street").
+#
+# Usage:
+#   python -m benchmarks.qbo_name_match
+#   python -m benchmarks.qbo_name_match --cases 20000 --seed 3
+#
+# Exit code 1 on any mismatch.
+# ============================================================================
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks.replay import FakeSupabase, install_supabase
+
+install_supabase(FakeSupabase())
+# api.routers.qbo pulls in the auth module, which requires JWT_SECRET at import.
+os.environ.setdefault("JWT_SECRET", "bench")
+
+from api.routers.qbo import _normalize_name, _ProjectNameMatcher  # noqa: E402
+
+_WORDS = ["oak", "street", "pine", "hill", "mesa", "casa", "del", "mar", "adu", "remodel"]
+
+_FIXED = [
+    # (project names, QBO name, expected project name or None)
+    (["Oak", "Oak Street"], "Oak Street", "Oak Street"),
+    (["Oak", "Oak Street"], "Smith - Oak Street ADU", "Oak Street"),
+    (["Pine", "Oak Street"], "Pine Oak Street", "Oak Street"),
+    (["Oak Street", "Oak"], "oak_street remodel", "Oak Street"),
+    (["Casa Del Mar"], "del mar", "Casa Del Mar"),
+    (["Mesa"], "Hill", None),
+]
+
+
+def _expected(projects, name):
+    key = _normalize_name(name)
+    if not key:
+        return set()
+    by_key = {}
+    for p in projects:
+        by_key.setdefault(_normalize_name(p["project_name"]), p)
+    if key in by_key:
+        return {by_key[key]["project_id"]}
+    inside = [k for k in by_key if k and k in key]
+    if inside:
+        longest = max(len(k) for k in inside)
+        return {by_key[k]["project_id"] for k in inside if len(k) == longest}
+    return {p["project_id"] for k, p in by_key.items() if k and key in k}
+
+
+def _phrase(rng, lo, hi):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def check(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+
+    def verify(projects, name, label):
+        nonlocal failures
+        got = _ProjectNameMatcher(projects).match(name)
+        expected = _expected(projects, name)
+        ok = (got is None and not expected) or (got is not None and got["project_id"] in expected)
+        if not ok:
+            failures += 1
+            if failures <= 10:
+                print("MISMATCH", label, repr(name), "->", got and got["project_name"],
+                      "expected one of", sorted(expected))
+
+    for names, name, want in _FIXED:
+        projects = [{"project_id": n, "project_name": n} for n in names]
+        got = _ProjectNameMatcher(projects).match(name)
+        if (got and got["project_name"]) != want:
+            failures += 1
+            print("MISMATCH fixed", repr(name), "->", got and got["project_name"], "expected", want)
+        verify(projects, name, "fixed")
+
+    for n in range(cases):
+        projects = [{"project_id": f"p{i}", "project_name": _phrase(rng, 1, 3)}
+                    for i in range(rng.randint(1, 12))]
+        name = _phrase(rng, 1, 5).replace(" ", rng.choice((" ", "-", "_")), 1)
+        verify(projects, name, f"#{n}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cases", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    failures = check(args.cases, args.seed)
+    print(f"{args.cases} random catalogs + {len(_FIXED)} fixed cases checked in "
+          f"{time.perf_counter() - t0:.1f}s: {failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
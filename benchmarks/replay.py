@@ -0,0 +1,320 @@
+# benchmarks/replay.py
+# ============================================================================
+# Offline stand-ins for the two network dependencies of the receipt pipeline
+# ============================================================================
+#   ReplayOpenAI / AsyncReplayOpenAI
+#       Drop-in for the OpenAI client objects gpt_client holds
+#       (_sync_client / _async_client). Serves the recorded response for the
+#       current "stage" (e.g. "fast", "categorize") instead of calling the API.
+#       Input tokens are ESTIMATED from the prompt actually sent (so prompt
+#       growth shows up as a regression); output tokens from the recording.
+#
+#   FakeSupabase
+#       In-memory table store with the subset of the supabase-py query
+#       builder the OCR / categorization code uses. Reads filter seeded rows
+#       and, like PostgREST, return at most max_rows (1000) rows per request,
+#       so an unpaged select over a large table comes back short here too;
+#       writes are counted, never applied, so every run starts identical.
+#
+# install() swaps both in before the services are imported.
+# ============================================================================
+
+import json
+import sys
+import threading
+import types
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+_CHARS_PER_TOKEN = 4
+# PostgREST's default db-max-rows: a select returns at most this many rows.
+POSTGREST_MAX_ROWS = 1000
+# OpenAI's per-image charge for a high-detail 1024px page (85 base + 4 tiles).
+_IMAGE_TOKENS = 765
+
+
+def _estimate_tokens(value: Any) -> int:
+    """Rough prompt size: text chars / 4, plus a flat charge per image part."""
+    images = 0
+    chars = 0
+
+    def walk(v):
+        nonlocal images, chars
+        if isinstance(v, str):
+            chars += len(v)
+        elif isinstance(v, dict):
+            if v.get("type") in ("image_url", "input_image"):
+                images += 1
+                return
+            for x in v.values():
+                walk(x)
+        elif isinstance(v, (list, tuple)):
+            for x in v:
+                walk(x)
+
+    walk(value)
+    return chars // _CHARS_PER_TOKEN + images * _IMAGE_TOKENS
+
+
+# ── OpenAI replay ────────────────────────────────────────────────
+
+class NoRecording(RuntimeError):
+    """The fixture has no recorded response for the requested stage."""
+
+
+class _Recorder:
+    """Shared state: the active recordings, current stage and a call log."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recordings: Dict[str, dict] = {}
+        self.stage: Optional[str] = None
+        self.calls: List[dict] = []
+
+    def use(self, recordings: Dict[str, dict], stage: str) -> None:
+        with self._lock:
+            self.recordings = recordings or {}
+            self.stage = stage
+            self.calls = []
+
+    def serve(self, model: str, prompt: Any) -> tuple:
+        """Return (text, input_tokens, output_tokens) for one model call."""
+        with self._lock:
+            stage = self.stage
+            rec = self.recordings.get(f"{stage}:{model}") or self.recordings.get(stage)
+            in_tok = _estimate_tokens(prompt)
+            if rec is None:
+                self.calls.append({"stage": stage, "model": model, "input_tokens": in_tok,
+                                   "output_tokens": 0, "api_ms": 0, "replayed": False})
+                raise NoRecording(f"no recorded response for stage '{stage}' ({model})")
+            response = rec["response"]
+            text = response if isinstance(response, str) else json.dumps(response)
+            out_tok = int(rec.get("output_tokens") or len(text) // _CHARS_PER_TOKEN)
+            self.calls.append({"stage": stage, "model": model, "input_tokens": in_tok,
+                               "output_tokens": out_tok, "api_ms": int(rec.get("latency_ms") or 0),
+                               "replayed": True})
+            return text, in_tok, out_tok
+
+    def take_calls(self) -> List[dict]:
+        with self._lock:
+            calls, self.calls = self.calls, []
+            return calls
+
+
+recorder = _Recorder()
+
+
+def _responses_result(text: str, in_tok: int, out_tok: int):
+    return SimpleNamespace(
+        output_text=text,
+        usage=SimpleNamespace(input_tokens=in_tok, output_tokens=out_tok),
+    )
+
+
+def _chat_result(text: str, in_tok: int, out_tok: int):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=in_tok, completion_tokens=out_tok),
+    )
+
+
+class ReplayOpenAI:
+    """Sync client exposing .responses.create and .chat.completions.create."""
+
+    def __init__(self, rec: _Recorder = recorder):
+        def responses_create(model, input=None, instructions=None, **_):
+            return _responses_result(*rec.serve(model, [instructions, input]))
+
+        def chat_create(model, messages=None, **_):
+            return _chat_result(*rec.serve(model, messages))
+
+        self.responses = SimpleNamespace(create=responses_create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=chat_create))
+
+
+class AsyncReplayOpenAI:
+    """Async twin of ReplayOpenAI (for gpt.mini_async / gpt.heavy_async)."""
+
+    def __init__(self, rec: _Recorder = recorder):
+        async def responses_create(model, input=None, instructions=None, **_):
+            return _responses_result(*rec.serve(model, [instructions, input]))
+
+        async def chat_create(model, messages=None, **_):
+            return _chat_result(*rec.serve(model, messages))
+
+        self.responses = SimpleNamespace(create=responses_create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=chat_create))
+
+
+# ── Supabase stand-in ────────────────────────────────────────────
+
+class _Query:
+    """Chainable query builder over a list of dict rows."""
+
+    def __init__(self, db: "FakeSupabase", table: str, rows: Optional[List[dict]] = None):
+        self._db = db
+        self._table = table
+        self._rows = list(rows if rows is not None else db.tables.get(table, []))
+        self._write: Optional[str] = None
+        self._limit: Optional[int] = None
+        self._single = False
+
+    # -- reads --
+
+    def select(self, *_cols, **_kw):
+        return self
+
+    def _filter(self, pred):
+        self._rows = [r for r in self._rows if pred(r)]
+        return self
+
+    def eq(self, col, val):
+        return self._filter(lambda r: r.get(col) == val)
+
+    def neq(self, col, val):
+        return self._filter(lambda r: r.get(col) != val)
+
+    def in_(self, col, vals):
+        vals = set(vals)
+        return self._filter(lambda r: r.get(col) in vals)
+
+    def gt(self, col, val):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) > val)
+
+    def gte(self, col, val):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) >= val)
+
+    def lt(self, col, val):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) < val)
+
+    def lte(self, col, val):
+        return self._filter(lambda r: r.get(col) is not None and r.get(col) <= val)
+
+    def is_(self, col, val):
+        target = None if val in (None, "null") else val
+        return self._filter(lambda r: r.get(col) is target)
+
+    @property
+    def not_(self) -> "_Negated":
+        return _Negated(self)
+
+    def order(self, col, desc=False, **_kw):
+        self._rows.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        return self
+
+    def limit(self, n, **_kw):
+        self._limit = n
+        return self
+
+    def range(self, start, end, **_kw):
+        self._rows = self._rows[start:end + 1]
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    maybe_single = single
+
+    # -- writes (counted, not applied) --
+
+    def _mark_write(self, kind: str, payload: Any = None):
+        self._write = kind
+        n = len(payload) if isinstance(payload, list) else 1
+        self._db.note_write(self._table, kind, n)
+        self._rows = payload if isinstance(payload, list) else ([payload] if payload else [])
+        return self
+
+    def insert(self, payload, **_kw):
+        return self._mark_write("insert", payload)
+
+    def upsert(self, payload, **_kw):
+        return self._mark_write("upsert", payload)
+
+    def update(self, payload, **_kw):
+        return self._mark_write("update", payload)
+
+    def delete(self, **_kw):
+        return self._mark_write("delete")
+
+    def execute(self):
+        if self._write is None:
+            self._db.note_read(self._table)
+        rows = self._rows if self._limit is None else self._rows[: self._limit]
+        if self._write is None and self._db.max_rows:
+            rows = rows[: self._db.max_rows]
+        if self._single:  # .single() yields one object (or None), not a list
+            return SimpleNamespace(data=dict(rows[0]) if rows else None, count=len(rows[:1]))
+        return SimpleNamespace(data=[dict(r) for r in rows], count=len(rows))
+
+
+class _Negated:
+    """`.not_.<filter>(...)` — keeps the rows the wrapped filter would drop."""
+
+    def __init__(self, query: _Query):
+        self._query = query
+
+    def __getattr__(self, name):
+        def apply(*args, **kwargs):
+            keep = _Query(self._query._db, self._query._table, self._query._rows)
+            getattr(keep, name)(*args, **kwargs)
+            dropped = {id(r) for r in keep._rows}
+            return self._query._filter(lambda r: id(r) not in dropped)
+
+        return apply
+
+
+class FakeSupabase:
+    """Seeded, read-only-ish Supabase: table(), rpc(), and per-table counters."""
+
+    def __init__(self, tables: Optional[Dict[str, List[dict]]] = None,
+                 rpcs: Optional[Dict[str, List[dict]]] = None,
+                 max_rows: Optional[int] = POSTGREST_MAX_ROWS):
+        self.tables: Dict[str, List[dict]] = tables or {}
+        self.rpcs: Dict[str, List[dict]] = rpcs or {}
+        self.max_rows = max_rows  # None = uncapped
+        self._lock = threading.Lock()
+        self.reads: Dict[str, int] = {}
+        self.writes: Dict[str, int] = {}
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, _params: Optional[dict] = None) -> _Query:
+        return _Query(self, f"rpc:{name}", self.rpcs.get(name, []))
+
+    def note_read(self, table: str) -> None:
+        with self._lock:
+            self.reads[table] = self.reads.get(table, 0) + 1
+
+    def note_write(self, table: str, kind: str, rows: int) -> None:
+        with self._lock:
+            key = f"{table}:{kind}"
+            self.writes[key] = self.writes.get(key, 0) + rows
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.reads.clear()
+            self.writes.clear()
+
+
+# ── Wiring ───────────────────────────────────────────────────────
+
+def install_supabase(db: FakeSupabase) -> None:
+    """Make `api.supabase_client.supabase` resolve to `db`. Call BEFORE
+    importing services."""
+    mod = types.ModuleType("api.supabase_client")
+    mod.supabase = db
+    sys.modules["api.supabase_client"] = mod
+
+
+def install(db: FakeSupabase) -> None:
+    """install_supabase(db) and point gpt_client at the replay clients.
+    Call BEFORE importing services."""
+    install_supabase(db)
+
+    from api.services import gpt_client
+    gpt_client._sync_client = ReplayOpenAI()
+    gpt_client._async_client = AsyncReplayOpenAI()
@@ -0,0 +1,152 @@
+# benchmarks/rrule_check.py
+# ============================================================================
+# rrule_lite vs dateutil.rrule — randomized cross-check + window timing
+# ============================================================================
+# Generates random series (FREQ / INTERVAL / BYDAY / COUNT / UNTIL, master
+# starts with odd seconds, windows up to 15 years after the master) and checks
+# that api/services/rrule_lite.py yields exactly what dateutil's RFC 5545
+# implementation yields:
+#
+#   expand_occurrences(rule, master, ws, we)  ==  rrule.between(ws, we, inc=True)
+#   next_occurrence(rule, master, after, None) ==  rrule.after(after)
+#   iter_occurrences(rule, master) prefix      ==  first N of rrule
+#
+# Known, intentional difference: MONTHLY clamps the day-of-month to short
+# months (Jan 31 -> Feb 28) to match the frontend, while RFC 5545 skips those
+# months. Monthly cases therefore use master days 1..28.
+#
+# Then times a window far from the master start, which used to cost a walk
+# from the first occurrence and now jumps straight to the window.
+#
+# Usage:
+#   python -m benchmarks.rrule_check                  # 2000 cases, seed 0
+#   python -m benchmarks.rrule_check --cases 20000 --seed 7
+#
+# Needs python-dateutil (dev only, not in requirements.txt). Exit code 1 on
+# any mismatch.
+# ============================================================================
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from api.services.rrule_lite import (
+    _WEEKDAY_TO_NUM,
+    expand_occurrences,
+    iter_occurrences,
+    next_occurrence,
+    parse_rrule,
+)
+
+try:
+    from dateutil import rrule as du
+except ImportError:  # pragma: no cover
+    du = None
+
+_NUM_TO_CODE = {v: k for k, v in _WEEKDAY_TO_NUM.items()}
+_DU_FREQ = {}
+if du is not None:
+    _DU_FREQ = {"DAILY": du.DAILY, "WEEKLY": du.WEEKLY, "MONTHLY": du.MONTHLY}
+
+
+def _random_case(rng: random.Random):
+    freq = rng.choice(("DAILY", "WEEKLY", "MONTHLY"))
+    master = datetime(
+        rng.randint(2015, 2026), rng.randint(1, 12),
+        rng.randint(1, 28), rng.randint(0, 23), rng.choice((0, 15, 30, 45)),
+        rng.choice((0, 0, 7, 59)), tzinfo=timezone.utc,
+    )
+    parts = [f"FREQ={freq}"]
+    if rng.random() < 0.7:
+        parts.append(f"INTERVAL={rng.randint(1, 4)}")
+    if freq == "WEEKLY" and rng.random() < 0.7:
+        days = rng.sample(range(7), rng.randint(1, 4))
+        parts.append("BYDAY=" + ",".join(_NUM_TO_CODE[d] for d in days))
+    r = rng.random()
+    if r < 0.25:
+        parts.append(f"COUNT={rng.randint(1, 800)}")
+    elif r < 0.5:
+        until = master + timedelta(days=rng.randint(0, 3000), seconds=rng.randint(0, 86400))
+        parts.append("UNTIL=" + until.strftime("%Y%m%dT%H%M%SZ"))
+    text = ";".join(parts)
+
+    ws = master + timedelta(days=rng.randint(-60, 15 * 365), minutes=rng.randint(0, 1440))
+    we = ws + timedelta(days=rng.choice((1, 7, 31, 42, 120)))
+    return text, master, ws, we
+
+
+def _oracle(rule: dict, master: datetime):
+    return du.rrule(
+        _DU_FREQ[rule["freq"]],
+        dtstart=master,
+        interval=rule["interval"],
+        byweekday=(rule["byday"] or None) if rule["freq"] == "WEEKLY" else None,
+        count=rule["count"],
+        until=rule["until"],
+        wkst=du.MO,
+        cache=False,
+    )
+
+
+def check(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    for n in range(cases):
+        text, master, ws, we = _random_case(rng)
+        rule = parse_rrule(text)
+        oracle = _oracle(rule, master)
+
+        got = expand_occurrences(rule, master, ws, we)
+        want = oracle.between(ws, we, inc=True)[:366]
+        nxt = next_occurrence(rule, master, ws, horizon_days=None)
+        want_nxt = oracle.after(ws)
+        head = list(islice(iter_occurrences(rule, master), 25))
+        want_head = list(islice(iter(oracle), 25))
+
+        for what, a, b in (("window", got, want), ("next", nxt, want_nxt), ("head", head, want_head)):
+            if a != b:
+                failures += 1
+                if failures <= 10:
+                    print(f"MISMATCH #{n} {what}: {text} master={master.isoformat()} "
+                          f"window=[{ws.isoformat()}, {we.isoformat()}]")
+                    print(f"   rrule_lite: {a if not isinstance(a, list) else a[:5]}")
+                    print(f"   dateutil:   {b if not isinstance(b, list) else b[:5]}")
+    return failures
+
+
+def time_far_window(reps: int = 2000) -> None:
+    master = datetime(2012, 1, 2, 9, 0, tzinfo=timezone.utc)
+    ws = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    we = ws + timedelta(days=42)
+    for text in ("FREQ=DAILY", "FREQ=WEEKLY;BYDAY=MO,WE,FR", "FREQ=MONTHLY"):
+        rule = parse_rrule(text)
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            occ = expand_occurrences(rule, master, ws, we)
+        us = (time.perf_counter() - t0) / reps * 1e6
+        print(f"  {text:<28} 6-week window 14y after start: {len(occ):>3} occurrences, {us:7.1f} us/call")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cases", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if du is None:
+        print("python-dateutil is not installed: pip install python-dateutil")
+        return 2
+
+    t0 = time.perf_counter()
+    failures = check(args.cases, args.seed)
+    print(f"{args.cases} random series checked against dateutil in "
+          f"{time.perf_counter() - t0:.1f}s: {failures} mismatches")
+    time_far_window()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
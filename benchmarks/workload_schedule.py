@@ -0,0 +1,291 @@
+# benchmarks/workload_schedule.py
+# ============================================================================
+# Workload scheduling engine — correctness cross-check + team-scale timing
+# ============================================================================
+# 1. Randomized cross-check of api/services/workload_scheduler.py against a
+#    naive day-by-day oracle (the way the old endpoints stepped dates):
+#
+#      WorkCalendar.add_working_days(d, n)  ==  step one day at a time
+#      plan_queue(tasks, ...)               ==  hour-by-day walk
+#
+#    over random working-day masks (incl. Sunday as 0 and as 7), days off and
+#    task sizes from 0.25h to 80h.
+#
+# 2. Recalculating a whole team (default 50 users x 500 open tasks each)
+#    against benchmarks/replay.FakeSupabase:
+#
+#      legacy   what POST /workload/recalculate/{user_id} did, once per user:
+#               capacity + statuses + tasks reads, a day-by-day walk, then
+#               one UPDATE per task
+#      engine   workload_scheduler.schedule_users(): capacities, time off
+#               and open tasks in three reads, one pass, one bulk write
+#
+#    Reports local CPU time, database round trips and the wall time those
+#    round trips would add at --rtt-ms per call.
+#
+# Usage:
+#   python -m benchmarks.workload_schedule
+#   python -m benchmarks.workload_schedule --users 50 --tasks 500 --rtt-ms 40
+#
+# Exit code 1 on any mismatch.
+# ============================================================================
+
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from benchmarks.replay import FakeSupabase, install_supabase
+
+_DB = FakeSupabase()
+install_supabase(_DB)
+
+from api.services import pipeline_lookups, workload_scheduler as ws  # noqa: E402
+
+_STATUSES = [
+    {"task_status_id": "st-not-started", "task_status": "Not Started"},
+    {"task_status_id": "st-working", "task_status": "Working on It"},
+    {"task_status_id": "st-done", "task_status": "Done"},
+]
+
+
+# ====================================================================
+# Oracle
+# ====================================================================
+
+def _naive_is_working(cal_days, off, d):
+    code = d.weekday() + 1
+    return (code in cal_days or (code == 7 and 0 in cal_days)) and d not in off
+
+
+def _naive_add(cal_days, off, d, n):
+    while n > 0:
+        d += timedelta(days=1)
+        if _naive_is_working(cal_days, off, d):
+            n -= 1
+    return d
+
+
+def _naive_plan(tasks, cap, off, today):
+    eff = cap.effective_hours
+    day = today
+    while not _naive_is_working(cap.working_days, off, day):
+        day += timedelta(days=1)
+    left = eff
+    out = []
+    for task in sorted(tasks, key=ws.queue_sort_key):
+        need = ws.task_hours(task)
+        if left <= 1e-9:
+            day = _naive_add(cap.working_days, off, day, 1)
+            left = eff
+        start = day
+        while need > left + 1e-9:
+            need -= left
+            day = _naive_add(cap.working_days, off, day, 1)
+            left = eff
+        left -= need
+        out.append((task["task_id"], start.isoformat(), day.isoformat()))
+    return out
+
+
+def _random_capacity(rng):
+    days = rng.sample([0, 1, 2, 3, 4, 5, 6, 7], rng.randint(1, 6))
+    return ws.Capacity(
+        hours_per_day=rng.choice((4.0, 6.0, 7.5, 8.0, 10.0)),
+        working_days=tuple(days),
+        buffer_percent=rng.choice((0, 10, 20, 35)),
+    )
+
+
+def _random_off(rng, today, cap):
+    off = set()
+    for _ in range(rng.randint(0, 12)):
+        start = today + timedelta(days=rng.randint(-5, 400))
+        for i in range(rng.randint(1, 15)):
+            off.add(start + timedelta(days=i))
+    return off
+
+
+def _random_tasks(rng, n, owner="u"):
+    tasks = []
+    for i in range(n):
+        tasks.append({
+            "task_id": f"{owner}-{i}",
+            "Owner_id": owner,
+            "estimated_hours": rng.choice((None, 0.25, 0.5, 1, 2, 3, 4.5, 8, 12, 16, 40, 80)),
+            "deadline": (date(2026, 1, 1) + timedelta(days=rng.randint(0, 500))).isoformat()
+            if rng.random() < 0.6 else None,
+            "queue_position": rng.randint(1, n) if rng.random() < 0.5 else None,
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00+00:00",
+        })
+    return tasks
+
+
+def check(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for n in range(cases):
+        today = date(2026, 1, 1) + timedelta(days=rng.randint(0, 700))
+        cap = _random_capacity(rng)
+        off = _random_off(rng, today, cap)
+        cal = ws.WorkCalendar(cap.working_days, off)
+
+        for _ in range(5):
+            k = rng.randint(0, 400)
+            got, want = cal.add_working_days(today, k), _naive_add(cap.working_days, off, today, k)
+            if got != want:
+                failures += 1
+                if failures <= 10:
+                    print(f"MISMATCH #{n} add_working_days({today}, {k}) days={cap.working_days}: {got} != {want}")
+
+        tasks = _random_tasks(rng, rng.randint(0, 40))
+        got = [(p["task_id"], p["scheduled_start_date"], p["scheduled_end_date"])
+               for p in ws.plan_queue(tasks, cap, cal, today)]
+        want = _naive_plan(tasks, cap, off, today)
+        if got != want:
+            failures += 1
+            if failures <= 10:
+                bad = next(i for i, (a, b) in enumerate(zip(got, want)) if a != b) if got and want else 0
+                print(f"MISMATCH #{n} plan_queue days={cap.working_days} eff={cap.effective_hours}: "
+                      f"{got[bad:bad + 1]} != {want[bad:bad + 1]}")
+    return failures
+
+
+# ====================================================================
+# Team-scale timing
+# ====================================================================
+
+def _seed_team(users, tasks_per_user, seed):
+    rng = random.Random(seed)
+    today = date(2026, 10, 19)
+    user_rows, capacity, time_off, tasks = [], [], [], []
+    for u in range(users):
+        uid = str(uuid.UUID(int=rng.getrandbits(128)))
+        user_rows.append({"user_id": uid, "user_name": f"user{u}", "avatar_color": u})
+        cap = _random_capacity(rng)
+        capacity.append({"user_id": uid, **cap.to_dict()})
+        for _ in range(rng.randint(0, 3)):
+            start = today + timedelta(days=rng.randint(0, 200))
+            time_off.append({
+                "user_id": uid,
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=rng.randint(0, 10))).isoformat(),
+            })
+        for t in _random_tasks(rng, tasks_per_user, uid):
+            t["task_status"] = rng.choice(("st-not-started", "st-working"))
+            tasks.append(t)
+    _DB.tables = {
+        "tasks_status": _STATUSES, "users": user_rows, "projects": [], "companies": [],
+        "tasks_priority": [], "task_completed_status": [],
+        "user_capacity_settings": capacity, "user_time_off": time_off, "tasks": tasks,
+    }
+    return today, [r["user_id"] for r in user_rows]
+
+
+def _legacy_recalculate(user_id, today):
+    """POST /workload/recalculate/{user_id} before the scheduling engine."""
+    db = _DB
+    cap_rows = db.table("user_capacity_settings").select("*").eq("user_id", user_id).execute().data
+    capacity = cap_rows[0] if cap_rows else {}
+    hours_per_day = capacity.get("hours_per_day", 8.0)
+    working_days = capacity.get("working_days", [1, 2, 3, 4, 5])
+    buffer_percent = capacity.get("buffer_percent", 20)
+    effective_hours = hours_per_day * (100 - buffer_percent) / 100
+
+    statuses = db.table("tasks_status").select("task_status_id, task_status").execute().data
+    status_map = {s["task_status"].lower(): s["task_status_id"] for s in statuses}
+    valid = [s for s in (status_map.get("not started"), status_map.get("working on it")) if s]
+    tasks = db.table("tasks").select("task_id, estimated_hours, deadline, task_priority").eq(
+        "Owner_id", user_id).in_("task_status", valid).order("deadline").execute().data
+
+    current_date = today
+    hours_remaining_today = effective_hours
+    previous_task_id = None
+    for idx, task in enumerate(tasks):
+        task_hours = task.get("estimated_hours") or 2.0
+        while (current_date.weekday() + 1) not in working_days:
+            current_date = current_date + timedelta(days=1)
+            hours_remaining_today = effective_hours
+        start_date = current_date
+        hours_needed = task_hours
+        end_date = current_date
+        while hours_needed > 0:
+            if hours_needed <= hours_remaining_today:
+                hours_remaining_today -= hours_needed
+                hours_needed = 0
+            else:
+                hours_needed -= hours_remaining_today
+                end_date = end_date + timedelta(days=1)
+                while (end_date.weekday() + 1) not in working_days:
+                    end_date = end_date + timedelta(days=1)
+                hours_remaining_today = effective_hours
+        update = {
+            "scheduled_start_date": str(start_date),
+            "scheduled_end_date": str(end_date),
+            "queue_position": idx + 1,
+            "scheduling_status": "scheduled",
+        }
+        if previous_task_id:
+            update["blocked_by_task_id"] = previous_task_id
+            update["auto_linked"] = True
+        db.table("tasks").update(update).eq("task_id", task["task_id"]).execute()
+        current_date = end_date
+        previous_task_id = task["task_id"]
+
+
+def _round_trips():
+    return sum(_DB.reads.values()) + sum(_DB.writes.get(k, 0) for k in _DB.writes if k.endswith(":update"))
+
+
+def time_team(users, tasks_per_user, seed, rtt_ms):
+    today, user_ids = _seed_team(users, tasks_per_user, seed)
+    pipeline_lookups.invalidate()
+    total = users * tasks_per_user
+    print(f"\n{users} users x {tasks_per_user} open tasks ({total} tasks), RTT {rtt_ms:g} ms")
+
+    _DB.reset_counters()
+    t0 = time.perf_counter()
+    for uid in user_ids:
+        _legacy_recalculate(uid, today)
+    legacy_s = time.perf_counter() - t0
+    legacy_rt = _round_trips()
+
+    _DB.reset_counters()
+    pipeline_lookups.invalidate()
+    t0 = time.perf_counter()
+    result = ws.schedule_users(None, today=today)
+    engine_s = time.perf_counter() - t0
+    # lookups (7 reads, cached between requests) + 3 scoped reads, paged
+    # per 1000 rows (FakeSupabase caps selects like PostgREST)
+    # + explicit dependencies + 1 RPC
+    engine_rt = _round_trips() + 1
+
+    for name, cpu, rt in (("legacy", legacy_s, legacy_rt), ("engine", engine_s, engine_rt)):
+        print(f"  {name:<7} cpu {cpu * 1000:8.1f} ms   round trips {rt:6d}   "
+              f"est. wall {cpu * 1000 + rt * rtt_ms:10.1f} ms")
+    print(f"  engine scheduled {result['tasks_scheduled']} tasks, {result['tasks_changed']} changed")
+    return result["tasks_scheduled"] == total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cases", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--tasks", type=int, default=500, help="open tasks per user")
+    ap.add_argument("--rtt-ms", type=float, default=40.0)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    failures = check(args.cases, args.seed)
+    print(f"{args.cases} random calendars/queues checked against the day-by-day oracle in "
+          f"{time.perf_counter() - t0:.1f}s: {failures} mismatches")
+    if not time_team(args.users, args.tasks, args.seed, args.rtt_ms):
+        failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
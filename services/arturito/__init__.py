@@ -5,7 +5,7 @@
 # Modular chatbot system with OpenAI Assistants API integration
 
 from .router import route, route_slash_command, ROUTES
-from .nlu import interpret_message
+from .nlu import interpret_message, interpret_message_async
 from .persona import get_persona_prompt, set_personality_level, get_personality_level
 from .assistants import (
     send_message_and_get_response,
@@ -22,6 +22,7 @@ __all__ = [
     "ROUTES",
     # NLU
     "interpret_message",
+    "interpret_message_async",
     # Persona
     "get_persona_prompt",
     "set_personality_level",
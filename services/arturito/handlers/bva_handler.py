@@ -316,6 +316,7 @@ def _gpt_fuzzy_match(query: str, candidates: List[str]) -> Optional[str]:
             "\"NONE\" if nothing is a reasonable match. No explanation.",
             f"User typed: \"{query}\"\n\nCandidates:\n{candidates_str}",
             max_tokens=80,
+            cache_ttl=24 * 3600,  # pure function of (query, candidates)
         )
         if not answer:
             return None
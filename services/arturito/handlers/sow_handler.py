@@ -140,5 +140,5 @@ CONTENIDO DEL SOW:
 {sow_content}
 """
 
-    result = gpt.mini(system_prompt, question, max_tokens=1000)
+    result = await gpt.mini_async(system_prompt, question, max_tokens=1000)
     return result if result else "Error querying the SOW. Please try again."
@@ -1217,41 +1217,37 @@ IMPORTANTE: Responde en el idioma que recibas (español o inglés), pero los val
 """
 
 
-def interpret_with_gpt(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-    """
-    Usa OpenAI para clasificar el intent cuando las reglas locales no matchean.
-    """
+# Same message + space context -> same classification; cache the GPT answer.
+_NLU_CACHE_TTL = 6 * 3600
+
+
+def _gpt_input(text: str, context: Dict[str, Any] = None) -> str:
     # Agregar contexto del espacio si existe
     context_info = ""
     if context:
         if context.get("space_name"):
             context_info = f"\n\nContexto: El usuario está en el espacio '{context['space_name']}'"
+    return f"Mensaje del usuario: {text}{context_info}"
 
-    try:
-        t0 = time.monotonic()
-        raw_response = gpt.with_fallback(
-            NLU_SYSTEM_PROMPT,
-            f"Mensaje del usuario: {text}{context_info}",
-            min_confidence=0.85,
-            max_tokens=200,
-        )
-        elapsed_ms = int((time.monotonic() - t0) * 1000)
 
-        if not raw_response:
-            logger.warning("[NLU] GPT returned empty response after %dms | text: '%s'", elapsed_ms, text[:80])
-            return {
-                "intent": "UNKNOWN",
-                "entities": {},
-                "confidence": 0.0,
-                "error": "GPT returned empty response"
-            }
+def _parse_gpt_intent(raw_response: Optional[str], text: str, elapsed_ms: int) -> Dict[str, Any]:
+    """Respuesta cruda de GPT -> resultado de intent (sync y async comparten esto)."""
+    if not raw_response:
+        logger.warning("[NLU] GPT returned empty response after %dms | text: '%s'", elapsed_ms, text[:80])
+        return {
+            "intent": "UNKNOWN",
+            "entities": {},
+            "confidence": 0.0,
+            "error": "GPT returned empty response"
+        }
 
-        # Limpiar respuesta (quitar markdown fences si los hay)
-        cleaned = raw_response
-        if cleaned.startswith("```"):
-            cleaned = re.sub(r'^```(?:json)?\s*', '', cleaned)
-            cleaned = re.sub(r'\s*```$', '', cleaned)
+    # Limpiar respuesta (quitar markdown fences si los hay)
+    cleaned = raw_response
+    if cleaned.startswith("```"):
+        cleaned = re.sub(r'^```(?:json)?\s*', '', cleaned)
+        cleaned = re.sub(r'\s*```$', '', cleaned)
 
+    try:
         # Parsear JSON
         parsed = json.loads(cleaned)
 
@@ -1282,17 +1278,47 @@ def interpret_with_gpt(text: str, context: Dict[str, Any] = None) -> Dict[str, A
         }
 
 
+def interpret_with_gpt(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Usa OpenAI para clasificar el intent cuando las reglas locales no matchean.
+    Desde código async usar interpret_with_gpt_async.
+    """
+    t0 = time.monotonic()
+    try:
+        raw_response = gpt.with_fallback(
+            NLU_SYSTEM_PROMPT,
+            _gpt_input(text, context),
+            min_confidence=0.85,
+            max_tokens=200,
+            cache_ttl=_NLU_CACHE_TTL,
+        )
+    except Exception as e:
+        return {"intent": "UNKNOWN", "entities": {}, "confidence": 0.0, "error": str(e)}
+    return _parse_gpt_intent(raw_response, text, int((time.monotonic() - t0) * 1000))
+
+
+async def interpret_with_gpt_async(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Versión async de interpret_with_gpt (no bloquea el event loop)."""
+    t0 = time.monotonic()
+    try:
+        raw_response = await gpt.with_fallback_async(
+            NLU_SYSTEM_PROMPT,
+            _gpt_input(text, context),
+            min_confidence=0.85,
+            max_tokens=200,
+            cache_ttl=_NLU_CACHE_TTL,
+        )
+    except Exception as e:
+        return {"intent": "UNKNOWN", "entities": {}, "confidence": 0.0, "error": str(e)}
+    return _parse_gpt_intent(raw_response, text, int((time.monotonic() - t0) * 1000))
+
+
 # ================================
 # Pipeline Principal de Interpretación
 # ================================
 
-def interpret_message(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-    """
-    Pipeline completo de interpretación:
-    1. Intenta reglas locales (rápido, sin API)
-    2. Si no hay match, usa GPT
-    3. Normaliza y retorna resultado estructurado
-    """
+def _interpret_local_step(text: str) -> Optional[Dict[str, Any]]:
+    """Pasos previos a GPT: texto vacío o match de reglas locales."""
     if not text or not text.strip():
         return {
             "intent": "UNKNOWN",
@@ -1313,7 +1339,11 @@ def interpret_message(text: str, context: Dict[str, Any] = None) -> Dict[str, An
 
     # 2. Delegar a GPT (mini -> heavy fallback)
     logger.info("[NLU] No regex match, delegating to GPT | text: '%s'", clean_text[:80])
-    gpt_result = interpret_with_gpt(clean_text, context)
+    return None
+
+
+def _finish_gpt_result(gpt_result: Dict[str, Any], clean_text: str,
+                       context: Dict[str, Any] = None) -> Dict[str, Any]:
     gpt_result["raw_text"] = clean_text
 
     # 3. Inferir proyecto desde contexto si no se detectó
@@ -1326,3 +1356,28 @@ def interpret_message(text: str, context: Dict[str, Any] = None) -> Dict[str, An
                 gpt_result["project_inferred"] = True
 
     return gpt_result
+
+
+def interpret_message(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Pipeline completo de interpretación:
+    1. Intenta reglas locales (rápido, sin API)
+    2. Si no hay match, usa GPT
+    3. Normaliza y retorna resultado estructurado
+
+    Desde endpoints async usar interpret_message_async.
+    """
+    local_result = _interpret_local_step(text)
+    if local_result is not None:
+        return local_result
+    clean_text = text.strip()
+    return _finish_gpt_result(interpret_with_gpt(clean_text, context), clean_text, context)
+
+
+async def interpret_message_async(text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Versión async de interpret_message: el paso GPT no bloquea el event loop."""
+    local_result = _interpret_local_step(text)
+    if local_result is not None:
+        return local_result
+    clean_text = text.strip()
+    return _finish_gpt_result(await interpret_with_gpt_async(clean_text, context), clean_text, context)
@@ -4,6 +4,7 @@
 # ================================
 # Migrado desde Router.gs
 
+import asyncio
 import os
 import time
 import json
@@ -787,5 +788,6 @@ async def route_async(
         result = await handle_manage_expense_authorizer(request, context, db_client)
         return result
 
-    # Fall back to sync route for all other intents
-    return route(intent_obj, context)
+    # Fall back to sync route for all other intents (its handlers make sync
+    # GPT / DB calls, so it runs off the event loop)
+    return await asyncio.to_thread(route, intent_obj, context)
@@ -3,12 +3,15 @@ QuickBooks Online OAuth2 Service
 Handles authentication, token management, and API calls to QBO
 """
 
+import asyncio
 import logging
 import os
 import base64
+import random
+import time
 import httpx
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, AsyncIterator
 from api.supabase_client import supabase
 
 logger = logging.getLogger(__name__)
@@ -32,6 +35,12 @@ API_BASE_PRODUCTION = "https://quickbooks.api.intuit.com"
 # Scopes
 SCOPES = "com.intuit.quickbooks.accounting"
 
+# Query paging / throttling. QBO caps a query page at 1000 rows and allows
+# ~10 concurrent requests (500/min) per realm+app; stay under both.
+QBO_PAGE_SIZE = 1000
+QBO_MAX_CONCURRENCY = max(1, min(10, int(os.getenv("QBO_MAX_CONCURRENCY", "4"))))
+QBO_THROTTLE_RETRIES = 3
+
 
 def get_api_base_url() -> str:
     """Get the correct API base URL based on environment"""
@@ -47,6 +56,98 @@ def get_auth_header() -> str:
     return f"Basic {encoded}"
 
 
+# ====== HTTP CLIENT ======
+
+# One pooled AsyncClient per event loop (the server has one; scripts that call
+# asyncio.run() repeatedly get a fresh one per loop). HTTP/2 + keep-alive means
+# a sync's hundreds of page requests reuse a handful of TLS connections.
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared AsyncClient for Intuit OAuth + QBO API calls."""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(http2=True, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+        _http_client_loop = loop
+    return _http_client
+
+
+# asyncio locks and semaphores belong to the loop that first waits on them, so
+# the per-realm ones below are kept per loop too; closed loops are dropped.
+_loop_primitives: Dict[asyncio.AbstractEventLoop, Dict[str, Dict[str, Any]]] = {}
+
+
+def _per_loop(kind: str) -> Dict[str, Any]:
+    """realm_id -> primitive map of `kind` for the running loop."""
+    loop = asyncio.get_running_loop()
+    per_loop = _loop_primitives.get(loop)
+    if per_loop is None:
+        for old in [lp for lp in _loop_primitives if lp.is_closed()]:
+            _loop_primitives.pop(old, None)
+        per_loop = _loop_primitives.setdefault(loop, {})
+    return per_loop.setdefault(kind, {})
+
+
+async def close_http_client() -> None:
+    """Close the pooled client (app shutdown)."""
+    global _http_client, _http_client_loop
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
+
+# ====== TOKEN CACHE ======
+
+# realm_id -> {"access_token": str, "expires_at": naive UTC datetime}
+# Saves the qbo_tokens read on every API call; entries are trusted until
+# TOKEN_REFRESH_MARGIN before expiry, after which the DB / refresh path runs.
+_token_cache: Dict[str, Dict[str, Any]] = {}
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def _parse_expiry(value: Optional[str]) -> datetime:
+    expires_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    # Make naive for comparison with utcnow()
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.replace(tzinfo=None)
+    return expires_at
+
+
+def _cache_token(realm_id: str, access_token: str, expires_at: datetime) -> None:
+    _token_cache[realm_id] = {"access_token": access_token, "expires_at": expires_at}
+
+
+def _cached_token(realm_id: str) -> Optional[str]:
+    entry = _token_cache.get(realm_id)
+    if entry and datetime.utcnow() < entry["expires_at"] - TOKEN_REFRESH_MARGIN:
+        return entry["access_token"]
+    return None
+
+
+def invalidate_token_cache(realm_id: Optional[str] = None) -> None:
+    """Forget cached tokens for one realm (or all)."""
+    if realm_id is None:
+        _token_cache.clear()
+    else:
+        _token_cache.pop(realm_id, None)
+
+
+def _refresh_lock(realm_id: str) -> asyncio.Lock:
+    locks = _per_loop("refresh_locks")
+    lock = locks.get(realm_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        locks[realm_id] = lock
+    return lock
+
+
 # ====== OAUTH FLOW ======
 
 def get_authorization_url(state: Optional[str] = None) -> str:
@@ -71,67 +172,69 @@ async def exchange_code_for_tokens(code: str, realm_id: str) -> Dict[str, Any]:
     Exchange authorization code for access and refresh tokens.
     Called after user authorizes and is redirected back.
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            OAUTH_TOKEN_URL,
-            headers={
-                "Authorization": get_auth_header(),
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Accept": "application/json"
-            },
-            data={
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": QBO_REDIRECT_URI
-            }
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"Token exchange failed: {response.status_code} - {response.text}")
+    client = get_http_client()
+    response = await client.post(
+        OAUTH_TOKEN_URL,
+        headers={
+            "Authorization": get_auth_header(),
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json"
+        },
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": QBO_REDIRECT_URI
+        }
+    )
 
-        token_data = response.json()
+    if response.status_code != 200:
+        raise Exception(f"Token exchange failed: {response.status_code} - {response.text}")
 
-        # Calculate expiration times
-        now = datetime.utcnow()
-        access_expires = now + timedelta(seconds=token_data.get("expires_in", 3600))
-        refresh_expires = now + timedelta(seconds=token_data.get("x_refresh_token_expires_in", 8726400))
+    token_data = response.json()
 
-        # Get company info
-        company_name = await get_company_name(
-            token_data["access_token"],
-            realm_id
-        )
+    # Calculate expiration times
+    now = datetime.utcnow()
+    access_expires = now + timedelta(seconds=token_data.get("expires_in", 3600))
+    refresh_expires = now + timedelta(seconds=token_data.get("x_refresh_token_expires_in", 8726400))
 
-        # Store tokens in database
-        token_record = {
-            "realm_id": realm_id,
-            "company_name": company_name,
-            "access_token": token_data["access_token"],
-            "refresh_token": token_data["refresh_token"],
-            "access_token_expires_at": access_expires.isoformat(),
-            "refresh_token_expires_at": refresh_expires.isoformat(),
-            "token_type": token_data.get("token_type", "Bearer"),
-            "updated_at": now.isoformat()
-        }
+    # Get company info
+    company_name = await get_company_name(
+        token_data["access_token"],
+        realm_id
+    )
 
-        # Upsert (update if exists, insert if not)
-        supabase.table("qbo_tokens").upsert(
-            token_record,
-            on_conflict="realm_id"
-        ).execute()
+    # Store tokens in database
+    token_record = {
+        "realm_id": realm_id,
+        "company_name": company_name,
+        "access_token": token_data["access_token"],
+        "refresh_token": token_data["refresh_token"],
+        "access_token_expires_at": access_expires.isoformat(),
+        "refresh_token_expires_at": refresh_expires.isoformat(),
+        "token_type": token_data.get("token_type", "Bearer"),
+        "updated_at": now.isoformat()
+    }
 
-        return {
-            "realm_id": realm_id,
-            "company_name": company_name,
-            "access_token_expires_at": access_expires.isoformat(),
-            "refresh_token_expires_at": refresh_expires.isoformat()
-        }
+    # Upsert (update if exists, insert if not)
+    supabase.table("qbo_tokens").upsert(
+        token_record,
+        on_conflict="realm_id"
+    ).execute()
+    _cache_token(realm_id, token_data["access_token"], access_expires)
+
+    return {
+        "realm_id": realm_id,
+        "company_name": company_name,
+        "access_token_expires_at": access_expires.isoformat(),
+        "refresh_token_expires_at": refresh_expires.isoformat()
+    }
 
 
 async def refresh_access_token(realm_id: str) -> Dict[str, Any]:
     """
     Refresh the access token using the refresh token.
     Called automatically when access token is expired.
+    Prefer _refresh_once(), which collapses concurrent refreshes into one.
     """
     # Get current tokens
     result = supabase.table("qbo_tokens") \
@@ -145,51 +248,73 @@ async def refresh_access_token(realm_id: str) -> Dict[str, Any]:
 
     current_tokens = result.data
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            OAUTH_TOKEN_URL,
-            headers={
-                "Authorization": get_auth_header(),
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Accept": "application/json"
-            },
-            data={
-                "grant_type": "refresh_token",
-                "refresh_token": current_tokens["refresh_token"]
-            }
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"Token refresh failed: {response.status_code} - {response.text}")
-
-        token_data = response.json()
+    client = get_http_client()
+    response = await client.post(
+        OAUTH_TOKEN_URL,
+        headers={
+            "Authorization": get_auth_header(),
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json"
+        },
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": current_tokens["refresh_token"]
+        }
+    )
 
-        # Calculate new expiration times
-        now = datetime.utcnow()
-        access_expires = now + timedelta(seconds=token_data.get("expires_in", 3600))
-        refresh_expires = now + timedelta(seconds=token_data.get("x_refresh_token_expires_in", 8726400))
+    if response.status_code != 200:
+        invalidate_token_cache(realm_id)
+        raise Exception(f"Token refresh failed: {response.status_code} - {response.text}")
+
+    token_data = response.json()
+
+    # Calculate new expiration times
+    now = datetime.utcnow()
+    access_expires = now + timedelta(seconds=token_data.get("expires_in", 3600))
+    refresh_expires = now + timedelta(seconds=token_data.get("x_refresh_token_expires_in", 8726400))
+
+    # Update tokens in database
+    supabase.table("qbo_tokens").update({
+        "access_token": token_data["access_token"],
+        "refresh_token": token_data["refresh_token"],
+        "access_token_expires_at": access_expires.isoformat(),
+        "refresh_token_expires_at": refresh_expires.isoformat(),
+        "updated_at": now.isoformat()
+    }).eq("realm_id", realm_id).execute()
+    _cache_token(realm_id, token_data["access_token"], access_expires)
+
+    return {
+        "realm_id": realm_id,
+        "access_token": token_data["access_token"],
+        "access_token_expires_at": access_expires.isoformat()
+    }
 
-        # Update tokens in database
-        supabase.table("qbo_tokens").update({
-            "access_token": token_data["access_token"],
-            "refresh_token": token_data["refresh_token"],
-            "access_token_expires_at": access_expires.isoformat(),
-            "refresh_token_expires_at": refresh_expires.isoformat(),
-            "updated_at": now.isoformat()
-        }).eq("realm_id", realm_id).execute()
 
-        return {
-            "realm_id": realm_id,
-            "access_token_expires_at": access_expires.isoformat()
-        }
+async def _refresh_once(realm_id: str, stale_token: Optional[str] = None) -> str:
+    """
+    Single-flight refresh: concurrent callers for the same realm wait on one
+    lock; whoever gets it second finds a fresh token already cached (different
+    from the one that failed for them) and reuses it instead of refreshing again.
+    """
+    async with _refresh_lock(realm_id):
+        cached = _cached_token(realm_id)
+        if cached and cached != stale_token:
+            return cached
+        refreshed = await refresh_access_token(realm_id)
+        return refreshed["access_token"]
 
 
 async def get_valid_access_token(realm_id: str) -> str:
     """
     Get a valid access token, refreshing if necessary.
+    Served from the in-memory cache until 5 minutes before expiry.
     """
+    cached = _cached_token(realm_id)
+    if cached:
+        return cached
+
     result = supabase.table("qbo_tokens") \
-        .select("*") \
+        .select("access_token, access_token_expires_at") \
         .eq("realm_id", realm_id) \
         .single() \
         .execute()
@@ -198,26 +323,14 @@ async def get_valid_access_token(realm_id: str) -> str:
         raise Exception(f"No tokens found for realm_id: {realm_id}. Please authorize first.")
 
     tokens = result.data
+    expires_at = _parse_expiry(tokens["access_token_expires_at"])
 
     # Check if access token is expired (with 5 min buffer)
-    expires_str = tokens["access_token_expires_at"].replace("Z", "+00:00")
-    expires_at = datetime.fromisoformat(expires_str)
-    # Make naive for comparison with utcnow()
-    if expires_at.tzinfo is not None:
-        expires_at = expires_at.replace(tzinfo=None)
-    if datetime.utcnow() >= (expires_at - timedelta(minutes=5)):
-        # Token expired or about to expire, refresh it
-        await refresh_access_token(realm_id)
-
-        # Get updated tokens
-        result = supabase.table("qbo_tokens") \
-            .select("access_token") \
-            .eq("realm_id", realm_id) \
-            .single() \
-            .execute()
-
-        return result.data["access_token"]
+    if datetime.utcnow() >= (expires_at - TOKEN_REFRESH_MARGIN):
+        # Token expired or about to expire, refresh it (once, for all waiters)
+        return await _refresh_once(realm_id, stale_token=tokens["access_token"])
 
+    _cache_token(realm_id, tokens["access_token"], expires_at)
     return tokens["access_token"]
 
 
@@ -234,6 +347,9 @@ async def qbo_api_request(
     Make an authenticated request to the QBO API.
     Automatically handles token refresh.
     """
+    if method not in ("GET", "POST"):
+        raise ValueError(f"Unsupported method: {method}")
+
     access_token = await get_valid_access_token(realm_id)
     base_url = get_api_base_url()
     url = f"{base_url}/v3/company/{realm_id}/{endpoint}"
@@ -244,29 +360,44 @@ async def qbo_api_request(
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    client = get_http_client()
+
+    async def send():
         if method == "GET":
-            response = await client.get(url, headers=headers, params=params)
-        elif method == "POST":
-            response = await client.post(url, headers=headers, json=json_data)
-        else:
-            raise ValueError(f"Unsupported method: {method}")
+            return await client.get(url, headers=headers, params=params)
+        return await client.post(url, headers=headers, json=json_data)
+
+    response = await send()
+
+    if response.status_code == 401:
+        # Token might be invalid (revoked / rotated elsewhere): refresh once,
+        # shared with any concurrent request that hit the same 401
+        access_token = await _refresh_once(realm_id, stale_token=access_token)
+        headers["Authorization"] = f"Bearer {access_token}"
+        response = await send()
+
+    # Throttled (429): back off and retry, honoring Retry-After when sent
+    attempt = 0
+    while response.status_code == 429 and attempt < QBO_THROTTLE_RETRIES:
+        await asyncio.sleep(_throttle_delay(response, attempt))
+        attempt += 1
+        response = await send()
 
-        if response.status_code == 401:
-            # Token might be invalid, try refreshing
-            await refresh_access_token(realm_id)
-            access_token = await get_valid_access_token(realm_id)
-            headers["Authorization"] = f"Bearer {access_token}"
+    if response.status_code != 200:
+        raise Exception(f"QBO API error: {response.status_code} - {response.text}")
 
-            if method == "GET":
-                response = await client.get(url, headers=headers, params=params)
-            else:
-                response = await client.post(url, headers=headers, json=json_data)
+    return response.json()
 
-        if response.status_code != 200:
-            raise Exception(f"QBO API error: {response.status_code} - {response.text}")
 
-        return response.json()
+def _throttle_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After if present, else jittered backoff."""
+    try:
+        hinted = float(response.headers.get("Retry-After", ""))
+        if 0 <= hinted <= 60:
+            return hinted
+    except ValueError:
+        pass
+    return random.uniform(0.5, 1.0) * (2 ** attempt)
 
 
 async def qbo_query(realm_id: str, query: str) -> Dict[str, Any]:
@@ -286,24 +417,204 @@ async def get_company_name(access_token: str, realm_id: str) -> str:
         base_url = get_api_base_url()
         url = f"{base_url}/v3/company/{realm_id}/companyinfo/{realm_id}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Accept": "application/json"
-                }
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("CompanyInfo", {}).get("CompanyName", "Unknown Company")
+        client = get_http_client()
+        response = await client.get(
+            url,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Accept": "application/json"
+            }
+        )
+
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("CompanyInfo", {}).get("CompanyName", "Unknown Company")
     except Exception as _exc:
         logger.debug("Suppressed company name fetch: %s", _exc)
 
     return "Unknown Company"
 
 
+# ====== PAGED QUERIES ======
+
+def _realm_gate(realm_id: str) -> asyncio.Semaphore:
+    """Per-realm cap on in-flight QBO requests (shared by every sync on the
+    running loop)."""
+    gates = _per_loop("realm_gates")
+    gate = gates.get(realm_id)
+    if gate is None:
+        gate = asyncio.Semaphore(QBO_MAX_CONCURRENCY)
+        gates[realm_id] = gate
+    return gate
+
+
+def _txn_date_filter(start_date: Optional[str], end_date: Optional[str]) -> str:
+    clauses = []
+    if start_date:
+        clauses.append(f"TxnDate >= '{start_date}'")
+    if end_date:
+        clauses.append(f"TxnDate <= '{end_date}'")
+    return " AND ".join(clauses)
+
+
+async def stream_query(
+    realm_id: str,
+    entity: str,
+    where: str = "",
+    select: str = "*",
+    stats: Optional[Dict[str, Any]] = None,
+    page_size: int = QBO_PAGE_SIZE,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield every row of `SELECT {select} FROM {entity}` one page at a time,
+    walking STARTPOSITION until a short page comes back. Pages are ordered
+    by Id: without ORDERBY, QBO doesn't guarantee a stable order across
+    requests and rows can be skipped or repeated between pages.
+
+    `stats` (optional) is filled with {pages, rows, ms, slowest_page_ms}.
+    """
+    base = f"SELECT {select} FROM {entity}"
+    if where:
+        base += f" WHERE {where}"
+    base += " ORDERBY Id"
+
+    if stats is not None:
+        stats.update({"pages": 0, "rows": 0, "ms": 0, "slowest_page_ms": 0})
+
+    position = 1
+    while True:
+        query = f"{base} STARTPOSITION {position} MAXRESULTS {page_size}"
+        async with _realm_gate(realm_id):
+            t0 = time.perf_counter()
+            result = await qbo_query(realm_id, query)
+            page_ms = int((time.perf_counter() - t0) * 1000)
+
+        rows = result.get("QueryResponse", {}).get(entity, [])
+        if stats is not None:
+            stats["pages"] += 1
+            stats["rows"] += len(rows)
+            stats["ms"] += page_ms
+            stats["slowest_page_ms"] = max(stats["slowest_page_ms"], page_ms)
+
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            break
+        position += page_size
+
+
+async def fetch_query_all(
+    realm_id: str,
+    entity: str,
+    where: str = "",
+    select: str = "*",
+    stats: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Every row of a QBO query, all pages collected into one list."""
+    rows: List[Dict[str, Any]] = []
+    async for page in stream_query(realm_id, entity, where, select, stats):
+        rows.extend(page)
+    return rows
+
+
+def stream_transactions(
+    realm_id: str,
+    entity: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Page stream of one transaction entity (Bill, Purchase, ...) in a TxnDate window."""
+    return stream_query(realm_id, entity, _txn_date_filter(start_date, end_date), stats=stats)
+
+
+# ====== CHANGE DATA CAPTURE ======
+
+# QBO's CDC endpoint only looks back 30 days and returns at most 1000 objects
+# per entity; keep a day of margin on the lookback.
+CDC_MAX_LOOKBACK = timedelta(days=29)
+CDC_MAX_OBJECTS = 1000
+# Re-read this much before the stored watermark (clock skew / in-flight
+# commits on Intuit's side). Upserts are idempotent, so overlap is harmless.
+CDC_OVERLAP = timedelta(minutes=5)
+
+
+def _qbo_timestamp(dt: datetime) -> str:
+    return dt.replace(microsecond=0).isoformat() + "Z"
+
+
+async def fetch_changes(
+    realm_id: str,
+    entities: List[str],
+    changed_since: datetime,
+    stats: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Entities created/updated/deleted since `changed_since` (naive UTC).
+
+    Returns {entity: {"changed": [txn, ...], "deleted": [txn_id, ...],
+    "capped": bool}}. "capped" means CDC hit its 1000-object cap for that
+    entity: the change set is incomplete (deletions past the cap can't be
+    re-read any other way), so the caller must not apply it and advance its
+    watermark; fall back to a full sync instead.
+    """
+    since = _qbo_timestamp(changed_since - CDC_OVERLAP)
+    t0 = time.perf_counter()
+    async with _realm_gate(realm_id):
+        result = await qbo_api_request(
+            realm_id, "cdc",
+            params={"entities": ",".join(entities), "changedSince": since},
+        )
+
+    out: Dict[str, Dict[str, Any]] = {e: {"changed": [], "deleted": [], "capped": False} for e in entities}
+    for block in result.get("CDCResponse", []) or []:
+        for qr in block.get("QueryResponse", []) or []:
+            for entity in entities:
+                for obj in qr.get(entity, []) or []:
+                    if obj.get("status") == "Deleted":
+                        out[entity]["deleted"].append(str(obj.get("Id", "")))
+                    else:
+                        out[entity]["changed"].append(obj)
+
+    for entity in entities:
+        if len(out[entity]["changed"]) + len(out[entity]["deleted"]) >= CDC_MAX_OBJECTS:
+            out[entity]["capped"] = True
+            logger.info("[QBO] CDC capped for %s (realm %s); change set incomplete", entity, realm_id)
+
+    if stats is not None:
+        stats["cdc_ms"] = int((time.perf_counter() - t0) * 1000)
+        stats["changed_since"] = since
+        stats["capped"] = [e for e in entities if out[e]["capped"]]
+
+    return out
+
+
+def get_sync_watermark(realm_id: str, scope: str) -> Optional[datetime]:
+    """Last successful sync start (naive UTC) for realm+scope, or None."""
+    result = supabase.table("qbo_sync_state") \
+        .select("last_synced_at") \
+        .eq("realm_id", realm_id) \
+        .eq("scope", scope) \
+        .execute()
+    if not result.data or not result.data[0].get("last_synced_at"):
+        return None
+    value = datetime.fromisoformat(str(result.data[0]["last_synced_at"]).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def set_sync_watermark(realm_id: str, scope: str, synced_at: datetime, mode: str) -> None:
+    """Record a completed sync. `synced_at` is when its fetch STARTED (naive UTC)."""
+    supabase.table("qbo_sync_state").upsert({
+        "realm_id": realm_id,
+        "scope": scope,
+        "last_synced_at": synced_at.isoformat(),
+        "last_mode": mode,
+        "updated_at": datetime.utcnow().isoformat(),
+    }, on_conflict="realm_id,scope").execute()
+
+
 # ====== EXPENSE FETCHING ======
 
 async def fetch_all_purchases(
@@ -314,18 +625,7 @@ async def fetch_all_purchases(
     """
     Fetch all Purchase transactions from QBO.
     """
-    query = "SELECT * FROM Purchase"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("Purchase", [])
+    return await fetch_query_all(realm_id, "Purchase", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_all_bills(
@@ -336,18 +636,7 @@ async def fetch_all_bills(
     """
     Fetch all Bill transactions from QBO.
     """
-    query = "SELECT * FROM Bill"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("Bill", [])
+    return await fetch_query_all(realm_id, "Bill", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_all_vendor_credits(
@@ -358,18 +647,7 @@ async def fetch_all_vendor_credits(
     """
     Fetch all VendorCredit transactions from QBO.
     """
-    query = "SELECT * FROM VendorCredit"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("VendorCredit", [])
+    return await fetch_query_all(realm_id, "VendorCredit", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_all_journal_entries(
@@ -380,18 +658,7 @@ async def fetch_all_journal_entries(
     """
     Fetch all JournalEntry transactions from QBO.
     """
-    query = "SELECT * FROM JournalEntry"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("JournalEntry", [])
+    return await fetch_query_all(realm_id, "JournalEntry", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_all_invoices(
@@ -402,18 +669,7 @@ async def fetch_all_invoices(
     """
     Fetch all Invoice transactions from QBO (Revenue/Income).
     """
-    query = "SELECT * FROM Invoice"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("Invoice", [])
+    return await fetch_query_all(realm_id, "Invoice", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_all_sales_receipts(
@@ -424,18 +680,7 @@ async def fetch_all_sales_receipts(
     """
     Fetch all SalesReceipt transactions from QBO (Revenue/Income).
     """
-    query = "SELECT * FROM SalesReceipt"
-    if start_date:
-        query += f" WHERE TxnDate >= '{start_date}'"
-        if end_date:
-            query += f" AND TxnDate <= '{end_date}'"
-    elif end_date:
-        query += f" WHERE TxnDate <= '{end_date}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("SalesReceipt", [])
+    return await fetch_query_all(realm_id, "SalesReceipt", _txn_date_filter(start_date, end_date))
 
 
 async def fetch_project_catalog(realm_id: str) -> Dict[str, str]:
@@ -443,10 +688,10 @@ async def fetch_project_catalog(realm_id: str) -> Dict[str, str]:
     Fetch all Jobs/Projects from QBO (Customers where Job=true).
     Returns dict: {customer_id: customer_name}
     """
-    query = "SELECT Id, DisplayName, FullyQualifiedName FROM Customer WHERE Job = true AND Active = true MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    customers = result.get("QueryResponse", {}).get("Customer", [])
+    customers = await fetch_query_all(
+        realm_id, "Customer", "Job = true AND Active = true",
+        select="Id, DisplayName, FullyQualifiedName",
+    )
 
     project_map = {}
     for c in customers:
@@ -462,10 +707,9 @@ async def fetch_accounts_metadata(realm_id: str) -> Dict[str, Dict]:
     Fetch all accounts from QBO with their metadata.
     Returns dict: {account_id: {Name, AccountType, AccountSubType}}
     """
-    query = "SELECT Id, Name, AccountType, AccountSubType FROM Account MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    accounts = result.get("QueryResponse", {}).get("Account", [])
+    accounts = await fetch_query_all(
+        realm_id, "Account", select="Id, Name, AccountType, AccountSubType",
+    )
 
     account_map = {}
     for a in accounts:
@@ -558,6 +802,7 @@ def disconnect(realm_id: str) -> bool:
     Remove QBO connection (delete tokens).
     """
     supabase.table("qbo_tokens").delete().eq("realm_id", realm_id).execute()
+    invalidate_token_cache(realm_id)
     return True
 
 
@@ -571,11 +816,5 @@ async def fetch_budgets(
     Fetch all Budget records from QBO.
     QuickBooks budgets are divided into 12 monthly periods.
     """
-    query = "SELECT * FROM Budget"
-    if fiscal_year:
-        query += f" WHERE FiscalYear = '{fiscal_year}'"
-
-    query += " MAXRESULTS 1000"
-
-    result = await qbo_query(realm_id, query)
-    return result.get("QueryResponse", {}).get("Budget", [])
+    where = f"FiscalYear = '{fiscal_year}'" if fiscal_year else ""
+    return await fetch_query_all(realm_id, "Budget", where)
@@ -0,0 +1,187 @@
+# services/receipt_prompt.py
+# ============================================================================
+# Token-budget helpers for the receipt OCR prompts (receipt_scanner).
+#
+# The OCR prompts used to embed the full Vendors table (thousands of names)
+# in every call. This module keeps the prompt small and cache-friendly:
+#
+#   shortlist_vendors()  -> top-k candidate vendors for THIS receipt, scored
+#                           locally from the receipt header, filename hints and
+#                           receipt_regex.fuzzy_match_vendor. No GPT.
+#   resolve_vendor()     -> maps whatever vendor name GPT returned back onto
+#                           the FULL vendor list (or "Unknown"), so a vendor
+#                           missing from the shortlist is still matched.
+#   record_prompt()      -> estimated prompt tokens per scan mode (in-memory
+#                           stats + value logged into ocr_metrics.metadata).
+#
+# Prompt layout rule (see receipt_scanner._build_*_prompt): the static rules
+# come FIRST and the per-receipt parts (candidate lists, page hint, receipt
+# text) LAST, so consecutive calls share a long identical prefix and the
+# provider-side prompt cache (>= 1024 identical leading tokens) applies.
+# ============================================================================
+
+import re
+import threading
+from collections import defaultdict
+from difflib import SequenceMatcher, get_close_matches
+from typing import Dict, List, Optional
+
+from services.receipt_regex import extract_filename_hints, fuzzy_match_vendor
+
+VENDOR_SHORTLIST_K = 25
+_HEADER_LINES = 15
+_WORD_RE = re.compile(r"[A-Z0-9&']{3,}")
+
+# Rough chars-per-token for English receipt prompts (no tokenizer dependency).
+_CHARS_PER_TOKEN = 4
+
+
+# ── Vendor shortlist ────────────────────────────────────────────
+
+def _words(s: str) -> set:
+    return set(_WORD_RE.findall(s.upper()))
+
+
+def shortlist_vendors(vendors_list: List[str], text: Optional[str] = None,
+                      filename: Optional[str] = None,
+                      k: int = VENDOR_SHORTLIST_K,
+                      extra: Optional[List[str]] = None) -> List[str]:
+    """Return at most k likely vendors for one receipt (always incl. "Unknown").
+
+    Scoring (higher wins):
+      100  exact vendor name in the receipt header / filename
+       80  receipt_regex.fuzzy_match_vendor pick
+       60  filename vendor hint (e.g. "Home Depot Invoice.pdf")
+     0-50  word overlap + difflib similarity against the header
+    `extra` names (e.g. vendors already on OCR items) are always kept.
+    """
+    if len(vendors_list) <= k:
+        return list(vendors_list)
+
+    header = "\n".join((text or "").split("\n")[:_HEADER_LINES])
+    fname = filename or ""
+    haystack = f"{header}\n{fname}".upper()
+    hay_words = _words(haystack)
+
+    scores: Dict[str, float] = {}
+
+    if text:
+        pick = fuzzy_match_vendor(text, vendors_list)
+        if pick and pick != "Unknown":
+            scores[pick] = 80.0
+
+    hint = extract_filename_hints(filename).get("vendor_hint") if filename else None
+    if hint:
+        hint_words = _words(hint.replace("_", " "))
+        for v in vendors_list:
+            if hint_words and hint_words <= _words(v):
+                scores[v] = max(scores.get(v, 0.0), 60.0)
+
+    if hay_words:
+        for v in vendors_list:
+            if v == "Unknown":
+                continue
+            vu = v.upper()
+            if vu in haystack:
+                scores[v] = 100.0
+                continue
+            vw = _words(vu)
+            if not vw:
+                continue
+            overlap = len(vw & hay_words) / len(vw)
+            if overlap:
+                scores[v] = max(scores.get(v, 0.0), 40.0 * overlap)
+
+        # difflib only over the header's first line-ish prefix; cheap enough for
+        # a few thousand names and catches OCR-mangled spellings.
+        probe = " ".join(header.split())[:60].upper()
+        if probe:
+            by_upper = {x.upper(): x for x in vendors_list}
+            for v in get_close_matches(probe, list(by_upper), n=k, cutoff=0.3):
+                orig = by_upper[v]
+                if orig != "Unknown":
+                    sim = SequenceMatcher(None, probe, v).ratio()
+                    scores[orig] = max(scores.get(orig, 0.0), 50.0 * sim)
+
+    ranked = [v for v, _ in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)]
+    out: List[str] = []
+    for v in list(extra or []) + ranked:
+        if v and v != "Unknown" and v not in out and v in vendors_list:
+            out.append(v)
+        if len(out) >= k - 1:
+            break
+    out.append("Unknown")
+    return out
+
+
+def resolve_vendor(name: Optional[str], vendors_list: List[str]) -> str:
+    """Map a GPT-returned vendor name onto the full vendor list, else "Unknown"."""
+    if not name:
+        return "Unknown"
+    if name in vendors_list:
+        return name
+    upper = name.strip().upper()
+    by_upper = {v.upper(): v for v in vendors_list}
+    if upper in by_upper:
+        return by_upper[upper]
+    # "THE HOME DEPOT #4521" -> "Home Depot"
+    contained = [v for v in vendors_list if v != "Unknown" and len(v) >= 4 and v.upper() in upper]
+    if contained:
+        return max(contained, key=len)
+    close = get_close_matches(upper, list(by_upper), n=1, cutoff=0.8)
+    if close:
+        return by_upper[close[0]]
+    return "Unknown"
+
+
+def resolve_expense_vendors(expenses: List[dict], vendors_list: List[str]) -> None:
+    """In place: every expense["vendor"] ends up in vendors_list or "Unknown"."""
+    memo: Dict[str, str] = {}
+    for exp in expenses:
+        raw = exp.get("vendor")
+        if raw in memo:
+            exp["vendor"] = memo[raw]
+            continue
+        resolved = resolve_vendor(raw, vendors_list)
+        memo[raw] = resolved
+        exp["vendor"] = resolved
+
+
+# ── Prompt size accounting ──────────────────────────────────────
+
+def estimate_tokens(*parts: str) -> int:
+    return sum(len(p or "") for p in parts) // _CHARS_PER_TOKEN
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"calls": 0, "prompt_tokens_est": 0, "max_prompt_tokens_est": 0, "vendors_included": 0}
+)
+
+
+def record_prompt(mode: str, prompt: str, vendors_included: int, system: str = "") -> int:
+    """Track estimated prompt tokens for one OCR call; returns the estimate."""
+    tokens = estimate_tokens(system, prompt)
+    with _stats_lock:
+        s = _stats[mode]
+        s["calls"] += 1
+        s["prompt_tokens_est"] += tokens
+        s["max_prompt_tokens_est"] = max(s["max_prompt_tokens_est"], tokens)
+        s["vendors_included"] += vendors_included
+    return tokens
+
+
+def get_prompt_stats() -> Dict[str, dict]:
+    """Per scan mode: calls, avg/max estimated prompt tokens, avg vendors sent."""
+    with _stats_lock:
+        snapshot = {m: dict(s) for m, s in _stats.items()}
+    out = {}
+    for mode, s in snapshot.items():
+        calls = s["calls"] or 1
+        out[mode] = {
+            "calls": s["calls"],
+            "avg_prompt_tokens_est": s["prompt_tokens_est"] // calls,
+            "max_prompt_tokens_est": s["max_prompt_tokens_est"],
+            "avg_vendors_included": round(s["vendors_included"] / calls, 1),
+        }
+    return out
@@ -12,6 +12,7 @@
 
 from api.supabase_client import supabase
 from api.services.ocr_metrics import log_ocr_metric, ocr_timer
+from services.receipt_prompt import record_prompt, resolve_expense_vendors, shortlist_vendors
 from typing import Optional
 import base64
 import hashlib
@@ -357,7 +358,7 @@ Return ONLY valid JSON in this exact format:
       "date": "2025-01-17",
       "bill_id": "INV-12345",
       "description": "Item name or description",
-      "vendor": "Exact vendor name from VENDORS list or Unknown",
+      "vendor": "Exact vendor name from VENDORS list (or as printed if not listed)",
       "amount": 45.99,
       "transaction_type": "Exact name from TRANSACTION TYPES list or Unknown",
       "payment_method": "Exact name from PAYMENT METHODS list or Unknown",
@@ -394,20 +395,12 @@ IMPORTANT:
 DO NOT include any text before or after the JSON. ONLY return the JSON object."""
 
 
-def _build_vision_prompt(vendors_list, txn_types_list, payment_methods_list, page_count_hint=""):
-    """Build the main OCR prompt for vision mode."""
-    return f"""You are an expert at extracting expense data from receipts, invoices, and bills.
-{page_count_hint}
+# Static part of the vision prompt, built once so every vision call starts with
+# an identical prefix (provider-side prompt caching). Everything per-receipt
+# (candidate vendors, lookup lists, page hint) is appended AFTER it.
+_VISION_RULES = f"""You are an expert at extracting expense data from receipts, invoices, and bills.
 Analyze this receipt/invoice and extract ALL expense items in JSON format.
-
-AVAILABLE VENDORS (you MUST match to one of these, or use "Unknown"):
-{json.dumps(vendors_list, indent=2)}
-
-AVAILABLE TRANSACTION TYPES (you MUST match to one of these by name, or use "Unknown"):
-{json.dumps(txn_types_list, indent=2)}
-
-AVAILABLE PAYMENT METHODS (you MUST match to one of these by name, or use "Unknown"):
-{json.dumps(payment_methods_list, indent=2)}
+The AVAILABLE VENDORS / TRANSACTION TYPES / PAYMENT METHODS lists are at the end of these instructions.
 
 IMPORTANT RULES:
 
@@ -450,7 +443,7 @@ IMPORTANT RULES:
    - date: Transaction date in YYYY-MM-DD format (look for: Date, Invoice Date, Transaction Date, or use document date)
    - bill_id: Invoice/Bill/Receipt number - extract from: "Invoice #", "Invoice No.", "Bill #", "Receipt #", "Ref #", "PO #", "Order #", "Transaction ID", "Document #", "Confirmation #", or any similar reference number at the top of the document. This is typically the same for all items in one receipt/invoice.
    - description: Item description (include quantity if shown, e.g., "3x Lumber 2x4", "Labor - 4 hours")
-   - vendor: Match to AVAILABLE VENDORS list using partial/fuzzy matching. If not found, use "Unknown"
+   - vendor: Match to AVAILABLE VENDORS list using partial/fuzzy matching. If none fits, use the vendor name exactly as printed on the receipt (it is matched to the full vendor list server-side)
    - amount: The LINE TOTAL as a number (no currency symbols) - NOT the unit price!
    - transaction_type: Match to AVAILABLE TRANSACTION TYPES by document type. If uncertain, use "Unknown"
    - payment_method: Match to AVAILABLE PAYMENT METHODS by payment indicators on receipt. If uncertain, use "Unknown"
@@ -469,11 +462,30 @@ IMPORTANT RULES:
 
 {_RULES_TAIL}
 
-9. CRITICAL: vendor, transaction_type, and payment_method MUST exactly match one from their respective lists, or use "Unknown"
+9. CRITICAL: transaction_type and payment_method MUST exactly match one from their respective lists, or use "Unknown". vendor MUST be an AVAILABLE VENDORS entry or, if none fits, the name as printed
 
 {_OUTPUT_SPEC}"""
 
 
+def _build_vision_prompt(vendors_list, txn_types_list, payment_methods_list, page_count_hint=""):
+    """Build the main OCR prompt for vision mode.
+
+    vendors_list is the per-receipt shortlist (see receipt_prompt.shortlist_vendors),
+    not the whole Vendors table. Static rules first, per-receipt lists last.
+    """
+    return f"""{_VISION_RULES}
+
+AVAILABLE VENDORS (candidates for this receipt; if none fits, use the name as printed):
+{json.dumps(vendors_list)}
+
+AVAILABLE TRANSACTION TYPES (you MUST match to one of these by name, or use "Unknown"):
+{json.dumps([t["name"] for t in txn_types_list])}
+
+AVAILABLE PAYMENT METHODS (you MUST match to one of these by name, or use "Unknown"):
+{json.dumps([p["name"] for p in payment_methods_list])}
+{page_count_hint}"""
+
+
 def _build_text_prompt(vendors_list, txn_types_list, payment_methods_list, extracted_text):
     """Build the OCR prompt for pdfplumber text mode."""
     return f"""You are an expert at extracting expense data from receipts, invoices, and bills.
@@ -563,19 +575,8 @@ IMPORTANT RULES:
 --- RECEIPT TEXT END ---"""
 
 
-def _build_text_prompt_slim(vendors_list, txn_types_list, payment_methods_list, extracted_text):
-    """Optimized prompt for text mode (pdfplumber). ~60% smaller than full prompt.
-    Used by both fast (gpt-5.2) and fast-beta (gpt-5-mini) text modes.
-    Relies on json_mode=True so no JSON template needed."""
-    vendor_names = ", ".join(vendors_list)
-    txn_names = ", ".join(t["name"] for t in txn_types_list)
-    pmt_names = ", ".join(p["name"] for p in payment_methods_list)
-
-    return f"""Extract ALL expense line items from this receipt text.
-
-VENDORS (match one or "Unknown"): {vendor_names}
-TRANSACTION TYPES (match one or "Unknown"): {txn_names}
-PAYMENT METHODS (match one or "Unknown"): {pmt_names}
+# Static part of the slim text prompt (see _VISION_RULES for the layout rule).
+_TEXT_RULES_SLIM = """Extract ALL expense line items from the receipt text at the end of this prompt.
 
 RULES:
 1. Use LINE TOTALS (extended amount), never unit prices. The line total is the largest dollar amount per item.
@@ -585,6 +586,7 @@ RULES:
 5. FEES (delivery, freight, environmental, surcharges, tips) are separate line items, NOT distributed like tax.
 6. Prefer "Debit" over "Unknown" for payment_method when any card/electronic indicator exists.
 7. If only one total with no itemization, create one expense with that total.
+8. vendor: one of the VENDORS candidates; if none fits, the vendor name as printed on the receipt. transaction_type / payment_method: one of their lists or "Unknown".
 
 IMPORTANT: NEVER create an expense for "Sales Tax", "Tax", "State Tax", "HST", "GST", "VAT", or any tax, NOR for a "Discount", "Coupon" or "Savings". Distribute tax across items, and subtract discounts proportionally from items, instead.
 
@@ -594,7 +596,23 @@ VALIDATION (mandatory):
 - validation_passed = true if they match within $0.02
 - If calculated_sum equals subtotal instead of grand total, you forgot tax distribution - fix it
 
-Return JSON: {{"expenses": [{{"date","bill_id","description","vendor","amount","transaction_type","payment_method","tax_included"}}], "tax_summary": {{"total_tax_detected","tax_label","subtotal","grand_total","distribution":[{{"description","original_amount","tax_added","final_amount"}}]}} or null, "validation": {{"invoice_total","calculated_sum","validation_passed","validation_warning"}}}}
+Return JSON: {"expenses": [{"date","bill_id","description","vendor","amount","transaction_type","payment_method","tax_included"}], "tax_summary": {"total_tax_detected","tax_label","subtotal","grand_total","distribution":[{"description","original_amount","tax_added","final_amount"}]} or null, "validation": {"invoice_total","calculated_sum","validation_passed","validation_warning"}}"""
+
+
+def _build_text_prompt_slim(vendors_list, txn_types_list, payment_methods_list, extracted_text):
+    """Optimized prompt for text mode (pdfplumber). ~60% smaller than full prompt.
+    Used by both fast (gpt-5.2) and fast-beta (gpt-5-mini) text modes.
+    Relies on json_mode=True so no JSON template needed. vendors_list is the
+    per-receipt shortlist; static rules first, per-receipt parts last."""
+    vendor_names = ", ".join(vendors_list)
+    txn_names = ", ".join(t["name"] for t in txn_types_list)
+    pmt_names = ", ".join(p["name"] for p in payment_methods_list)
+
+    return f"""{_TEXT_RULES_SLIM}
+
+VENDORS (candidates; match one, else the name as printed): {vendor_names}
+TRANSACTION TYPES (match one or "Unknown"): {txn_names}
+PAYMENT METHODS (match one or "Unknown"): {pmt_names}
 
 --- RECEIPT TEXT ---
 {extracted_text}"""
@@ -929,20 +947,32 @@ def _scan_receipt_inner(file_content, file_type, model, correction_context, file
               f"(using cleaned text: {len(cleaned_text)} chars)")
         extracted_text = cleaned_text
 
-    # Build prompt
+    # Build prompt. Only a per-receipt vendor shortlist goes into the prompt;
+    # whatever vendor GPT returns is resolved against the full list afterwards.
     if correction_context:
         use_text_mode = False
         extraction_method = "correction"
-        prompt = _build_correction_prompt(correction_context, vendors_list, txn_types_list, payment_methods_list)
+        prompt_vendors = shortlist_vendors(
+            vendors_list, filename=filename,
+            extra=[i.get("vendor") for i in correction_context.get("items", [])],
+        )
+        prompt = _build_correction_prompt(correction_context, prompt_vendors, txn_types_list, payment_methods_list)
     elif use_text_mode:
         # Text modes (fast, fast-beta) use the slim prompt
-        prompt = _build_text_prompt_slim(vendors_list, txn_types_list, payment_methods_list, extracted_text)
+        prompt_vendors = shortlist_vendors(vendors_list, text=extracted_text, filename=filename)
+        prompt = _build_text_prompt_slim(prompt_vendors, txn_types_list, payment_methods_list, extracted_text)
         logger.info(f"[SCAN-RECEIPT] Slim prompt: {len(prompt)} chars")
     else:
         page_count_hint = ""
         if len(base64_images) > 1:
             page_count_hint = f"\n\nIMPORTANT: This document has {len(base64_images)} pages. Analyze ALL pages and combine the data from all of them into a single response. The images are provided in page order (Page 1, Page 2, etc.).\n"
-        prompt = _build_vision_prompt(vendors_list, txn_types_list, payment_methods_list, page_count_hint)
+        prompt_vendors = shortlist_vendors(vendors_list, filename=filename)
+        prompt = _build_vision_prompt(prompt_vendors, txn_types_list, payment_methods_list, page_count_hint)
+
+    prompt_tokens_est = record_prompt("correction" if correction_context else model, prompt,
+                                      vendors_included=len(prompt_vendors))
+    logger.info(f"[SCAN-RECEIPT] Prompt ~{prompt_tokens_est} tokens "
+                f"({len(prompt_vendors)}/{len(vendors_list)} vendors)")
 
     # Call OpenAI
     if use_text_mode:
@@ -1020,6 +1050,9 @@ def _scan_receipt_inner(file_content, file_type, model, correction_context, file
     # Safety net: catch and redistribute any tax line items GPT created
     parsed_data = _redistribute_tax_items(parsed_data)
 
+    # Vendors outside the shortlist come back as printed; map onto the full list
+    resolve_expense_vendors(parsed_data["expenses"], vendors_list)
+
     logger.info(f"[SCAN-RECEIPT] COMPLETADO - metodo: {extraction_method}, items: {len(parsed_data['expenses'])}")
 
     # Log OCR metric
@@ -1037,6 +1070,7 @@ def _scan_receipt_inner(file_content, file_type, model, correction_context, file
         confidence=int(validation.get("validation_passed", False)) * 100 if validation else None,
         items_count=len(parsed_data["expenses"]),
         tax_detected=bool(tax_summary and tax_summary.get("total_tax_detected", 0) > 0),
+        metadata={"prompt_tokens_est": prompt_tokens_est, "vendors_in_prompt": len(prompt_vendors)},
     )
 
     return {
@@ -0,0 +1,50 @@
+-- ============================================
+-- AUTOMATION DUTIES — BULK TASK UPDATES
+-- ============================================
+-- apply_automation_task_updates(rows): applies the changed automated tasks of
+-- a duty run (api/routers/pipeline.py run_duty / manual responsibilities) in
+-- one statement instead of one UPDATE per task.
+--
+-- p_rows: [{"task_id", "task_description", "task_notes",
+--           ["automation_metadata"], ["managers_ids"], ["manager"],
+--           ["Owner_id"], ["task_department"]}]
+-- Optional keys are only written when present in the row.
+-- The API falls back to per-row updates while the function is missing.
+--
+-- Idempotent. Run on staging, then prod.
+
+CREATE OR REPLACE FUNCTION apply_automation_task_updates(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE tasks t
+       SET task_description    = x.j->>'task_description',
+           task_notes          = x.j->>'task_notes',
+           automation_metadata = CASE WHEN x.j ? 'automation_metadata'
+                                      THEN x.j->'automation_metadata' ELSE t.automation_metadata END,
+           managers_ids        = CASE WHEN x.j ? 'managers_ids' THEN
+                                          CASE WHEN jsonb_typeof(x.j->'managers_ids') = 'array'
+                                               THEN ARRAY(SELECT jsonb_array_elements_text(x.j->'managers_ids'))::uuid[]
+                                          END
+                                      ELSE t.managers_ids END,
+           manager             = CASE WHEN x.j ? 'manager'
+                                      THEN (x.j->>'manager')::uuid ELSE t.manager END,
+           "Owner_id"          = CASE WHEN x.j ? 'Owner_id'
+                                      THEN (x.j->>'Owner_id')::uuid ELSE t."Owner_id" END,
+           task_department     = CASE WHEN x.j ? 'task_department'
+                                      THEN (x.j->>'task_department')::uuid ELSE t.task_department END
+      FROM jsonb_array_elements(p_rows) AS x(j)
+     WHERE t.task_id = (x.j->>'task_id')::uuid;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- SECURITY DEFINER with a pinned search_path; EXECUTE is revoked from
+-- public/anon/authenticated so only service_role (the API) can call it.
+REVOKE EXECUTE ON FUNCTION apply_automation_task_updates(JSONB) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_automation_task_updates(JSONB) TO service_role;
+
+-- Shared per-run read of every automated task.
+CREATE INDEX IF NOT EXISTS idx_tasks_automated_type ON tasks(automation_type) WHERE is_automated = TRUE;
@@ -0,0 +1,61 @@
+-- =============================================================================
+-- Calendar — bulk Google pull sync + per-user sync stats
+-- =============================================================================
+-- Supports google_calendar.sync_users / _apply_pulled_events:
+--
+--   1. google_calendar_tokens.last_sync_ms / last_sync_counts / last_sync_error
+--        written by every pull (duration, fetched/created/updated/deleted/
+--        skipped counts, last failure) and surfaced by /calendar/google/status
+--   2. apply_calendar_event_patches(rows) — applies a batch of Google-side
+--        changes to calendar_events in one statement and returns the updated
+--        rows (the API reschedules reminders from them)
+--
+-- The API falls back to per-row updates while the function is missing.
+--
+-- Idempotent. Run on staging first, then prod (Supabase SQL editor).
+-- Path: C:\Users\germa\Desktop\NGM_API\sql\calendar_google_bulk_sync.sql
+-- =============================================================================
+
+
+-- =============================================================================
+-- 1. Per-user sync stats
+-- =============================================================================
+ALTER TABLE google_calendar_tokens ADD COLUMN IF NOT EXISTS last_sync_ms integer;
+ALTER TABLE google_calendar_tokens ADD COLUMN IF NOT EXISTS last_sync_counts jsonb;
+ALTER TABLE google_calendar_tokens ADD COLUMN IF NOT EXISTS last_sync_error text;
+
+
+-- =============================================================================
+-- 2. Bulk patch
+-- =============================================================================
+-- p_rows: [{"event_id", "title", "description", "location", "start_at",
+--           "end_at", "all_day", "rrule", ["meeting_url", "meeting_provider"]}]
+-- meeting_* are only touched when the key is present (Google had a Meet link).
+CREATE OR REPLACE FUNCTION apply_calendar_event_patches(p_rows jsonb)
+RETURNS SETOF calendar_events AS $$
+    UPDATE calendar_events e
+       SET title            = x.j->>'title',
+           description      = x.j->>'description',
+           location         = x.j->>'location',
+           start_at         = (x.j->>'start_at')::timestamptz,
+           end_at           = (x.j->>'end_at')::timestamptz,
+           all_day          = coalesce((x.j->>'all_day')::boolean, false),
+           rrule            = x.j->>'rrule',
+           meeting_url      = CASE WHEN x.j ? 'meeting_url' THEN x.j->>'meeting_url' ELSE e.meeting_url END,
+           meeting_provider = CASE WHEN x.j ? 'meeting_provider' THEN x.j->>'meeting_provider' ELSE e.meeting_provider END
+      FROM jsonb_array_elements(p_rows) AS x(j)
+     WHERE e.event_id = (x.j->>'event_id')::uuid
+    RETURNING e.*;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- SECURITY DEFINER with a pinned search_path; EXECUTE is revoked from
+-- public/anon/authenticated so only service_role (the API) can call it.
+REVOKE EXECUTE ON FUNCTION apply_calendar_event_patches(jsonb) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_calendar_event_patches(jsonb) TO service_role;
+
+
+-- =============================================================================
+-- VERIFICATION
+-- =============================================================================
+-- select user_id, last_synced_at, last_sync_ms, last_sync_counts, last_sync_error
+--   from google_calendar_tokens order by last_sync_ms desc nulls last;
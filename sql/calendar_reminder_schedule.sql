@@ -0,0 +1,78 @@
+-- =============================================================================
+-- Calendar — materialized reminder schedule
+-- =============================================================================
+-- Adds the precomputed "next reminder" to calendar_events so the cron
+-- dispatcher (/calendar/cron/dispatch-reminders) reads only the reminders that
+-- are due instead of expanding every recurring series on every tick:
+--
+--   * next_reminder_at          — when the next reminder fires (NULL = none left)
+--   * next_reminder_occurrence  — the occurrence start it announces
+--
+-- The API keeps both current (api/services/calendar_reminders.py): on event
+-- create/update, after a Google pull changes an event, and after each fire.
+--
+-- set_calendar_reminder_schedule(rows) writes a batch of schedules in one call.
+--
+-- Backfill: one-off events are filled below. Recurring series need RRULE
+-- expansion — run `python backfill_reminder_schedule.py` once after this file.
+--
+-- Idempotent. Run on staging first, then prod (Supabase SQL editor).
+-- Path: C:\Users\germa\Desktop\NGM_API\sql\calendar_reminder_schedule.sql
+-- =============================================================================
+
+ALTER TABLE calendar_events ADD COLUMN IF NOT EXISTS next_reminder_at timestamptz;
+ALTER TABLE calendar_events ADD COLUMN IF NOT EXISTS next_reminder_occurrence timestamptz;
+
+-- Due-reminder sweep: WHERE next_reminder_at <= now() ORDER BY next_reminder_at.
+CREATE INDEX IF NOT EXISTS idx_calendar_events_next_reminder
+    ON calendar_events (next_reminder_at)
+    WHERE next_reminder_at IS NOT NULL;
+
+
+-- =============================================================================
+-- Bulk schedule write
+-- =============================================================================
+-- p_rows: [{"event_id": uuid, "next_reminder_at": ts|null,
+--           "next_reminder_occurrence": ts|null}, ...]
+CREATE OR REPLACE FUNCTION set_calendar_reminder_schedule(p_rows jsonb)
+RETURNS integer AS $$
+DECLARE
+    n integer;
+BEGIN
+    UPDATE calendar_events e
+       SET next_reminder_at = x.next_reminder_at,
+           next_reminder_occurrence = x.next_reminder_occurrence
+      FROM jsonb_to_recordset(p_rows)
+           AS x(event_id uuid, next_reminder_at timestamptz, next_reminder_occurrence timestamptz)
+     WHERE e.event_id = x.event_id;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- SECURITY DEFINER with a pinned search_path; EXECUTE is revoked from
+-- public/anon/authenticated so only service_role (the API) can call it.
+REVOKE EXECUTE ON FUNCTION set_calendar_reminder_schedule(jsonb) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION set_calendar_reminder_schedule(jsonb) TO service_role;
+
+
+-- =============================================================================
+-- Backfill — one-off events whose reminder is still ahead
+-- =============================================================================
+UPDATE calendar_events
+   SET next_reminder_at = start_at - make_interval(mins => reminder_minutes),
+       next_reminder_occurrence = start_at
+ WHERE rrule IS NULL
+   AND reminder_minutes > 0
+   AND start_at - make_interval(mins => reminder_minutes) > now()
+   AND next_reminder_at IS NULL;
+
+
+-- =============================================================================
+-- VERIFICATION
+-- =============================================================================
+-- select event_id, title, reminder_minutes, rrule, next_reminder_at, next_reminder_occurrence
+--   from calendar_events where next_reminder_at is not null order by next_reminder_at limit 20;
+--
+-- explain select * from calendar_events where next_reminder_at <= now()
+--   order by next_reminder_at limit 500;
@@ -0,0 +1,136 @@
+-- ============================================================
+-- channel_unread_counts — incrementally maintained unread badges.
+--
+-- Replaces the per-request recount in get_unread_counts() with one row per
+-- (user, channel_key):
+--   bump_unread_counts(message_id)        +1 for the channel audience
+--                                         (members for custom/direct/group,
+--                                         every user otherwise), sender excluded
+--   release_unread_for_message(message_id) -1 for users who had not read it yet
+--                                         (soft delete)
+--   /messages/mark-read                    resets the row to 0
+-- Same counting rules as get_unread_counts(): top-level, non-deleted messages
+-- from other users. The backfill at the bottom seeds rows from those rules.
+-- Both functions are security definer with a pinned search_path; EXECUTE is
+-- revoked from public/anon/authenticated so only service_role (the API)
+-- can call them.
+-- Idempotent. Run on staging, then prod.
+-- ============================================================
+
+create table if not exists public.channel_unread_counts (
+  user_id       uuid not null references public.users(user_id) on delete cascade,
+  channel_key   text not null,                 -- matches messages.channel_key
+  unread_count  integer not null default 0,
+  updated_at    timestamptz not null default now(),
+  primary key (user_id, channel_key)
+);
+
+-- Channel clear / release: all rows for one channel
+create index if not exists idx_channel_unread_counts_key
+  on public.channel_unread_counts (channel_key);
+
+alter table public.channel_unread_counts enable row level security;
+
+drop policy if exists "Service role full access" on public.channel_unread_counts;
+create policy "Service role full access" on public.channel_unread_counts
+  for all
+  using (auth.role() = 'service_role')
+  with check (auth.role() = 'service_role');
+
+
+-- +1 for everyone who can see the message's channel except the sender.
+create or replace function public.bump_unread_counts(p_message_id uuid)
+returns integer as $$
+declare
+  m record;
+  n integer;
+begin
+  select channel_key, channel_type, channel_id, user_id, reply_to_id, is_deleted
+    into m
+    from public.messages
+   where id = p_message_id;
+
+  if not found or m.reply_to_id is not null or coalesce(m.is_deleted, false) then
+    return 0;
+  end if;
+
+  insert into public.channel_unread_counts as c (user_id, channel_key, unread_count, updated_at)
+  select r.user_id, m.channel_key, 1, now()
+    from (
+      select cm.user_id
+        from public.channel_members cm
+       where m.channel_type in ('custom', 'direct', 'group')
+         and cm.channel_id = m.channel_id
+      union
+      select u.user_id
+        from public.users u
+       where m.channel_type not in ('custom', 'direct', 'group')
+    ) r
+   where r.user_id <> m.user_id
+  on conflict (user_id, channel_key)
+  do update set unread_count = c.unread_count + 1, updated_at = now();
+
+  get diagnostics n = row_count;
+  return n;
+end;
+$$ language plpgsql security definer set search_path = public;
+
+revoke execute on function public.bump_unread_counts(uuid) from public, anon, authenticated;
+grant execute on function public.bump_unread_counts(uuid) to service_role;
+
+
+-- -1 for users whose last read predates the message (it was still unread).
+create or replace function public.release_unread_for_message(p_message_id uuid)
+returns integer as $$
+declare
+  n integer;
+begin
+  update public.channel_unread_counts c
+     set unread_count = greatest(c.unread_count - 1, 0),
+         updated_at = now()
+    from public.messages m
+   where m.id = p_message_id
+     and m.reply_to_id is null
+     and c.channel_key = m.channel_key
+     and c.user_id <> m.user_id
+     and c.unread_count > 0
+     and not exists (
+       select 1
+         from public.channel_read_status s
+        where s.user_id = c.user_id
+          and s.channel_key = m.channel_key
+          and s.last_read_at >= m.created_at
+     );
+
+  get diagnostics n = row_count;
+  return n;
+end;
+$$ language plpgsql security definer set search_path = public;
+
+revoke execute on function public.release_unread_for_message(uuid) from public, anon, authenticated;
+grant execute on function public.release_unread_for_message(uuid) to service_role;
+
+
+-- Backfill: current unread state under the same audience rules.
+insert into public.channel_unread_counts as c (user_id, channel_key, unread_count, updated_at)
+select r.user_id, m.channel_key, count(*)::integer, now()
+  from public.messages m
+  join lateral (
+    select cm.user_id
+      from public.channel_members cm
+     where m.channel_type in ('custom', 'direct', 'group')
+       and cm.channel_id = m.channel_id
+    union
+    select u.user_id
+      from public.users u
+     where m.channel_type not in ('custom', 'direct', 'group')
+  ) r on r.user_id <> m.user_id
+  left join public.channel_read_status s
+    on s.user_id = r.user_id
+   and s.channel_key = m.channel_key
+ where m.is_deleted = false
+   and m.reply_to_id is null
+   and m.created_at > coalesce(s.last_read_at, '1970-01-01'::timestamptz)
+ group by r.user_id, m.channel_key
+on conflict (user_id, channel_key)
+do update set unread_count = excluded.unread_count, updated_at = now();
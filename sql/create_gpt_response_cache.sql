@@ -0,0 +1,23 @@
+-- ============================================================
+-- gpt_response_cache — optional second level of the GPT prompt cache.
+--
+-- Only used when GPT_CACHE_DB=1 (see api/services/gpt_cache.py). Memory is
+-- always the first level; this table lets cached answers for deterministic
+-- prompts survive deploys and be shared across workers.
+-- Idempotent. Run on staging, then prod.
+-- ============================================================
+
+create table if not exists public.gpt_response_cache (
+  cache_key     text primary key,                  -- sha256(model|instr|input|json_mode|variant)
+  model         text not null,
+  response      text not null,
+  input_tokens  integer not null default 0,        -- tokens of the original call (cost-saved stats)
+  output_tokens integer not null default 0,
+  created_at    timestamptz not null default now(),
+  expires_at    timestamptz not null
+);
+
+create index if not exists idx_gpt_response_cache_expires on public.gpt_response_cache (expires_at);
+
+-- Periodic cleanup (pg_cron or manual):
+--   delete from public.gpt_response_cache where expires_at < now();
@@ -0,0 +1,114 @@
+-- ============================================================
+-- Message full-text search (GET /messages/search).
+--
+-- messages.search_tsv is kept current by a trigger on insert / content edit
+-- and indexed with GIN. search_messages() ranks with ts_rank_cd, applies the
+-- channel visibility rules inside the query (members for custom/direct/group,
+-- read_roles for broadcast, admins see everything) and pages by keyset on
+-- (rank, created_at, id).
+--
+-- Existing rows: run backfill_message_search() until it returns 0
+-- (python backfill_message_search.py does that in batches).
+--
+-- Both functions are security definer and trust their arguments (the API
+-- passes the caller's user id / role / admin flag), so EXECUTE is revoked
+-- from public, anon and authenticated: only service_role (the API) can call
+-- them over PostgREST.
+-- Idempotent. Run on staging, then prod.
+-- ============================================================
+
+alter table public.messages add column if not exists search_tsv tsvector;
+
+create or replace function public.messages_search_tsv_update()
+returns trigger as $$
+begin
+  new.search_tsv := to_tsvector('english', coalesce(new.content, ''));
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists trg_messages_search_tsv on public.messages;
+create trigger trg_messages_search_tsv
+  before insert or update of content on public.messages
+  for each row execute function public.messages_search_tsv_update();
+
+create index if not exists idx_messages_search_tsv
+  on public.messages using gin (search_tsv);
+
+
+-- Batched backfill: fills up to p_batch rows per call, returns rows filled.
+create or replace function public.backfill_message_search(p_batch integer default 5000)
+returns integer as $$
+declare
+  n integer;
+begin
+  update public.messages m
+     set search_tsv = to_tsvector('english', coalesce(m.content, ''))
+   where m.id in (
+     select id from public.messages where search_tsv is null limit p_batch
+   );
+  get diagnostics n = row_count;
+  return n;
+end;
+$$ language plpgsql security definer set search_path = public;
+
+revoke execute on function public.backfill_message_search(integer) from public, anon, authenticated;
+grant execute on function public.backfill_message_search(integer) to service_role;
+
+
+-- p_query is a to_tsquery expression built by the API ("word:* & word:*").
+-- Pass the last row's (rank, created_at, id) as p_after_* for the next page.
+create or replace function public.search_messages(
+  p_user_id       uuid,
+  p_role          text,
+  p_is_admin      boolean,
+  p_query         text,
+  p_channel_type  text default null,
+  p_channel_id    uuid default null,
+  p_project_id    uuid default null,
+  p_limit         integer default 50,
+  p_after_rank    real default null,
+  p_after_created timestamptz default null,
+  p_after_id      uuid default null
+)
+returns table (message jsonb, rank real) as $$
+  with q as (
+    select to_tsquery('english', p_query) as tsq
+  )
+  select
+    (to_jsonb(m) - 'search_tsv')
+      || jsonb_build_object('users', jsonb_build_object(
+           'user_name', u.user_name, 'avatar_color', u.avatar_color)),
+    r.rank
+  from q
+  join public.messages m on m.search_tsv @@ q.tsq
+  cross join lateral (select ts_rank_cd(m.search_tsv, q.tsq)::real as rank) r
+  left join public.users u on u.user_id = m.user_id
+  where coalesce(m.is_deleted, false) = false
+    and (p_channel_type is null or m.channel_type = p_channel_type)
+    and (p_channel_id is null or m.channel_id = p_channel_id)
+    and (p_project_id is null or m.project_id = p_project_id)
+    and (
+      p_is_admin
+      or m.channel_type not in ('custom', 'direct', 'group', 'broadcast')
+      or (m.channel_type in ('custom', 'direct', 'group') and exists (
+            select 1 from public.channel_members cm
+             where cm.channel_id = m.channel_id and cm.user_id = p_user_id))
+      or (m.channel_type = 'broadcast' and exists (
+            select 1 from public.channels c
+             where c.id = m.channel_id
+               and (coalesce(jsonb_array_length(c.read_roles), 0) = 0
+                    or c.read_roles ? p_role)))
+    )
+    and (p_after_rank is null
+         or (r.rank, m.created_at, m.id) < (p_after_rank, p_after_created, p_after_id))
+  order by r.rank desc, m.created_at desc, m.id desc
+  limit p_limit;
+$$ language sql stable security definer set search_path = public;
+
+revoke execute on function public.search_messages(
+  uuid, text, boolean, text, text, uuid, uuid, integer, real, timestamptz, uuid
+) from public, anon, authenticated;
+grant execute on function public.search_messages(
+  uuid, text, boolean, text, text, uuid, uuid, integer, real, timestamptz, uuid
+) to service_role;
@@ -0,0 +1,21 @@
+-- ============================================================
+-- qbo_sync_state — per-realm high-water mark for incremental QBO sync.
+--
+-- /qbo/sync?incremental=true reads last_synced_at, asks QBO's Change Data
+-- Capture endpoint for everything changed since then, and applies only
+-- those upserts / deletes (see api/routers/qbo.py). Every successful sync
+-- (full or incremental) advances the mark to the time its fetch started.
+-- Idempotent. Run on staging, then prod.
+-- ============================================================
+
+create table if not exists public.qbo_sync_state (
+  realm_id        text not null,
+  scope           text not null,                 -- 'expenses'
+  last_synced_at  timestamptz not null,          -- fetch start of the last good sync
+  last_mode       text not null default 'full',  -- 'full' | 'incremental'
+  updated_at      timestamptz not null default now(),
+  primary key (realm_id, scope)
+);
+
+-- Incremental sync removes lines per transaction (edited / deleted in QBO)
+create index if not exists idx_qbo_expenses_txn on public.qbo_expenses (txn_type, txn_id);
@@ -0,0 +1,24 @@
+-- ============================================
+-- DEPENDENCY GRAPH SUPPORT
+-- ============================================
+-- api/services/dependency_graph.py loads one project's dependencies by
+-- predecessor / successor (existing indexes), and the workload scheduler
+-- reads the explicit ones (is_auto_generated = false) on every
+-- recalculation to hold successors back. Old rows have NULL there, which
+-- an equality filter would miss, so the flag becomes NOT NULL.
+--
+-- Idempotent. Run on staging, then prod.
+
+ALTER TABLE task_dependencies ADD COLUMN IF NOT EXISTS is_auto_generated BOOLEAN DEFAULT FALSE;
+
+UPDATE task_dependencies SET is_auto_generated = FALSE WHERE is_auto_generated IS NULL;
+
+ALTER TABLE task_dependencies ALTER COLUMN is_auto_generated SET DEFAULT FALSE;
+ALTER TABLE task_dependencies ALTER COLUMN is_auto_generated SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_task_dependencies_explicit
+    ON task_dependencies(successor_task_id)
+    WHERE is_auto_generated = FALSE;
+
+-- VERIFICATION
+-- select is_auto_generated, count(*) from task_dependencies group by 1;
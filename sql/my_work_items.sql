@@ -0,0 +1,132 @@
+-- ============================================
+-- MY WORK PROJECTION (my_work_items)
+-- ============================================
+-- One row per (user, open task) the user works on, as owner or as manager
+-- (managers_ids[] or the legacy single manager; owner wins when both).
+-- "Open" = status Not Started / Working on It.
+--
+-- Kept current by a trigger on tasks, so every write path (create, patch,
+-- start, approve, reject, duties, scheduler, scripts) updates it. Rows hold
+-- task fields only; names (project, priority, type, status) are resolved by
+-- the API from its cached lookups, so renames need no rewrite here.
+--
+--   GET /pipeline/my-work/{user_id}       -> one read on the primary key
+--   GET /pipeline/my-work/team-overview   -> one read of owner rows
+--
+-- Idempotent (the backfill at the end rebuilds the table). Run on staging,
+-- then prod.
+
+CREATE TABLE IF NOT EXISTS my_work_items (
+    user_id UUID NOT NULL,
+    task_id UUID NOT NULL REFERENCES tasks(task_id) ON DELETE CASCADE,
+    role TEXT NOT NULL,                -- owner | manager
+    task JSONB NOT NULL,               -- projected task fields (see _my_work_task)
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, task_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_my_work_items_task ON my_work_items(task_id);
+CREATE INDEX IF NOT EXISTS idx_my_work_items_owner ON my_work_items(user_id) WHERE role = 'owner';
+
+ALTER TABLE my_work_items ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role full access" ON my_work_items;
+CREATE POLICY "Service role full access" ON my_work_items
+    FOR ALL
+    USING (auth.role() = 'service_role')
+    WITH CHECK (auth.role() = 'service_role');
+
+-- --------------------------------------------
+-- Projected fields. Picked from to_jsonb(row) so optional columns
+-- (canvas_x / canvas_y, ...) simply drop out where they don't exist.
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION _my_work_task(p_row JSONB)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_object_agg(key, value), '{}'::jsonb)
+      FROM jsonb_each(p_row)
+     WHERE key = ANY (ARRAY[
+        'task_id', 'task_description', 'task_notes', 'project_id', 'task_priority',
+        'task_status', 'task_type', 'Owner_id', 'managers_ids', 'manager',
+        'due_date', 'deadline', 'estimated_hours', 'time_start', 'created_at',
+        'canvas_x', 'canvas_y'
+     ]);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Users a task row shows up for: owner first, then managers (deduplicated).
+CREATE OR REPLACE FUNCTION _my_work_assignees(p_row JSONB)
+RETURNS TABLE (user_id UUID, role TEXT) AS $$
+    WITH raw AS (
+        SELECT p_row->>'Owner_id' AS uid, 'owner' AS role, 0 AS rank
+        UNION ALL
+        SELECT m, 'manager', 1
+          FROM jsonb_array_elements_text(
+                   CASE WHEN jsonb_typeof(p_row->'managers_ids') = 'array'
+                        THEN p_row->'managers_ids' ELSE '[]'::jsonb END) AS m
+        UNION ALL
+        SELECT p_row->>'manager', 'manager', 2
+    )
+    SELECT DISTINCT ON (uid) uid::uuid, role
+      FROM raw
+     WHERE uid ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+     ORDER BY uid, rank;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION _my_work_status_open(p_status_id UUID)
+RETURNS BOOLEAN AS $$
+    SELECT COALESCE((
+        SELECT lower(task_status) IN ('not started', 'working on it')
+          FROM tasks_status WHERE task_status_id = p_status_id
+    ), FALSE);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION sync_my_work_items()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_new JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM my_work_items WHERE task_id = OLD.task_id;
+        RETURN OLD;
+    END IF;
+
+    v_new := _my_work_task(to_jsonb(NEW));
+
+    -- Writes that touch none of the projected fields (scheduling, updated_at...)
+    -- leave the projection alone.
+    IF TG_OP = 'UPDATE' AND _my_work_task(to_jsonb(OLD)) = v_new THEN
+        RETURN NEW;
+    END IF;
+
+    DELETE FROM my_work_items WHERE task_id = NEW.task_id;
+
+    IF _my_work_status_open(NEW.task_status) THEN
+        INSERT INTO my_work_items (user_id, task_id, role, task, updated_at)
+        SELECT a.user_id, NEW.task_id, a.role, v_new, NOW()
+          FROM _my_work_assignees(v_new) a
+        ON CONFLICT (user_id, task_id) DO NOTHING;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trigger_sync_my_work_items ON tasks;
+CREATE TRIGGER trigger_sync_my_work_items
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_my_work_items();
+
+-- --------------------------------------------
+-- Backfill (rebuild from tasks)
+-- --------------------------------------------
+DELETE FROM my_work_items;
+
+INSERT INTO my_work_items (user_id, task_id, role, task)
+SELECT a.user_id, t.task_id, a.role, _my_work_task(to_jsonb(t))
+  FROM tasks t
+ CROSS JOIN LATERAL _my_work_assignees(_my_work_task(to_jsonb(t))) a
+ WHERE _my_work_status_open(t.task_status)
+ON CONFLICT (user_id, task_id) DO NOTHING;
+
+-- VERIFICATION
+-- select role, count(*) from my_work_items group by role;
@@ -0,0 +1,120 @@
+-- ============================================
+-- PIPELINE BOARD (GET /pipeline/board)
+-- ============================================
+-- Supports the paged, incremental task board:
+--
+--   1. tasks.updated_at (+ trigger)   -> "changed since" polling and the
+--                                        "recently closed" filter
+--   2. task_deletions (+ trigger)     -> tombstones so since= can report
+--                                        deleted task ids
+--   3. pipeline_board(...)            -> one query: workspace scope, open +
+--                                        recently closed filter, top N per
+--                                        status (window function) and each
+--                                        status's total, returning only the
+--                                        columns the board renders
+--
+-- Idempotent. Run on staging, then prod.
+
+-- ============================================
+-- 1. tasks.updated_at
+-- ============================================
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION update_task_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_task_timestamp ON tasks;
+CREATE TRIGGER trigger_update_task_timestamp
+    BEFORE UPDATE ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION update_task_timestamp();
+
+CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(task_status, created_at DESC);
+
+-- ============================================
+-- 2. task_deletions (tombstones, pruned after 30 days by the trigger)
+-- ============================================
+CREATE TABLE IF NOT EXISTS task_deletions (
+    task_id UUID PRIMARY KEY,
+    company_management UUID,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_deletions_deleted_at ON task_deletions(deleted_at);
+
+CREATE OR REPLACE FUNCTION record_task_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO task_deletions (task_id, company_management, deleted_at)
+    VALUES (OLD.task_id, OLD.company_management, NOW())
+    ON CONFLICT (task_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    DELETE FROM task_deletions WHERE deleted_at < NOW() - INTERVAL '30 days';
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_record_task_deletion ON tasks;
+CREATE TRIGGER trigger_record_task_deletion
+    AFTER DELETE ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION record_task_deletion();
+
+ALTER TABLE task_deletions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role full access" ON task_deletions;
+CREATE POLICY "Service role full access" ON task_deletions
+    FOR ALL
+    USING (auth.role() = 'service_role')
+    WITH CHECK (auth.role() = 'service_role');
+
+-- ============================================
+-- 3. pipeline_board()
+-- ============================================
+-- p_closed_status_ids: statuses that count as closed ("done"/"complete").
+-- p_closed_since: closed tasks last updated before this are left out
+--                 (NULL = keep every closed task).
+-- p_status_id + p_offset: "load more" for a single column.
+CREATE OR REPLACE FUNCTION pipeline_board(
+    p_company_id UUID DEFAULT NULL,
+    p_per_status INTEGER DEFAULT 100,
+    p_closed_status_ids UUID[] DEFAULT '{}',
+    p_closed_since TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_status_id UUID DEFAULT NULL,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (task JSONB, status_total BIGINT) AS $$
+    WITH scoped AS (
+        SELECT
+            t.task_id, t.task_description, t.task_status, t.task_priority,
+            t.task_finished_status, t.project_id, t.company_management,
+            t.task_department, t.task_type, t."Owner_id", t.collaborators_ids,
+            t."Colaborators_id", t.managers_ids, t.manager, t.due_date,
+            t.start_date, t.deadline, t.time_start, t.time_finish,
+            t.estimated_hours, t.docs_link, t.result_link, t.is_automated,
+            t.automation_type, t.created_at, t.updated_at
+        FROM tasks t
+        WHERE (p_company_id IS NULL OR t.company_management = p_company_id OR t.company_management IS NULL)
+          AND (p_status_id IS NULL OR t.task_status = p_status_id)
+          AND (p_closed_since IS NULL
+               OR t.task_status IS NULL
+               OR NOT (t.task_status = ANY(p_closed_status_ids))
+               OR t.updated_at >= p_closed_since)
+    ),
+    ranked AS (
+        SELECT
+            s.*,
+            ROW_NUMBER() OVER (PARTITION BY s.task_status ORDER BY s.created_at DESC, s.task_id) AS rn,
+            COUNT(*) OVER (PARTITION BY s.task_status) AS total
+        FROM scoped s
+    )
+    SELECT to_jsonb(r) - 'rn' - 'total', r.total
+    FROM ranked r
+    WHERE r.rn > p_offset AND r.rn <= p_offset + p_per_status
+    ORDER BY r.task_status, r.rn;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
@@ -0,0 +1,41 @@
+-- ============================================
+-- WORKLOAD BULK SCHEDULE
+-- ============================================
+-- apply_task_schedule(rows): writes a batch of planned schedules computed by
+-- api/services/workload_scheduler.py in one statement, so recalculating a
+-- whole team is one round trip instead of one UPDATE per task.
+--
+-- p_rows: [{"task_id", "scheduled_start_date", "scheduled_end_date",
+--           "queue_position", "scheduling_status", "blocked_by_task_id",
+--           "auto_linked"}]
+-- Returns the number of tasks updated. The API falls back to per-row
+-- updates while the function is missing.
+--
+-- Idempotent. Run on staging, then prod.
+
+CREATE OR REPLACE FUNCTION apply_task_schedule(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE tasks t
+       SET scheduled_start_date = (x.j->>'scheduled_start_date')::timestamptz,
+           scheduled_end_date   = (x.j->>'scheduled_end_date')::timestamptz,
+           queue_position       = (x.j->>'queue_position')::integer,
+           scheduling_status    = COALESCE(x.j->>'scheduling_status', 'scheduled'),
+           blocked_by_task_id   = (x.j->>'blocked_by_task_id')::uuid,
+           auto_linked          = COALESCE((x.j->>'auto_linked')::boolean, FALSE)
+      FROM jsonb_array_elements(p_rows) AS x(j)
+     WHERE t.task_id = (x.j->>'task_id')::uuid;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- SECURITY DEFINER with a pinned search_path; EXECUTE is revoked from
+-- public/anon/authenticated so only service_role (the API) can call it.
+REVOKE EXECUTE ON FUNCTION apply_task_schedule(JSONB) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_task_schedule(JSONB) TO service_role;
+
+-- Time-off lookups for the whole team ("still upcoming" filter).
+CREATE INDEX IF NOT EXISTS idx_user_time_off_end ON user_time_off(end_date);